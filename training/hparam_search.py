@@ -0,0 +1,399 @@
+import os
+import sys
+import json
+import math
+import time
+import copy
+import random
+import logging
+import argparse
+import statistics
+
+from .train_runner import PROJECT_ROOT, ResultsTail
+from .job_queue import expand_grid, start_train_process, stop_process, find_save_dir
+
+logger = logging.getLogger('YOLOLabelCreator.HparamSearch')
+
+# 搜索策略
+STRATEGY_GRID = "grid"      # 搜索空间的所有组合，按中位数规则提前停止
+STRATEGY_RANDOM = "random"  # 随机采样，按中位数规则提前停止
+STRATEGY_ASHA = "asha"      # 随机采样，异步逐次减半（在各梯级只保留前1/eta的试验）
+STRATEGIES = (STRATEGY_GRID, STRATEGY_RANDOM, STRATEGY_ASHA)
+
+# 试验状态
+TRIAL_PENDING = "pending"
+TRIAL_RUNNING = "running"
+TRIAL_DONE = "done"
+TRIAL_STOPPED = "stopped"  # 表现较差被提前停止
+TRIAL_FAILED = "failed"
+
+# 搜索输出目录（每次搜索一个子目录：试验设置、日志、训练输出和search.json）
+SEARCH_ROOT = os.path.join(PROJECT_ROOT, "runs", "hparam_search")
+
+DEFAULT_POLL_INTERVAL = 5
+
+
+def fitness(row):
+    """
+    由results.csv的一行计算综合指标（与ultralytics一致：0.1*mAP50 + 0.9*mAP50-95）
+
+    姿态模型同时累加边界框(B)和关键点(P)指标。没有验证指标时返回None。
+    """
+    total = None
+    for suffix in ("(B)", "(P)"):
+        map50 = row.get(f"metrics/mAP50{suffix}")
+        map50_95 = row.get(f"metrics/mAP50-95{suffix}")
+        if isinstance(map50, float) and isinstance(map50_95, float):
+            total = (total or 0.0) + 0.1 * map50 + 0.9 * map50_95
+    return total
+
+
+def sample_value(spec, rng):
+    """按参数定义随机采样一个取值"""
+    if isinstance(spec, list):
+        return rng.choice(spec)
+    kind = spec.get("type", "choice")
+    if kind == "choice":
+        return rng.choice(spec["values"])
+    if kind == "uniform":
+        return rng.uniform(spec["low"], spec["high"])
+    if kind == "loguniform":
+        return math.exp(rng.uniform(math.log(spec["low"]), math.log(spec["high"])))
+    if kind == "int":
+        step = spec.get("step", 1)
+        return rng.randrange(spec["low"], spec["high"] + 1, step)
+    raise ValueError(f"未知的参数类型: {kind}")
+
+
+def grid_values(key, spec):
+    """网格搜索中参数的所有取值（只支持离散取值）"""
+    if isinstance(spec, list):
+        return spec
+    kind = spec.get("type", "choice")
+    if kind == "choice":
+        return spec["values"]
+    if kind == "int":
+        return list(range(spec["low"], spec["high"] + 1, spec.get("step", 1)))
+    raise ValueError(f"网格搜索不支持连续参数: {key} ({kind})，请改用 random 或 asha")
+
+
+def asha_rungs(min_epochs, max_epochs, eta):
+    """ASHA的梯级（轮数）：min_epochs, min_epochs*eta, ...，不超过max_epochs"""
+    rungs = []
+    epoch = max(1, int(min_epochs))
+    while epoch < max_epochs:
+        rungs.append(epoch)
+        epoch *= eta
+    return rungs
+
+
+class Trial:
+    """一次超参数试验（一个训练进程）"""
+
+    def __init__(self, trial_id, params, settings):
+        self.id = trial_id
+        self.params = params
+        self.settings = settings
+        self.status = TRIAL_PENDING
+        self.process = None
+        self.log_file = None
+        self.log_path = None
+        self.save_dir = None
+        self.results = None
+        self.history = []  # 每轮的综合指标（到该轮为止的最好值）
+        self.started = None
+        self.finished = None
+        self.exit_code = None
+        self.stop_reason = None
+
+    @property
+    def best_fitness(self):
+        return self.history[-1] if self.history else None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "params": self.params,
+            "status": self.status,
+            "epochs": len(self.history),
+            "best_fitness": self.best_fitness,
+            "history": self.history,
+            "wall_time": (self.finished or time.time()) - self.started if self.started else None,
+            "exit_code": self.exit_code,
+            "stop_reason": self.stop_reason,
+            "save_dir": self.save_dir,
+            "log_path": self.log_path,
+        }
+
+
+class HyperparameterSearch:
+    """
+    基于train_yolo.py的超参数搜索
+
+    每个试验以子进程运行train_yolo.py（较少的轮数、可只用部分训练集作为快速试验），
+    运行中持续读取results.csv，表现较差的试验被提前停止：
+    grid/random按中位数规则（某轮的最好指标低于其他试验同一轮的中位数时停止），
+    asha在每个梯级只保留指标位于前1/eta的试验。搜索结束后最佳参数写回训练设置文件。
+
+    Args:
+        template (dict): 训练设置模板（yolo_train_settings.json格式）
+        space (dict): 搜索空间 {参数名: [取值...] 或 {"type": "uniform"/"loguniform"/"int"/"choice", ...}}
+        strategy (str): 搜索策略，见STRATEGIES
+        n_trials (int): random/asha的试验数量（grid为全部组合，可用n_trials截断）
+        max_epochs (int): 每个试验的最大轮数
+        min_epochs (int): 开始比较前至少训练的轮数（ASHA的第一个梯级）
+        eta (int): ASHA的减半系数
+        fraction (float): 快速试验使用的训练集比例
+        parallel (int): 同时运行的试验数量
+    """
+
+    def __init__(self, template, space, strategy=STRATEGY_ASHA, n_trials=16, max_epochs=30, min_epochs=3,
+                 eta=3, fraction=1.0, parallel=1, python_executable=None, seed=0, output_dir=None,
+                 poll_interval=DEFAULT_POLL_INTERVAL):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"未知的搜索策略: {strategy}")
+        self.template = template
+        self.space = space
+        self.strategy = strategy
+        self.n_trials = n_trials
+        self.max_epochs = int(max_epochs)
+        self.min_epochs = int(min_epochs)
+        self.eta = max(2, int(eta))
+        self.fraction = fraction
+        self.parallel = max(1, int(parallel))
+        self.python_executable = python_executable or sys.executable
+        self.rng = random.Random(seed)
+        self.output_dir = output_dir or os.path.join(SEARCH_ROOT, time.strftime("%Y%m%d-%H%M%S"))
+        self.poll_interval = poll_interval
+        self.rungs = asha_rungs(self.min_epochs, self.max_epochs, self.eta)
+        self.rung_results = {}   # ASHA: 梯级轮数 -> [试验在该梯级的指标]
+        self.epoch_results = {}  # 中位数规则: 轮数 -> {试验编号: 到该轮为止的最好指标}
+        self.trials = [self.create_trial(i + 1, params) for i, params in enumerate(self.generate_params())]
+
+    def generate_params(self):
+        if self.strategy == STRATEGY_GRID:
+            configs = expand_grid({key: grid_values(key, spec) for key, spec in self.space.items()})
+            return configs[:self.n_trials] if self.n_trials else configs
+        return [{key: sample_value(spec, self.rng) for key, spec in self.space.items()}
+                for _ in range(self.n_trials)]
+
+    def create_trial(self, trial_id, params):
+        settings = copy.deepcopy(self.template)
+        settings.update(params)
+        settings["epochs"] = self.max_epochs
+        settings["patience"] = self.max_epochs
+        settings["project_path"] = os.path.join(self.output_dir, "runs")
+        settings["name"] = f"trial_{trial_id}"
+        if self.fraction < 1.0:
+            settings["fraction"] = self.fraction
+        return Trial(trial_id, params, settings)
+
+    def launch(self, trial):
+        os.makedirs(self.output_dir, exist_ok=True)
+        settings_path = os.path.join(self.output_dir, f"trial_{trial.id}.json")
+        trial.log_path = os.path.join(self.output_dir, f"trial_{trial.id}.log")
+        try:
+            trial.process, trial.log_file = start_train_process(self.python_executable, trial.settings,
+                                                                settings_path, trial.log_path)
+        except OSError as e:
+            logger.error(f"启动试验 #{trial.id} 失败: {str(e)}")
+            trial.status = TRIAL_FAILED
+            return
+        trial.status = TRIAL_RUNNING
+        trial.started = time.time()
+        logger.info(f"试验 #{trial.id} 已启动: {trial.params}")
+
+    def should_stop(self, trial):
+        """根据试验最新一轮的指标判断是否提前停止，返回停止原因（继续时返回None）"""
+        epoch = len(trial.history)
+        score = trial.best_fitness
+        if score is None or epoch >= self.max_epochs:
+            return None
+
+        if self.strategy == STRATEGY_ASHA:
+            if epoch not in self.rungs:
+                return None
+            results = self.rung_results.setdefault(epoch, [])
+            results.append(score)
+            if len(results) < self.eta:
+                return None
+            keep = max(1, len(results) // self.eta)
+            threshold = sorted(results, reverse=True)[keep - 1]
+            if score < threshold:
+                return f"第{epoch}轮指标 {score:.4f} 未进入前1/{self.eta}（阈值 {threshold:.4f}）"
+            return None
+
+        self.epoch_results.setdefault(epoch, {})[trial.id] = score
+        if epoch < self.min_epochs:
+            return None
+        others = [value for trial_id, value in self.epoch_results[epoch].items() if trial_id != trial.id]
+        if len(others) < 2:
+            return None
+        median = statistics.median(others)
+        if score < median:
+            return f"第{epoch}轮指标 {score:.4f} 低于中位数 {median:.4f}"
+        return None
+
+    def update_trial(self, trial):
+        """读取试验新增的results.csv行，必要时提前停止试验"""
+        if trial.results is None:
+            trial.save_dir = find_save_dir(trial.log_path)
+            if trial.save_dir is None:
+                return
+            trial.results = ResultsTail(os.path.join(trial.save_dir, "results.csv"))
+        for row in trial.results.read_new_rows():
+            score = fitness(row)
+            best = trial.best_fitness
+            if score is None:
+                score = best
+            elif best is not None:
+                score = max(score, best)
+            trial.history.append(score)
+            reason = self.should_stop(trial)
+            if reason and trial.status == TRIAL_RUNNING:
+                logger.info(f"提前停止试验 #{trial.id}: {reason}")
+                trial.stop_reason = reason
+                trial.status = TRIAL_STOPPED
+                stop_process(trial.process)
+                break
+
+    def poll(self):
+        for trial in self.trials:
+            if trial.process is None or trial.finished is not None:
+                continue
+            self.update_trial(trial)
+            exit_code = trial.process.poll()
+            if exit_code is None:
+                continue
+            self.update_trial(trial)
+            trial.log_file.close()
+            trial.finished = time.time()
+            trial.exit_code = exit_code
+            if trial.status == TRIAL_RUNNING:
+                trial.status = TRIAL_DONE if exit_code == 0 else TRIAL_FAILED
+            best = f"{trial.best_fitness:.4f}" if trial.best_fitness is not None else "-"
+            logger.info(f"试验 #{trial.id} 结束: {trial.status}, 轮数 {len(trial.history)}, 最好指标 {best}")
+            self.save_summary()
+
+    def best_trial(self):
+        """最好指标最高的试验（被提前停止的试验也参与比较）"""
+        scored = [trial for trial in self.trials if trial.best_fitness is not None]
+        if not scored:
+            return None
+        return max(scored, key=lambda trial: trial.best_fitness)
+
+    def save_summary(self):
+        best = self.best_trial()
+        summary = {
+            "strategy": self.strategy,
+            "space": self.space,
+            "max_epochs": self.max_epochs,
+            "min_epochs": self.min_epochs,
+            "eta": self.eta,
+            "fraction": self.fraction,
+            "rungs": self.rungs if self.strategy == STRATEGY_ASHA else None,
+            "best_trial": best.id if best else None,
+            "trials": [trial.to_dict() for trial in self.trials],
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        tmp_path = os.path.join(self.output_dir, "search.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, os.path.join(self.output_dir, "search.json"))
+
+    def write_best_settings(self, path):
+        """
+        将最佳参数写回训练设置文件（以模板为基础，保留模板的训练轮数、实验名称等，
+        不包含快速试验使用的轮数和数据子集）
+
+        Returns:
+            dict: 最佳训练设置，没有可用结果时返回None
+        """
+        best = self.best_trial()
+        if best is None:
+            return None
+        settings = copy.deepcopy(self.template)
+        settings.update(best.params)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(settings, f, ensure_ascii=False, indent=4)
+        logger.info(f"最佳参数（试验 #{best.id}，指标 {best.best_fitness:.4f}）已写入: {path}")
+        return settings
+
+    def run(self):
+        """运行全部试验，返回最佳试验（没有可用结果时返回None）"""
+        logger.info(f"开始超参数搜索: {self.strategy}, {len(self.trials)} 个试验, 输出目录 {self.output_dir}")
+        pending = [trial for trial in self.trials if trial.status == TRIAL_PENDING]
+        try:
+            while True:
+                self.poll()
+                running = [trial for trial in self.trials
+                           if trial.process is not None and trial.finished is None]
+                while pending and len(running) < self.parallel:
+                    trial = pending.pop(0)
+                    self.launch(trial)
+                    if trial.status == TRIAL_RUNNING:
+                        running.append(trial)
+                if not running and not pending:
+                    break
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            logger.info("搜索被中断，正在停止运行中的试验")
+            for trial in self.trials:
+                if trial.process is not None and trial.finished is None:
+                    stop_process(trial.process)
+                    trial.log_file.close()
+                    trial.finished = time.time()
+                    trial.status = TRIAL_STOPPED
+                    trial.stop_reason = "搜索被中断"
+            raise
+        finally:
+            self.save_summary()
+        return self.best_trial()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="YOLO超参数搜索")
+    parser.add_argument("--space", required=True,
+                        help='搜索空间JSON文件，如 {"lr0": {"type": "loguniform", "low": 0.0001, "high": 0.05}, '
+                             '"model_type": ["yolov8n", "yolov8s"]}')
+    parser.add_argument("--template", default=os.path.join(PROJECT_ROOT, "config", "yolo_train_settings.json"),
+                        help="训练设置模板")
+    parser.add_argument("--strategy", choices=STRATEGIES, default=STRATEGY_ASHA, help="搜索策略")
+    parser.add_argument("-n", "--trials", type=int, default=16, help="试验数量（grid为最多试验数量，0表示全部组合）")
+    parser.add_argument("--epochs", type=int, default=30, help="每个试验的最大轮数")
+    parser.add_argument("--min-epochs", type=int, default=3, help="开始比较前至少训练的轮数")
+    parser.add_argument("--eta", type=int, default=3, help="ASHA减半系数")
+    parser.add_argument("--fraction", type=float, default=1.0, help="快速试验使用的训练集比例（如0.25）")
+    parser.add_argument("-j", "--parallel", type=int, default=1, help="同时运行的试验数量")
+    parser.add_argument("--python", help="运行训练脚本的Python解释器（默认当前解释器）")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default=os.path.join(PROJECT_ROOT, "config", "yolo_train_settings.best.json"),
+                        help="最佳训练设置的输出路径")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    with open(args.template, "r", encoding="utf-8") as f:
+        template = json.load(f)
+    with open(args.space, "r", encoding="utf-8") as f:
+        space = json.load(f)
+
+    search = HyperparameterSearch(template, space, args.strategy, args.trials, args.epochs, args.min_epochs,
+                                  args.eta, args.fraction, args.parallel, args.python, args.seed)
+    try:
+        best = search.run()
+    except KeyboardInterrupt:
+        best = search.best_trial()
+    if best is None:
+        print("没有得到可用的试验结果")
+        return 1
+    search.write_best_settings(args.output)
+    print(f"最佳试验 #{best.id}: {best.params}，指标 {best.best_fitness:.4f}")
+    print(f"最佳训练设置已写入: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
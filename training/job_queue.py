@@ -0,0 +1,602 @@
+import os
+import sys
+import json
+import time
+import copy
+import logging
+import argparse
+import itertools
+import threading
+import contextlib
+import subprocess
+
+from .train_runner import (TRAIN_SCRIPT, PROJECT_ROOT, SAVE_DIR_MARKER, ResultsTail,
+                           conda_env_prefix, conda_path_dirs)
+
+# 尝试导入 psutil（用于检查内存和CPU占用，不可用时使用系统接口的近似值）
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger('YOLOLabelCreator.JobQueue')
+
+# 队列文件及每个任务的设置文件、日志目录
+QUEUE_PATH = os.path.join(PROJECT_ROOT, "config", "train_queue.json")
+JOB_DIR = os.path.join(PROJECT_ROOT, "logs", "train_queue")
+QUEUE_VERSION = 1
+
+# 任务状态
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+JOB_STATUSES = (JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+# 调度器检查任务状态的间隔（秒）；启动一个任务后至少等待该时间再启动下一个，
+# 让新任务的内存和CPU占用体现在资源检查中
+DEFAULT_POLL_INTERVAL = 10
+LAUNCH_SETTLE_TIME = 60
+
+# 停止任务时等待进程退出的时间（秒），超时后强制结束
+STOP_TIMEOUT = 10
+
+# 挑选最佳轮次时使用的指标（按顺序取第一个存在的列）
+FITNESS_KEYS = ("metrics/mAP50-95(P)", "metrics/mAP50-95(B)", "metrics/mAP50(B)")
+
+
+def expand_grid(grid):
+    """
+    将参数网格展开为覆盖参数列表
+
+    Args:
+        grid (dict): {参数名: [取值, ...]}
+
+    Returns:
+        list: [{参数名: 取值, ...}, ...]，参数组合的笛卡尔积
+    """
+    if not grid:
+        return [{}]
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def variant_suffix(overrides):
+    """由覆盖参数生成实验名称后缀，如 model_type=yolov8s, lr0=0.001 -> yolov8s_lr0-0.001"""
+    parts = []
+    for key, value in overrides.items():
+        if key == "model_type":
+            parts.append(str(value))
+        else:
+            parts.append(f"{key}-{value}")
+    return "_".join(parts).replace(os.sep, "-").replace("/", "-")
+
+
+def read_final_metrics(save_dir):
+    """
+    读取训练结果目录中results.csv的最终指标
+
+    Returns:
+        dict: {'final': 最后一轮的指标, 'best': 最佳一轮的指标, 'epochs': 完成的轮数}，
+              没有结果时返回None
+    """
+    rows = ResultsTail(os.path.join(save_dir, "results.csv")).read_new_rows()
+    if not rows:
+        return None
+    final = rows[-1]
+    best = final
+    for key in FITNESS_KEYS:
+        if key in final:
+            best = max(rows, key=lambda row: row.get(key) if isinstance(row.get(key), float) else -1.0)
+            break
+    return {"final": final, "best": best, "epochs": len(rows)}
+
+
+def start_train_process(python_executable, settings, settings_path, log_path):
+    """
+    写入训练设置并以非交互方式启动train_yolo.py，输出写入日志文件
+
+    Returns:
+        tuple: (subprocess.Popen, 已打开的日志文件)，调用方在进程结束后关闭日志文件
+    """
+    with open(settings_path, "w", encoding="utf-8") as f:
+        json.dump(settings, f, ensure_ascii=False, indent=4)
+    env = dict(os.environ, PYTHONUNBUFFERED="1", PYTHONIOENCODING="utf-8")
+    prefix = conda_env_prefix(python_executable)
+    if prefix:
+        env["PATH"] = os.pathsep.join(conda_path_dirs(prefix) + [env.get("PATH", "")])
+        env["CONDA_PREFIX"] = prefix
+    log_file = open(log_path, "w", encoding="utf-8")
+    try:
+        process = subprocess.Popen(
+            [python_executable, "-u", TRAIN_SCRIPT, "--settings", settings_path, "--yes"],
+            cwd=PROJECT_ROOT, stdout=log_file, stderr=subprocess.STDOUT,
+            stdin=subprocess.DEVNULL, env=env)
+    except OSError:
+        log_file.close()
+        raise
+    return process, log_file
+
+
+def stop_process(process, timeout=STOP_TIMEOUT):
+    """结束训练进程，超时未退出时强制结束"""
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def pid_alive(pid):
+    """进程是否仍在运行"""
+    if not pid:
+        return False
+    if PSUTIL_AVAILABLE:
+        return psutil.pid_exists(pid)
+    if sys.platform == "win32":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+@contextlib.contextmanager
+def file_lock(lock_path):
+    """跨进程的排他文件锁（阻塞直到获得锁）"""
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if sys.platform == "win32":
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK重试约10秒后仍未获得锁时抛出异常，继续等待
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def find_save_dir(log_path):
+    """从训练日志中查找训练脚本输出的结果目录"""
+    save_dir = None
+    try:
+        with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if line.startswith(SAVE_DIR_MARKER):
+                    save_dir = line[len(SAVE_DIR_MARKER):].strip()
+    except OSError:
+        return None
+    return save_dir
+
+
+class TrainJobQueue:
+    """
+    持久化的训练任务队列（JSON文件）
+
+    每个任务保存完整的训练设置（yolo_train_settings.json格式）以及状态、起止时间、
+    耗时和最终指标。每次修改都在跨进程文件锁（队列文件旁的.lock文件）内重新读取
+    文件后再原子写入，图形界面和调度器进程同时修改队列时不会丢失对方的写入。
+    """
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self.lock_path = f"{path}.lock"
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        with self._lock, file_lock(self.lock_path):
+            yield
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {"version": QUEUE_VERSION, "next_id": 1, "jobs": []}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取训练队列失败: {self.path}, 错误: {str(e)}")
+            raise
+        data.setdefault("next_id", max([job["id"] for job in data.get("jobs", [])], default=0) + 1)
+        data.setdefault("jobs", [])
+        return data
+
+    def _save(self, data):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, self.path)
+
+    def _modify(self, func):
+        """读取-修改-写入队列文件，返回func的返回值"""
+        with self._locked():
+            data = self._load()
+            result = func(data)
+            self._save(data)
+            return result
+
+    def jobs(self):
+        """所有任务（按添加顺序）"""
+        with self._locked():
+            return self._load()["jobs"]
+
+    def get(self, job_id):
+        for job in self.jobs():
+            if job["id"] == job_id:
+                return job
+        return None
+
+    def add_job(self, settings, overrides=None, name=None, priority=0):
+        """
+        添加一个训练任务
+
+        Args:
+            settings (dict): 训练设置模板
+            overrides (dict, optional): 覆盖模板中的参数
+            name (str, optional): 实验名称，默认为模板名称加任务编号和参数后缀
+            priority (int): 优先级，数值大的先运行
+
+        Returns:
+            dict: 新添加的任务
+        """
+        overrides = dict(overrides or {})
+        job_settings = copy.deepcopy(settings)
+        job_settings.update(overrides)
+
+        def add(data):
+            job_id = data["next_id"]
+            data["next_id"] = job_id + 1
+            job_name = name
+            if not job_name:
+                suffix = variant_suffix(overrides)
+                job_name = f"{settings.get('name') or 'exp'}_q{job_id}" + (f"_{suffix}" if suffix else "")
+            # 每个任务使用独立的实验名称，避免训练输出互相覆盖
+            job_settings["name"] = job_name
+            job = {
+                "id": job_id,
+                "name": job_name,
+                "status": JOB_PENDING,
+                "priority": int(priority),
+                "overrides": overrides,
+                "settings": job_settings,
+                "created": time.time(),
+                "started": None,
+                "finished": None,
+                "wall_time": None,
+                "exit_code": None,
+                "attempts": 0,
+                "log_path": None,
+                "save_dir": None,
+                "metrics": None,
+                "scheduler_pid": None,
+            }
+            data["jobs"].append(job)
+            return job
+
+        job = self._modify(add)
+        logger.info(f"已添加训练任务 #{job['id']}: {job['name']}")
+        return job
+
+    def add_sweep(self, settings, grid, priority=0):
+        """按参数网格批量添加训练任务，返回添加的任务列表"""
+        return [self.add_job(settings, overrides, priority=priority) for overrides in expand_grid(grid)]
+
+    def update_job(self, job_id, **fields):
+        def update(data):
+            for job in data["jobs"]:
+                if job["id"] == job_id:
+                    job.update(fields)
+                    return job
+            return None
+        return self._modify(update)
+
+    def next_pending(self):
+        """下一个待运行的任务（优先级高的优先，同优先级按添加顺序）"""
+        pending = [job for job in self.jobs() if job["status"] == JOB_PENDING]
+        if not pending:
+            return None
+        return min(pending, key=lambda job: (-job.get("priority", 0), job["id"]))
+
+    def cancel(self, job_id):
+        """取消等待中或运行中的任务（运行中的任务由调度器停止）"""
+        job = self.get(job_id)
+        if job is None or job["status"] not in (JOB_PENDING, JOB_RUNNING):
+            return False
+        self.update_job(job_id, status=JOB_CANCELLED)
+        return True
+
+    def retry(self, job_id):
+        """将失败或已取消的任务重新放回队列"""
+        job = self.get(job_id)
+        if job is None or job["status"] not in (JOB_FAILED, JOB_CANCELLED):
+            return False
+        self.update_job(job_id, status=JOB_PENDING, exit_code=None, finished=None, wall_time=None)
+        return True
+
+    def remove_finished(self):
+        """移除已完成、失败和已取消的任务，返回移除的数量"""
+        def remove(data):
+            before = len(data["jobs"])
+            data["jobs"] = [job for job in data["jobs"] if job["status"] in (JOB_PENDING, JOB_RUNNING)]
+            return before - len(data["jobs"])
+        return self._modify(remove)
+
+    def reset_interrupted(self):
+        """
+        将状态为运行中、但运行它的调度器进程已不存在的任务放回队列
+
+        调度器异常退出（如断电）后再次启动时调用，返回放回队列的任务数量。
+        仍在运行的其他调度器的任务不受影响。
+        """
+        def reset(data):
+            count = 0
+            for job in data["jobs"]:
+                if job["status"] == JOB_RUNNING and not pid_alive(job.get("scheduler_pid")):
+                    job["status"] = JOB_PENDING
+                    job["scheduler_pid"] = None
+                    count += 1
+            return count
+        return self._modify(reset)
+
+
+def available_memory_gb():
+    """可用内存（GB），无法获取时返回None"""
+    if PSUTIL_AVAILABLE:
+        return psutil.virtual_memory().available / 1024 ** 3
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024 ** 3
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def cpu_usage_percent():
+    """CPU占用百分比，无法获取时返回None"""
+    if PSUTIL_AVAILABLE:
+        return psutil.cpu_percent(interval=1.0)
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1) * 100.0
+    except (OSError, AttributeError):
+        return None
+
+
+class JobScheduler:
+    """
+    训练任务调度器
+
+    依次从队列中取出任务，以子进程方式运行train_yolo.py（非交互），最多同时运行
+    max_parallel个任务。已有任务运行时，只有可用内存和CPU占用满足限制才会启动新任务。
+    每个任务的输出写入 logs/train_queue/job_<编号>.log，结束后记录退出码、耗时和
+    results.csv中的最终指标。
+    """
+
+    def __init__(self, queue, python_executable=None, max_parallel=1, min_free_ram_gb=None,
+                 max_cpu_percent=None, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.queue = queue
+        self.python_executable = python_executable or sys.executable
+        self.max_parallel = max(1, int(max_parallel))
+        self.min_free_ram_gb = min_free_ram_gb
+        self.max_cpu_percent = max_cpu_percent
+        self.poll_interval = poll_interval
+        self.running = {}  # job_id -> (Popen, 日志文件, 开始时间)
+        self.last_launch = 0.0
+
+    def resources_available(self):
+        """检查是否可以再启动一个任务，返回 (是否可以, 原因)"""
+        if len(self.running) >= self.max_parallel:
+            return False, f"已有 {len(self.running)} 个任务在运行"
+        if not self.running:
+            return True, ""
+        if time.time() - self.last_launch < LAUNCH_SETTLE_TIME:
+            return False, "等待上一个任务的资源占用稳定"
+        if self.min_free_ram_gb is not None:
+            free = available_memory_gb()
+            if free is not None and free < self.min_free_ram_gb:
+                return False, f"可用内存不足: {free:.1f}GB < {self.min_free_ram_gb}GB"
+        if self.max_cpu_percent is not None:
+            usage = cpu_usage_percent()
+            if usage is not None and usage > self.max_cpu_percent:
+                return False, f"CPU占用过高: {usage:.0f}% > {self.max_cpu_percent}%"
+        return True, ""
+
+    def launch(self, job):
+        """启动一个任务的训练进程"""
+        os.makedirs(JOB_DIR, exist_ok=True)
+        settings_path = os.path.join(JOB_DIR, f"job_{job['id']}.json")
+        log_path = os.path.join(JOB_DIR, f"job_{job['id']}.log")
+        try:
+            process, log_file = start_train_process(self.python_executable, job["settings"],
+                                                    settings_path, log_path)
+        except OSError as e:
+            logger.error(f"启动训练任务 #{job['id']} 失败: {str(e)}")
+            self.queue.update_job(job["id"], status=JOB_FAILED, finished=time.time(),
+                                  exit_code=None, log_path=log_path)
+            return False
+
+        started = time.time()
+        self.running[job["id"]] = (process, log_file, started)
+        self.last_launch = started
+        self.queue.update_job(job["id"], status=JOB_RUNNING, started=started, finished=None,
+                              wall_time=None, exit_code=None, log_path=log_path,
+                              attempts=job.get("attempts", 0) + 1, scheduler_pid=os.getpid())
+        logger.info(f"训练任务 #{job['id']} 已启动: {job['name']} (pid {process.pid})")
+        return True
+
+    def poll(self):
+        """检查运行中的任务，记录已结束任务的结果；停止被取消的任务"""
+        for job_id, (process, log_file, started) in list(self.running.items()):
+            job = self.queue.get(job_id)
+            cancelled = job is None or job["status"] == JOB_CANCELLED
+            if cancelled and process.poll() is None:
+                logger.info(f"训练任务 #{job_id} 已被取消，正在停止")
+                stop_process(process)
+            exit_code = process.poll()
+            if exit_code is None:
+                continue
+
+            log_file.close()
+            del self.running[job_id]
+            finished = time.time()
+            save_dir = find_save_dir(log_file.name)
+            metrics = read_final_metrics(save_dir) if save_dir else None
+            if cancelled:
+                status = JOB_CANCELLED
+            else:
+                status = JOB_DONE if exit_code == 0 else JOB_FAILED
+            if job is not None:
+                self.queue.update_job(job_id, status=status, finished=finished, wall_time=finished - started,
+                                      exit_code=exit_code, save_dir=save_dir, metrics=metrics,
+                                      scheduler_pid=None)
+            logger.info(f"训练任务 #{job_id} 结束: {status}, 退出码 {exit_code}, 耗时 {finished - started:.0f}s")
+
+    def run(self, stop_when_empty=True):
+        """
+        运行调度循环，直到队列中没有待运行的任务（stop_when_empty=False时持续等待新任务）
+
+        收到 KeyboardInterrupt 时停止所有运行中的任务并将其放回队列。
+        """
+        interrupted = self.queue.reset_interrupted()
+        if interrupted:
+            logger.info(f"{interrupted} 个上次中断的任务已放回队列")
+        waiting_reason = None
+        try:
+            while True:
+                self.poll()
+                job = self.queue.next_pending()
+                if job is None:
+                    if not self.running and stop_when_empty:
+                        break
+                else:
+                    available, reason = self.resources_available()
+                    if available:
+                        waiting_reason = None
+                        self.launch(job)
+                        continue
+                    if reason != waiting_reason:
+                        logger.info(f"任务 #{job['id']} 等待中: {reason}")
+                        waiting_reason = reason
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            logger.info("调度器被中断，正在停止运行中的任务")
+            for job_id, (process, log_file, started) in list(self.running.items()):
+                stop_process(process)
+                log_file.close()
+                self.queue.update_job(job_id, status=JOB_PENDING, started=None, scheduler_pid=None)
+            self.running.clear()
+            raise
+
+
+def format_job(job):
+    """单行显示任务的状态、耗时和最终指标"""
+    wall = f"{job['wall_time'] / 60:.1f}min" if job.get("wall_time") else "-"
+    metrics = ""
+    final = (job.get("metrics") or {}).get("final") or {}
+    for key, label in (("metrics/mAP50(B)", "mAP50"), ("metrics/mAP50-95(B)", "mAP50-95")):
+        if isinstance(final.get(key), float):
+            metrics += f" {label}={final[key]:.4f}"
+    return f"#{job['id']:<4} {job['status']:<10} {wall:>9}  {job['name']}{metrics}"
+
+
+def parse_grid(items):
+    """解析命令行参数网格：['lr0=0.01,0.001', 'model_type=yolov8n,yolov8s']"""
+    grid = {}
+    for item in items or []:
+        key, _, values = item.partition("=")
+        if not key or not values:
+            raise ValueError(f"无效的参数网格: {item}，格式应为 参数名=值1,值2")
+        parsed = []
+        for value in values.split(","):
+            try:
+                parsed.append(json.loads(value))
+            except ValueError:
+                parsed.append(value)
+        grid[key.strip()] = parsed
+    return grid
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="YOLO训练任务队列")
+    parser.add_argument("--queue", default=QUEUE_PATH, help="队列文件路径")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="按训练设置模板添加任务")
+    add.add_argument("--template", default=os.path.join(PROJECT_ROOT, "config", "yolo_train_settings.json"),
+                     help="训练设置模板（yolo_train_settings.json格式）")
+    add.add_argument("--grid", action="append", metavar="KEY=V1,V2",
+                     help="参数网格，可多次指定，如 --grid model_type=yolov8n,yolov8s --grid lr0=0.01,0.001")
+    add.add_argument("--priority", type=int, default=0, help="优先级，数值大的先运行")
+
+    commands.add_parser("list", help="列出所有任务")
+
+    run = commands.add_parser("run", help="运行调度器")
+    run.add_argument("--python", help="运行训练脚本的Python解释器（默认当前解释器）")
+    run.add_argument("-j", "--max-parallel", type=int, default=1, help="最多同时运行的任务数")
+    run.add_argument("--min-free-ram", type=float, help="启动新任务所需的最小可用内存（GB）")
+    run.add_argument("--max-cpu", type=float, help="启动新任务时允许的最大CPU占用（%%）")
+    run.add_argument("--watch", action="store_true", help="队列为空时继续等待新任务")
+
+    for name, text in (("cancel", "取消任务"), ("retry", "重新运行失败或已取消的任务")):
+        command = commands.add_parser(name, help=text)
+        command.add_argument("job_ids", type=int, nargs="+")
+
+    commands.add_parser("clean", help="移除已结束的任务")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    queue = TrainJobQueue(args.queue)
+
+    if args.command == "add":
+        with open(args.template, "r", encoding="utf-8") as f:
+            template = json.load(f)
+        for job in queue.add_sweep(template, parse_grid(args.grid), args.priority):
+            print(format_job(job))
+    elif args.command == "list":
+        for job in queue.jobs():
+            print(format_job(job))
+    elif args.command == "run":
+        scheduler = JobScheduler(queue, args.python, args.max_parallel, args.min_free_ram, args.max_cpu)
+        try:
+            scheduler.run(stop_when_empty=not args.watch)
+        except KeyboardInterrupt:
+            return 130
+        for job in queue.jobs():
+            print(format_job(job))
+    elif args.command in ("cancel", "retry"):
+        action = queue.cancel if args.command == "cancel" else queue.retry
+        for job_id in args.job_ids:
+            print(f"#{job_id}: {'成功' if action(job_id) else '无法操作（任务不存在或状态不符）'}")
+    elif args.command == "clean":
+        print(f"已移除 {queue.remove_finished()} 个任务")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
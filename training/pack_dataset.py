@@ -0,0 +1,97 @@
+import os
+import sys
+import hashlib
+import logging
+import argparse
+import tempfile
+
+import yaml
+
+from utils.shard_pack import (ShardWriter, write_pack_yaml, unpack_pack, DEFAULT_SHARD_BYTES, SPLIT_KEYS)
+from training.preprocess_cache import resolve_split_path, list_split_images, label_path_for
+
+logger = logging.getLogger('YOLOLabelCreator.PackDataset')
+
+# 训练前解包数据包的本地目录（按数据包路径区分）
+UNPACK_ROOT = os.path.join(tempfile.gettempdir(), 'labelcreator_packs')
+
+
+def pack_dataset(data_yaml, output_dir, shard_bytes=DEFAULT_SHARD_BYTES, progress=None):
+    """
+    将YOLO数据集（data.yaml中的train/val/test）导出为分片数据包
+
+    样本键为图像相对于划分目录的路径（不含扩展名），标签为同名的.txt。
+
+    Returns:
+        str: 数据包的data.yaml路径
+    """
+    data_yaml = os.path.abspath(data_yaml)
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    dataset_dir = os.path.dirname(data_yaml)
+    root = data.get('path') or dataset_dir
+    if not os.path.isabs(root):
+        root = os.path.normpath(os.path.join(dataset_dir, root))
+
+    splits = {}
+    for key in SPLIT_KEYS:
+        entries = data.get(key)
+        if not entries:
+            continue
+        images = []
+        for entry in (entries if isinstance(entries, list) else [entries]):
+            base, found = list_split_images(resolve_split_path(root, str(entry)))
+            if base is None:
+                logger.warning(f"数据集划分路径不存在: {key}: {entry}")
+                continue
+            images.extend((base, path) for path in found)
+        if images:
+            splits[key] = images
+
+    total = sum(len(images) for images in splits.values())
+    done = 0
+    for split, images in splits.items():
+        writer = ShardWriter(os.path.join(output_dir, split), shard_bytes)
+        for base, image_path in images:
+            key = os.path.splitext(os.path.relpath(image_path, base))[0].replace(os.sep, '/')
+            writer.add_files(key, image_path, label_path_for(image_path))
+            done += 1
+            if progress:
+                progress(done, total)
+        writer.close()
+    return write_pack_yaml(output_dir, list(splits), data)
+
+
+def unpack_for_training(pack_yaml, progress=None):
+    """将数据包解包到本地临时目录供训练使用，返回解包后的data.yaml路径"""
+    digest = hashlib.sha1(os.path.abspath(pack_yaml).encode('utf-8')).hexdigest()[:12]
+    return unpack_pack(pack_yaml, os.path.join(UNPACK_ROOT, digest), progress)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="YOLO数据集分片数据包")
+    commands = parser.add_subparsers(dest="command", required=True)
+    pack = commands.add_parser("pack", help="将数据集导出为分片数据包")
+    pack.add_argument("data_yaml", help="数据集的data.yaml")
+    pack.add_argument("output", help="数据包目录")
+    pack.add_argument("--shard-mb", type=int, default=DEFAULT_SHARD_BYTES // (1024 * 1024), help="单个分片大小（MB）")
+    unpack = commands.add_parser("unpack", help="将数据包解包为普通数据集目录")
+    unpack.add_argument("pack_yaml", help="数据包的data.yaml")
+    unpack.add_argument("output", help="解包目录")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    if args.command == "pack":
+        path = pack_dataset(args.data_yaml, args.output, args.shard_mb * 1024 * 1024)
+        print(f"数据包已写入: {path}")
+    else:
+        path = unpack_pack(args.pack_yaml, args.output)
+        print(f"数据集已解包: {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
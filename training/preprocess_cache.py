@@ -0,0 +1,246 @@
+import os
+import sys
+import shutil
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import yaml
+from PIL import Image
+
+from utils.dataset_cache import get_cache_dir, file_signature, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.PreprocessCache')
+
+# 预缩放缓存目录（位于数据集缓存目录下，按训练尺寸区分）及清单格式版本
+RESIZE_CACHE_PREFIX = 'train_resized_'
+MANIFEST_FILE = 'manifest.json'
+MANIFEST_VERSION = 1
+
+# 与ultralytics一致的图像扩展名
+IMAGE_EXTENSIONS = ('.bmp', '.dng', '.jpeg', '.jpg', '.mpo', '.png', '.tif', '.tiff', '.webp', '.pfm', '.heic')
+
+# 重新编码JPEG的质量
+JPEG_QUALITY = 95
+
+# 每个工作进程一次处理的图像数量
+POOL_CHUNK_SIZE = 16
+
+# 数据集划分的键
+SPLIT_KEYS = ('train', 'val', 'test')
+
+
+def label_path_for(image_path):
+    """与ultralytics一致：路径中最后一个 /images/ 替换为 /labels/，扩展名改为.txt"""
+    sa, sb = f"{os.sep}images{os.sep}", f"{os.sep}labels{os.sep}"
+    head, sep, tail = image_path.rpartition(sa)
+    base = f"{head}{sb}{tail}" if sep else image_path
+    return os.path.splitext(base)[0] + '.txt'
+
+
+def resolve_split_path(root, entry):
+    """按ultralytics的规则解析data.yaml中的划分路径（相对于path，找不到时去掉开头的../再试）"""
+    if os.path.isabs(entry):
+        return os.path.normpath(entry)
+    path = os.path.normpath(os.path.join(root, entry))
+    if not os.path.exists(path) and entry.startswith('../'):
+        path = os.path.normpath(os.path.join(root, entry[3:]))
+    return path
+
+
+def list_split_images(path):
+    """
+    列出一个划分路径中的图像
+
+    Returns:
+        tuple: (图像所在的基准目录, [图像路径, ...])，基准目录用于在缓存中保持相对路径
+    """
+    if os.path.isdir(path):
+        images = []
+        for current, _, files in os.walk(path):
+            images.extend(os.path.join(current, name) for name in files
+                          if name.lower().endswith(IMAGE_EXTENSIONS))
+        return path, sorted(images)
+    if os.path.isfile(path) and path.lower().endswith('.txt'):
+        # 图像列表文件，相对路径相对于列表文件所在目录
+        base = os.path.dirname(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            images = [os.path.normpath(os.path.join(base, line.strip())) for line in f if line.strip()]
+        images = [image for image in images if image.lower().endswith(IMAGE_EXTENSIONS)]
+        return (os.path.commonpath(images) if images else base), images
+    return None, []
+
+
+def resize_image(src, dst, img_size):
+    """
+    将图像长边缩放到img_size写入dst，长边不超过img_size时直接复制
+
+    缩放的是文件中存储的原始像素，EXIF（包括方向）和ICC配置原样保留，
+    训练时图像方向和归一化标签坐标的含义与原图一致。JPEG借助draft在解码阶段降采样。
+
+    Returns:
+        str: 'resized'、'copied' 或错误信息
+    """
+    try:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        with Image.open(src) as img:
+            if max(img.size) <= img_size:
+                shutil.copy2(src, dst)
+                return 'copied'
+            info = img.info
+            save_args = {}
+            if info.get('exif'):
+                save_args['exif'] = info['exif']
+            if info.get('icc_profile'):
+                save_args['icc_profile'] = info['icc_profile']
+            image_format = img.format
+            img.thumbnail((img_size, img_size), Image.BILINEAR, reducing_gap=2.0)
+            if image_format == 'JPEG':
+                save_args['quality'] = JPEG_QUALITY
+            tmp_path = f"{dst}.tmp"
+            img.save(tmp_path, format=image_format, **save_args)
+        os.replace(tmp_path, dst)
+        return 'resized'
+    except Exception as e:
+        return f"{type(e).__name__}: {str(e)}"
+
+
+def _process_item(item):
+    """工作进程：缩放一张图像并复制其标签文件"""
+    src, dst, label_src, label_dst, img_size = item
+    result = resize_image(src, dst, img_size)
+    if result in ('resized', 'copied'):
+        try:
+            if os.path.exists(label_src):
+                shutil.copy2(label_src, label_dst)
+            elif os.path.exists(label_dst):
+                os.remove(label_dst)
+        except OSError as e:
+            result = f"复制标签失败: {str(e)}"
+    return src, result
+
+
+def _signature(path):
+    signature = file_signature(path)
+    return list(signature) if signature else None
+
+
+def prepare_resized_dataset(data_yaml, img_size, workers=None, cache_root=None, progress=None):
+    """
+    生成训练图像的预缩放缓存，返回指向缓存的data.yaml路径
+
+    对data.yaml中train/val/test的每张图像，在进程池中将长边缩放到img_size，
+    写入数据集缓存目录（.labelcreator/train_resized_<尺寸>/），标签为归一化坐标，原样复制。
+    按源图像和标签文件的修改时间、大小增量更新：只处理新增或变化的图像，
+    源数据集中已删除的图像也会从缓存中删除。
+
+    Args:
+        data_yaml (str): 数据集的data.yaml路径
+        img_size (int): 训练图像尺寸（长边）
+        workers (int, optional): 进程数，默认为CPU核心数
+        cache_root (str, optional): 缓存目录，默认位于数据集缓存目录下
+        progress (callable, optional): progress(已完成数量, 总数量)
+
+    Returns:
+        str: 缓存中的data.yaml路径
+    """
+    data_yaml = os.path.abspath(data_yaml)
+    with open(data_yaml, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    dataset_dir = os.path.dirname(data_yaml)
+    root = data.get('path') or dataset_dir
+    if not os.path.isabs(root):
+        root = os.path.normpath(os.path.join(dataset_dir, root))
+    if cache_root is None:
+        cache_root = os.path.join(get_cache_dir(dataset_dir), f"{RESIZE_CACHE_PREFIX}{int(img_size)}")
+
+    manifest_path = os.path.join(cache_root, MANIFEST_FILE)
+    manifest = load_json_cache(manifest_path)
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('img_size') != int(img_size):
+        manifest = {}
+    old_files = manifest.get('files', {})
+    files = {}
+    tasks = []
+    cached_data = {key: value for key, value in data.items() if key not in SPLIT_KEYS}
+    cached_data['path'] = cache_root
+
+    for key in SPLIT_KEYS:
+        entries = data.get(key)
+        if not entries:
+            continue
+        entry_list = entries if isinstance(entries, list) else [entries]
+        cached_entries = []
+        for index, entry in enumerate(entry_list):
+            split_name = key if len(entry_list) == 1 else f"{key}_{index}"
+            base, images = list_split_images(resolve_split_path(root, str(entry)))
+            if base is None:
+                logger.warning(f"数据集划分路径不存在: {key}: {entry}")
+                continue
+            cached_entries.append(f"{split_name}/images")
+            for src in images:
+                rel = os.path.relpath(src, base)
+                dst_rel = os.path.join(split_name, 'images', rel)
+                dst = os.path.join(cache_root, dst_rel)
+                label_src = label_path_for(src)
+                label_dst = label_path_for(dst)
+                signature = [_signature(src), _signature(label_src)]
+                files[dst_rel] = signature
+                if old_files.get(dst_rel) == signature and os.path.exists(dst):
+                    continue
+                os.makedirs(os.path.dirname(label_dst), exist_ok=True)
+                tasks.append((src, dst, label_src, label_dst, int(img_size)))
+        if cached_entries:
+            cached_data[key] = cached_entries if isinstance(entries, list) else cached_entries[0]
+
+    # 删除源数据集中已不存在的图像及其标签
+    removed = 0
+    for dst_rel in set(old_files) - set(files):
+        for path in (os.path.join(cache_root, dst_rel), label_path_for(os.path.join(cache_root, dst_rel))):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+
+    total = len(tasks)
+    logger.info(f"预缩放缓存: {len(files)} 张图像，需处理 {total} 张，缓存目录 {cache_root}")
+    failed = 0
+    if tasks:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=max(1, min(int(workers), total))) as pool:
+            for done, (src, result) in enumerate(pool.map(_process_item, tasks, chunksize=POOL_CHUNK_SIZE), 1):
+                if result not in ('resized', 'copied'):
+                    failed += 1
+                    logger.warning(f"预缩放图像失败: {src}, 错误: {result}")
+                    files.pop(os.path.relpath(tasks[done - 1][1], cache_root), None)
+                if progress:
+                    progress(done, total)
+
+    # ultralytics的标签缓存（labels.cache）按文件列表校验，图像变化后会自动重建
+    save_json_cache(manifest_path, {'version': MANIFEST_VERSION, 'img_size': int(img_size), 'files': files})
+    cached_yaml = os.path.join(cache_root, 'data.yaml')
+    with open(cached_yaml, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(cached_data, f, allow_unicode=True, sort_keys=False)
+    logger.info(f"预缩放缓存已更新: 处理 {total - failed} 张，失败 {failed} 张，删除 {removed} 个过期文件")
+    return cached_yaml
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="生成训练图像的预缩放缓存")
+    parser.add_argument("data_yaml", help="数据集的data.yaml")
+    parser.add_argument("--img-size", type=int, default=640, help="训练图像尺寸（长边）")
+    parser.add_argument("-j", "--workers", type=int, help="进程数（默认CPU核心数）")
+    parser.add_argument("--output", help="缓存目录（默认位于数据集的.labelcreator目录下）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    args = parse_args(argv)
+    cached_yaml = prepare_resized_dataset(args.data_yaml, args.img_size, args.workers, args.output)
+    print(f"训练时使用: {cached_yaml}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+import os
+import sys
+import logging
+
+from PyQt5.QtCore import QObject, QProcess, QProcessEnvironment, QTimer, pyqtSignal
+
+logger = logging.getLogger('YOLOLabelCreator.TrainRunner')
+
+# 训练脚本路径及项目根目录（训练进程的工作目录）
+TRAIN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train_yolo.py")
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 与 train_yolo.SAVE_DIR_MARKER 一致（此处不导入train_yolo，以免界面进程依赖ultralytics）
+SAVE_DIR_MARKER = "[train_yolo] save_dir="
+
+# results.csv 轮询间隔（毫秒）
+RESULTS_POLL_INTERVAL = 2000
+
+# 停止训练时等待进程退出的时间（毫秒），超时后强制结束
+STOP_TIMEOUT = 10000
+
+
+def env_python(env_path):
+    """conda环境目录中的Python解释器路径，不存在时返回None"""
+    if sys.platform == "win32":
+        candidate = os.path.join(env_path, "python.exe")
+    else:
+        candidate = os.path.join(env_path, "bin", "python")
+    return candidate if os.path.isfile(candidate) else None
+
+
+def conda_env_prefix(python_executable):
+    """Python解释器所在的conda环境目录，不属于conda环境时返回None"""
+    python_dir = os.path.dirname(os.path.abspath(python_executable))
+    prefix = python_dir if sys.platform == "win32" else os.path.dirname(python_dir)
+    return prefix if os.path.isdir(os.path.join(prefix, "conda-meta")) else None
+
+
+def conda_path_dirs(prefix):
+    """
+    激活conda环境时加入PATH的目录
+
+    直接运行环境中的python.exe而不激活环境时，Windows上torch、numpy等依赖的DLL
+    （位于Library/bin等目录）无法找到，因此启动训练进程时需要把这些目录加入PATH。
+    """
+    if sys.platform == "win32":
+        subdirs = ("", os.path.join("Library", "mingw-w64", "bin"), os.path.join("Library", "usr", "bin"),
+                   os.path.join("Library", "bin"), "Scripts", "bin")
+    else:
+        subdirs = ("bin",)
+    return [os.path.join(prefix, subdir) if subdir else prefix for subdir in subdirs
+            if os.path.isdir(os.path.join(prefix, subdir))]
+
+
+def parse_results_row(header, line):
+    """
+    解析ultralytics results.csv中的一行
+
+    ultralytics的列名带有对齐空格，这里去掉空格；数值无法解析时保留原字符串。
+
+    Returns:
+        dict: {列名: 数值}，空行或列数不匹配时返回None
+    """
+    values = [value.strip() for value in line.split(",")]
+    if len(values) != len(header) or not any(values):
+        return None
+    row = {}
+    for key, value in zip(header, values):
+        try:
+            number = float(value)
+            row[key] = int(number) if key == "epoch" else number
+        except ValueError:
+            row[key] = value
+    return row
+
+
+class ResultsTail:
+    """增量读取不断增长的results.csv，只解析新增的完整行"""
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.header = None
+        self.pending = ""
+
+    def read_new_rows(self):
+        """读取上次之后新增的行，返回解析后的行列表"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return []
+        if size < self.offset:
+            # 文件被重写（例如重新开始训练），从头读取
+            self.offset, self.header, self.pending = 0, None, ""
+        if size == self.offset:
+            return []
+        try:
+            with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+                f.seek(self.offset)
+                chunk = f.read()
+                self.offset = f.tell()
+        except OSError as e:
+            logger.warning(f"读取训练结果失败: {self.path}, 错误: {str(e)}")
+            return []
+
+        lines = (self.pending + chunk).split("\n")
+        self.pending = lines.pop()  # 最后一段可能是未写完的行
+        rows = []
+        for line in lines:
+            if not line.strip():
+                continue
+            if self.header is None:
+                self.header = [name.strip() for name in line.split(",")]
+                continue
+            row = parse_results_row(self.header, line)
+            if row is not None:
+                rows.append(row)
+        return rows
+
+
+class TrainRunner(QObject):
+    """
+    以子进程方式运行train_yolo.py（QProcess，跨平台）
+
+    训练进程以非交互方式启动（--yes），标准输出逐行通过log_line发出，
+    进度条等以回车刷新的输出通过progress发出。训练开始后根据训练脚本输出的结果目录
+    轮询results.csv，每完成一个epoch发出一次epoch_metrics。支持停止和从last.pt继续训练。
+    """
+
+    log_line = pyqtSignal(str)
+    progress = pyqtSignal(str)
+    epoch_metrics = pyqtSignal(dict)
+    started = pyqtSignal()
+    finished = pyqtSignal(int, bool)  # 退出码, 是否为用户停止
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.process = None
+        self.save_dir = None
+        self.results_tail = None
+        self.stop_requested = False
+        self.output_buffer = ""
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(RESULTS_POLL_INTERVAL)
+        self.poll_timer.timeout.connect(self.poll_results)
+        # 停止训练的超时计时器，进程退出或启动新进程时取消，避免误杀之后启动的训练
+        self.kill_timer = QTimer(self)
+        self.kill_timer.setSingleShot(True)
+        self.kill_timer.setInterval(STOP_TIMEOUT)
+        self.kill_timer.timeout.connect(self.kill_if_running)
+
+    def is_running(self):
+        return self.process is not None and self.process.state() != QProcess.NotRunning
+
+    def last_checkpoint(self):
+        """最近一次训练的last.pt路径，不存在时返回None"""
+        if not self.save_dir:
+            return None
+        path = os.path.join(self.save_dir, "weights", "last.pt")
+        return path if os.path.exists(path) else None
+
+    def start(self, python_executable=None, settings_path=None):
+        """按训练设置文件开始新的训练"""
+        args = ["--yes"]
+        if settings_path:
+            args += ["--settings", settings_path]
+        return self._launch(python_executable, args)
+
+    def resume(self, python_executable=None, checkpoint=None):
+        """从检查点继续训练，默认使用最近一次训练的last.pt"""
+        checkpoint = checkpoint or self.last_checkpoint()
+        if not checkpoint:
+            self.log_line.emit("未找到可继续训练的检查点 (weights/last.pt)")
+            return False
+        return self._launch(python_executable, ["--resume", checkpoint])
+
+    def _launch(self, python_executable, script_args):
+        if self.is_running():
+            self.log_line.emit("训练进程已在运行")
+            return False
+
+        python_executable = python_executable or sys.executable
+        self.kill_timer.stop()
+        self.stop_requested = False
+        self.output_buffer = ""
+
+        process = QProcess(self)
+        process.setProcessChannelMode(QProcess.MergedChannels)
+        process.setWorkingDirectory(PROJECT_ROOT)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert("PYTHONUNBUFFERED", "1")
+        env.insert("PYTHONIOENCODING", "utf-8")
+        prefix = conda_env_prefix(python_executable)
+        if prefix:
+            # 相当于conda activate
+            env.insert("PATH", os.pathsep.join(conda_path_dirs(prefix) + [env.value("PATH")]))
+            env.insert("CONDA_PREFIX", prefix)
+        process.setProcessEnvironment(env)
+        process.readyReadStandardOutput.connect(self.read_output)
+        process.finished.connect(self.on_finished)
+        process.errorOccurred.connect(self.on_error)
+        self.process = process
+
+        args = ["-u", TRAIN_SCRIPT] + script_args
+        logger.info(f"启动训练进程: {python_executable} {' '.join(args)}")
+        self.log_line.emit(f"启动训练进程: {python_executable} {' '.join(args)}")
+        process.start(python_executable, args)
+        if not process.waitForStarted(5000):
+            return False
+        self.started.emit()
+        return True
+
+    def stop(self):
+        """请求停止训练，超时未退出时强制结束进程"""
+        if not self.is_running():
+            return
+        self.stop_requested = True
+        self.log_line.emit("正在停止训练...")
+        self.process.terminate()
+        self.kill_timer.start()
+
+    def kill_if_running(self):
+        if self.is_running():
+            logger.warning("训练进程未在规定时间内退出，强制结束")
+            self.process.kill()
+
+    def read_output(self):
+        """读取进程输出：换行结束的为日志行，回车刷新的为进度"""
+        data = bytes(self.process.readAllStandardOutput()).decode("utf-8", errors="replace")
+        self.output_buffer += data.replace("\r\n", "\n")
+        while True:
+            newline = self.output_buffer.find("\n")
+            carriage = self.output_buffer.find("\r")
+            if newline < 0 and carriage < 0:
+                break
+            if carriage >= 0 and (newline < 0 or carriage < newline):
+                segment, self.output_buffer = self.output_buffer[:carriage], self.output_buffer[carriage + 1:]
+                if segment.strip():
+                    self.progress.emit(segment)
+                continue
+            line, self.output_buffer = self.output_buffer[:newline], self.output_buffer[newline + 1:]
+            self.handle_line(line)
+
+    def handle_line(self, line):
+        if line.startswith(SAVE_DIR_MARKER):
+            self.save_dir = line[len(SAVE_DIR_MARKER):].strip()
+            self.results_tail = ResultsTail(os.path.join(self.save_dir, "results.csv"))
+            self.poll_timer.start()
+            self.log_line.emit(f"训练结果目录: {self.save_dir}")
+            return
+        self.log_line.emit(line)
+
+    def poll_results(self):
+        if self.results_tail is None:
+            return
+        for row in self.results_tail.read_new_rows():
+            self.epoch_metrics.emit(row)
+
+    def on_error(self, error):
+        if error == QProcess.FailedToStart:
+            self.log_line.emit(f"训练进程启动失败: {self.process.errorString()}")
+
+    def on_finished(self, exit_code, exit_status):
+        if self.output_buffer.strip():
+            self.handle_line(self.output_buffer)
+        self.output_buffer = ""
+        self.kill_timer.stop()
+        self.poll_timer.stop()
+        self.poll_results()
+        stopped = self.stop_requested or exit_status == QProcess.CrashExit
+        if stopped:
+            self.log_line.emit("训练已停止" + ("，可从 last.pt 继续训练" if self.last_checkpoint() else ""))
+        else:
+            self.log_line.emit(f"训练进程已退出，退出码: {exit_code}")
+        self.finished.emit(exit_code, self.stop_requested)
@@ -1,8 +1,18 @@
 import os
 import json
 import argparse
+import sys
 from ultralytics import YOLO
 
+# 项目根目录加入导入路径（本脚本通常直接运行），以便导入training、utils中的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from training.preprocess_cache import prepare_resized_dataset
+from training.pack_dataset import unpack_for_training
+from utils.shard_pack import is_pack_yaml
+
+# 训练开始时输出的结果目录标记，训练进程的启动方（TrainRunner）据此找到results.csv
+SAVE_DIR_MARKER = "[train_yolo] save_dir="
+
 def load_settings(settings_path=None):
     """从JSON文件加载训练设置"""
     # 如果没有指定路径，使用默认的config目录下的配置文件
@@ -57,10 +67,36 @@ def print_settings(settings):
     print(f"  设备: {settings['device'] or '默认'}")
     print(f"  余弦学习率调度: {settings['cos_lr']}")
     print(f"  缓存图像: {settings['cache']}")
+    print(f"  预缩放图像缓存: {settings.get('resize_cache', False)}")
     print("=" * 50 + "\n")
 
+def report_save_dir(trainer):
+    """训练开始时输出结果目录（ultralytics回调）"""
+    print(f"{SAVE_DIR_MARKER}{os.path.abspath(str(trainer.save_dir))}", flush=True)
+
+def progress_printer(title, interval=100):
+    """返回progress(done, total)回调，每interval个输出一次进度（以回车刷新）"""
+    def report(done, total):
+        if done == total or done % interval == 0:
+            end = "\n" if done == total else ""
+            print(f"\r  {title}: {done}/{total}", end=end, flush=True)
+    return report
+
+def resume_training(checkpoint_path):
+    """从检查点（通常为 weights/last.pt）继续中断的训练，训练参数保存在检查点中"""
+    try:
+        print(f"从检查点继续训练: {checkpoint_path}")
+        model = YOLO(checkpoint_path)
+        model.add_callback("on_train_start", report_save_dir)
+        model.train(resume=True)
+        print("\n训练完成!")
+        return True
+    except Exception as e:
+        print(f"继续训练时出错: {str(e)}")
+        return False
+
 def train_yolo(settings):
-    """使用设置训练YOLOv8模型"""
+    """使用设置训练YOLOv8模型，成功返回True"""
     try:
         # 获取项目根目录
         script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -107,9 +143,22 @@ def train_yolo(settings):
                 # 从头开始训练
                 model = YOLO(f"{model_name}.yaml")
         
+        # 预先把训练图像缩放到训练尺寸，训练时每轮只需解码小图
+        data_yaml = settings['yaml_path']
+        if is_pack_yaml(data_yaml):
+            # 分片数据包先顺序解包到本地磁盘，避免训练时逐个读取网络存储上的小文件
+            print(f"正在解包分片数据包: {data_yaml}")
+            data_yaml = unpack_for_training(data_yaml, progress=progress_printer("解包样本"))
+            print(f"使用解包后的数据集: {data_yaml}")
+        if settings.get('resize_cache', False):
+            print(f"正在生成预缩放图像缓存（长边 {settings['img_size']}）...")
+            data_yaml = prepare_resized_dataset(data_yaml, settings['img_size'], settings.get('workers'),
+                                                progress=progress_printer("预缩放图像"))
+            print(f"使用预缩放缓存: {data_yaml}")
+        
         # 准备训练参数
         train_args = {
-            'data': settings['yaml_path'],
+            'data': data_yaml,
             'epochs': settings['epochs'],
             'batch': settings['batch_size'],
             'imgsz': settings['img_size'],
@@ -139,6 +188,10 @@ def train_yolo(settings):
         if settings['device']:
             train_args['device'] = settings['device']
         
+        # 只使用部分训练集（超参数搜索的快速试验）
+        if settings.get('fraction', 1.0) < 1.0:
+            train_args['fraction'] = settings['fraction']
+        
         # 如果启用了数据增强，添加相关参数
         if settings['augment']:
             train_args['hsv_h'] = settings['hsv_h']
@@ -160,34 +213,60 @@ def train_yolo(settings):
             print("详情请参考：https://docs.ultralytics.com/datasets/keypoints/")
             
         # 执行训练，指定任务类型
+        model.add_callback("on_train_start", report_save_dir)
         model.train(task=task, **train_args)
         
         print("\n训练完成!")
         print(f"模型保存在: {os.path.join(train_args.get('project', ''), train_args.get('name', 'exp'))}")
+        return True
         
     except Exception as e:
         print(f"训练过程中出错: {str(e)}")
+        return False
 
-def main(settings_path=None):
+def main(settings_path=None, assume_yes=False, resume=None):
+    """
+    训练脚本入口
+    
+    Args:
+        settings_path (str, optional): 训练设置JSON文件路径，默认使用config/yolo_train_settings.json
+        assume_yes (bool): 不询问确认直接开始训练（由图形界面等非交互方式启动时使用）
+        resume (str, optional): 检查点路径，指定时从该检查点继续训练，不读取训练设置
+    
+    Returns:
+        int: 进程退出码，0表示训练完成
+    """
     print("YOLO模型训练脚本启动")
     
+    if resume:
+        return 0 if resume_training(resume) else 1
+    
     # 加载设置
     settings = load_settings(settings_path)
     if not settings:
         print("无法加载设置，训练终止")
-        return
+        return 1
     
     # 打印设置
     print_settings(settings)
     
     # 确认是否继续
-    confirm = input("是否开始训练? (y/n): ")
-    if confirm.lower() != 'y':
-        print("训练已取消")
-        return
+    if not assume_yes:
+        confirm = input("是否开始训练? (y/n): ")
+        if confirm.lower() != 'y':
+            print("训练已取消")
+            return 1
     
     # 开始训练
-    train_yolo(settings)
+    return 0 if train_yolo(settings) else 1
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="YOLO模型训练脚本")
+    parser.add_argument("--settings", help="训练设置JSON文件路径（默认 config/yolo_train_settings.json）")
+    parser.add_argument("-y", "--yes", action="store_true", help="不询问确认，直接开始训练")
+    parser.add_argument("--resume", metavar="CHECKPOINT", help="从检查点（如 runs/detect/exp/weights/last.pt）继续训练")
+    return parser.parse_args(argv)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    sys.exit(main(args.settings, args.yes, args.resume))
@@ -1,6 +1,6 @@
 import os
 import sys
-from PyQt5.QtWidgets import QDialog, QVBoxLayout, QPushButton, QWidget
+from PyQt5.QtWidgets import QDialog, QVBoxLayout, QPushButton, QWidget, QMessageBox
 from PyQt5.QtCore import Qt
 from .trainer_ui import YoloTrainerUI
 
@@ -31,4 +31,23 @@ class YoloTrainerDialog(QDialog):
         # 设置对话框按钮
         self.close_button = QPushButton("关闭")
         self.close_button.clicked.connect(self.accept)
-        layout.addWidget(self.close_button)
\ No newline at end of file
+        layout.addWidget(self.close_button)
+    
+    def confirm_stop_training(self):
+        """训练进行中时询问是否停止训练，返回是否可以关闭对话框"""
+        if not self.trainer_ui.is_training():
+            return True
+        reply = QMessageBox.question(self, "训练进行中",
+                                     "训练仍在进行，关闭窗口将停止训练（可稍后从 last.pt 继续）。是否关闭？",
+                                     QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return False
+        self.trainer_ui.stop_training()
+        if not self.trainer_ui.runner.process.waitForFinished(5000):
+            self.trainer_ui.runner.process.kill()
+        return True
+    
+    def done(self, result):
+        # 关闭按钮、Esc和窗口关闭按钮最终都会调用done
+        if self.confirm_stop_training():
+            super().done(result)
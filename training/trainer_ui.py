@@ -5,9 +5,27 @@ import subprocess
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QFileDialog, QComboBox,
                              QSpinBox, QDoubleSpinBox, QGroupBox, QFormLayout, QTabWidget,
-                             QTextEdit, QCheckBox, QGridLayout, QDialog)
+                             QTextEdit, QCheckBox, QGridLayout, QDialog, QTableWidget,
+                             QTableWidgetItem, QHeaderView, QAbstractItemView)
 from PyQt5.QtCore import Qt, QSettings
 
+from .train_runner import TrainRunner, env_python
+from .job_queue import TrainJobQueue, JOB_PENDING
+
+# 训练指标表格中显示的列（ultralytics results.csv列名 -> 表头），不存在的列不显示
+METRIC_COLUMNS = [
+    ("epoch", "轮次"),
+    ("train/box_loss", "box_loss"),
+    ("train/cls_loss", "cls_loss"),
+    ("train/pose_loss", "pose_loss"),
+    ("metrics/precision(B)", "P"),
+    ("metrics/recall(B)", "R"),
+    ("metrics/mAP50(B)", "mAP50"),
+    ("metrics/mAP50-95(B)", "mAP50-95"),
+    ("metrics/mAP50(P)", "mAP50(P)"),
+    ("metrics/mAP50-95(P)", "mAP50-95(P)"),
+]
+
 class YoloTrainerUI(QMainWindow):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -48,11 +66,46 @@ class YoloTrainerUI(QMainWindow):
         self.save_button.clicked.connect(self.save_settings)
         self.train_button = QPushButton("开始训练")
         self.train_button.clicked.connect(self.start_training)
+        self.stop_button = QPushButton("停止训练")
+        self.stop_button.setEnabled(False)
+        self.stop_button.clicked.connect(self.stop_training)
+        self.resume_button = QPushButton("继续训练")
+        self.resume_button.setToolTip("从上次训练的 weights/last.pt 继续")
+        self.resume_button.setEnabled(False)
+        self.resume_button.clicked.connect(self.resume_training)
+        self.queue_button = QPushButton("加入训练队列")
+        self.queue_button.setToolTip("将当前设置加入训练队列，由 python -m training.job_queue run 依次运行")
+        self.queue_button.clicked.connect(self.add_to_queue)
         
         self.button_layout.addWidget(self.save_button)
         self.button_layout.addWidget(self.train_button)
+        self.button_layout.addWidget(self.stop_button)
+        self.button_layout.addWidget(self.resume_button)
+        self.button_layout.addWidget(self.queue_button)
         self.main_layout.addLayout(self.button_layout)
         
+        # 训练进程（QProcess），输出和每轮指标实时显示在下方
+        self.runner = TrainRunner(self)
+        self.runner.log_line.connect(self.log_message)
+        self.runner.progress.connect(self.show_progress)
+        self.runner.epoch_metrics.connect(self.add_epoch_metrics)
+        self.runner.started.connect(self.update_training_buttons)
+        self.runner.finished.connect(self.on_training_finished)
+        
+        # 训练指标区域
+        self.metrics_group = QGroupBox("训练指标")
+        self.metrics_layout = QVBoxLayout()
+        self.progress_label = QLabel("")
+        self.metrics_table = QTableWidget(0, 0)
+        self.metrics_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.metrics_table.verticalHeader().setVisible(False)
+        self.metrics_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.metrics_layout.addWidget(self.progress_label)
+        self.metrics_layout.addWidget(self.metrics_table)
+        self.metrics_group.setLayout(self.metrics_layout)
+        self.main_layout.addWidget(self.metrics_group)
+        self.metric_keys = []
+        
         # 日志区域
         self.log_group = QGroupBox("日志")
         self.log_layout = QVBoxLayout()
@@ -367,6 +420,12 @@ class YoloTrainerUI(QMainWindow):
         self.cache.setChecked(False)
         advanced_layout.addRow("", self.cache)
         
+        self.resize_cache = QCheckBox("训练前将图像预缩放到训练尺寸（离线缓存）")
+        self.resize_cache.setToolTip("在数据集的 .labelcreator 目录中生成长边为图像大小的图像副本，"
+                                     "训练时每轮只需解码小图；图像变化后增量更新")
+        self.resize_cache.setChecked(False)
+        advanced_layout.addRow("", self.resize_cache)
+        
         advanced_group.setLayout(advanced_layout)
         layout.addWidget(advanced_group)
         
@@ -376,6 +435,8 @@ class YoloTrainerUI(QMainWindow):
     def refresh_conda_envs(self):
         self.log_message("正在获取Conda环境列表...")
         self.conda_env_combo.clear()
+        # 始终提供当前运行界面的Python环境（条目数据为解释器路径）
+        self.conda_env_combo.addItem("当前Python环境", sys.executable)
         
         try:
             # 使用subprocess获取conda环境列表
@@ -391,9 +452,12 @@ class YoloTrainerUI(QMainWindow):
                 json_content = stdout[json_start:json_end]
                 env_data = json.loads(json_content)
                 
-                # 提取环境名称
-                envs = [os.path.basename(env) for env in env_data['envs']]
-                self.conda_env_combo.addItems(envs)
+                # 显示环境名称，条目数据为该环境的Python解释器路径
+                envs = env_data['envs']
+                for env in envs:
+                    python_path = env_python(env)
+                    if python_path:
+                        self.conda_env_combo.addItem(os.path.basename(env) or env, python_path)
                 
                 self.log_message(f"找到 {len(envs)} 个Conda环境")
             else:
@@ -414,6 +478,50 @@ class YoloTrainerUI(QMainWindow):
     def log_message(self, message):
         self.log_text.append(message)
     
+    def show_progress(self, text):
+        """显示以回车刷新的进度输出（如每个batch的进度条），不写入日志"""
+        self.progress_label.setText(text.strip())
+    
+    def add_epoch_metrics(self, row):
+        """在指标表格中添加（或更新）一轮的训练指标"""
+        if not self.metric_keys:
+            self.metric_keys = [key for key, _ in METRIC_COLUMNS if key in row]
+            names = dict(METRIC_COLUMNS)
+            self.metrics_table.setColumnCount(len(self.metric_keys))
+            self.metrics_table.setHorizontalHeaderLabels([names[key] for key in self.metric_keys])
+        
+        # 继续训练时results.csv会从头重新读取，已有的轮次直接覆盖
+        epoch = row.get("epoch")
+        target = self.metrics_table.rowCount()
+        for i in range(self.metrics_table.rowCount()):
+            item = self.metrics_table.item(i, 0)
+            if item is not None and item.text() == str(epoch):
+                target = i
+                break
+        if target == self.metrics_table.rowCount():
+            self.metrics_table.insertRow(target)
+        
+        for column, key in enumerate(self.metric_keys):
+            value = row.get(key, "")
+            text = f"{value:.4f}" if isinstance(value, float) else str(value)
+            self.metrics_table.setItem(target, column, QTableWidgetItem(text))
+        self.metrics_table.scrollToBottom()
+    
+    def update_training_buttons(self):
+        running = self.runner.is_running()
+        self.train_button.setEnabled(not running)
+        self.stop_button.setEnabled(running)
+        self.resume_button.setEnabled(not running and self.runner.last_checkpoint() is not None)
+    
+    def on_training_finished(self, exit_code, stopped):
+        self.progress_label.setText("")
+        if exit_code == 0 and not stopped:
+            self.log_message("训练完成")
+        self.update_training_buttons()
+    
+    def is_training(self):
+        return self.runner.is_running()
+    
     def get_all_parameters(self):
         params = {
             # 基本设置
@@ -450,7 +558,8 @@ class YoloTrainerUI(QMainWindow):
             "workers": self.workers.value(),
             "device": self.device.text(),
             "cos_lr": self.cos_lr.isChecked(),
-            "cache": self.cache.isChecked()
+            "cache": self.cache.isChecked(),
+            "resize_cache": self.resize_cache.isChecked()
         }
         return params
     
@@ -463,7 +572,7 @@ class YoloTrainerUI(QMainWindow):
         
         self.log_message("设置已保存")
         
-        # 同时保存到JSON文件以便训练脚本使用
+        # 同时保存到JSON文件以便训练脚本使用，返回文件路径（失败时返回None）
         try:
             current_dir = os.path.dirname(os.path.abspath(__file__))
             parent_dir = os.path.dirname(current_dir)  # 获取父目录路径
@@ -471,8 +580,10 @@ class YoloTrainerUI(QMainWindow):
             with open(settings_path, "w", encoding="utf-8") as f:
                 json.dump(params, f, ensure_ascii=False, indent=4)
             self.log_message(f"设置已保存到{settings_path}")
+            return settings_path
         except Exception as e:
             self.log_message(f"保存设置到文件失败: {str(e)}")
+            return None
     
     def load_settings(self):
         # 尝试从QSettings加载
@@ -526,45 +637,66 @@ class YoloTrainerUI(QMainWindow):
             self.device.setText(self.settings.value("device", ""))
             self.cos_lr.setChecked(self.settings.value("cos_lr", True, type=bool))
             self.cache.setChecked(self.settings.value("cache", False, type=bool))
+            self.resize_cache.setChecked(self.settings.value("resize_cache", False, type=bool))
             
             self.log_message("已加载保存的设置")
         
             # 刷新Conda环境列表
             self.refresh_conda_envs()
+            conda_env = self.settings.value("conda_env", "")
+            if conda_env:
+                self.conda_env_combo.setCurrentText(conda_env)
+        else:
+            self.refresh_conda_envs()
+    
+    def selected_python(self):
+        """所选环境的Python解释器路径"""
+        return self.conda_env_combo.currentData() or sys.executable
         
     def start_training(self):
         # 保存当前设置
-        self.save_settings()
+        settings_path = self.save_settings()
                 
         # 检查必要参数
         if not self.yaml_path.text():
             self.log_message("错误: 请选择数据集YAML文件")
             return
-                
-        if not self.conda_env_combo.currentText():
-            self.log_message("错误: 请选择Conda环境")
+        
+        if not settings_path:
+            self.log_message("错误: 训练设置未能保存，无法启动训练")
             return
                 
         self.log_message("正在启动训练进程...")
-                
+        self.metrics_table.setRowCount(0)
+        self.metric_keys = []
+        
+        # 在所选环境中以非交互方式运行训练脚本，不阻塞界面
+        if self.runner.start(self.selected_python(), settings_path):
+            self.log_message(f"训练进程已启动，使用环境: {self.conda_env_combo.currentText()}")
+        self.update_training_buttons()
+    
+    def add_to_queue(self):
+        """将当前设置作为一个任务加入训练队列"""
+        if not self.yaml_path.text():
+            self.log_message("错误: 请选择数据集YAML文件")
+            return
         try:
-            # 在Windows上使用start命令启动新的终端窗口
-            conda_env = self.conda_env_combo.currentText()
-                    
-            # 获取训练脚本的绝对路径
-            script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "train_yolo.py")
-                    
-            # 构建命令，先初始化conda，然后激活环境并运行脚本
-            cmd = f'start cmd.exe /k "conda init cmd.exe && conda activate {conda_env} && python "{script_path}""'
-                    
-            # 执行命令
-            subprocess.Popen(cmd, shell=True)
-                    
-            self.log_message(f"已在新终端中启动训练进程，使用环境: {conda_env}")
+            queue = TrainJobQueue()
+            job = queue.add_job(self.get_all_parameters())
+            pending = sum(1 for j in queue.jobs() if j["status"] == JOB_PENDING)
+            self.log_message(f"已加入训练队列: #{job['id']} {job['name']}（等待中的任务: {pending}）")
         except Exception as e:
-            self.log_message(f"启动训练进程失败: {str(e)}")
-        
-            # 如果直接运行此文件，则创建独立窗口
+            self.log_message(f"加入训练队列失败: {str(e)}")
+    
+    def stop_training(self):
+        self.runner.stop()
+    
+    def resume_training(self):
+        self.log_message("正在从检查点继续训练...")
+        self.runner.resume(self.selected_python())
+        self.update_training_buttons()
+
+# 如果直接运行此文件，则创建独立窗口
 if __name__ == "__main__":
     app = QApplication(sys.argv)
     window = YoloTrainerUI()
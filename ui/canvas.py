@@ -3,15 +3,56 @@ import traceback
 import logging
 import numpy as np
 from PyQt5.QtWidgets import QWidget, QMessageBox
-from PyQt5.QtGui import QPainter, QPen, QColor, QPixmap, QCursor, QFont, QBrush
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtGui import (QPainter, QPen, QColor, QPixmap, QCursor, QFont, QBrush,
+                         QStaticText, QFontMetrics, QPolygon, QImageReader)
+from PyQt5.QtCore import Qt, QPoint, QPointF, QRect, QLine, QSize
 
 from models.bounding_box import BoundingBox
+from utils.settings import DEFAULT_RENDER_PARAMS
+from utils.undo_stack import (AddBoxes, ChangeGeometry, ChangeClass, ChangeKeypoints,
+                              box_geometry, copy_keypoints)
 from i18n import tr
 
 # 获取日志记录器
 logger = logging.getLogger('YOLOLabelCreator.Canvas')
 
+# 边界框颜色（按类别ID循环使用）
+BOX_COLORS = [
+    QColor(231, 76, 60),   # 红色
+    QColor(46, 204, 113),  # 绿色
+    QColor(52, 152, 219),  # 蓝色
+    QColor(241, 196, 15),  # 黄色
+    QColor(155, 89, 182),  # 紫色
+    QColor(230, 126, 34)   # 橙色
+]
+
+# 按画布尺寸降采样解码的图像格式（解码器支持DCT域缩放），以及原图至少大于画布多少倍时才降采样
+PREVIEW_DECODE_FORMATS = (b'jpeg', b'jpg')
+PREVIEW_DECODE_MIN_RATIO = 1.5
+
+# 显示尺寸超过降采样图像分辨率该倍数时解码原图
+FULL_RESOLUTION_TOLERANCE = 1.05
+
+# 背景网格画笔
+GRID_PEN = QPen(QColor(230, 230, 230), 1)
+
+# 特征点绘制样式
+KEYPOINT_PEN = QPen(QColor(255, 0, 255), 2)
+KEYPOINT_BRUSH = QBrush(QColor(255, 0, 255, 180))
+KEYPOINT_LABEL_BACKGROUND = QBrush(QColor(255, 255, 255, 200))
+
+KEYPOINT_TINY_PEN = QPen(QColor(255, 0, 255), 2)
+
+# 特征点可见区域判断的外扩边距（编号图片会超出特征点位置）
+KEYPOINT_CULL_MARGIN = 32
+
+# 未绘制标签的类别汇总
+SUMMARY_BACKGROUND = QBrush(QColor(255, 255, 255, 200))
+LABEL_SUMMARY_MAX_ROWS = 8
+
+# 缓存的标签文字（QStaticText）数量上限
+STATIC_TEXT_CACHE_SIZE = 1024
+
 class ImageCanvas(QWidget):
     """
     图像标注画布组件
@@ -27,6 +68,8 @@ class ImageCanvas(QWidget):
         # 初始化画布基础属性
         self.parent = parent
         self.pixmap = None
+        self.image_size = QSize()  # 原图尺寸（pixmap可能是降采样解码的图像，标注坐标始终以原图为准）
+        self.full_resolution = True  # pixmap是否为原始分辨率
         self.image_path = None
         self.boxes = []
         self.current_box = None
@@ -71,12 +114,91 @@ class ImageCanvas(QWidget):
         # 添加辅助线属性
         self.guide_lines_enabled = True  # 是否启用辅助线
         self.mouse_pos = None  # 当前鼠标位置
+        
+        # 当前图像的撤销历史（由MainWindow在加载图像时设置）
+        self.undo_history = None
+        self.edit_start_geometry = None  # 开始拖动边界框时的坐标
+        self.edit_start_keypoints = None  # 开始移动特征点时的特征点坐标
+        
+        # 绘制缓存：画笔、画刷和排版好的标签文字
+        self.pen_cache = {}
+        self.brush_cache = {}
+        self.static_text_cache = {}
+        self.keypoint_sprite_cache = {}
+        self.keypoint_font = QFont()
+        self.keypoint_font.setPointSize(8)
+        self.keypoint_font.setBold(True)
+        
+        # 细节层次阈值（屏幕像素，按边界框较短边计算），可通过set_lod_params修改
+        self.lod_label_min_size = 0  # 小于该值时不绘制类别标签，改为汇总显示
+        self.lod_keypoint_label_min_size = 0  # 小于该值时不绘制特征点编号
+        self.lod_keypoint_min_size = 0  # 小于该值时特征点绘制为单像素点
+        self.lod_handle_min_size = 0  # 选中的边界框小于该值时不绘制控制点
+        self.set_lod_params(DEFAULT_RENDER_PARAMS)
+        
+        # 阈值调整时的预测结果预览（只绘制，不属于标注）
+        self.preview_boxes = []
+    
+    def record_edit(self, command):
+        """记录一次已执行的编辑，供撤销/重做使用"""
+        if self.undo_history is not None:
+            self.undo_history.push(command)
+    
+    def preview_decode_size(self):
+        """适应窗口显示时需要的解码尺寸（设备像素）"""
+        ratio = self.devicePixelRatioF()
+        width = max(self.width(), self.minimumWidth())
+        height = max(self.height(), self.minimumHeight())
+        return QSize(int(width * ratio), int(height * ratio))
+    
+    @staticmethod
+    def decode_image(image_path, max_size=None):
+        """
+        解码图像
+        
+        指定max_size且图像为JPEG、原图明显大于max_size时，让解码器直接在DCT域
+        降采样解码（QImageReader.setScaledSize），不完整解码原图。
+        
+        Returns:
+            tuple: (QPixmap, 原图尺寸QSize, 是否为原始分辨率)，解码失败时QPixmap为空
+        """
+        reader = QImageReader(image_path)
+        original = reader.size()
+        full_resolution = True
+        if (max_size is not None and original.isValid()
+                and bytes(reader.format()).lower() in PREVIEW_DECODE_FORMATS
+                and (original.width() >= max_size.width() * PREVIEW_DECODE_MIN_RATIO
+                     or original.height() >= max_size.height() * PREVIEW_DECODE_MIN_RATIO)):
+            reader.setScaledSize(original.scaled(max_size, Qt.KeepAspectRatio))
+            full_resolution = False
+        image = reader.read()
+        if image.isNull():
+            logger.error(f"图像解码失败: {image_path}, 错误: {reader.errorString()}")
+            return QPixmap(), original, full_resolution
+        if not original.isValid():
+            original = image.size()
+        return QPixmap.fromImage(image), original, full_resolution
+    
+    def ensure_full_resolution(self, display_size):
+        """放大到超过降采样图像的分辨率时，解码原图替换当前图像"""
+        if self.full_resolution or not self.image_path:
+            return
+        ratio = self.devicePixelRatioF()
+        if display_size.width() * ratio <= self.pixmap.width() * FULL_RESOLUTION_TOLERANCE:
+            return
+        logger.info(f"解码原始分辨率图像: {self.image_path}")
+        pixmap, _, _ = self.decode_image(self.image_path)
+        # 解码失败时继续使用降采样图像，不再重试
+        self.full_resolution = True
+        if not pixmap.isNull():
+            self.pixmap = pixmap
+    
     def load_image(self, image_path):
         """
         加载图像文件到画布
         
         该方法仅负责图像加载，标签的读取由MainWindow类负责。
-        加载过程中会保存当前状态，以便在出错时能够恢复。
+        新图像解码成功后才替换当前图像，加载失败时画布保持原状。
         
         Args:
             image_path (str): 要加载的图像文件路径
@@ -86,13 +208,8 @@ class ImageCanvas(QWidget):
             ValueError: 图像格式不支持时抛出
             RuntimeError: 图像加载失败时抛出
         """
-        self.image_path = image_path
         logger.info(f"开始加载图像: {image_path}")
         
-        # 保留当前标注数据作为回滚点
-        previous_boxes = self.boxes.copy() if self.boxes else []
-        previous_pixmap = self.pixmap.copy() if self.pixmap else None
-        
         try:
             # 文件存在性检查
             if not os.path.exists(image_path):
@@ -105,11 +222,15 @@ class ImageCanvas(QWidget):
                 logger.error(f"不支持的图像格式: {image_path}")
                 raise ValueError(tr("不支持的图像格式"))
 
-            # 加载QPixmap并验证有效性
-            self.pixmap = QPixmap(image_path)
-            if self.pixmap.isNull():
+            # 解码图像并验证有效性（大JPEG先按画布尺寸降采样解码，放大时再解码原图）
+            pixmap, image_size, full_resolution = self.decode_image(image_path, self.preview_decode_size())
+            if pixmap.isNull():
                 logger.error(f"QPixmap创建失败: {image_path}")
                 raise RuntimeError(tr("图像加载失败"))
+            self.pixmap = pixmap
+            self.image_size = image_size
+            self.full_resolution = full_resolution
+            self.image_path = image_path
                 
             # 更新标签路径显示（但不读取标签，由MainWindow负责）
             label_path = self.parent.get_label_path(image_path)
@@ -125,25 +246,13 @@ class ImageCanvas(QWidget):
         except FileNotFoundError as e:
             # 文件不存在异常处理
             logger.error(f"文件未找到: {str(e)}")
-            self._restore_previous_state(previous_pixmap, previous_boxes)
             raise
 
         except Exception as e:
             # 通用异常处理
             logger.error(f"图像加载失败: {str(e)}\n{traceback.format_exc()}")
-            self._restore_previous_state(previous_pixmap, previous_boxes)
             raise
 
-        finally:
-            # 资源清理
-            if previous_pixmap:
-                del previous_pixmap
-
-    def _restore_previous_state(self, previous_pixmap, previous_boxes):
-        """恢复到之前的状态"""
-        self.pixmap = previous_pixmap
-        self.boxes = previous_boxes
-
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
@@ -153,206 +262,378 @@ class ImageCanvas(QWidget):
         
         # 绘制网格背景
         grid_size = 20
-        painter.setPen(QPen(QColor(230, 230, 230), 1))
-        for x in range(0, self.width(), grid_size):
-            painter.drawLine(x, 0, x, self.height())
-        for y in range(0, self.height(), grid_size):
-            painter.drawLine(0, y, self.width(), y)
+        painter.setPen(GRID_PEN)
+        painter.setRenderHint(QPainter.Antialiasing, False)
+        painter.drawLines([QLine(x, 0, x, self.height()) for x in range(0, self.width(), grid_size)] +
+                          [QLine(0, y, self.width(), y) for y in range(0, self.height(), grid_size)])
+        painter.setRenderHint(QPainter.Antialiasing)
         
         if self.pixmap:
-            # Calculate scaled dimensions while maintaining aspect ratio
-            scaled_pixmap = self.pixmap.scaled(int(self.width() * self.scale_factor), 
-                                              int(self.height() * self.scale_factor),
-                                              Qt.KeepAspectRatio)
+            # 图像在画布上的显示尺寸（保持宽高比，不生成缩放后的图像）
+            scaled_size = self.display_size()
+            self.ensure_full_resolution(scaled_size)
             
             # Center the image and apply pan offset
-            x_offset = (self.width() - scaled_pixmap.width()) // 2 + self.offset_x
-            y_offset = (self.height() - scaled_pixmap.height()) // 2 + self.offset_y
+            x_offset = (self.width() - scaled_size.width()) // 2 + self.offset_x
+            y_offset = (self.height() - scaled_size.height()) // 2 + self.offset_y
             
             # 绘制图像阴影
             shadow_offset = 5
             painter.fillRect(
                 x_offset + shadow_offset, 
                 y_offset + shadow_offset, 
-                scaled_pixmap.width(), 
-                scaled_pixmap.height(), 
+                scaled_size.width(), 
+                scaled_size.height(), 
                 QColor(0, 0, 0, 30)
             )
             
-            # Draw the image
-            painter.drawPixmap(x_offset, y_offset, scaled_pixmap)
+            # Draw the image（直接绘制到目标矩形，只处理可见区域的像素）
+            painter.drawPixmap(QRect(x_offset, y_offset, scaled_size.width(), scaled_size.height()), self.pixmap)
             
             # 绘制图像边框
             painter.setPen(QPen(QColor(180, 180, 180), 1))
-            painter.drawRect(x_offset, y_offset, scaled_pixmap.width(), scaled_pixmap.height())
+            painter.drawRect(x_offset, y_offset, scaled_size.width(), scaled_size.height())
             
-            # 绘制所有边界框
-            for i, box in enumerate(self.boxes):
-                # 选中的边界框使用不同的样式
-                is_selected = (i == self.selected_box_index)
-                self.draw_box(painter, box, x_offset, y_offset, scaled_pixmap.width(), scaled_pixmap.height(), is_selected)
-
-                # 绘制特征点（如果有）
-                if box.has_keypoints():
-                    painter.save()  # 保存当前绘图状态
-                    keypoints = box.get_keypoints()
-                    # 设置特征点绘制样式
-                    painter.setPen(QPen(QColor(255, 0, 255), 2))
-                    painter.setBrush(QBrush(QColor(255, 0, 255, 180)))
-                    
-                    # 获取原始图像尺寸
-                    orig_width = self.pixmap.width()
-                    orig_height = self.pixmap.height()
-                    
-                    # 计算缩放比例
-                    scale_x = scaled_pixmap.width() / orig_width
-                    scale_y = scaled_pixmap.height() / orig_height
-                    
-                    # 设置特征点编号的字体
-                    font = QFont()
-                    font.setPointSize(8)
-                    font.setBold(True)
-                    painter.setFont(font)
-                    
-                    # 计算特征点在画布上的位置
-                    for kp_idx, kp in enumerate(keypoints):
-                        # 特征点数据只有 x, y 两个值
-                        kp_x, kp_y = kp
-                            
-                        # 应用与边界框相同的缩放和偏移逻辑
-                        kp_x = x_offset + kp_x * scale_x
-                        kp_y = y_offset + kp_y * scale_y
-                        
-                        # 绘制特征点（小圆点）
-                        point_radius = 3
-                        painter.drawEllipse(QPoint(int(kp_x), int(kp_y)), point_radius, point_radius)
-                        
-                        # 绘制特征点编号
-                        # 设置白色背景以增强可读性
-                        text = str(kp_idx)
-                        text_rect = painter.fontMetrics().boundingRect(text)
-                        text_x = int(kp_x) + point_radius + 2
-                        text_y = int(kp_y)
-                        
-                        # 绘制文本背景
-                        bg_rect = text_rect.adjusted(-2, -2, 2, 2)
-                        bg_rect.moveCenter(QPoint(int(text_x + text_rect.width()/2), int(text_y)))
-                        painter.fillRect(bg_rect, QColor(255, 255, 255, 200))
-                        
-                        # 绘制编号文本
-                        painter.drawText(int(text_x), int(text_y + text_rect.height()/2), text)
-                    
-                    painter.restore()  # 恢复绘图状态
+            # 批量绘制所有边界框、类别标签和特征点（按边界框在屏幕上的大小决定绘制的细节）
+            screen_boxes = self.box_screen_coords(x_offset, y_offset, scaled_size.width(), scaled_size.height())
+            self.draw_boxes(painter, screen_boxes, x_offset, y_offset, scaled_size.width(), scaled_size.height())
+            self.draw_keypoints(painter, screen_boxes, x_offset, y_offset, scaled_size.width(), scaled_size.height())
+            
+            # 绘制预测结果预览
+            for box in self.preview_boxes:
+                self.draw_preview_box(painter, box, x_offset, y_offset, scaled_size.width(), scaled_size.height())
             
             # Draw the box being created
             if self.current_box:
-                self.draw_box(painter, self.current_box, x_offset, y_offset, scaled_pixmap.width(), scaled_pixmap.height())
+                self.draw_box(painter, self.current_box, x_offset, y_offset, scaled_size.width(), scaled_size.height())
                 
             # 绘制辅助线（十字线）
             if self.guide_lines_enabled and self.mouse_pos and self.pixmap:
                 mouse_x, mouse_y = self.mouse_pos.x(), self.mouse_pos.y()
                 
                 # 判断鼠标是否在图像范围内
-                if (x_offset <= mouse_x <= x_offset + scaled_pixmap.width() and 
-                    y_offset <= mouse_y <= y_offset + scaled_pixmap.height()):
+                if (x_offset <= mouse_x <= x_offset + scaled_size.width() and 
+                    y_offset <= mouse_y <= y_offset + scaled_size.height()):
                     
                     # 设置辅助线样式：半透明蓝色虚线
                     guide_pen = QPen(QColor(0, 120, 215, 180), 1, Qt.DashLine)
                     painter.setPen(guide_pen)
                     
                     # 绘制水平辅助线
-                    painter.drawLine(x_offset, mouse_y, x_offset + scaled_pixmap.width(), mouse_y)
+                    painter.drawLine(x_offset, mouse_y, x_offset + scaled_size.width(), mouse_y)
                     
                     # 绘制垂直辅助线
-                    painter.drawLine(mouse_x, y_offset, mouse_x, y_offset + scaled_pixmap.height())
+                    painter.drawLine(mouse_x, y_offset, mouse_x, y_offset + scaled_size.height())
     
-    def draw_box(self, painter, box, offset_x, offset_y, img_width, img_height, is_selected=False):
-        # Get original image dimensions
-        orig_width = self.pixmap.width()
-        orig_height = self.pixmap.height()
+    def box_pen(self, color_index, width):
+        """获取（缓存的）边界框画笔"""
+        key = (color_index, width)
+        pen = self.pen_cache.get(key)
+        if pen is None:
+            pen = QPen(BOX_COLORS[color_index], width, Qt.SolidLine)
+            self.pen_cache[key] = pen
+        return pen
+    
+    def box_brush(self, color_index, alpha):
+        """获取（缓存的）半透明填充画刷"""
+        key = (color_index, alpha)
+        brush = self.brush_cache.get(key)
+        if brush is None:
+            color = QColor(BOX_COLORS[color_index])
+            color.setAlpha(alpha)
+            brush = QBrush(color)
+            self.brush_cache[key] = brush
+        return brush
+    
+    def static_text(self, text):
+        """获取（缓存的）QStaticText，文字排版只在第一次绘制时进行"""
+        static = self.static_text_cache.get(text)
+        if static is None:
+            if len(self.static_text_cache) >= STATIC_TEXT_CACHE_SIZE:
+                self.static_text_cache.clear()
+            static = QStaticText(text)
+            static.setPerformanceHint(QStaticText.AggressiveCaching)
+            self.static_text_cache[text] = static
+        return static
+    
+    def keypoint_sprite(self, index):
+        """
+        获取（缓存的）特征点图片：圆点 + 白色半透明背景上的编号文字，index为None时只有圆点
+        
+        Returns:
+            tuple: (图片, 圆点中心在图片中的逻辑坐标 (x, y))
+        """
+        ratio = self.devicePixelRatioF()
+        cached = self.keypoint_sprite_cache.get(index)
+        if cached is not None and cached[0].devicePixelRatioF() == ratio:
+            return cached
+        
+        radius = self.keypoint_radius
+        dot_extent = radius + KEYPOINT_PEN.width()
+        if index is None:
+            width = height = dot_extent * 2
+        else:
+            metrics = QFontMetrics(self.keypoint_font)
+            text_rect = metrics.boundingRect(str(index))
+            label_width, label_height = text_rect.width() + 4, text_rect.height() + 4
+            width = dot_extent + radius + label_width
+            height = max(dot_extent * 2, label_height)
+        center = (dot_extent, height // 2)
         
+        sprite = QPixmap(int(width * ratio), int(height * ratio))
+        sprite.setDevicePixelRatio(ratio)
+        sprite.fill(Qt.transparent)
+        sprite_painter = QPainter(sprite)
+        sprite_painter.setRenderHint(QPainter.Antialiasing)
+        sprite_painter.setPen(KEYPOINT_PEN)
+        sprite_painter.setBrush(KEYPOINT_BRUSH)
+        sprite_painter.drawEllipse(QPointF(*center), radius, radius)
+        
+        # 编号背景和文字（与圆点中心垂直居中）
+        if index is None:
+            sprite_painter.end()
+            cached = (sprite, center)
+            self.keypoint_sprite_cache[index] = cached
+            return cached
+        label_left = center[0] + radius
+        label_top = center[1] - text_rect.height() // 2 - 2
+        sprite_painter.fillRect(label_left, label_top, label_width, label_height, KEYPOINT_LABEL_BACKGROUND)
+        sprite_painter.setFont(self.keypoint_font)
+        sprite_painter.drawStaticText(QPointF(label_left + 2, label_top + 2 + text_rect.height() - metrics.ascent()),
+                                      self.static_text(str(index)))
+        sprite_painter.end()
+        
+        cached = (sprite, center)
+        self.keypoint_sprite_cache[index] = cached
+        return cached
+    
+    def box_label(self, class_id):
+        return self.static_text(f"{self.parent.get_class_name(class_id)} (ID: {class_id})")
+    
+    def box_screen_coords(self, offset_x, offset_y, img_width, img_height):
+        """所有边界框在画布上的坐标（取整），(N, 4) 数组"""
+        if not self.boxes:
+            return np.empty((0, 4), dtype=np.int64)
+        coords = np.array([(box.x1, box.y1, box.x2, box.y2) for box in self.boxes], dtype=np.float64)
+        coords[:, 0::2] = coords[:, 0::2] * (img_width / self.image_size.width()) + offset_x
+        coords[:, 1::2] = coords[:, 1::2] * (img_height / self.image_size.height()) + offset_y
+        return coords.astype(np.int64)
+    
+    def visible_mask(self, screen_boxes):
+        """与画布可见区域相交的边界框"""
+        x1 = np.minimum(screen_boxes[:, 0], screen_boxes[:, 2])
+        x2 = np.maximum(screen_boxes[:, 0], screen_boxes[:, 2])
+        y1 = np.minimum(screen_boxes[:, 1], screen_boxes[:, 3])
+        y2 = np.maximum(screen_boxes[:, 1], screen_boxes[:, 3])
+        return (x2 >= 0) & (x1 <= self.width()) & (y2 >= 0) & (y1 <= self.height())
+    
+    def draw_boxes(self, painter, screen_boxes, offset_x, offset_y, img_width, img_height):
+        """
+        批量绘制所有边界框
+        
+        未选中的边界框按颜色分组，每组只设置一次画笔和画刷，用一次drawRects绘制；
+        类别标签使用缓存的QStaticText。不在可见区域内的边界框不绘制，屏幕上小于
+        lod_label_min_size的边界框不绘制标签，改为在左上角按类别汇总数量。
+        选中的边界框最后单独绘制。
+        """
+        if not self.boxes:
+            return
+        visible = self.visible_mask(screen_boxes)
+        sizes = np.minimum(np.abs(screen_boxes[:, 2] - screen_boxes[:, 0]),
+                           np.abs(screen_boxes[:, 3] - screen_boxes[:, 1]))
+        show_label = (sizes >= self.lod_label_min_size).tolist()
+        coords = screen_boxes.tolist()
+        
+        groups = {}
+        for i in np.flatnonzero(visible).tolist():
+            if i != self.selected_box_index:
+                groups.setdefault(self.boxes[i].class_id % len(BOX_COLORS), []).append(i)
+        
+        # 坐标已取整，轴对齐的矩形不需要抗锯齿
+        label_ascent = painter.fontMetrics().ascent()
+        hidden_labels = {}
+        for color_index, indices in groups.items():
+            painter.setPen(self.box_pen(color_index, 2))
+            painter.setBrush(self.box_brush(color_index, 30))
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.drawRects([QRect(x1, y1, x2 - x1, y2 - y1)
+                               for x1, y1, x2, y2 in (coords[i] for i in indices)])
+            painter.setRenderHint(QPainter.Antialiasing)
+            for i in indices:
+                class_id = self.boxes[i].class_id
+                if show_label[i]:
+                    painter.drawStaticText(QPointF(coords[i][0], coords[i][1] - 5 - label_ascent),
+                                           self.box_label(class_id))
+                else:
+                    hidden_labels[class_id] = hidden_labels.get(class_id, 0) + 1
+        painter.setBrush(Qt.NoBrush)
+        
+        if hidden_labels:
+            self.draw_label_summary(painter, hidden_labels)
+        
+        if 0 <= self.selected_box_index < len(self.boxes):
+            self.draw_box(painter, self.boxes[self.selected_box_index],
+                          offset_x, offset_y, img_width, img_height, True)
+    
+    def draw_label_summary(self, painter, counts):
+        """在画布左上角按类别汇总未绘制标签的边界框数量"""
+        painter.save()
+        metrics = painter.fontMetrics()
+        line_height = metrics.height()
+        items = sorted(counts.items())
+        if len(items) > LABEL_SUMMARY_MAX_ROWS:
+            rest = sum(count for _, count in items[LABEL_SUMMARY_MAX_ROWS - 1:])
+            items = items[:LABEL_SUMMARY_MAX_ROWS - 1] + [(None, rest)]
+        lines = [(class_id, f"{self.parent.get_class_name(class_id)}: {count}" if class_id is not None
+                  else tr("其他: {}").format(count)) for class_id, count in items]
+        width = max(metrics.horizontalAdvance(text) for _, text in lines) + 12
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(SUMMARY_BACKGROUND)
+        painter.drawRect(4, 4, width, line_height * len(lines) + 8)
+        for row, (class_id, text) in enumerate(lines):
+            color_index = 0 if class_id is None else class_id % len(BOX_COLORS)
+            painter.setPen(self.box_pen(color_index, 1))
+            painter.drawStaticText(QPointF(10, 8 + row * line_height), self.static_text(text))
+        painter.restore()
+    
+    def draw_keypoints(self, painter, screen_boxes, offset_x, offset_y, img_width, img_height):
+        """
+        批量绘制所有特征点
+        
+        所有特征点的坐标一次性换算，按所属边界框在屏幕上的大小选择细节：
+        不小于lod_keypoint_label_min_size时绘制圆点和编号（预先渲染为缓存的图片，每个特征点一次贴图）；
+        不小于lod_keypoint_min_size时只绘制圆点；更小时所有特征点合并为一次drawPoints绘制的单像素点。
+        可见区域外的特征点不绘制。
+        """
+        box_indices = [i for i, box in enumerate(self.boxes) if box.has_keypoints()]
+        if not box_indices:
+            return
+        keypoint_sets = [np.asarray(self.boxes[i].keypoints, dtype=np.float64).reshape(-1, 2) for i in box_indices]
+        counts = [len(keypoints) for keypoints in keypoint_sets]
+        points = np.vstack(keypoint_sets)
+        points[:, 0] = points[:, 0] * (img_width / self.image_size.width()) + offset_x
+        points[:, 1] = points[:, 1] * (img_height / self.image_size.height()) + offset_y
+        points = points.astype(np.int64)
+        point_indices = np.concatenate([np.arange(n) for n in counts])
+        
+        # 每个特征点所属边界框在屏幕上的大小
+        owners = screen_boxes[box_indices]
+        box_sizes = np.minimum(np.abs(owners[:, 2] - owners[:, 0]), np.abs(owners[:, 3] - owners[:, 1]))
+        point_sizes = np.repeat(box_sizes, counts)
+        
+        visible = (points[:, 0] >= -KEYPOINT_CULL_MARGIN) & (points[:, 0] <= self.width() + KEYPOINT_CULL_MARGIN) & \
+                  (points[:, 1] >= -KEYPOINT_CULL_MARGIN) & (points[:, 1] <= self.height() + KEYPOINT_CULL_MARGIN)
+        labeled = visible & (point_sizes >= self.lod_keypoint_label_min_size)
+        dots = visible & ~labeled & (point_sizes >= self.lod_keypoint_min_size)
+        tiny = visible & (point_sizes < self.lod_keypoint_min_size)
+        
+        for (x, y), k in zip(points[labeled].tolist(), point_indices[labeled].tolist()):
+            sprite, (cx, cy) = self.keypoint_sprite(k)
+            painter.drawPixmap(x - cx, y - cy, sprite)
+        
+        if dots.any():
+            sprite, (cx, cy) = self.keypoint_sprite(None)
+            for x, y in points[dots].tolist():
+                painter.drawPixmap(x - cx, y - cy, sprite)
+        
+        if tiny.any():
+            painter.save()
+            painter.setRenderHint(QPainter.Antialiasing, False)
+            painter.setPen(KEYPOINT_TINY_PEN)
+            painter.drawPoints(QPolygon([QPoint(x, y) for x, y in points[tiny].tolist()]))
+            painter.restore()
+    
+    def draw_box(self, painter, box, offset_x, offset_y, img_width, img_height, is_selected=False):
+        """绘制单个边界框（选中的边界框、正在绘制的边界框）"""
         # Scale box coordinates to match displayed image
-        scale_x = img_width / orig_width
-        scale_y = img_height / orig_height
+        scale_x = img_width / self.image_size.width()
+        scale_y = img_height / self.image_size.height()
         
         x1 = offset_x + box.x1 * scale_x
         y1 = offset_y + box.y1 * scale_y
         x2 = offset_x + box.x2 * scale_x
         y2 = offset_y + box.y2 * scale_y
         
-        # 更现代的颜色方案
-        colors = [
-            QColor(231, 76, 60),   # 红色
-            QColor(46, 204, 113),  # 绿色
-            QColor(52, 152, 219),  # 蓝色
-            QColor(241, 196, 15),  # 黄色
-            QColor(155, 89, 182),  # 紫色
-            QColor(230, 126, 34)   # 橙色
-        ]
-        color = colors[box.class_id % len(colors)]
-        
-        # 选中的边界框使用更粗的线条
-        pen_width = 3 if is_selected else 2
-        pen = QPen(color, pen_width, Qt.SolidLine)
-        painter.setPen(pen)
-        
-        # 无论是否选中，都添加半透明填充，但选中的透明度稍低（更明显）
-        fill_color = QColor(color)
-        fill_color.setAlpha(30 if not is_selected else 100)  # 设置透明度
-        painter.fillRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1), fill_color)
+        color_index = box.class_id % len(BOX_COLORS)
+        
+        # 选中的边界框使用更粗的线条和更明显的填充
+        painter.setPen(self.box_pen(color_index, 3 if is_selected else 2))
+        painter.fillRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1),
+                         self.box_brush(color_index, 100 if is_selected else 30))
         
         # 绘制边框
         painter.drawRect(int(x1), int(y1), int(x2 - x1), int(y2 - y1))
         
-        # 只有当is_selected为True时才绘制控制点
-        if is_selected:
+        # 只有当is_selected为True且边界框在屏幕上足够大时才绘制控制点
+        if is_selected and min(abs(x2 - x1), abs(y2 - y1)) >= self.lod_handle_min_size:
             painter.save()  # 保存当前状态
             handle_size = 6
-            handle_color = Qt.white
-            painter.setBrush(QColor(handle_color))
-            
-            # 绘制四个角点
-            corners = [
-                (x1, y1),  # 左上
-                (x2, y1),  # 右上
-                (x1, y2),  # 左下
-                (x2, y2)   # 右下
-            ]
-            for cx, cy in corners:
-                painter.drawRect(int(cx - handle_size/2), int(cy - handle_size/2), handle_size, handle_size)
-            
-            # 绘制四条边的中点
-            edges = [
-                (x1 + (x2-x1)/2, y1),  # 上边中点
-                (x2, y1 + (y2-y1)/2),  # 右边中点
-                (x1 + (x2-x1)/2, y2),  # 下边中点
-                (x1, y1 + (y2-y1)/2)   # 左边中点
+            painter.setBrush(QColor(Qt.white))
+            
+            # 四个角点和四条边的中点
+            handles = [
+                (x1, y1), (x2, y1), (x1, y2), (x2, y2),
+                (x1 + (x2-x1)/2, y1), (x2, y1 + (y2-y1)/2), (x1 + (x2-x1)/2, y2), (x1, y1 + (y2-y1)/2)
             ]
-            for ex, ey in edges:
-                painter.drawRect(int(ex - handle_size/2), int(ey - handle_size/2), handle_size, handle_size)
+            painter.drawRects([QRect(int(hx - handle_size/2), int(hy - handle_size/2), handle_size, handle_size)
+                               for hx, hy in handles])
             
             painter.restore()  # 恢复保存的状态
         
         # Draw class label
+        painter.drawStaticText(QPointF(int(x1), int(y1) - 5 - painter.fontMetrics().ascent()),
+                               self.box_label(box.class_id))
+    
+    def draw_preview_box(self, painter, box, offset_x, offset_y, img_width, img_height):
+        """以虚线绘制预览中的预测边界框，并标注类别和置信度"""
+        scale_x = img_width / self.image_size.width()
+        scale_y = img_height / self.image_size.height()
+        x1 = int(offset_x + box.x1 * scale_x)
+        y1 = int(offset_y + box.y1 * scale_y)
+        x2 = int(offset_x + box.x2 * scale_x)
+        y2 = int(offset_y + box.y2 * scale_y)
+        
+        painter.save()
+        painter.setPen(QPen(QColor(0, 200, 255), 2, Qt.DashLine))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(x1, y1, x2 - x1, y2 - y1)
         class_name = self.parent.get_class_name(box.class_id)
-        painter.drawText(int(x1), int(y1) - 5, f"{class_name} (ID: {box.class_id})")
+        painter.drawText(x1, y2 + 14, f"{class_name} {box.confidence:.2f}")
+        painter.restore()
+    
+    def set_lod_params(self, params):
+        """设置细节层次阈值（键与Settings.get_render_params一致）并重绘"""
+        self.lod_label_min_size = int(params.get('label_min_size', self.lod_label_min_size))
+        self.lod_keypoint_label_min_size = int(params.get('keypoint_label_min_size', self.lod_keypoint_label_min_size))
+        self.lod_keypoint_min_size = int(params.get('keypoint_min_size', self.lod_keypoint_min_size))
+        self.lod_handle_min_size = int(params.get('handle_min_size', self.lod_handle_min_size))
+        self.update()
+    
+    def set_preview_boxes(self, boxes):
+        """设置预测结果预览并重绘"""
+        self.preview_boxes = list(boxes)
+        self.update()
+    
+    def display_size(self):
+        """图像按当前缩放比例、保持宽高比显示时的尺寸"""
+        return self.image_size.scaled(int(self.width() * self.scale_factor),
+                                         int(self.height() * self.scale_factor),
+                                         Qt.KeepAspectRatio)
     
     def get_scaled_pos(self, pos):
         """将QPoint窗口坐标转换为考虑缩放因子的图像坐标"""
         if not self.pixmap:
             return QPoint(0, 0)
             
-        scaled_pixmap = self.pixmap.scaled(int(self.width() * self.scale_factor), 
-                                          int(self.height() * self.scale_factor),
-                                          Qt.KeepAspectRatio)
-        offset_x = (self.width() - scaled_pixmap.width()) // 2 + self.offset_x
-        offset_y = (self.height() - scaled_pixmap.height()) // 2 + self.offset_y
+        scaled_size = self.display_size()
+        offset_x = (self.width() - scaled_size.width()) // 2 + self.offset_x
+        offset_y = (self.height() - scaled_size.height()) // 2 + self.offset_y
         
         # 转换为原始图像坐标
-        orig_width = self.pixmap.width()
-        orig_height = self.pixmap.height()
-        scale_x = orig_width / scaled_pixmap.width()
-        scale_y = orig_height / scaled_pixmap.height()
+        orig_width = self.image_size.width()
+        orig_height = self.image_size.height()
+        scale_x = orig_width / scaled_size.width()
+        scale_y = orig_height / scaled_size.height()
         
         x = (pos.x() - offset_x) * scale_x
         y = (pos.y() - offset_y) * scale_y
@@ -364,22 +645,20 @@ class ImageCanvas(QWidget):
         if not self.pixmap:
             return None, None
             
-        scaled_pixmap = self.pixmap.scaled(int(self.width() * self.scale_factor), 
-                                          int(self.height() * self.scale_factor),
-                                          Qt.KeepAspectRatio)
-        offset_x = (self.width() - scaled_pixmap.width()) // 2 + self.offset_x
-        offset_y = (self.height() - scaled_pixmap.height()) // 2 + self.offset_y
+        scaled_size = self.display_size()
+        offset_x = (self.width() - scaled_size.width()) // 2 + self.offset_x
+        offset_y = (self.height() - scaled_size.height()) // 2 + self.offset_y
         
         # 检查点是否在图像范围内
-        if not (offset_x <= event_x <= offset_x + scaled_pixmap.width() and
-                offset_y <= event_y <= offset_y + scaled_pixmap.height()):
+        if not (offset_x <= event_x <= offset_x + scaled_size.width() and
+                offset_y <= event_y <= offset_y + scaled_size.height()):
             return None, None
             
         # 转换为原始图像坐标
-        orig_width = self.pixmap.width()
-        orig_height = self.pixmap.height()
-        scale_x = orig_width / scaled_pixmap.width()
-        scale_y = orig_height / scaled_pixmap.height()
+        orig_width = self.image_size.width()
+        orig_height = self.image_size.height()
+        scale_x = orig_width / scaled_size.width()
+        scale_y = orig_height / scaled_size.height()
         
         x = (event_x - offset_x) * scale_x
         y = (event_y - offset_y) * scale_y
@@ -454,6 +733,7 @@ class ImageCanvas(QWidget):
                             if abs(kp_x - pos.x()) <= self.keypoint_radius * 2 and abs(kp_y - pos.y()) <= self.keypoint_radius * 2:
                                 # 开始移动特征点
                                 self.moving_keypoint = True
+                                self.edit_start_keypoints = copy_keypoints(box.keypoints)
                                 self.moving_keypoint_box_index = box_idx
                                 self.moving_keypoint_index = kp_idx
                                 self.setCursor(Qt.ClosedHandCursor)  # 设置为抓取光标
@@ -465,7 +745,9 @@ class ImageCanvas(QWidget):
                     # 直接检查点击位置是否在边界框的确切边界内，不使用边缘容差
                     if box.x1 <= pos.x() <= box.x2 and box.y1 <= pos.y() <= box.y2:
                         # 添加特征点
+                        old_keypoints = copy_keypoints(box.keypoints)
                         if box.add_keypoint(pos.x(), pos.y()):
+                            self.record_edit(ChangeKeypoints(self.selected_box_index, old_keypoints, box.keypoints))
                             self.update()
                             self.parent.save_current()  # 保存修改
                             return
@@ -486,6 +768,7 @@ class ImageCanvas(QWidget):
                 self.edit_mode = edit_mode
                 self.edit_handle = handle
                 self.last_cursor_pos = (x, y)
+                self.edit_start_geometry = box_geometry(self.boxes[box_index])
                 
                 # 更新边界框列表选择
                 self.parent.box_list.setCurrentRow(box_index)
@@ -531,6 +814,7 @@ class ImageCanvas(QWidget):
                 if distance <= 5:  # 5像素的容差
                     # 删除特征点
                     new_keypoints = np.delete(keypoints, j, axis=0)
+                    self.record_edit(ChangeKeypoints(i, keypoints, new_keypoints))
                     box.set_keypoints(new_keypoints)
                     self.update()
                     self.parent.save_current()  # 保存修改
@@ -566,8 +850,8 @@ class ImageCanvas(QWidget):
                 box = self.boxes[self.moving_keypoint_box_index]
                 if box.has_keypoints():
                     # 确保特征点位置在图像范围内
-                    x = max(0, min(pos.x(), self.pixmap.width()))
-                    y = max(0, min(pos.y(), self.pixmap.height()))
+                    x = max(0, min(pos.x(), self.image_size.width()))
+                    y = max(0, min(pos.y(), self.image_size.height()))
                     
                     # 更新特征点坐标
                     box.keypoints[self.moving_keypoint_index] = [x, y]
@@ -605,8 +889,8 @@ class ImageCanvas(QWidget):
             dy = y - self.last_cursor_pos[1]
             
             # 获取图像边界
-            img_width = self.pixmap.width()
-            img_height = self.pixmap.height()
+            img_width = self.image_size.width()
+            img_height = self.image_size.height()
             
             if self.edit_mode == 'move':
                 # 移动整个边界框
@@ -654,8 +938,8 @@ class ImageCanvas(QWidget):
         # 处理新边界框创建
         elif self.start_point and self.current_box:
             # 限制在图像边界内
-            x = max(0, min(x, self.pixmap.width()))
-            y = max(0, min(y, self.pixmap.height()))
+            x = max(0, min(x, self.image_size.width()))
+            y = max(0, min(y, self.image_size.height()))
             
             self.current_box.x2 = x
             self.current_box.y2 = y
@@ -680,6 +964,13 @@ class ImageCanvas(QWidget):
                 self.moving_keypoint = False
                 self.setCursor(Qt.CrossCursor)  # 恢复十字光标
                 
+                # 记录特征点移动
+                box = self.boxes[self.moving_keypoint_box_index]
+                if self.edit_start_keypoints is not None and not np.array_equal(self.edit_start_keypoints, box.keypoints):
+                    self.record_edit(ChangeKeypoints(self.moving_keypoint_box_index,
+                                                     self.edit_start_keypoints, box.keypoints))
+                self.edit_start_keypoints = None
+                
                 # 保存更新的特征点位置
                 self.parent.save_current()  # 保存修改
                 
@@ -701,8 +992,8 @@ class ImageCanvas(QWidget):
                 dy = y - self.last_cursor_pos[1]
                 
                 # 获取图像边界
-                img_width = self.pixmap.width()
-                img_height = self.pixmap.height()
+                img_width = self.image_size.width()
+                img_height = self.image_size.height()
                 
                 if self.edit_mode == 'move':
                     # 移动整个边界框
@@ -748,13 +1039,19 @@ class ImageCanvas(QWidget):
                 self.edit_mode = None
                 self.edit_handle = None
                 self.last_cursor_pos = None
-                self.parent.save_current()  # 保存修改
+                
+                # 只有坐标确实变化时才记录和保存（单击选中边界框不算编辑）
+                new_geometry = box_geometry(box)
+                if self.edit_start_geometry is not None and new_geometry != self.edit_start_geometry:
+                    self.record_edit(ChangeGeometry(self.selected_box_index, self.edit_start_geometry, new_geometry))
+                    self.parent.save_current()  # 保存修改
+                self.edit_start_geometry = None
                 
             # 处理新边界框创建
             elif self.start_point and self.current_box:
                 # 限制在图像边界内
-                x = max(0, min(x, self.pixmap.width()))
-                y = max(0, min(y, self.pixmap.height()))
+                x = max(0, min(x, self.image_size.width()))
+                y = max(0, min(y, self.image_size.height()))
                 
                 self.current_box.x2 = x
                 self.current_box.y2 = y
@@ -766,6 +1063,7 @@ class ImageCanvas(QWidget):
                 box_added = False
                 if width > 5 and height > 5:  # 最小尺寸阈值
                     self.boxes.append(self.current_box)
+                    self.record_edit(AddBoxes(len(self.boxes) - 1, [self.current_box]))
                     self.parent.update_box_list()
                     box_added = True
                 
@@ -783,7 +1081,11 @@ class ImageCanvas(QWidget):
         
         # 如果有选中的边界框，更新其类别
         if self.selected_box_index >= 0 and self.selected_box_index < len(self.boxes):
-            self.boxes[self.selected_box_index].class_id = class_id
+            box = self.boxes[self.selected_box_index]
+            if box.class_id == class_id:
+                return
+            self.record_edit(ChangeClass(self.selected_box_index, box.class_id, class_id))
+            box.class_id = class_id
             self.parent.update_box_list()
             self.update()
             self.parent.save_current()  # 保存修改
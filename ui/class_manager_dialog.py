@@ -1,19 +1,27 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, 
-                            QListWidget, QListWidgetItem, QInputDialog, QMessageBox)
+                            QListWidget, QListWidgetItem, QInputDialog, QMessageBox,
+                            QProgressDialog, QApplication)
 from PyQt5.QtCore import Qt
 import os
 import yaml
 from i18n import tr
+from utils.class_remap import ClassRemapper
 import logging
 
 logger = logging.getLogger('YOLOLabelCreator.ClassManager')
 
 class ClassManagerDialog(QDialog):
-    def __init__(self, classes, data_yaml_path=None, parent=None):
+    def __init__(self, classes, data_yaml_path=None, parent=None, dataset_dir=None):
         super().__init__(parent)
         self.classes = classes.copy()  # 复制类别列表，避免直接修改
         self.data_yaml_path = data_yaml_path
         self.original_classes = classes.copy()  # 保存原始类别列表，用于比较变化
+        # 数据集目录，类别ID变化时用于改写标签文件
+        self.dataset_dir = dataset_dir
+        # 每个类别对应的原类别ID（合并后可能有多个，新添加的类别为空）
+        self.source_ids = [[i] for i in range(len(classes))]
+        # 标签文件重映射结果，未改写标签时为None
+        self.remap_result = None
         
         self.setWindowTitle(tr("类别管理"))
         self.setMinimumSize(400, 300)
@@ -49,6 +57,23 @@ class ClassManagerDialog(QDialog):
         
         layout.addLayout(button_layout)
         
+        # 排序与合并按钮布局
+        order_layout = QHBoxLayout()
+        
+        self.move_up_button = QPushButton(tr("上移"))
+        self.move_up_button.clicked.connect(lambda: self.move_class(-1))
+        order_layout.addWidget(self.move_up_button)
+        
+        self.move_down_button = QPushButton(tr("下移"))
+        self.move_down_button.clicked.connect(lambda: self.move_class(1))
+        order_layout.addWidget(self.move_down_button)
+        
+        self.merge_button = QPushButton(tr("合并到..."))
+        self.merge_button.clicked.connect(self.merge_class)
+        order_layout.addWidget(self.merge_button)
+        
+        layout.addLayout(order_layout)
+        
         # 确定取消按钮
         dialog_buttons = QHBoxLayout()
         
@@ -78,6 +103,7 @@ class ClassManagerDialog(QDialog):
                 return
             
             self.classes.append(class_name)
+            self.source_ids.append([])
             self.populate_class_list()
     
     def edit_class(self):
@@ -123,8 +149,63 @@ class ClassManagerDialog(QDialog):
         
         if reply == QMessageBox.Yes:
             del self.classes[current_index]
+            del self.source_ids[current_index]
             self.populate_class_list()
     
+    def move_class(self, offset):
+        """将选中的类别上移或下移一位（改变类别ID）"""
+        current_index = self.class_list.currentRow()
+        target_index = current_index + offset
+        if current_index < 0 or not 0 <= target_index < len(self.classes):
+            return
+        
+        for items in (self.classes, self.source_ids):
+            items[current_index], items[target_index] = items[target_index], items[current_index]
+        self.populate_class_list()
+        self.class_list.setCurrentRow(target_index)
+    
+    def merge_class(self):
+        """将选中的类别合并到另一个类别"""
+        current_index = self.class_list.currentRow()
+        if current_index < 0:
+            QMessageBox.warning(self, tr("警告"), tr("请先选择一个类别"))
+            return
+        
+        targets = [f"{i}: {name}" for i, name in enumerate(self.classes) if i != current_index]
+        if not targets:
+            return
+        target, ok = QInputDialog.getItem(
+            self, tr("合并类别"),
+            tr("将类别 '{}' 合并到:").format(self.classes[current_index]),
+            targets, 0, False
+        )
+        if not ok:
+            return
+        
+        target_index = int(target.split(":", 1)[0])
+        self.source_ids[target_index].extend(self.source_ids[current_index])
+        del self.classes[current_index]
+        del self.source_ids[current_index]
+        self.populate_class_list()
+        self.class_list.setCurrentRow(target_index if target_index < current_index else target_index - 1)
+    
+    def get_class_mapping(self):
+        """
+        返回原类别ID到新类别ID的映射
+        
+        Returns:
+            dict: {旧类别ID: 新类别ID}，被删除的类别映射为None
+        """
+        mapping = {old_id: None for old_id in range(len(self.original_classes))}
+        for new_id, old_ids in enumerate(self.source_ids):
+            for old_id in old_ids:
+                mapping[old_id] = new_id
+        return mapping
+    
+    def has_id_changes(self):
+        """检查是否有类别ID发生变化（删除、合并或重新排序）"""
+        return any(old_id != new_id for old_id, new_id in self.get_class_mapping().items())
+    
     def get_classes(self):
         """返回修改后的类别列表"""
         return self.classes
@@ -139,6 +220,11 @@ class ClassManagerDialog(QDialog):
             QMessageBox.warning(self, tr("警告"), tr("类别列表不能为空"))
             return
         
+        # 类别ID变化时同步改写数据集中的标签文件
+        if self.dataset_dir and self.has_id_changes():
+            if not self.remap_labels():
+                return
+        
         # 如果有data.yaml路径，尝试更新
         if self.data_yaml_path and os.path.exists(os.path.dirname(self.data_yaml_path)):
             try:
@@ -149,6 +235,65 @@ class ClassManagerDialog(QDialog):
         
         super().accept()
     
+    def remap_labels(self):
+        """
+        统计并改写受类别ID变化影响的标签文件
+        
+        Returns:
+            bool: 是否继续保存类别列表（用户取消时返回False）
+        """
+        remapper = ClassRemapper(self.dataset_dir, self.get_class_mapping(), len(self.original_classes))
+        
+        progress = QProgressDialog(tr("正在统计受影响的标签..."), tr("取消"), 0, 100, self)
+        progress.setWindowTitle(tr("类别重映射"))
+        progress.setWindowModality(Qt.WindowModal)
+        progress.show()
+        
+        def on_progress(done, total):
+            progress.setMaximum(max(1, total))
+            progress.setValue(done)
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+        
+        preview = remapper.run(dry_run=True, progress_callback=on_progress)
+        progress.close()
+        if preview is None:
+            return False
+        if preview['changed_files'] == 0:
+            return True
+        
+        details = [tr("{} 个标签文件中的标注将被修改:").format(preview['changed_files']),
+                   tr("{} 个边界框更改类别").format(preview['changed_boxes']),
+                   tr("{} 个边界框被删除").format(preview['deleted_boxes'])]
+        mapping = remapper.lookup
+        for old_id, count in sorted(preview['per_class'].items()):
+            old_name = self.original_classes[old_id] if old_id < len(self.original_classes) else str(old_id)
+            new_id = int(mapping[old_id])
+            target = tr("删除") if new_id < 0 else f"{new_id}: {self.classes[new_id]}"
+            details.append(f"  {old_id}: {old_name} → {target} ({count})")
+        reply = QMessageBox.question(
+            self, tr("类别重映射"),
+            "\n".join(details) + "\n\n" + tr("是否改写标签文件？选择“否”则只修改类别列表。"),
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes
+        )
+        if reply == QMessageBox.Cancel:
+            return False
+        if reply == QMessageBox.No:
+            return True
+        
+        progress = QProgressDialog(tr("正在改写标签文件..."), None, 0, max(1, preview['files']), self)
+        progress.setWindowTitle(tr("类别重映射"))
+        progress.setWindowModality(Qt.WindowModal)
+        progress.show()
+        self.remap_result = remapper.run(progress_callback=on_progress)
+        progress.close()
+        
+        if self.remap_result['errors']:
+            failed = "\n".join(path for path, _ in self.remap_result['errors'][:10])
+            QMessageBox.warning(self, tr("警告"),
+                                tr("{} 个标签文件改写失败:").format(len(self.remap_result['errors'])) + "\n" + failed)
+        return True
+    
     def update_data_yaml(self):
         """更新data.yaml文件"""
         if not self.data_yaml_path:
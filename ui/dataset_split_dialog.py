@@ -5,9 +5,11 @@ import yaml
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
                             QLabel, QPushButton, QDoubleSpinBox, QGroupBox,
                             QRadioButton, QFileDialog, QLineEdit, QMessageBox,
-                            QCheckBox, QProgressDialog)
+                            QCheckBox, QProgressDialog, QSpinBox, QApplication)
 from PyQt5.QtCore import Qt, QSettings
 from utils.logger import setup_logger
+from utils.image_hasher import DuplicateFinder, DEFAULT_MAX_DISTANCE
+from utils.shard_pack import ShardWriter, write_pack_yaml, PACK_VERSION, PACK_YAML_KEY
 from i18n import tr
 
 logger = setup_logger('YOLOLabelCreator.DatasetSplit')
@@ -96,6 +98,27 @@ class DatasetSplitDialog(QDialog):
         self.create_yaml.setChecked(True)
         ratio_layout.addRow("", self.create_yaml)
         
+        # 重复图像分组选项，避免同一画面泄漏到不同子集
+        self.keep_duplicates = QCheckBox(tr("保持重复图像在同一子集"))
+        self.keep_duplicates.setChecked(False)
+        self.keep_duplicates.setToolTip(tr("通过内容哈希和感知哈希检测重复/近似重复图像，并将其划分到同一子集"))
+        ratio_layout.addRow("", self.keep_duplicates)
+        
+        self.duplicate_distance = QSpinBox()
+        self.duplicate_distance.setRange(0, 16)
+        self.duplicate_distance.setValue(DEFAULT_MAX_DISTANCE)
+        self.duplicate_distance.setToolTip(tr("感知哈希的最大汉明距离，0表示只合并几乎完全相同的图像"))
+        self.duplicate_distance.setEnabled(False)
+        self.keep_duplicates.toggled.connect(self.duplicate_distance.setEnabled)
+        ratio_layout.addRow(tr("相似度阈值:"), self.duplicate_distance)
+        
+        # 输出为分片数据包（大量小文件位于网络存储时减少逐文件的打开开销）
+        self.output_pack = QCheckBox(tr("输出为分片数据包"))
+        self.output_pack.setChecked(False)
+        self.output_pack.setToolTip(tr("每个子集写入若干个tar分片和偏移索引，而不是逐个复制图像和标签文件；"
+                                       "可在训练器中直接使用数据包的data.yaml"))
+        ratio_layout.addRow("", self.output_pack)
+        
         ratio_group.setLayout(ratio_layout)
         layout.addWidget(ratio_group)
         
@@ -154,6 +177,9 @@ class DatasetSplitDialog(QDialog):
         self.val_ratio.setValue(float(self.settings.value("dataset_split/val_ratio", 0.2)))
         self.random_seed.setValue(int(self.settings.value("dataset_split/random_seed", 42)))
         self.create_yaml.setChecked(self.settings.value("dataset_split/create_yaml", True, type=bool))
+        self.output_pack.setChecked(self.settings.value("dataset_split/output_pack", False, type=bool))
+        self.keep_duplicates.setChecked(self.settings.value("dataset_split/keep_duplicates", False, type=bool))
+        self.duplicate_distance.setValue(int(self.settings.value("dataset_split/duplicate_distance", DEFAULT_MAX_DISTANCE)))
         
         self.update_split_button()
     
@@ -164,6 +190,9 @@ class DatasetSplitDialog(QDialog):
         self.settings.setValue("dataset_split/val_ratio", self.val_ratio.value())
         self.settings.setValue("dataset_split/random_seed", int(self.random_seed.value()))
         self.settings.setValue("dataset_split/create_yaml", self.create_yaml.isChecked())
+        self.settings.setValue("dataset_split/output_pack", self.output_pack.isChecked())
+        self.settings.setValue("dataset_split/keep_duplicates", self.keep_duplicates.isChecked())
+        self.settings.setValue("dataset_split/duplicate_distance", self.duplicate_distance.value())
         self.settings.sync()
     
     def split_dataset(self):
@@ -175,6 +204,9 @@ class DatasetSplitDialog(QDialog):
         test_ratio = 1.0 - train_ratio - val_ratio
         random_seed = int(self.random_seed.value())
         create_yaml = self.create_yaml.isChecked()
+        keep_duplicates = self.keep_duplicates.isChecked()
+        duplicate_distance = self.duplicate_distance.value()
+        output_pack = self.output_pack.isChecked()
         
         # 保存设置
         self.save_settings()
@@ -273,9 +305,18 @@ class DatasetSplitDialog(QDialog):
             test_count = total_files - train_count - val_count
             
             # 划分文件
-            train_files = valid_pairs[:train_count]
-            val_files = valid_pairs[train_count:train_count+val_count]
-            test_files = valid_pairs[train_count+val_count:]
+            if keep_duplicates:
+                duplicate_groups = self._find_duplicate_groups(
+                    source_path, [img_path for img_path, _ in valid_pairs], duplicate_distance)
+                if duplicate_groups is None:
+                    logger.info("重复图像检测已取消，终止划分")
+                    return
+                train_files, val_files, test_files = self._split_keeping_groups(
+                    valid_pairs, duplicate_groups, train_count, val_count)
+            else:
+                train_files = valid_pairs[:train_count]
+                val_files = valid_pairs[train_count:train_count+val_count]
+                test_files = valid_pairs[train_count+val_count:]
             
             # 创建进度对话框
             progress = QProgressDialog(tr("正在划分数据集..."), tr("取消"), 0, total_files, self)
@@ -283,8 +324,12 @@ class DatasetSplitDialog(QDialog):
             progress.setWindowModality(Qt.WindowModal)
             progress.show()
             
-            # 创建输出目录结构
+            # 创建输出目录结构（数据包模式下每个子集一个分片写入器）
+            pack_writers = {}
             for split in ["train", "val", "test"]:
+                if output_pack:
+                    pack_writers[split] = ShardWriter(os.path.join(output_path, split))
+                    continue
                 for subdir in ["images", "labels"]:
                     split_dir = os.path.join(output_path, split, subdir)
                     try:
@@ -303,7 +348,7 @@ class DatasetSplitDialog(QDialog):
                 if progress.wasCanceled():
                     break
                 
-                if not self._copy_file_pair(img_path, label_path, output_path, "train"):
+                if not self._export_file_pair(img_path, label_path, output_path, "train", pack_writers):
                     continue
                 
                 processed += 1
@@ -314,7 +359,7 @@ class DatasetSplitDialog(QDialog):
                 if progress.wasCanceled():
                     break
                 
-                if not self._copy_file_pair(img_path, label_path, output_path, "val"):
+                if not self._export_file_pair(img_path, label_path, output_path, "val", pack_writers):
                     continue
                 
                 processed += 1
@@ -325,13 +370,18 @@ class DatasetSplitDialog(QDialog):
                 if progress.wasCanceled():
                     break
                 
-                if not self._copy_file_pair(img_path, label_path, output_path, "test"):
+                if not self._export_file_pair(img_path, label_path, output_path, "test", pack_writers):
                     continue
                 
                 processed += 1
                 progress.setValue(processed)
             
             progress.setValue(total_files)
+            for writer in pack_writers.values():
+                writer.close()
+            if output_pack and not create_yaml:
+                # 数据包通过data.yaml识别，不创建YAML配置时也写入只包含子集的描述文件
+                write_pack_yaml(output_path, list(pack_writers), {})
             
             # 如果需要创建YAML文件
             if create_yaml and not progress.wasCanceled():
@@ -384,10 +434,17 @@ class DatasetSplitDialog(QDialog):
                 try:
                     with open(yaml_path, 'w', encoding='utf-8') as f:
                         f.write(f"# YOLOv8 数据集配置\n")
-                        f.write(f"path: {output_path}\n")
-                        f.write(f"train: train/images\n")
-                        f.write(f"val: val/images\n")
-                        f.write(f"test: test/images\n\n")
+                        if output_pack:
+                            # 分片数据包：各子集为数据包目录，训练前由训练脚本解包
+                            f.write(f"{PACK_YAML_KEY}: {PACK_VERSION}\n")
+                            f.write(f"train: train\n")
+                            f.write(f"val: val\n")
+                            f.write(f"test: test\n\n")
+                        else:
+                            f.write(f"path: {output_path}\n")
+                            f.write(f"train: train/images\n")
+                            f.write(f"val: val/images\n")
+                            f.write(f"test: test/images\n\n")
                         f.write(f"nc: {len(classes)}\n")
                         f.write(f"names: {classes}\n")
                         
@@ -453,6 +510,92 @@ class DatasetSplitDialog(QDialog):
             logger.exception("详细错误信息")  # 添加详细的异常堆栈信息
             QMessageBox.critical(self, tr("错误"), tr(f"划分数据集时出错: {str(e)}"))
     
+    def _find_duplicate_groups(self, source_path, image_paths, max_distance):
+        """
+        检测重复/近似重复图像分组
+        
+        Args:
+            source_path (str): 数据集根目录（用于存放哈希缓存）
+            image_paths (list): 图像路径列表
+            max_distance (int): 感知哈希最大汉明距离
+            
+        Returns:
+            list: 重复分组列表，用户取消时返回None
+        """
+        progress = QProgressDialog(tr("正在检测重复图像..."), tr("取消"), 0, len(image_paths), self)
+        progress.setWindowTitle(tr("重复图像检测"))
+        progress.setWindowModality(Qt.WindowModal)
+        progress.show()
+        
+        def on_progress(done, total):
+            progress.setValue(done)
+            QApplication.processEvents()
+            return not progress.wasCanceled()
+        
+        finder = DuplicateFinder(source_path)
+        hashes = finder.scan(image_paths, on_progress)
+        progress.close()
+        if hashes is None:
+            return None
+        return finder.find_groups(max_distance)
+    
+    def _split_keeping_groups(self, valid_pairs, duplicate_groups, train_count, val_count):
+        """
+        按重复分组划分数据集，同一分组内的图像总是进入同一子集
+        
+        Args:
+            valid_pairs (list): 已打乱顺序的(图像, 标签)对列表
+            duplicate_groups (list): 重复图像分组
+            train_count (int): 训练集目标数量
+            val_count (int): 验证集目标数量
+            
+        Returns:
+            tuple: (训练集, 验证集, 测试集)
+        """
+        group_of = {}
+        for group_id, group in enumerate(duplicate_groups):
+            for img_path in group:
+                group_of[img_path] = group_id
+        
+        # 按打乱后的顺序把文件对合并为划分单元
+        units = []
+        unit_of_group = {}
+        for pair in valid_pairs:
+            group_id = group_of.get(pair[0])
+            if group_id is None:
+                units.append([pair])
+            elif group_id in unit_of_group:
+                unit_of_group[group_id].append(pair)
+            else:
+                unit = [pair]
+                unit_of_group[group_id] = unit
+                units.append(unit)
+        
+        train_files, val_files, test_files = [], [], []
+        for unit in units:
+            if len(train_files) < train_count:
+                train_files.extend(unit)
+            elif len(val_files) < val_count:
+                val_files.extend(unit)
+            else:
+                test_files.extend(unit)
+        
+        logger.info(f"按 {len(duplicate_groups)} 个重复分组划分: "
+                    f"训练集 {len(train_files)}，验证集 {len(val_files)}，测试集 {len(test_files)}")
+        return train_files, val_files, test_files
+    
+    def _export_file_pair(self, img_path, label_path, output_path, split_type, pack_writers):
+        """复制图像和标签文件对，数据包模式下写入对应子集的分片"""
+        if not pack_writers:
+            return self._copy_file_pair(img_path, label_path, output_path, split_type)
+        key = os.path.splitext(os.path.basename(img_path))[0]
+        try:
+            pack_writers[split_type].add_files(key, img_path, label_path)
+        except Exception as e:
+            logger.error(f"写入数据包失败: {img_path}, 错误: {str(e)}")
+            return False
+        return True
+    
     def _copy_file_pair(self, img_path, label_path, output_path, split_type):
         """
         复制图像和标签文件对到指定的输出目录
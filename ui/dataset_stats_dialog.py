@@ -0,0 +1,265 @@
+import os
+import logging
+import numpy as np
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel,
+                             QTabWidget, QTableWidget, QTableWidgetItem, QHeaderView,
+                             QProgressBar, QCheckBox, QFileDialog, QMessageBox)
+from PyQt5.QtCore import Qt, QThread, QSettings, pyqtSignal
+
+from utils.dataset_stats import DatasetStatistics, export_json, export_csv
+from utils.image_info import ImageSizeCache
+from i18n import tr
+
+logger = logging.getLogger('YOLOLabelCreator.DatasetStatsDialog')
+
+
+class StatisticsThread(QThread):
+    """后台线程用于收集和计算数据集统计，避免UI阻塞"""
+    progress = pyqtSignal(int, int)
+    statistics_ready = pyqtSignal(dict)
+    failed = pyqtSignal(str)
+
+    def __init__(self, dataset_dir, class_names, pixel_sizes=False, size_cache=None):
+        super().__init__()
+        self.dataset_dir = dataset_dir
+        self.class_names = class_names
+        self.pixel_sizes = pixel_sizes
+        self.size_cache = size_cache
+
+    def _on_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self.isInterruptionRequested()
+
+    def run(self):
+        try:
+            statistics = DatasetStatistics(self.dataset_dir)
+            if not statistics.collect(self._on_progress):
+                return
+
+            image_sizes = None
+            if self.pixel_sizes:
+                # 图像尺寸只读取文件头，并使用数据集的尺寸缓存（优先使用主窗口已打开的缓存，
+                # 同一个缓存文件由多个实例分别保存时会互相覆盖新增的条目）
+                size_cache = self.size_cache or ImageSizeCache(self.dataset_dir)
+                image_paths = statistics.image_paths_for_labels()
+                sizes = size_cache.get_sizes([path for path in image_paths if path])
+                size_cache.save()
+                image_sizes = np.array([sizes.get(path, (0, 0)) if path else (0, 0) for path in image_paths],
+                                       np.float64).reshape(-1, 2)
+
+            self.statistics_ready.emit(statistics.compute(self.class_names, image_sizes))
+        except Exception as e:
+            logger.error(f"数据集统计失败: {str(e)}")
+            self.failed.emit(str(e))
+
+
+class DatasetStatsDialog(QDialog):
+    """数据集统计对话框，显示类别分布、边界框尺寸分布、每图框数和关键点完整度"""
+
+    def __init__(self, dataset_dir, class_names=None, parent=None, size_cache=None):
+        super().__init__(parent)
+        self.dataset_dir = dataset_dir
+        self.class_names = class_names or []
+        self.size_cache = size_cache
+        self.settings = QSettings()
+        self.stats = None
+        self.thread = None
+
+        self.setWindowTitle(tr("数据集统计"))
+        self.resize(800, 600)
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        """设置对话框UI"""
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        path_label = QLabel(tr("数据集:") + f" {self.dataset_dir}")
+        path_label.setWordWrap(True)
+        top_layout.addWidget(path_label, 1)
+
+        self.pixel_size_check = QCheckBox(tr("统计像素尺寸"))
+        self.pixel_size_check.setToolTip(tr("读取图像文件头获取图像尺寸，统计小/中/大目标数量"))
+        self.pixel_size_check.setChecked(self.settings.value("dataset_stats/pixel_sizes", False, type=bool))
+        top_layout.addWidget(self.pixel_size_check)
+
+        self.refresh_button = QPushButton(tr("刷新"))
+        self.refresh_button.clicked.connect(self.refresh)
+        top_layout.addWidget(self.refresh_button)
+        layout.addLayout(top_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        layout.addWidget(self.progress_bar)
+
+        self.tabs = QTabWidget()
+        self.summary_table = self._create_table([tr("指标"), tr("数值")])
+        self.class_table = self._create_table([])
+        self.size_table = self._create_table([])
+        self.count_table = self._create_table([tr("每图框数"), tr("图像数")])
+        self.tabs.addTab(self.summary_table, tr("概览"))
+        self.tabs.addTab(self.class_table, tr("类别分布"))
+        self.tabs.addTab(self.size_table, tr("尺寸分布"))
+        self.tabs.addTab(self.count_table, tr("每图框数"))
+        layout.addWidget(self.tabs, 1)
+
+        button_layout = QHBoxLayout()
+        self.export_json_button = QPushButton(tr("导出JSON"))
+        self.export_json_button.clicked.connect(lambda: self.export('json'))
+        self.export_csv_button = QPushButton(tr("导出CSV"))
+        self.export_csv_button.clicked.connect(lambda: self.export('csv'))
+        close_button = QPushButton(tr("关闭"))
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(self.export_json_button)
+        button_layout.addWidget(self.export_csv_button)
+        button_layout.addStretch()
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    def _create_table(self, headers):
+        table = QTableWidget()
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    @staticmethod
+    def _fill_table(table, headers, rows):
+        table.clear()
+        table.setColumnCount(len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if isinstance(value, (int, float)):
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, item)
+
+    # ---- 统计 ----
+
+    def refresh(self):
+        """在后台重新收集统计数据（只重新解析变化的标签文件）"""
+        if self.thread and self.thread.isRunning():
+            return
+        self.settings.setValue("dataset_stats/pixel_sizes", self.pixel_size_check.isChecked())
+        self.set_busy(True)
+        self.thread = StatisticsThread(self.dataset_dir, self.class_names, self.pixel_size_check.isChecked(),
+                                       self.size_cache)
+        self.thread.progress.connect(self.on_progress)
+        self.thread.statistics_ready.connect(self.on_statistics_ready)
+        self.thread.failed.connect(self.on_failed)
+        self.thread.finished.connect(lambda: self.set_busy(False))
+        self.thread.start()
+
+    def set_busy(self, busy):
+        self.refresh_button.setEnabled(not busy)
+        self.export_json_button.setEnabled(not busy and self.stats is not None)
+        self.export_csv_button.setEnabled(not busy and self.stats is not None)
+        if busy:
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.show()
+        else:
+            self.progress_bar.hide()
+
+    def on_progress(self, done, total):
+        self.progress_bar.setRange(0, max(1, total))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(tr("解析标签文件") + f" {done}/{total}")
+
+    def on_failed(self, message):
+        QMessageBox.warning(self, tr("错误"), f"{tr('数据集统计失败')}: {message}")
+
+    def on_statistics_ready(self, stats):
+        self.stats = stats
+        self.show_summary(stats)
+        self.show_classes(stats)
+        self.show_sizes(stats)
+        self.show_box_counts(stats)
+
+    def show_summary(self, stats):
+        names = {
+            'label_files': tr("标签文件数"),
+            'empty_label_files': tr("空标签文件数"),
+            'boxes': tr("边界框总数"),
+            'classes': tr("类别数"),
+            'invalid_class_ids': tr("无效类别ID"),
+            'out_of_range_boxes': tr("超出图像范围的边界框"),
+            'mean_boxes_per_image': tr("平均每图框数"),
+        }
+        rows = [(names.get(key, key), value) for key, value in stats['summary'].items()]
+        keypoints = stats['keypoints']
+        if keypoints['boxes_with_keypoints']:
+            rows.append((tr("含关键点的边界框"), keypoints['boxes_with_keypoints']))
+            rows.append((tr("关键点完整度"), f"{keypoints['completeness'] * 100:.1f}%"))
+        for split in stats['splits']:
+            rows.append((f"{tr('划分')} {split['name']}",
+                         f"{split['images']} {tr('张图像')}, {split['boxes']} {tr('个边界框')}, "
+                         f"{split['empty_images']} {tr('个空标签')}"))
+        pixel_size = stats.get('pixel_size')
+        if pixel_size:
+            rows.append((tr("小目标 (<32²)"), pixel_size['small']))
+            rows.append((tr("中目标 (32²-96²)"), pixel_size['medium']))
+            rows.append((tr("大目标 (>96²)"), pixel_size['large']))
+        self._fill_table(self.summary_table, [tr("指标"), tr("数值")], rows)
+
+    def show_classes(self, stats):
+        headers = [tr("ID"), tr("类别"), tr("边界框数"), tr("图像数"), tr("占比")]
+        headers += [split['name'] for split in stats['splits']]
+        rows = []
+        for item in stats['classes']:
+            row = [item['id'], item['name'], item['boxes'], item['images'], f"{item['fraction'] * 100:.2f}%"]
+            row += [split['class_boxes'][item['id']] for split in stats['splits']]
+            rows.append(row)
+        self._fill_table(self.class_table, headers, rows)
+
+    def show_sizes(self, stats):
+        """显示宽、高、面积的直方图和分位数（均为相对图像尺寸的归一化值）"""
+        headers = [tr("区间"), tr("宽度"), tr("高度"), tr("面积")]
+        edges = stats['box_width']['histogram']['edges']
+        rows = []
+        for i in range(len(edges) - 1):
+            rows.append([f"{edges[i]:.2f} - {edges[i + 1]:.2f}",
+                         stats['box_width']['histogram']['counts'][i],
+                         stats['box_height']['histogram']['counts'][i],
+                         stats['box_area']['histogram']['counts'][i]])
+        for name in stats['box_width']['quantiles']:
+            rows.append([name,
+                         stats['box_width']['quantiles'][name],
+                         stats['box_height']['quantiles'][name],
+                         stats['box_area']['quantiles'][name]])
+        self._fill_table(self.size_table, headers, rows)
+
+    def show_box_counts(self, stats):
+        rows = [(count, images) for count, images in enumerate(stats['boxes_per_image']) if images]
+        self._fill_table(self.count_table, [tr("每图框数"), tr("图像数")], rows)
+
+    # ---- 导出 ----
+
+    def export(self, file_format):
+        if not self.stats:
+            return
+        default_path = os.path.join(self.dataset_dir, f"dataset_stats.{file_format}")
+        file_filter = "JSON (*.json)" if file_format == 'json' else "CSV (*.csv)"
+        path, _ = QFileDialog.getSaveFileName(self, tr("导出统计结果"), default_path, file_filter)
+        if not path:
+            return
+        try:
+            if file_format == 'json':
+                export_json(self.stats, path)
+            else:
+                export_csv(self.stats, path)
+            logger.info(f"统计结果已导出: {path}")
+        except Exception as e:
+            logger.error(f"导出统计结果失败: {str(e)}")
+            QMessageBox.warning(self, tr("错误"), f"{tr('导出统计结果失败')}: {str(e)}")
+
+    def done(self, result):
+        # 关闭对话框时取消正在进行的统计
+        if self.thread and self.thread.isRunning():
+            self.thread.requestInterruption()
+            self.thread.wait()
+        super().done(result)
@@ -0,0 +1,176 @@
+import os
+import logging
+from PyQt5.QtCore import Qt, QModelIndex, QFileSystemWatcher, pyqtSignal
+from PyQt5.QtGui import QStandardItemModel, QStandardItem
+
+logger = logging.getLogger('YOLOLabelCreator.FolderTreeModel')
+
+# 文件夹是否已加载子目录的标记
+LOADED_ROLE = Qt.UserRole + 1
+
+
+def list_subdirectories(path):
+    """
+    列出目录下的子目录（按名称排序，忽略隐藏目录）
+
+    使用os.scandir返回的d_type信息判断是否为目录，大多数文件系统上
+    无需对每个条目额外执行stat。
+    """
+    names = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir():
+                        names.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.error(f"读取目录失败: {path}, 错误: {str(e)}")
+    names.sort(key=str.lower)
+    return names
+
+
+class FolderTreeModel(QStandardItemModel):
+    """
+    懒加载的文件夹树模型
+
+    只有在节点展开时才读取其子目录（canFetchMore/fetchMore），
+    已加载的目录通过QFileSystemWatcher监视，其他工具新建或删除
+    子目录时增量更新树结构。
+    """
+
+    # 被监视的目录内容发生变化（参数为目录路径）
+    directory_changed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = {}
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        self._extra_watched = set()
+
+    def set_root(self, root_dir):
+        """设置根目录并重建树（只创建根节点，子目录在展开时加载）"""
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+        self._items = {}
+        self._extra_watched = set()
+        self.clear()
+        root_item = self._create_item(os.path.basename(root_dir) or root_dir, root_dir)
+        self.appendRow(root_item)
+        return root_item
+
+    def item_for_path(self, path):
+        return self._items.get(os.path.normpath(path))
+
+    def load_path(self, path):
+        """
+        逐级加载到指定目录并返回其节点
+
+        Returns:
+            QStandardItem: 目录节点，目录不在根目录下或不存在时返回None
+        """
+        path = os.path.normpath(path)
+        item = self._items.get(path)
+        root = self.item(0)
+        if item is not None or root is None:
+            return item
+        rel_path = os.path.relpath(path, os.path.normpath(root.data(Qt.UserRole)))
+        if rel_path == os.pardir or rel_path.startswith(os.pardir + os.sep):
+            return None
+        item = root
+        for part in rel_path.split(os.sep):
+            if not item.data(LOADED_ROLE):
+                self.fetchMore(item.index())
+            item = self._items.get(os.path.normpath(os.path.join(item.data(Qt.UserRole), part)))
+            if item is None:
+                return None
+        return item
+
+    def _create_item(self, name, path):
+        item = QStandardItem(name)
+        item.setData(path, Qt.UserRole)
+        item.setData(False, LOADED_ROLE)
+        item.setEditable(False)
+        self._items[os.path.normpath(path)] = item
+        return item
+
+    def _forget(self, item):
+        """移除节点及其所有子节点的路径索引和监视"""
+        path = os.path.normpath(item.data(Qt.UserRole))
+        self._items.pop(path, None)
+        if path in self._watcher.directories():
+            self._watcher.removePath(path)
+        for row in range(item.rowCount()):
+            self._forget(item.child(row))
+
+    # ---- 懒加载接口 ----
+
+    def hasChildren(self, parent=QModelIndex()):
+        item = self.itemFromIndex(parent) if parent.isValid() else None
+        if item is not None and not item.data(LOADED_ROLE):
+            # 尚未读取的目录先假定有子目录，展开后再确定
+            return True
+        return super().hasChildren(parent)
+
+    def canFetchMore(self, parent):
+        item = self.itemFromIndex(parent) if parent.isValid() else None
+        return item is not None and not item.data(LOADED_ROLE)
+
+    def fetchMore(self, parent):
+        item = self.itemFromIndex(parent) if parent.isValid() else None
+        if item is None or item.data(LOADED_ROLE):
+            return
+        path = item.data(Qt.UserRole)
+        item.setData(True, LOADED_ROLE)
+        names = list_subdirectories(path)
+        if names:
+            item.appendRows([self._create_item(name, os.path.join(path, name)) for name in names])
+        self._watch(path)
+
+    # ---- 文件系统监视 ----
+
+    def _watch(self, path):
+        if os.path.isdir(path) and path not in self._watcher.directories():
+            if not self._watcher.addPath(path):
+                logger.warning(f"无法监视目录: {path}")
+
+    def watch_directory(self, path):
+        """额外监视一个目录（例如当前正在浏览的图像文件夹）"""
+        for old_path in self._extra_watched:
+            item = self.item_for_path(old_path)
+            if item is None or not item.data(LOADED_ROLE):
+                self._watcher.removePath(old_path)
+        self._extra_watched = {path}
+        self._watch(path)
+
+    def _on_directory_changed(self, path):
+        item = self.item_for_path(path)
+        if item is not None and item.data(LOADED_ROLE):
+            self._sync_children(item, path)
+        self.directory_changed.emit(path)
+
+    def _sync_children(self, item, path):
+        """根据磁盘上的子目录增量更新节点"""
+        if not os.path.isdir(path):
+            # 目录本身被删除，交由父目录的变化通知处理
+            return
+        names = list_subdirectories(path)
+        wanted = set(names)
+
+        # 删除已不存在的子目录
+        for row in range(item.rowCount() - 1, -1, -1):
+            child = item.child(row)
+            if child.text() not in wanted:
+                self._forget(child)
+                item.removeRow(row)
+
+        # 按排序位置插入新增的子目录
+        existing = {item.child(row).text() for row in range(item.rowCount())}
+        for position, name in enumerate(names):
+            if name not in existing:
+                item.insertRow(position, self._create_item(name, os.path.join(path, name)))
@@ -0,0 +1,368 @@
+import os
+import re
+import time
+import logging
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QThread, pyqtSignal
+from PyQt5.QtGui import QColor, QIcon, QPixmap
+
+from i18n import tr
+from utils.label_status import STATUS_UNLABELED, STATUS_EMPTY, STATUS_LABELED, STATUS_PREDICTED
+
+logger = logging.getLogger('YOLOLabelCreator.ImageListModel')
+
+# 支持的图像格式
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+# 后台扫描时每批发送的文件数量和最长间隔（秒）
+SCAN_BATCH_SIZE = 2000
+SCAN_BATCH_INTERVAL = 0.1
+
+# 含有这些字符的筛选文本按正则表达式处理，否则按文件名前缀匹配
+_REGEX_CHARS = set('*?[](){}|^$\\+')
+
+
+def _status_icon(color):
+    """生成用于标注状态装饰的小色块图标"""
+    pixmap = QPixmap(10, 10)
+    pixmap.fill(QColor(color))
+    return QIcon(pixmap)
+
+
+class DirectoryScanner(QThread):
+    """
+    后台目录扫描线程
+
+    使用os.scandir遍历目录，按批次发送图像文件名，避免在界面线程中
+    一次性列出大目录。
+    """
+    batch_found = pyqtSignal(int, list)
+    scan_finished = pyqtSignal(int, int)
+
+    def __init__(self, directory, token, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.token = token
+
+    def run(self):
+        batch = []
+        total = 0
+        last_emit = time.monotonic()
+        try:
+            with os.scandir(self.directory) as entries:
+                for entry in entries:
+                    if self.isInterruptionRequested():
+                        return
+                    if entry.name.lower().endswith(IMAGE_EXTENSIONS):
+                        batch.append(entry.name)
+                    now = time.monotonic()
+                    if len(batch) >= SCAN_BATCH_SIZE or (batch and now - last_emit >= SCAN_BATCH_INTERVAL):
+                        total += len(batch)
+                        self.batch_found.emit(self.token, batch)
+                        batch = []
+                        last_emit = now
+        except OSError as e:
+            logger.error(f"扫描目录失败: {self.directory}, 错误: {str(e)}")
+        if batch and not self.isInterruptionRequested():
+            total += len(batch)
+            self.batch_found.emit(self.token, batch)
+        self.scan_finished.emit(self.token, total)
+
+
+class LabelStatusScanner(QThread):
+    """后台建立图像文件夹的标注状态索引"""
+    scan_finished = pyqtSignal(int, bool)
+
+    def __init__(self, status_index, image_dir, token, parent=None):
+        super().__init__(parent)
+        self.status_index = status_index
+        self.image_dir = image_dir
+        self.token = token
+
+    def run(self):
+        completed = self.status_index.scan_folder(self.image_dir, self.isInterruptionRequested)
+        self.scan_finished.emit(self.token, completed)
+
+
+class AnnotationArchiveUpdater(QThread):
+    """后台增量更新数据集的标注归档（供标注查询使用）"""
+    update_progress = pyqtSignal(int, int, int)
+    update_finished = pyqtSignal(int, bool)
+
+    def __init__(self, archive, token, parent=None):
+        super().__init__(parent)
+        self.archive = archive
+        self.token = token
+
+    def run(self):
+        def on_progress(done, total):
+            self.update_progress.emit(self.token, done, total)
+            return not self.isInterruptionRequested()
+        try:
+            completed = self.archive.update(on_progress)
+        except Exception as e:
+            logger.error(f"更新标注归档失败: {str(e)}")
+            completed = False
+        self.update_finished.emit(self.token, completed)
+
+
+class ImageListModel(QAbstractListModel):
+    """
+    图像列表模型
+
+    只保存图像文件名列表，视图按需请求每一行的数据，因此即使目录中有
+    数十万张图像也不会为每一行创建控件对象。标注状态等装饰信息在行
+    第一次显示时通过status_provider懒加载并缓存。
+
+    status_provider(name) 返回 (状态类别, 边界框数量, 最低置信度)，
+    状态尚未可知时返回None。
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._names = []
+        self._visible = self._names
+        self._filter_text = ""
+        self._name_matcher = None
+        self._status_filter = None
+        self._matcher = None
+        self._row_index = None
+        self._status_cache = {}
+        self._thumbnails = {}
+        self.status_provider = None
+        self.show_thumbnails = False
+        self._status_icons = {
+            STATUS_LABELED: _status_icon("#2ecc71"),
+            STATUS_PREDICTED: _status_icon("#3498db"),
+            STATUS_EMPTY: _status_icon("#f1c40f"),
+            STATUS_UNLABELED: _status_icon("#bdc3c7"),
+        }
+
+    # ---- Qt模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._visible)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._visible):
+            return None
+        name = self._visible[index.row()]
+        if role == Qt.DisplayRole:
+            return name
+        if role == Qt.DecorationRole:
+            if self.show_thumbnails:
+                return self._thumbnails.get(name)
+            status = self.status(name)
+            if status is None:
+                return None
+            return self._status_icons.get(status[0])
+        if role == Qt.ToolTipRole:
+            status = self.status(name)
+            if status is None:
+                return name
+            category, box_count, min_conf = status
+            if category == STATUS_UNLABELED:
+                return f"{name}\n{tr('未标注')}"
+            if category == STATUS_EMPTY:
+                return f"{name}\n{tr('空标签')}"
+            text = f"{name}\n{tr('已标注')}: {box_count} {tr('个边界框')}"
+            if category == STATUS_PREDICTED and min_conf is not None:
+                text += f"\n{tr('自动标注，最低置信度')}: {min_conf:.2f}"
+            return text
+        return None
+
+    # ---- 数据访问 ----
+
+    @property
+    def visible_names(self):
+        """当前可见（筛选后）的图像文件名列表"""
+        return self._visible
+
+    @property
+    def total_count(self):
+        return len(self._names)
+
+    def name_at(self, row):
+        if 0 <= row < len(self._visible):
+            return self._visible[row]
+        return None
+
+    def row_of(self, name):
+        """返回图像在可见列表中的行号，不存在时返回-1"""
+        if self._row_index is None:
+            self._row_index = {n: row for row, n in enumerate(self._visible)}
+        return self._row_index.get(name, -1)
+
+    def status(self, name):
+        """获取（并缓存）图像的标注状态 (状态类别, 边界框数量, 最低置信度)"""
+        if name in self._status_cache:
+            return self._status_cache[name]
+        if self.status_provider is None:
+            return None
+        status = self.status_provider(name)
+        if status is not None:
+            self._status_cache[name] = status
+        return status
+
+    def invalidate_status(self, name=None):
+        """使标注状态缓存失效（name为None时全部失效）"""
+        if name is None:
+            self._status_cache.clear()
+            if self._visible:
+                self.dataChanged.emit(self.index(0), self.index(len(self._visible) - 1),
+                                      [Qt.DecorationRole, Qt.ToolTipRole])
+            return
+        self._status_cache.pop(name, None)
+        self._emit_changed(name, [Qt.DecorationRole, Qt.ToolTipRole])
+
+    def set_thumbnail(self, name, image):
+        self._thumbnails[name] = QIcon(QPixmap.fromImage(image))
+        self._emit_changed(name, [Qt.DecorationRole])
+
+    def has_thumbnail(self, name):
+        return name in self._thumbnails
+
+    def set_show_thumbnails(self, enabled):
+        self.show_thumbnails = enabled
+        if not enabled:
+            # 列表模式下不显示缩略图，释放图标占用的内存
+            self._thumbnails.clear()
+        if self._visible:
+            self.dataChanged.emit(self.index(0), self.index(len(self._visible) - 1), [Qt.DecorationRole])
+
+    def _emit_changed(self, name, roles):
+        row = self.row_of(name)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, roles)
+
+    # ---- 增量填充 ----
+
+    def clear(self):
+        self.beginResetModel()
+        self._names = []
+        self._visible = self._names if self._matcher is None else []
+        self._row_index = None
+        self._status_cache = {}
+        self._thumbnails = {}
+        self.endResetModel()
+
+    def append_names(self, names):
+        """追加一批图像文件名（由后台扫描线程分批提供）"""
+        if self._matcher is None:
+            new_visible = names
+        else:
+            new_visible = [name for name in names if self._matcher(name)]
+        first = len(self._visible)
+        if new_visible:
+            self.beginInsertRows(QModelIndex(), first, first + len(new_visible) - 1)
+        self._names.extend(names)
+        if self._visible is not self._names:
+            self._visible.extend(new_visible)
+        if self._row_index is not None:
+            self._row_index.update((name, first + i) for i, name in enumerate(new_visible))
+        if new_visible:
+            self.endInsertRows()
+
+    def sync_names(self, names):
+        """
+        与磁盘上的最新文件列表同步（用于目录变化后的增量刷新）
+
+        新增的文件追加到列表末尾；有文件被删除时重建可见列表。
+        """
+        current = set(self._names)
+        latest = set(names)
+        removed = current - latest
+        added = [name for name in names if name not in current]
+        if removed:
+            self.beginResetModel()
+            self._names = [name for name in self._names if name not in removed]
+            if self._matcher is None:
+                self._visible = self._names
+            else:
+                self._visible = [name for name in self._visible if name not in removed]
+            for name in removed:
+                self._status_cache.pop(name, None)
+                self._thumbnails.pop(name, None)
+            self._row_index = None
+            self.endResetModel()
+        if added:
+            self.append_names(added)
+        return bool(removed or added)
+
+    # ---- 筛选 ----
+
+    @staticmethod
+    def build_matcher(text):
+        """
+        根据筛选文本构造匹配函数
+
+        普通文本按文件名前缀（不区分大小写）匹配；含有正则元字符时按
+        正则表达式搜索，正则无效时退化为子串匹配。
+        """
+        text = text.strip()
+        if not text:
+            return None
+        if _REGEX_CHARS & set(text):
+            try:
+                return re.compile(text, re.IGNORECASE).search
+            except re.error:
+                lowered = text.lower()
+                return lambda name: lowered in name.lower()
+        lowered = text.lower()
+        return lambda name: name.lower().startswith(lowered)
+
+    def set_filter(self, text):
+        """设置文件名筛选条件"""
+        if text == self._filter_text:
+            return
+        self._filter_text = text
+        self.set_matcher(self.build_matcher(text))
+
+    def set_query_matcher(self, text, matcher):
+        """设置由标注查询构造的匹配函数（text为对应的筛选文本）"""
+        self._filter_text = text
+        self.set_matcher(matcher)
+
+    def set_status_filter(self, predicate):
+        """
+        设置标注状态筛选条件
+
+        Args:
+            predicate (callable): predicate(status) 返回是否显示，None表示不筛选；
+                状态尚未可知的图像不会被显示
+        """
+        self._status_filter = predicate
+        self._apply_filters()
+
+    def refresh_filter(self):
+        """标注状态变化后重新应用筛选条件"""
+        if self._status_filter is not None:
+            self._apply_filters()
+
+    def set_matcher(self, matcher):
+        """直接设置文件名匹配函数（None表示不筛选）"""
+        self._name_matcher = matcher
+        self._apply_filters()
+
+    def _apply_filters(self):
+        name_matcher = self._name_matcher
+        status_filter = self._status_filter
+        if status_filter is None:
+            matcher = name_matcher
+        else:
+            def matcher(name):
+                if name_matcher is not None and not name_matcher(name):
+                    return False
+                status = self.status(name)
+                return status is not None and status_filter(status)
+
+        self.beginResetModel()
+        self._matcher = matcher
+        if matcher is None:
+            self._visible = self._names
+        else:
+            self._visible = [name for name in self._names if matcher(name)]
+        self._row_index = None
+        self.endResetModel()
@@ -3,48 +3,107 @@ import yaml
 import logging
 import traceback
 import shutil
-import numpy as np
+import time
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QPushButton, QLabel, QFileDialog, QListWidget, QMessageBox,
                              QComboBox, QLineEdit, QSplitter, QAction, QTreeView,
                              QGroupBox, QFrame, QStyle, QDialog, QApplication, QShortcut,
-                             QScrollArea)
-from PyQt5.QtGui import QStandardItemModel, QStandardItem, QKeySequence
-from PyQt5.QtCore import Qt, QDir
+                             QScrollArea, QListView)
+from PyQt5.QtGui import QKeySequence
+from PyQt5.QtCore import Qt, QDir, QSize, QTimer, pyqtSignal
 
-from models.bounding_box import BoundingBox
 from ui.canvas import ImageCanvas
 from i18n import tr
 from utils.yolo_predictor import YOLOPredictor
 from utils.settings import Settings
 from ui.settings_dialog import SettingsDialog
-from ui.model_settings_dialog import ModelSettingsDialog
+from ui.model_settings_dialog import ModelSettingsDialog, RawPredictionThread
 from training.trainer_dialog import YoloTrainerDialog
 from ui.dataset_split_dialog import DatasetSplitDialog
+from ui.dataset_stats_dialog import DatasetStatsDialog
+from ui.validation_report_dialog import ValidationReportDialog
+from ui.pack_browser_dialog import PackBrowserDialog
 from ui.class_manager_dialog import ClassManagerDialog
 from ui.model_converter_dialog import ModelConverterDialog
 from ui.model_inspector_dialog import ModelInspectorDialog
+from ui.thumbnail_loader import ThumbnailLoader
+from ui.image_list_model import ImageListModel, DirectoryScanner, LabelStatusScanner, AnnotationArchiveUpdater
+from ui.folder_tree_model import FolderTreeModel
+from utils.thumbnail_cache import ThumbnailCache, DEFAULT_THUMBNAIL_SIZE
+from utils.label_io import read_label_file, format_label_lines
+from utils.annotation_session import AnnotationSession
+from utils.undo_stack import UndoManager, RemoveBox, ReplaceBoxes
+from utils.box_merge import merge_predictions, DEFAULT_MERGE_POLICY
+from utils.label_writer import LabelWriter
+from utils.image_info import ImageSizeCache
+from utils.dataset_cache import get_cache_dir
+from utils.dataset_stats import find_label_dirs
+from utils.shard_pack import is_pack_yaml
+from utils.annotation_archive import AnnotationArchive
+from utils.annotation_query import AnnotationQuery, QueryError, is_annotation_query
+from utils.label_status import (LabelStatusIndex, label_path_for, label_dir_for, LOW_CONFIDENCE_THRESHOLD,
+                                STATUS_UNLABELED, STATUS_EMPTY, STATUS_LABELED, STATUS_PREDICTED)
 
 # 获取日志记录器
 logger = logging.getLogger('YOLOLabelCreator.MainWindow')
 
 class YOLOLabelCreator(QMainWindow):
     
+    # 后台标签写入完成: (图像路径, 标签路径, 修改版本号, 错误信息)
+    label_written = pyqtSignal(str, str, int, str)
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle(tr("YOLO Label Creator"))
         self.setGeometry(100, 100, 1200, 800)
         
         self.current_dir = ""
-        self.image_files = []
         self.current_image_index = -1
         self.classes = []
         self.current_folder = ""
         
         # 初始化YOLO预测器
         self.yolo_predictor = YOLOPredictor()
+        self.threshold_preview_thread = None  # 阈值预览的后台推理线程
         self.model_path = ""
         
+        # 缩略图加载器（按数据集创建）
+        self.thumbnail_loader = None
+        
+        # 后台目录扫描
+        self.directory_scanner = None
+        self.scan_token = 0
+        self.refresh_names = []
+        # 切换文件夹后等待选中的图像文件名
+        self.pending_image_name = None
+        
+        # 标注检查报告窗口
+        self.validation_dialog = None
+        
+        # 标注状态索引（按数据集创建）
+        self.label_status_index = None
+        self.status_scanner = None
+        self.status_token = 0
+        
+        # 标注归档（按数据集创建，供标注查询使用），保存标注后标记为需要更新
+        self.annotation_archive = None
+        self.archive_updater = None
+        self.archive_token = 0
+        self.archive_dirty = True
+        
+        # 图像尺寸缓存（按数据集创建）
+        self.image_size_cache = None
+        
+        # 标注编辑会话及后台标签写入
+        self.annotation_session = AnnotationSession()
+        self.undo_manager = UndoManager()
+        # 已提交但尚未写入的标签文件（LabelWriter会合并同一路径的写入，因此按路径而不是次数记录）
+        self.pending_label_paths = set()
+        self.label_written.connect(self.on_label_written)
+        self.label_writer = LabelWriter(on_written=self._emit_label_written)
+        # classes.txt、data.yaml等文件最近一次写入的内容，内容不变时不再重写
+        self.written_file_contents = {}
+        
         # 初始化设置
         app_dir = QDir.currentPath()
         self.settings = Settings(app_dir)
@@ -88,12 +147,12 @@ class YOLOLabelCreator(QMainWindow):
             QLabel {
                 color: #333333;
             }
-            QListWidget, QTreeView {
+            QListWidget, QListView, QTreeView {
                 background-color: white;
                 border: 1px solid #dddddd;
                 border-radius: 4px;
             }
-            QListWidget::item:selected, QTreeView::item:selected {
+            QListWidget::item:selected, QListView::item:selected, QTreeView::item:selected {
                 background-color: #3498db;
                 color: white;
             }
@@ -158,7 +217,8 @@ class YOLOLabelCreator(QMainWindow):
         folder_layout = QVBoxLayout(folder_group)
         self.folder_tree = QTreeView()
         self.folder_tree.setHeaderHidden(True)
-        self.folder_model = QStandardItemModel()
+        self.folder_model = FolderTreeModel(self)
+        self.folder_model.directory_changed.connect(self.on_directory_changed)
         self.folder_tree.setModel(self.folder_model)
         self.folder_tree.clicked.connect(self.folder_selected)
         self.folder_tree.setMinimumHeight(150)
@@ -167,10 +227,64 @@ class YOLOLabelCreator(QMainWindow):
         # Image list in a group box
         image_group = QGroupBox(tr("Images in selected folder"))
         image_layout = QVBoxLayout(image_group)
-        self.image_list = QListWidget()
-        self.image_list.itemClicked.connect(self.load_selected_image)
+        self.image_filter = QLineEdit()
+        self.image_filter.setPlaceholderText(tr("筛选图像（文件名前缀、正则表达式或标注查询）"))
+        self.image_filter.setToolTip(tr("标注查询示例: class:person count>20 area<0.001 keypoints:incomplete unlabeled\n"
+                                        "条件: class:名称或ID[,...]  count/area/width/height/aspect 比较(<, <=, >, >=, =, !=)\n"
+                                        "keypoints:complete|incomplete|none|any  unlabeled / empty / labeled"))
+        self.image_filter.setClearButtonEnabled(True)
+        
+        # 按标注状态筛选
+        self.status_filter_combo = QComboBox()
+        self.status_filter_combo.addItem(tr("全部图像"), None)
+        self.status_filter_combo.addItem(tr("仅未标注"), STATUS_UNLABELED)
+        self.status_filter_combo.addItem(tr("仅已标注"), STATUS_LABELED)
+        self.status_filter_combo.addItem(tr("仅空标签"), STATUS_EMPTY)
+        self.status_filter_combo.addItem(tr("仅自动标注"), STATUS_PREDICTED)
+        self.status_filter_combo.addItem(tr("仅低置信度"), "low_confidence")
+        self.status_filter_combo.currentIndexChanged.connect(self.apply_status_filter)
+        
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(self.image_filter, 1)
+        filter_layout.addWidget(self.status_filter_combo)
+        image_layout.addLayout(filter_layout)
+        
+        self.image_list_model = ImageListModel(self)
+        self.image_list_model.status_provider = self.image_label_status
+        self.image_list = QListView()
+        self.image_list.setModel(self.image_list_model)
+        self.image_list.setUniformItemSizes(True)
+        self.image_list.setEditTriggers(QListView.NoEditTriggers)
+        self.image_list.clicked.connect(self.load_selected_image)
         image_layout.addWidget(self.image_list)
         
+        # 输入筛选文本时延迟应用，避免每个按键都遍历整个列表
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(self.apply_image_filter)
+        self.image_filter.textChanged.connect(self.filter_timer.start)
+        
+        # 当前文件夹被其他程序修改时，合并短时间内的多次变化后再刷新
+        self.image_refresh_timer = QTimer(self)
+        self.image_refresh_timer.setSingleShot(True)
+        self.image_refresh_timer.setInterval(500)
+        self.image_refresh_timer.timeout.connect(self.refresh_image_list)
+        
+        # 网格视图切换按钮
+        self.grid_view_button = QPushButton(tr("网格视图"))
+        self.grid_view_button.setIcon(self.style().standardIcon(QStyle.SP_FileDialogContentsView))
+        self.grid_view_button.setCheckable(True)
+        self.grid_view_button.clicked.connect(self.toggle_grid_view)
+        image_layout.addWidget(self.grid_view_button)
+        
+        # 滚动或缩放图像列表时延迟请求可见区域的缩略图
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setSingleShot(True)
+        self.thumbnail_timer.setInterval(50)
+        self.thumbnail_timer.timeout.connect(self.request_visible_thumbnails)
+        self.image_list.verticalScrollBar().valueChanged.connect(self.schedule_thumbnail_update)
+        
         # Class management in a group box
         class_group = QGroupBox(tr("Class Management"))
         class_layout = QVBoxLayout(class_group)
@@ -298,6 +412,7 @@ class YOLOLabelCreator(QMainWindow):
         canvas_layout = QVBoxLayout(canvas_frame)
         canvas_layout.setContentsMargins(1, 1, 1, 1)
         self.canvas = ImageCanvas(self)
+        self.canvas.set_lod_params(self.settings.get_render_params())
         canvas_layout.addWidget(self.canvas)
         
         # Zoom controls with icons
@@ -405,6 +520,24 @@ class YOLOLabelCreator(QMainWindow):
         dataset_split_action.triggered.connect(self.open_dataset_split)
         tools_menu.addAction(dataset_split_action)
         
+        # 添加数据集统计菜单项
+        dataset_stats_action = QAction(tr("数据集统计"), self)
+        dataset_stats_action.setIcon(self.style().standardIcon(QStyle.SP_FileDialogListView))
+        dataset_stats_action.triggered.connect(self.open_dataset_stats)
+        tools_menu.addAction(dataset_stats_action)
+        
+        # 添加标注检查菜单项
+        validate_action = QAction(tr("标注检查"), self)
+        validate_action.setIcon(self.style().standardIcon(QStyle.SP_MessageBoxWarning))
+        validate_action.triggered.connect(self.open_validation_report)
+        tools_menu.addAction(validate_action)
+        
+        # 添加分片数据包浏览菜单项
+        pack_browser_action = QAction(tr("浏览分片数据包"), self)
+        pack_browser_action.setIcon(self.style().standardIcon(QStyle.SP_DirOpenIcon))
+        pack_browser_action.triggered.connect(self.open_pack_browser)
+        tools_menu.addAction(pack_browser_action)
+        
         # 添加模型转换菜单项
         model_converter_action = QAction(tr("PT模型转ONNX"), self)
         model_converter_action.setIcon(self.style().standardIcon(QStyle.SP_FileDialogContentsView))
@@ -450,8 +583,19 @@ class YOLOLabelCreator(QMainWindow):
         # 不再自动保存，直接切换目录
         dir_path = QFileDialog.getExistingDirectory(self, "Select Directory")
         if dir_path:
+            self.stash_current_annotations()
+            self.label_writer.flush()
+            self.annotation_session.clear()
+            self.undo_manager.clear()
+            self.canvas.undo_history = None
+            self.written_file_contents = {}
             self.current_dir = dir_path
             self.dir_label.setText(dir_path)
+            self.open_thumbnail_cache()
+            self.open_label_status_index()
+            self.open_annotation_archive()
+            self.open_image_size_cache()
+            self.yolo_predictor.set_cache_dir(get_cache_dir(self.current_dir))
             self.populate_folder_tree()
             
             # 自动读取并初始化标签
@@ -476,35 +620,55 @@ class YOLOLabelCreator(QMainWindow):
                 self.reload_all_labels_and_update_config()
     
     def populate_folder_tree(self):
-        """填充文件夹树视图"""
-        self.folder_model.clear()
-        root_item = QStandardItem(os.path.basename(self.current_dir))
-        root_item.setData(self.current_dir, Qt.UserRole)
-        self.folder_model.appendRow(root_item)
-        
-        # 递归添加子文件夹
-        self.add_folders(root_item, self.current_dir)
+        """填充文件夹树视图（子文件夹在展开时懒加载）"""
+        root_item = self.folder_model.set_root(self.current_dir)
+        root_index = self.folder_model.indexFromItem(root_item)
         
         # 展开根节点
-        self.folder_tree.expand(self.folder_model.indexFromItem(root_item))
+        self.folder_tree.expand(root_index)
         
         # 默认选择根目录
-        self.folder_tree.setCurrentIndex(self.folder_model.indexFromItem(root_item))
+        self.folder_tree.setCurrentIndex(root_index)
         self.current_folder = self.current_dir
         self.load_images_from_directory(self.current_dir)
     
-    def add_folders(self, parent_item, parent_path):
-        """递归添加子文件夹到树视图"""
-        try:
-            for item in os.listdir(parent_path):
-                item_path = os.path.join(parent_path, item)
-                if os.path.isdir(item_path):
-                    folder_item = QStandardItem(item)
-                    folder_item.setData(item_path, Qt.UserRole)
-                    parent_item.appendRow(folder_item)
-                    self.add_folders(folder_item, item_path)
-        except Exception as e:
-            logger.error(f"Error adding folders: {str(e)}")
+    def on_directory_changed(self, path):
+        """被监视的目录发生变化"""
+        if self.current_folder and os.path.normpath(path) == os.path.normpath(self.current_folder):
+            self.image_refresh_timer.start()
+    
+    def refresh_image_list(self):
+        """在后台重新扫描当前文件夹，增量更新图像列表"""
+        if self.directory_scanner and self.directory_scanner.isRunning():
+            # 扫描尚未结束，稍后再试
+            self.image_refresh_timer.start()
+            return
+        self.refresh_names = []
+        self.scan_token += 1
+        self.directory_scanner = DirectoryScanner(self.current_folder, self.scan_token, self)
+        self.directory_scanner.batch_found.connect(self.on_refresh_batch_found)
+        self.directory_scanner.scan_finished.connect(self.on_refresh_finished)
+        self.directory_scanner.start()
+    
+    def on_refresh_batch_found(self, token, names):
+        if token == self.scan_token:
+            self.refresh_names.extend(names)
+    
+    def on_refresh_finished(self, token, total):
+        if token != self.scan_token:
+            return
+        current_name = self.image_list_model.name_at(self.current_image_index)
+        names, self.refresh_names = self.refresh_names, []
+        if not self.image_list_model.sync_names(names):
+            return
+        logger.info(f"文件夹内容已变化，图像列表已更新: {self.current_folder}")
+        if current_name:
+            row = self.image_list_model.row_of(current_name)
+            if row >= 0:
+                self.set_current_image_row(row)
+            else:
+                self.current_image_index = -1
+        self.schedule_thumbnail_update()
     
     def folder_selected(self, index):
         """当文件夹被选中时调用"""
@@ -517,39 +681,404 @@ class YOLOLabelCreator(QMainWindow):
                 self.load_images_from_directory(folder_path)
     
     def load_images_from_directory(self, directory):
-        """从指定目录加载图像"""
-        self.image_files = []
-        self.image_list.clear()
+        """从指定目录加载图像（在后台线程中分批扫描）"""
+        self.stop_directory_scan()
+        self.image_refresh_timer.stop()
+        self.folder_model.watch_directory(directory)
+        self.start_status_scan(directory)
+        self.current_image_index = -1
+        self.pending_image_name = None
+        self.image_list_model.clear()
+        if self.thumbnail_loader:
+            self.thumbnail_loader.clear()
+        if is_annotation_query(self.image_filter.text()):
+            # 标注查询按文件夹求值，在图像到达前换成新文件夹的匹配函数
+            self.apply_annotation_query(self.image_filter.text())
+        
+        self.scan_token += 1
+        self.directory_scanner = DirectoryScanner(directory, self.scan_token, self)
+        self.directory_scanner.batch_found.connect(self.on_image_batch_found)
+        self.directory_scanner.scan_finished.connect(self.on_image_scan_finished)
+        self.directory_scanner.start()
+        self.statusBar().showMessage(tr("正在扫描图像..."))
+    
+    def stop_directory_scan(self):
+        """停止正在进行的目录扫描"""
+        if self.directory_scanner and self.directory_scanner.isRunning():
+            self.directory_scanner.requestInterruption()
+            self.directory_scanner.wait()
+        self.directory_scanner = None
+    
+    def on_image_batch_found(self, token, names):
+        """后台扫描到一批图像文件"""
+        if token != self.scan_token:
+            return
+        self.image_list_model.append_names(names)
+        
+        if self.pending_image_name:
+            # 等待跳转的目标图像到达后再显示
+            row = self.image_list_model.row_of(self.pending_image_name)
+            if row >= 0:
+                name, self.pending_image_name = self.pending_image_name, None
+                self.set_current_image_row(row)
+                self.load_image(os.path.join(self.current_folder, name))
+        # 第一批图像到达时立即显示第一张
+        elif self.current_image_index < 0 and self.image_list_model.rowCount() > 0:
+            self.set_current_image_row(0)
+            self.load_image(os.path.join(self.current_folder, self.image_files[0]))
+        self.schedule_thumbnail_update()
+    
+    def on_image_scan_finished(self, token, total):
+        """后台扫描完成"""
+        if token != self.scan_token:
+            return
+        logger.info(f"目录扫描完成，共 {total} 张图像: {self.current_folder}")
+        self.statusBar().showMessage(tr("共 {} 张图像").format(total), 3000)
+        if self.pending_image_name:
+            # 目标图像被筛选条件隐藏，清除筛选后再定位
+            name, self.pending_image_name = self.pending_image_name, None
+            self.navigate_to_image(os.path.join(self.current_folder, name))
+            return
+        if total == 0:
+            # 清空画布
+            self.canvas.image_path = None
+            self.canvas.pixmap = None
+            self.canvas.boxes = []
+            self.canvas.update()
+            self.update_box_list()
+    
+    @property
+    def image_files(self):
+        """当前图像列表中（筛选后）可见的图像文件名"""
+        return self.image_list_model.visible_names
+    
+    def set_current_image_row(self, row):
+        """设置图像列表的当前行"""
+        self.current_image_index = row
+        index = self.image_list_model.index(row)
+        self.image_list.setCurrentIndex(index)
+        self.image_list.scrollTo(index)
+    
+    def apply_image_filter(self):
+        """按文件名或标注查询筛选图像列表，并尽量保持当前图像的选中状态"""
+        current_name = self.image_list_model.name_at(self.current_image_index)
+        text = self.image_filter.text()
+        if is_annotation_query(text):
+            if not self.apply_annotation_query(text):
+                return
+        else:
+            self.image_filter.setStyleSheet("")
+            self.image_list_model.set_filter(text)
+        self.restore_current_image_row(current_name)
+        self.statusBar().showMessage(
+            tr("显示 {} / {} 张图像").format(self.image_list_model.rowCount(), self.image_list_model.total_count), 3000)
+        self.schedule_thumbnail_update()
+    
+    def apply_annotation_query(self, text):
+        """
+        按标注查询筛选图像列表（在标注归档上求值，不读取标签文件）
+        
+        归档需要更新时先在后台增量更新，更新完成前列表为空，完成后重新应用查询。
         
-        # Get all image files
+        Returns:
+            bool: 是否已设置筛选条件（查询语法错误时返回False，保留原来的筛选结果）
+        """
         try:
-            for file in os.listdir(directory):
-                if file.lower().endswith((".jpg", ".jpeg", ".png", ".bmp")):
-                    self.image_files.append(file)
-            
-            # Add to list widget
-            self.image_list.addItems(self.image_files)
-            
-            # Load first image if available
-            if self.image_files:
-                self.current_image_index = 0
-                self.image_list.setCurrentRow(0)
-                self.load_image(os.path.join(directory, self.image_files[0]))
-            else:
-                # 清空画布
-                self.canvas.image_path = None
-                self.canvas.pixmap = None
-                self.canvas.boxes = []
-                self.canvas.update()
-                self.update_box_list()
+            query = AnnotationQuery.parse(text, self.classes)
+        except QueryError as e:
+            self.image_filter.setStyleSheet("QLineEdit { color: #c0392b; }")
+            self.statusBar().showMessage(f"{tr('查询语法错误')}: {str(e)}", 5000)
+            return False
+        self.image_filter.setStyleSheet("")
+        if not self.annotation_archive or not self.current_folder:
+            return False
+        if self.archive_dirty or (self.archive_updater and self.archive_updater.isRunning()):
+            self.image_list_model.set_query_matcher(text, lambda name: False)
+            self.start_archive_update()
+            return True
+        
+        start = time.perf_counter()
+        name_matcher = ImageListModel.build_matcher(query.name_text)
+        matcher = query.build_matcher(self.annotation_archive, label_dir_for(self.current_folder), name_matcher)
+        self.image_list_model.set_query_matcher(text, matcher)
+        logger.info(f"标注查询 \"{text}\" 用时 {(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+    
+    def open_annotation_archive(self):
+        """为当前数据集打开标注归档（首次查询时再增量更新）"""
+        self.stop_archive_update()
+        if self.annotation_archive:
+            self.annotation_archive.close()
+        self.annotation_archive = AnnotationArchive(self.current_dir)
+        self.annotation_archive.load()
+        self.archive_dirty = True
+    
+    def start_archive_update(self):
+        """在后台增量更新标注归档"""
+        if self.archive_updater and self.archive_updater.isRunning():
+            return
+        # 先写出尚未落盘的标签，归档按标签文件的修改时间更新
+        self.label_writer.flush()
+        # 更新期间保存的标注会重新标记为需要更新
+        self.archive_dirty = False
+        self.archive_token += 1
+        self.archive_updater = AnnotationArchiveUpdater(self.annotation_archive, self.archive_token, self)
+        self.archive_updater.update_progress.connect(self.on_archive_update_progress)
+        self.archive_updater.update_finished.connect(self.on_archive_update_finished)
+        self.archive_updater.start()
+        self.statusBar().showMessage(tr("正在更新标注索引..."))
+    
+    def stop_archive_update(self):
+        """停止正在进行的标注归档更新"""
+        if self.archive_updater and self.archive_updater.isRunning():
+            self.archive_updater.requestInterruption()
+            self.archive_updater.wait()
+        self.archive_updater = None
+    
+    def on_archive_update_progress(self, token, done, total):
+        if token == self.archive_token:
+            self.statusBar().showMessage(tr("正在更新标注索引: {} / {}").format(done, total))
+    
+    def on_archive_update_finished(self, token, completed):
+        """标注归档更新完成后重新应用标注查询"""
+        if token != self.archive_token:
+            return
+        self.archive_updater = None
+        if not completed:
+            self.archive_dirty = True
+            self.statusBar().showMessage(tr("标注索引更新失败"), 3000)
+            return
+        if is_annotation_query(self.image_filter.text()):
+            self.apply_image_filter()
+    
+    def image_label_status(self, name):
+        """
+        获取图像的标注状态，供图像列表懒加载装饰信息（只查询内存中的索引）
+        
+        Returns:
+            tuple: (状态类别, 边界框数量, 最低置信度)，索引尚未建立时返回None
+        """
+        if not self.label_status_index:
+            return None
+        return self.label_status_index.status(self.current_folder, name)
+    
+    def open_thumbnail_cache(self):
+        """为当前数据集打开缩略图缓存"""
+        if self.thumbnail_loader:
+            self.thumbnail_loader.shutdown()
+            self.thumbnail_loader.deleteLater()
+            self.thumbnail_loader = None
+        try:
+            cache = ThumbnailCache(self.current_dir, DEFAULT_THUMBNAIL_SIZE)
+            self.thumbnail_loader = ThumbnailLoader(cache, self)
+            self.thumbnail_loader.thumbnail_ready.connect(self.on_thumbnail_ready)
         except Exception as e:
-            logger.error(f"Error loading images from directory: {str(e)}")
-            QMessageBox.warning(self, tr("Error"), f"{tr('Failed to load images')}: {str(e)}")
+            logger.error(f"打开缩略图缓存失败: {str(e)}")
+    
+    def open_label_status_index(self):
+        """为当前数据集打开标注状态索引"""
+        self.stop_status_scan()
+        if self.label_status_index:
+            self.label_status_index.save()
+        self.label_status_index = LabelStatusIndex(self.current_dir)
+    
+    def open_image_size_cache(self):
+        """为当前数据集打开图像尺寸缓存"""
+        if self.image_size_cache:
+            self.image_size_cache.save()
+        self.image_size_cache = ImageSizeCache(self.current_dir)
+    
+    def start_status_scan(self, directory):
+        """在后台建立（或刷新）文件夹的标注状态索引"""
+        self.stop_status_scan()
+        if not self.label_status_index:
+            return
+        self.status_token += 1
+        self.status_scanner = LabelStatusScanner(self.label_status_index, directory, self.status_token, self)
+        self.status_scanner.scan_finished.connect(self.on_status_scan_finished)
+        self.status_scanner.start()
     
-    def load_selected_image(self, item):
+    def stop_status_scan(self):
+        """停止正在进行的标注状态扫描"""
+        if self.status_scanner and self.status_scanner.isRunning():
+            self.status_scanner.requestInterruption()
+            self.status_scanner.wait()
+        self.status_scanner = None
+    
+    def on_status_scan_finished(self, token, completed):
+        """标注状态索引建立完成后刷新列表装饰和筛选结果"""
+        if token != self.status_token or not completed:
+            return
+        self.image_list_model.invalidate_status()
+        self.image_list_model.refresh_filter()
+        self.restore_current_image_row()
+        self.label_status_index.save()
+    
+    def apply_status_filter(self):
+        """按标注状态筛选图像列表"""
+        mode = self.status_filter_combo.currentData()
+        if mode is None:
+            predicate = None
+        elif mode == "low_confidence":
+            predicate = lambda status: status[2] is not None and status[2] < LOW_CONFIDENCE_THRESHOLD
+        else:
+            predicate = lambda status: status[0] == mode
+        current_name = self.image_list_model.name_at(self.current_image_index)
+        self.image_list_model.set_status_filter(predicate)
+        self.restore_current_image_row(current_name)
+        self.statusBar().showMessage(
+            tr("显示 {} / {} 张图像").format(self.image_list_model.rowCount(), self.image_list_model.total_count), 3000)
+        self.schedule_thumbnail_update()
+    
+    def clear_image_filters(self):
+        """清除文件名和标注状态筛选"""
+        self.filter_timer.stop()
+        self.status_filter_combo.setCurrentIndex(0)
+        if self.image_filter.text():
+            self.image_filter.setText("")
+            self.filter_timer.stop()
+            self.apply_image_filter()
+    
+    def navigate_to_image(self, image_path):
+        """
+        跳转到指定图像（必要时切换文件夹并清除列表筛选）
+        
+        Args:
+            image_path (str): 图像文件路径
+        """
+        image_path = os.path.normpath(image_path)
+        if not os.path.isfile(image_path):
+            QMessageBox.warning(self, tr("警告"), f"{tr('图像文件不存在')}: {image_path}")
+            return
+        folder, name = os.path.split(image_path)
+        
+        if not self.current_folder or os.path.normpath(self.current_folder) != folder:
+            item = self.folder_model.load_path(folder)
+            if item is not None:
+                index = self.folder_model.indexFromItem(item)
+                self.folder_tree.setCurrentIndex(index)
+                self.folder_tree.scrollTo(index)
+            self.current_folder = folder
+            self.load_images_from_directory(folder)
+            # 图像列表在后台扫描，目标图像到达后再显示
+            self.pending_image_name = name
+            return
+        
+        row = self.image_list_model.row_of(name)
+        if row < 0:
+            self.clear_image_filters()
+            row = self.image_list_model.row_of(name)
+        if row >= 0:
+            self.set_current_image_row(row)
+        self.load_image(image_path)
+        self.raise_()
+        self.activateWindow()
+    
+    def restore_current_image_row(self, name=None):
+        """筛选条件变化后重新定位当前图像所在的行"""
+        if name is None:
+            name = os.path.basename(self.canvas.image_path) if self.canvas.image_path else None
+        row = self.image_list_model.row_of(name) if name else -1
+        if row >= 0:
+            self.set_current_image_row(row)
+        else:
+            self.current_image_index = -1
+            self.image_list.clearSelection()
+    
+    def toggle_grid_view(self):
+        """在列表视图和缩略图网格视图之间切换"""
+        if self.grid_view_button.isChecked():
+            self.image_list.setViewMode(QListView.IconMode)
+            self.image_list.setIconSize(QSize(DEFAULT_THUMBNAIL_SIZE, DEFAULT_THUMBNAIL_SIZE))
+            self.image_list.setGridSize(QSize(DEFAULT_THUMBNAIL_SIZE + 16, DEFAULT_THUMBNAIL_SIZE + 32))
+            self.image_list.setResizeMode(QListView.Adjust)
+            self.image_list.setMovement(QListView.Static)
+            self.image_list.setWordWrap(True)
+            self.image_list.setMinimumHeight(300)
+            self.image_list_model.set_show_thumbnails(True)
+            self.grid_view_button.setText(tr("列表视图"))
+            self.schedule_thumbnail_update()
+        else:
+            self.image_list.setViewMode(QListView.ListMode)
+            self.image_list.setIconSize(QSize())
+            self.image_list.setGridSize(QSize())
+            self.image_list.setMinimumHeight(0)
+            self.image_list_model.set_show_thumbnails(False)
+            self.grid_view_button.setText(tr("网格视图"))
+            if self.thumbnail_loader:
+                self.thumbnail_loader.clear()
+        if self.image_list.currentIndex().isValid():
+            self.image_list.scrollTo(self.image_list.currentIndex())
+    
+    def schedule_thumbnail_update(self, *args):
+        """延迟请求可见区域缩略图，合并连续的滚动事件"""
+        if self.grid_view_button.isChecked():
+            self.thumbnail_timer.start()
+    
+    def visible_image_rows(self):
+        """返回图像列表视口中当前可见的行范围"""
+        count = self.image_list_model.rowCount()
+        if count == 0:
+            return range(0)
+        viewport_height = self.image_list.viewport().height()
+        model = self.image_list_model
+        
+        # 各行在视图中的位置单调递增，二分查找第一个可见行
+        low, high = 0, count - 1
+        while low < high:
+            mid = (low + high) // 2
+            if self.image_list.visualRect(model.index(mid)).bottom() < 0:
+                low = mid + 1
+            else:
+                high = mid
+        
+        last = low
+        while last < count and self.image_list.visualRect(model.index(last)).top() <= viewport_height:
+            last += 1
+        return range(low, last)
+    
+    def request_visible_thumbnails(self):
+        """只为视口中可见且尚无缩略图的图像请求缩略图"""
+        if not self.thumbnail_loader or not self.grid_view_button.isChecked():
+            return
+        paths = []
+        for row in self.visible_image_rows():
+            name = self.image_list_model.name_at(row)
+            if not self.image_list_model.has_thumbnail(name):
+                paths.append(os.path.join(self.current_folder, name))
+        if paths:
+            self.thumbnail_loader.request(paths)
+    
+    def on_thumbnail_ready(self, image_path, image):
+        """缩略图生成完成后更新对应行的图标"""
+        if os.path.dirname(image_path) != self.current_folder or not self.grid_view_button.isChecked():
+            return
+        self.image_list_model.set_thumbnail(os.path.basename(image_path), image)
+    
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.schedule_thumbnail_update()
+    
+    def closeEvent(self, event):
+        """关闭窗口前保存缓存"""
+        self.stop_directory_scan()
+        self.stop_status_scan()
+        self.stop_archive_update()
+        if self.validation_dialog is not None:
+            self.validation_dialog.close()
+        self.label_writer.close()
+        if self.label_status_index:
+            self.label_status_index.save()
+        if self.image_size_cache:
+            self.image_size_cache.save()
+        if self.thumbnail_loader:
+            self.thumbnail_loader.shutdown()
+        super().closeEvent(event)
+    
+    def load_selected_image(self, index):
         # 不再在切换图像时自动保存标签，只读取新图像的标签
-        self.current_image_index = self.image_list.row(item)
-        image_path = os.path.join(self.current_folder, item.text())
+        self.current_image_index = index.row()
+        image_path = os.path.join(self.current_folder, self.image_list_model.name_at(index.row()))
         self.load_image(image_path)
     
     def load_image(self, image_path):
@@ -567,6 +1096,9 @@ class YOLOLabelCreator(QMainWindow):
             QMessageBox.warning(self, tr("Error"), error_msg)
             return
         
+        # 切换图像前将当前图像的标注保留在编辑会话中
+        self.stash_current_annotations()
+        
         try:    
             # 首先加载图像到画布
             self.canvas.load_image(image_path)
@@ -584,9 +1116,15 @@ class YOLOLabelCreator(QMainWindow):
                 logger.info(f"清空加载新图像前的边界框，数量: {original_box_count}")
                 self.canvas.boxes = []
             
-            # 检查是否存在对应的标注文件
+            # 编辑会话中已有该图像的标注时直接使用，不再重新读取标签文件
             label_path = self.get_label_path(image_path)
-            if os.path.exists(label_path):
+            entry = self.annotation_session.get(image_path, label_path)
+            if entry is not None:
+                logger.info(f"使用编辑会话中的标注: {image_path}")
+                self.canvas.boxes = entry.boxes
+                self.update_box_list()
+                self.canvas.update()
+            elif os.path.exists(label_path):
                 logger.info(f"Found existing annotation file: {label_path}")
                 self.load_annotations(label_path)
             else:
@@ -594,6 +1132,13 @@ class YOLOLabelCreator(QMainWindow):
                 self.canvas.boxes = []
                 self.update_box_list()
                 
+            if entry is None:
+                self.annotation_session.store(image_path, self.canvas.boxes,
+                                              (self.canvas.image_size.width(), self.canvas.image_size.height()), label_path)
+                # 标注重新从磁盘读取，之前的撤销历史不再适用
+                self.undo_manager.discard(image_path)
+            self.canvas.undo_history = self.undo_manager.history_for(image_path)
+            
             # 验证加载后的边界框数量
             loaded_box_count = len(self.canvas.boxes)
             logger.info(f"图像加载完成后的边界框数量: {loaded_box_count}")
@@ -611,19 +1156,8 @@ class YOLOLabelCreator(QMainWindow):
     
     def get_label_path(self, image_path):
         """根据图像路径生成对应的YOLO格式标签文件路径"""
-        # 提取图像文件名（不含扩展名）
-        image_filename = os.path.basename(image_path)
-        base_name = os.path.splitext(image_filename)[0]
-        
-        # 创建标签目录结构
-        image_dir = os.path.dirname(image_path)
-        parent_dir = os.path.dirname(image_dir)
-        labels_dir = os.path.join(parent_dir, "labels")
-        label_subdir = labels_dir
-        if not os.path.exists(label_subdir):
-            os.makedirs(label_subdir, exist_ok=True)
-            
-        return os.path.normpath(os.path.join(label_subdir, f"{base_name}.txt"))
+        # 标签目录在保存时才创建
+        return label_path_for(image_path)
     
     def load_annotations(self, label_path):
         """从YOLO格式标签文件加载标注数据"""
@@ -639,70 +1173,10 @@ class YOLOLabelCreator(QMainWindow):
         # 先读取文件内容，确认能正确解析后再清空现有标签
         try:
             if os.path.exists(label_path):
-                with open(label_path, 'r') as f:
-                    lines = f.readlines()
-                
-                # 初始化临时列表
-                temp_boxes = []
-                
                 # 原始图像尺寸
-                img_width = self.canvas.pixmap.width()
-                img_height = self.canvas.pixmap.height()
-                
-                # 解析每一行数据
-                for line in lines:
-                    line = line.strip()
-                    if not line:  # 跳过空行
-                        continue
-                    
-                    parts = line.split()
-                    if len(parts) < 5:  # 至少需要类别和边界框坐标
-                        logger.warning(f"格式错误的标注行: {line}")
-                        continue
-                        
-                    try:
-                        # 解析YOLO格式数据
-                        class_id = int(parts[0])
-                        x_center = float(parts[1])
-                        y_center = float(parts[2])
-                        width = float(parts[3])
-                        height = float(parts[4])
-                        
-                        # 转换为像素坐标
-                        x1 = (x_center - width / 2) * img_width
-                        y1 = (y_center - height / 2) * img_height
-                        x2 = (x_center + width / 2) * img_width
-                        y2 = (y_center + height / 2) * img_height
-                        
-                        # 创建边界框对象
-                        box = BoundingBox(x1, y1, x2, y2, class_id)
-                        
-                        # 检查是否有关键点数据（每个点有x、y两个坐标值）
-                        if len(parts) > 5:
-                            keypoints_data = parts[5:]
-                            keypoints_count = len(keypoints_data) // 2
-                            
-                            if keypoints_count > 0 and len(keypoints_data) % 2 == 0:
-                                keypoints = []
-                                
-                                # 解析关键点坐标
-                                for i in range(keypoints_count):
-                                    try:
-                                        kp_x = float(keypoints_data[i*2]) * img_width
-                                        kp_y = float(keypoints_data[i*2+1]) * img_height
-                                        keypoints.append([kp_x, kp_y])
-                                    except (ValueError, IndexError) as e:
-                                        logger.warning(f"解析关键点坐标时出错 #{i}: {str(e)}")
-                                
-                                # 设置特征点
-                                if keypoints:
-                                    box.set_keypoints(np.array(keypoints))
-                        
-                        # 添加到临时列表
-                        temp_boxes.append(box)
-                        
-                    except ValueError as e:
-                        logger.warning(f"解析标注数据时出错: {str(e)}, 行: {line}")
+                img_width = self.canvas.image_size.width()
+                img_height = self.canvas.image_size.height()
+                temp_boxes = read_label_file(label_path, img_width, img_height)
                 
                 # 成功解析完成，现在更新画布的边界框列表
                 self.canvas.boxes = temp_boxes
@@ -764,6 +1238,8 @@ class YOLOLabelCreator(QMainWindow):
                     
                     # 执行删除操作
                     del self.canvas.boxes[index]
+                    self.canvas.record_edit(RemoveBox(index, box_to_delete))
+                    self.canvas.selected_box_index = -1
                     
                     # 记录删除后的标签数量
                     logger.info(f"删除后标签数量: {len(self.canvas.boxes)}")
@@ -796,16 +1272,14 @@ class YOLOLabelCreator(QMainWindow):
     def prev_image(self):
         if self.current_image_index > 0:
             # 不再自动保存，直接切换到上一张图像
-            self.current_image_index -= 1
-            self.image_list.setCurrentRow(self.current_image_index)
+            self.set_current_image_row(self.current_image_index - 1)
             image_path = os.path.join(self.current_folder, self.image_files[self.current_image_index])
             self.load_image(image_path)
     
     def next_image(self):
         if self.current_image_index < len(self.image_files) - 1:
             # 不再自动保存，直接切换到下一张图像
-            self.current_image_index += 1
-            self.image_list.setCurrentRow(self.current_image_index)
+            self.set_current_image_row(self.current_image_index + 1)
             image_path = os.path.join(self.current_folder, self.image_files[self.current_image_index])
             self.load_image(image_path)
     
@@ -814,49 +1288,140 @@ class YOLOLabelCreator(QMainWindow):
             QMessageBox.warning(self, tr("Warning"), tr("No image loaded"))
             return
         
-        label_path = self.get_label_path(self.canvas.image_path)
-        self.save_annotations(label_path)
+        image_path = self.canvas.image_path
+        label_path = self.get_label_path(image_path)
+        self.stash_current_annotations()
+        version = self.annotation_session.mark_dirty(image_path)
+        self.save_annotations(label_path, version)
     
-    def save_all(self):
-        if not self.image_files:
-            QMessageBox.warning(self, tr("Warning"), tr("No images loaded"))
+    def undo(self):
+        """撤销当前图像的最近一次编辑"""
+        history = self.canvas.undo_history
+        if history is None or not history.can_undo():
+            self.statusBar().showMessage(tr("没有可撤销的操作"), 2000)
             return
+        history.undo(self.canvas.boxes)
+        self._after_undo_redo()
+    
+    def redo(self):
+        """重做当前图像最近一次撤销的编辑"""
+        history = self.canvas.undo_history
+        if history is None or not history.can_redo():
+            self.statusBar().showMessage(tr("没有可重做的操作"), 2000)
+            return
+        history.redo(self.canvas.boxes)
+        self._after_undo_redo()
+    
+    def _after_undo_redo(self):
+        """撤销或重做后刷新界面并保存"""
+        self.canvas.selected_box_index = -1
+        self.canvas.edit_mode = None
+        self.update_box_list()
+        self.canvas.update()
+        self.save_current()
+    
+    def stash_current_annotations(self):
+        """将画布上当前图像的标注记录到编辑会话"""
+        if self.canvas.image_path and self.canvas.pixmap and not self.canvas.pixmap.isNull():
+            self.annotation_session.store(self.canvas.image_path, self.canvas.boxes,
+                                          (self.canvas.image_size.width(), self.canvas.image_size.height()))
+    
+    def save_all(self):
+        """
+        保存编辑会话中所有已修改的标注
         
-        # Save current image first
-        if self.canvas.image_path:
-            self.save_current()
-        
-        # Save all other images
-        current_index = self.current_image_index
-        for i, image_file in enumerate(self.image_files):
-            if i != current_index:  # Skip current image as it's already saved
-                self.current_image_index = i
-                self.image_list.setCurrentRow(i)
-                image_path = os.path.join(self.current_folder, image_file)
-                self.load_image(image_path)
-                label_path = self.get_label_path(image_path)
-                self.save_annotations(label_path)
+        只写出被修改过的图像的标签，标签内容直接由会话中的边界框生成，
+        在后台线程中写入，不需要重新加载任何图像。
+        """
+        self.stash_current_annotations()
+        dirty_items = self.annotation_session.dirty_items()
+        if not dirty_items:
+            self.statusBar().showMessage(tr("没有需要保存的修改"), 3000)
+            return
         
-        # Return to original image
-        self.current_image_index = current_index
-        self.image_list.setCurrentRow(current_index)
-        image_path = os.path.join(self.current_folder, self.image_files[current_index])
-        self.load_image(image_path)
+        labels_dirs = set()
+        for image_path, entry in dirty_items:
+            content = format_label_lines(entry.boxes, *entry.image_size)
+            label_path = self.get_label_path(image_path)
+            labels_dirs.add(os.path.dirname(label_path))
+            self.pending_label_paths.add(label_path)
+            self.label_writer.submit(label_path, content, image_path, entry.version)
+        # 修改可能来自多个文件夹（如train/val），每个标签文件夹都需要classes.txt
+        for labels_dir in sorted(labels_dirs):
+            self.save_classes_file(labels_dir)
+        self.update_data_yaml()
+        logger.info(f"后台保存 {len(dirty_items)} 个已修改的标签文件")
+        self.statusBar().showMessage(tr("正在保存 {} 个已修改的标签文件...").format(len(dirty_items)))
+    
+    def _emit_label_written(self, image_path, label_path, version, error):
+        """标签写入线程的回调，转发到界面线程处理"""
+        self.label_written.emit(image_path or "", label_path, -1 if version is None else version,
+                                str(error) if error else "")
+    
+    def on_label_written(self, image_path, label_path, version, error):
+        """后台标签写入完成"""
+        if not image_path:
+            # classes.txt、data.yaml等非标签文件
+            if error:
+                self.written_file_contents.pop(label_path, None)
+            return
+        # 回调经信号排队送达，期间同一路径可能又提交了新的写入
+        if not self.label_writer.is_pending(label_path):
+            self.pending_label_paths.discard(label_path)
+        if error:
+            QMessageBox.warning(self, tr("Error"), f"{tr('Failed to save annotations')}: {error}")
+        else:
+            self.annotation_session.mark_clean(image_path, label_path, None if version < 0 else version)
+            entry = self.annotation_session.get(image_path, label_path)
+            if self.label_status_index and entry is not None:
+                self.label_status_index.update(image_path, entry.boxes)
+            self.archive_dirty = True
+            if os.path.dirname(image_path) == self.current_folder:
+                self.image_list_model.invalidate_status(os.path.basename(image_path))
+        if not self.pending_label_paths:
+            self.statusBar().showMessage(tr("All annotations saved successfully"), 3000)
+    
+    def write_file_if_changed(self, path, content):
+        """
+        内容与上次写入（或磁盘上现有文件）不同时才提交到后台写入
         
-        QMessageBox.information(self, tr("Success"), tr("All annotations saved successfully"))
+        Returns:
+            bool: 是否提交了写入
+        """
+        previous = self.written_file_contents.get(path)
+        if previous is None and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    previous = f.read()
+            except Exception:
+                previous = None
+        if previous == content:
+            self.written_file_contents[path] = content
+            return False
+        self.written_file_contents[path] = content
+        self.label_writer.submit(path, content)
+        return True
     
-    def save_annotations(self, label_path):
+    def save_classes_file(self, labels_dir):
+        """保存类别名称到classes.txt（类别列表变化时才重写）"""
+        content = "".join(f"{class_name}\n" for class_name in self.classes)
+        if self.write_file_if_changed(os.path.join(labels_dir, "classes.txt"), content):
+            logger.info(f"类别列表已变化，更新类别文件: {labels_dir}")
+    
+    def save_annotations(self, label_path, version=None):
         """
         将当前标注保存为YOLO格式标签文件
         
         Args:
             label_path (str): 标签文件保存路径
+            version (int, optional): 编辑会话中的修改版本号
             
         Returns:
-            bool: 保存是否成功
+            bool: 是否已提交保存
             
         Note:
-            同时会更新classes.txt和data.yaml文件
+            标签文件由后台写入器延迟合并、原子写入；classes.txt和data.yaml
+            只在类别列表变化时才重写
         """
         # 确保图像已正确加载
         if not self.canvas.pixmap or self.canvas.pixmap.isNull():
@@ -885,8 +1450,8 @@ class YOLOLabelCreator(QMainWindow):
             logger.warning(f"保存空标签文件: {label_path}")
             
         try:
-            img_width = self.canvas.pixmap.width()
-            img_height = self.canvas.pixmap.height()
+            img_width = self.canvas.image_size.width()
+            img_height = self.canvas.image_size.height()
             
             # 保存前记录即将保存的边界框数量
             pre_save_box_count = len(self.canvas.boxes)
@@ -896,22 +1461,20 @@ class YOLOLabelCreator(QMainWindow):
             if pre_save_box_count == 0:
                 logger.warning(f"注意：正在保存空标签文件 {label_path}")
             
-            # 保存标签文件
-            self._write_label_file(label_path, img_width, img_height)
+            # 提交标签文件到后台写入队列
+            self._write_label_file(label_path, img_width, img_height, version)
             
             # 确认保存后标签数量未变化
             post_save_box_count = len(self.canvas.boxes)
             if pre_save_box_count != post_save_box_count:
                 logger.error(f"警告：保存前边界框数量 {pre_save_box_count} 与保存后数量 {post_save_box_count} 不一致")
             
-            # 保存类别名称到classes.txt
-            classes_path = os.path.join(os.path.dirname(label_path), "classes.txt")
-            with open(classes_path, 'w') as f:
-                for class_name in self.classes:
-                    f.write(f"{class_name}\n")
+            # 类别列表变化时更新classes.txt和data.yaml
+            self.save_classes_file(os.path.dirname(label_path))
+            self.update_data_yaml()
             
-            # 记录保存的标签数量        
-            logger.info(f"成功保存标签文件: {label_path}，共 {post_save_box_count} 个标签")
+            # 记录保存的标签数量（标注状态索引在写入完成后更新）
+            logger.info(f"已提交标签文件: {label_path}，共 {post_save_box_count} 个标签")
             
             return True
         except Exception as e:
@@ -919,45 +1482,26 @@ class YOLOLabelCreator(QMainWindow):
             QMessageBox.warning(self, tr("Error"), f"{tr('Failed to save annotations')}: {str(e)}")
             return False
             
-    def _write_label_file(self, path, img_width, img_height):
+    def _write_label_file(self, path, img_width, img_height, version=None):
         """
-        将边界框数据写入YOLO格式标签文件
+        将当前边界框转换为YOLO格式并提交到后台写入队列
         
         Args:
             path (str): 标签文件保存路径
             img_width (int): 图像宽度
             img_height (int): 图像高度
-            
-        Note:
-            YOLO格式：每行表示一个边界框，格式为 "class_id x_center y_center width height [keypoints...]"
-            所有坐标都是归一化的（0-1范围）
+            version (int, optional): 编辑会话中的修改版本号
         """
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        
         # 记录即将写入的框数量
         boxes_to_save = len(self.canvas.boxes)
         logger.info(f"准备写入标签数量: {boxes_to_save}")
         
-        with open(path, 'w', encoding='utf-8') as f:
-            for box in self.canvas.boxes:
-                yolo_box = box.to_yolo_format(img_width, img_height)
-                line = f"{yolo_box[0]} {yolo_box[1]:.6f} {yolo_box[2]:.6f} {yolo_box[3]:.6f} {yolo_box[4]:.6f}"
-                
-                # 检查是否有特征点数据，如果有则添加到标签行
-                if box.has_keypoints():
-                    keypoints = box.keypoints
-                    # 将特征点坐标转换为相对坐标并添加到行末
-                    for kp in keypoints:
-                        # 归一化坐标到[0,1]范围
-                        kp_x_norm = kp[0] / img_width
-                        kp_y_norm = kp[1] / img_height
-                        line += f" {kp_x_norm:.6f} {kp_y_norm:.6f}"
-                
-                line += "\n"
-                f.write(line)
-        self.update_data_yaml()
+        content = format_label_lines(self.canvas.boxes, img_width, img_height)
+        self.pending_label_paths.add(path)
+        self.label_writer.submit(path, content, self.canvas.image_path, version)
 
     def update_data_yaml(self):
+        """更新数据集的data.yaml（内容变化时才重写）"""
         if not self.current_dir:
             return
         
@@ -970,14 +1514,13 @@ class YOLOLabelCreator(QMainWindow):
             'names': self.classes
         }
         try:
-            with open(yaml_path, 'w', encoding='utf-8') as f:
-                yaml.dump(data, f, default_flow_style=False)
+            self.write_file_if_changed(yaml_path, yaml.dump(data, default_flow_style=False))
         except Exception as e:
             logger.error(f"Failed to save data.yaml: {str(e)}")
     
     def auto_label_current(self):
         """使用YOLO模型自动标注当前图像"""
-        if not self.canvas.pixmap:
+        if not self.canvas.pixmap or not self.canvas.image_path:
             QMessageBox.warning(self, tr("警告"), tr("请先加载图像"))
             return
             
@@ -993,9 +1536,8 @@ class YOLOLabelCreator(QMainWindow):
             progress.setWindowModality(Qt.WindowModal)
             progress.setValue(10)
             
-            # 获取当前图像路径
-            current_image = self.image_files[self.current_image_index]
-            image_path = os.path.join(self.current_folder, current_image)
+            # 使用画布上显示的图像（列表筛选后current_image_index可能为-1）
+            image_path = self.canvas.image_path
             
             progress.setValue(30)
             
@@ -1008,12 +1550,15 @@ class YOLOLabelCreator(QMainWindow):
             original_count = len(self.canvas.boxes)
             logger.info(f"自动标注前标签数量: {original_count}")
             
-            if boxes:
-                # 不再弹出确认对话框，直接添加预测的边界框，保留现有标注
-                self.canvas.boxes.extend(boxes)
-                # 记录添加后的标签数量
-                new_count = len(self.canvas.boxes)
-                logger.info(f"自动标注后标签数量: {new_count}，新增 {new_count - original_count} 个标签")
+            # 按合并策略与现有标注合并，重复自动标注不会产生重复的边界框
+            result = merge_predictions(self.canvas.boxes, boxes, self.get_merge_policy())
+            if result.changed:
+                self.canvas.record_edit(ReplaceBoxes(self.canvas.boxes, result.boxes))
+                self.canvas.boxes[:] = result.boxes
+                if self.canvas.selected_box_index >= len(self.canvas.boxes) or result.removed:
+                    self.canvas.selected_box_index = -1
+                logger.info(f"自动标注后标签数量: {len(self.canvas.boxes)}，新增 {result.added} 个，"
+                            f"修正 {result.refined} 个，替换 {result.removed} 个")
                 
                 self.update_box_list()
                 self.canvas.update()
@@ -1022,7 +1567,10 @@ class YOLOLabelCreator(QMainWindow):
                 self.save_current()
 
                 # 改为状态栏提示
-                self.statusBar().showMessage(tr(f"自动标注完成，检测到{len(boxes)}个目标"), 3000)
+                self.statusBar().showMessage(
+                    tr(f"自动标注完成，检测到{len(boxes)}个目标，新增{result.added}个，修正{result.refined}个"), 3000)
+            elif boxes:
+                self.statusBar().showMessage(tr(f"检测到{len(boxes)}个目标，均已存在于现有标注中"), 3000)
             else:
                 # 状态栏提示
                 self.statusBar().showMessage(tr("未检测到任何目标"), 3000)
@@ -1032,6 +1580,10 @@ class YOLOLabelCreator(QMainWindow):
             logger.error(f"自动标注失败: {str(e)}")
             QMessageBox.warning(self, tr("错误"), tr(f"自动标注失败: {str(e)}"))
 
+    def get_merge_policy(self):
+        """自动标注结果与现有标注的合并策略"""
+        return self.settings.get_model_params().get('merge_policy', DEFAULT_MERGE_POLICY)
+    
     def auto_label_all(self):
         """使用YOLO模型自动标注当前文件夹中的所有图像"""
         if not self.current_folder or not self.image_files:
@@ -1050,52 +1602,69 @@ class YOLOLabelCreator(QMainWindow):
             progress.setWindowModality(Qt.WindowModal)
             progress.setValue(0)
             
-            # 保存当前图像索引，以便处理完成后恢复
-            original_index = self.current_image_index
+            # 画布上当前图像的标注也通过编辑会话更新
+            self.stash_current_annotations()
+            image_files = list(self.image_files)
+            merge_policy = self.get_merge_policy()
             
-            # 处理每张图像
+            # 处理每张图像（不加载到画布，尺寸从图像文件头读取）
             processed_count = 0
-            for i, image_file in enumerate(self.image_files):
+            labels_dir = None
+            for i, image_file in enumerate(image_files):
                 if progress.wasCanceled():
                     break
                     
                 image_path = os.path.join(self.current_folder, image_file)
-                progress.setLabelText(tr(f"正在处理 ({i+1}/{len(self.image_files)}): {image_file}"))
+                progress.setLabelText(tr(f"正在处理 ({i+1}/{len(image_files)}): {image_file}"))
+                
+                image_size = self.image_size_cache.get_size(image_path) if self.image_size_cache else None
+                if image_size is None:
+                    logger.warning(f"无法读取图像尺寸，跳过: {image_path}")
+                    progress.setValue(i + 1)
+                    continue
                 
-                # 加载图像
-                self.current_image_index = i
-                self.image_list.setCurrentRow(i)
-                self.load_image(image_path)
+                # 读取现有标注（优先使用编辑会话中的标注）
+                label_path = self.get_label_path(image_path)
+                entry = self.annotation_session.get(image_path, label_path)
+                if entry is None:
+                    existing_boxes = read_label_file(label_path, *image_size) if os.path.exists(label_path) else []
+                    entry = self.annotation_session.store(image_path, existing_boxes, image_size, label_path)
                 
                 # 记录当前标签数量
-                original_count = len(self.canvas.boxes)
-                logger.info(f"批量自动标注 [{i+1}/{len(self.image_files)}] '{image_file}' - 初始标签数量: {original_count}")
+                original_count = len(entry.boxes)
+                logger.info(f"批量自动标注 [{i+1}/{len(image_files)}] '{image_file}' - 初始标签数量: {original_count}")
                 
                 # 执行预测
                 boxes = self.yolo_predictor.predict(image_path)
                 
-                if boxes:
-                    # 添加预测的边界框，保留现有标注
-                    self.canvas.boxes.extend(boxes)
-                    new_count = len(self.canvas.boxes)
-                    logger.info(f"批量自动标注 - 添加后标签数量: {new_count}，新增 {new_count - original_count} 个标签")
+                # 按合并策略与现有标注合并
+                result = merge_predictions(entry.boxes, boxes, merge_policy)
+                if result.changed:
+                    self.undo_manager.history_for(image_path).push(ReplaceBoxes(entry.boxes, result.boxes))
+                    entry.boxes[:] = result.boxes
+                    logger.info(f"批量自动标注 - 合并后标签数量: {len(entry.boxes)}，新增 {result.added} 个，"
+                                f"修正 {result.refined} 个，替换 {result.removed} 个")
                     
-                    self.update_box_list()
-                    self.canvas.update()
-                    
-                    # 保存标注
-                    self.save_current()
+                    # 提交到后台写入队列
+                    version = self.annotation_session.mark_dirty(image_path)
+                    self.pending_label_paths.add(label_path)
+                    self.label_writer.submit(label_path, format_label_lines(entry.boxes, *entry.image_size),
+                                             image_path, version)
+                    labels_dir = os.path.dirname(label_path)
                     processed_count += 1
                 
                 # 更新进度
                 progress.setValue(i + 1)
                 QApplication.processEvents()  # 确保UI响应
             
-            # 恢复到原始图像
-            self.current_image_index = original_index
-            self.image_list.setCurrentRow(original_index)
-            image_path = os.path.join(self.current_folder, self.image_files[original_index])
-            self.load_image(image_path)
+            if labels_dir:
+                self.save_classes_file(labels_dir)
+                self.update_data_yaml()
+            
+            # 刷新画布上当前图像的标注
+            if self.canvas.image_path:
+                self.update_box_list()
+                self.canvas.update()
             
             # 显示完成消息
             self.statusBar().showMessage(tr(f"批量标注完成，成功处理 {processed_count} 张图像"), 5000)
@@ -1157,18 +1726,27 @@ class YOLOLabelCreator(QMainWindow):
         # 切换特征点编辑模式
         toggle_keypoint_shortcut = QShortcut(QKeySequence(self.settings.get_shortcut('toggle_keypoint_mode')), self)
         toggle_keypoint_shortcut.activated.connect(self.toggle_keypoint_mode)
+        
+        # 撤销 / 重做
+        undo_shortcut = QShortcut(QKeySequence(self.settings.get_shortcut('undo')), self)
+        undo_shortcut.activated.connect(self.undo)
+        
+        redo_shortcut = QShortcut(QKeySequence(self.settings.get_shortcut('redo')), self)
+        redo_shortcut.activated.connect(self.redo)
 
     def show_settings(self):
         """显示设置对话框"""
         dialog = SettingsDialog(self.settings, self)  # Now this will work correctly
         if dialog.exec_() == QDialog.Accepted:
-            # 如果设置已保存，重新应用快捷键
+            # 如果设置已保存，重新应用快捷键和画布细节层次阈值
             self.setup_shortcuts()
+            self.canvas.set_lod_params(self.settings.get_render_params())
             self.statusBar().showMessage(tr("设置已更新"), 3000)
 
     def open_yolo_trainer(self):
             """打开YOLO模型训练器对话框"""
             try:
+                self.label_writer.flush()
                 trainer_dialog = YoloTrainerDialog(self)
                 trainer_dialog.exec_()
             except Exception as e:
@@ -1183,7 +1761,9 @@ class YOLOLabelCreator(QMainWindow):
             
             # 创建并显示对话框
             dialog = ModelSettingsDialog(self, model_params, self.yolo_predictor.available_devices)
+            self.start_threshold_preview(dialog)
             result = dialog.exec_()
+            self.stop_threshold_preview()
             
             # 处理结果
             if result == QDialog.Accepted:
@@ -1230,6 +1810,60 @@ class YOLOLabelCreator(QMainWindow):
             logger.error(traceback.format_exc())
             QMessageBox.warning(self, tr("Error"), f"{tr('Failed to open model settings')}: {str(e)}")
 
+    def start_threshold_preview(self, dialog):
+        """
+        调整模型设置对话框中的阈值时，在画布上实时预览当前图像的预测结果
+        
+        优先使用预测器内存中保留的原始候选框；没有时在第一次调整阈值时才在后台推理
+        （或读取磁盘缓存），只修改模型路径或设备时不进行推理，也不阻塞界面。
+        """
+        image_path = self.canvas.image_path
+        if self.yolo_predictor.model is None or not image_path:
+            return
+        
+        state = {'raw': self.yolo_predictor.get_last_raw(image_path)}
+        
+        def update_preview(conf_threshold, iou_threshold, max_detections):
+            raw = state['raw']
+            if raw is None:
+                if self.threshold_preview_thread is None:
+                    dialog.set_preview_status(tr("正在推理..."))
+                    self.threshold_preview_thread = RawPredictionThread(self.yolo_predictor, image_path, dialog)
+                    self.threshold_preview_thread.raw_ready.connect(on_raw_ready)
+                    self.threshold_preview_thread.start()
+                return
+            start = time.perf_counter()
+            boxes = self.yolo_predictor.filter_predictions(raw, conf_threshold, iou_threshold, max_detections)
+            elapsed = (time.perf_counter() - start) * 1000
+            self.canvas.set_preview_boxes(boxes)
+            dialog.set_preview_status(tr("{} 个目标（共 {} 个候选框，过滤耗时 {:.1f} ms）").format(
+                len(boxes), len(raw), elapsed))
+        
+        def on_raw_ready(raw):
+            if raw is None:
+                dialog.set_preview_status(tr("无可预览的预测结果"))
+                return
+            state['raw'] = raw
+            dialog.emit_thresholds()
+        
+        dialog.thresholds_changed.connect(update_preview)
+        if state['raw'] is not None:
+            dialog.emit_thresholds()
+    
+    def stop_threshold_preview(self):
+        """模型设置对话框关闭后清除预览，并等待仍在进行的预览推理结束（之后可能会加载新模型）"""
+        thread = self.threshold_preview_thread
+        self.threshold_preview_thread = None
+        if thread is not None:
+            thread.raw_ready.disconnect()
+            if thread.isRunning():
+                QApplication.setOverrideCursor(Qt.WaitCursor)
+                try:
+                    thread.wait()
+                finally:
+                    QApplication.restoreOverrideCursor()
+        self.canvas.set_preview_boxes([])
+    
     def open_dataset_split(self):
         """打开数据集划分对话框"""
         try:
@@ -1237,12 +1871,65 @@ class YOLOLabelCreator(QMainWindow):
                 QMessageBox.warning(self, tr("警告"), tr("请先选择一个文件夹"))
                 return
                 
+            self.label_writer.flush()
             dialog = DatasetSplitDialog(self, self.current_folder)
             dialog.exec_()
         except Exception as e:
             logger.error(f"打开数据集划分对话框失败: {str(e)}")
             QMessageBox.warning(self, tr("错误"), f"{tr('打开数据集划分对话框失败')}: {str(e)}")
 
+    def open_dataset_stats(self):
+        """打开数据集统计对话框"""
+        try:
+            if not self.current_dir:
+                QMessageBox.warning(self, tr("警告"), tr("请先选择数据集文件夹"))
+                return
+            
+            self.label_writer.flush()
+            dialog = DatasetStatsDialog(self.current_dir, self.classes, self, self.image_size_cache)
+            dialog.exec_()
+        except Exception as e:
+            logger.error(f"打开数据集统计对话框失败: {str(e)}")
+            QMessageBox.warning(self, tr("错误"), f"{tr('打开数据集统计对话框失败')}: {str(e)}")
+
+    def open_validation_report(self):
+        """打开标注检查报告窗口（非模态，检查在后台进行，不影响继续标注）"""
+        try:
+            if not self.current_dir:
+                QMessageBox.warning(self, tr("警告"), tr("请先选择数据集文件夹"))
+                return
+            
+            self.label_writer.flush()
+            if self.validation_dialog is not None and self.validation_dialog.dataset_dir == self.current_dir:
+                self.validation_dialog.show()
+                self.validation_dialog.raise_()
+                self.validation_dialog.refresh()
+                return
+            if self.validation_dialog is not None:
+                self.validation_dialog.close()
+            self.validation_dialog = ValidationReportDialog(self.current_dir, self.classes, self)
+            self.validation_dialog.image_activated.connect(self.navigate_to_image)
+            self.validation_dialog.show()
+        except Exception as e:
+            logger.error(f"打开标注检查窗口失败: {str(e)}")
+            QMessageBox.warning(self, tr("错误"), f"{tr('打开标注检查窗口失败')}: {str(e)}")
+    
+    def open_pack_browser(self):
+        """选择分片数据包的data.yaml并打开浏览窗口（只读）"""
+        pack_yaml, _ = QFileDialog.getOpenFileName(self, tr("选择分片数据包的data.yaml"), "",
+                                                   "YAML (*.yaml *.yml)")
+        if not pack_yaml:
+            return
+        if not is_pack_yaml(pack_yaml):
+            QMessageBox.warning(self, tr("警告"), tr("所选文件不是分片数据包的data.yaml"))
+            return
+        try:
+            dialog = PackBrowserDialog(pack_yaml, self)
+            dialog.show()
+        except Exception as e:
+            logger.error(f"打开分片数据包失败: {str(e)}")
+            QMessageBox.warning(self, tr("错误"), f"{tr('打开分片数据包失败')}: {str(e)}")
+    
     def open_class_manager(self):
         """打开类别管理对话框"""
         try:
@@ -1251,10 +1938,19 @@ class YOLOLabelCreator(QMainWindow):
             if self.current_folder:
                 data_yaml_path = os.path.join(self.current_folder, 'data.yaml')
             
-            dialog = ClassManagerDialog(self.classes, data_yaml_path, self)
+            # 类别ID可能被重映射，先写出所有未保存的修改
+            self.stash_current_annotations()
+            if self.annotation_session.dirty_items():
+                self.save_all()
+            self.label_writer.flush()
+            QApplication.processEvents()
+            
+            dialog = ClassManagerDialog(self.classes, data_yaml_path, self, self.current_dir or None)
             if dialog.exec_() == QDialog.Accepted:
                 # 获取修改后的类别列表
                 new_classes = dialog.get_classes()
+                if data_yaml_path:
+                    self.written_file_contents.pop(data_yaml_path, None)
                 
                 # 检查是否有变化
                 if dialog.has_changes():
@@ -1262,6 +1958,10 @@ class YOLOLabelCreator(QMainWindow):
                     self.classes = new_classes
                     self.update_class_combo()
                     
+                    # 标签文件已按新的类别ID改写
+                    if dialog.remap_result is not None:
+                        self.on_labels_remapped()
+                    
                     # 如果当前有图像加载，可能需要更新标注
                     if self.canvas.pixmap:
                         # 更新类别下拉框
@@ -1272,6 +1972,34 @@ class YOLOLabelCreator(QMainWindow):
             logger.error(f"打开类别管理对话框失败: {str(e)}")
             QMessageBox.warning(self, tr("错误"), tr(f"打开类别管理对话框失败: {str(e)}"))
 
+    def on_labels_remapped(self):
+        """标签文件被批量改写后丢弃编辑会话和撤销历史，并重新读取当前图像的标注"""
+        self.annotation_session.clear()
+        self.undo_manager.clear()
+        self.canvas.undo_history = None
+        image_path = self.canvas.image_path
+        if image_path and self.canvas.pixmap and not self.canvas.pixmap.isNull():
+            label_path = self.get_label_path(image_path)
+            self.canvas.boxes = []
+            if os.path.exists(label_path):
+                self.load_annotations(label_path)
+            self.annotation_session.store(image_path, self.canvas.boxes,
+                                          (self.canvas.image_size.width(), self.canvas.image_size.height()), label_path)
+            self.canvas.undo_history = self.undo_manager.history_for(image_path)
+            self.update_box_list()
+            self.canvas.update()
+        
+        # 标签文件修改时间已变化，重新扫描当前文件夹的标注状态
+        self.archive_dirty = True
+        if self.current_folder:
+            self.start_status_scan(self.current_folder)
+        
+        # classes.txt与新的类别列表保持一致
+        if self.current_dir:
+            for _, labels_dir in find_label_dirs(self.current_dir):
+                self.save_classes_file(labels_dir)
+            self.label_writer.flush()
+    
     def toggle_keypoint_mode(self):
         """切换特征点编辑模式"""
         is_checked = self.keypoint_edit_button.isChecked()
@@ -1338,6 +2066,9 @@ class YOLOLabelCreator(QMainWindow):
         if not self.current_dir:
             QMessageBox.warning(self, tr("警告"), tr("请先选择数据集文件夹"))
             return False
+        
+        # 先写出尚未落盘的标签
+        self.label_writer.flush()
             
         try:
             # 创建进度对话框
@@ -1349,54 +2080,25 @@ class YOLOLabelCreator(QMainWindow):
             progress.show()
             QApplication.processEvents()
             
-            # 用于收集所有类别的字典
-            class_ids = set()
+            # 通过标注归档收集所有类别（只重新解析修改过的标签文件）
+            self.stop_archive_update()
+            archive = self.annotation_archive
             
-            # 扫描所有子文件夹
-            total_labels = 0
-            progress.setValue(10)
+            def on_progress(done, total):
+                progress.setLabelText(tr(f"扫描标签文件: {done}/{total}"))
+                progress.setValue(10 + int(80 * done / max(1, total)))
+                QApplication.processEvents()
+                return not progress.wasCanceled()
             
-            # 遍历数据集目录树
-            for root, dirs, files in os.walk(self.current_dir):
-                if progress.wasCanceled():
-                    break
-                
-                # 寻找labels目录
-                if os.path.basename(root) == "labels":
-                    parent_dir = os.path.dirname(root)
-                    
-                    # 更新进度条信息
-                    relative_path = os.path.relpath(root, self.current_dir)
-                    progress.setLabelText(tr(f"扫描: {relative_path}"))
-                    
-                    # 扫描所有标签文件
-                    label_files = [f for f in files if f.endswith('.txt')]
-                    total_labels += len(label_files)
-                    
-                    # 读取每个标签文件
-                    for i, label_file in enumerate(label_files):
-                        if i % 10 == 0:  # 每处理10个文件更新一次进度
-                            progress_val = 10 + min(80, int(80 * i / max(1, len(label_files))))
-                            progress.setValue(progress_val)
-                            QApplication.processEvents()
-                            
-                        if progress.wasCanceled():
-                            break
-                            
-                        label_path = os.path.join(root, label_file)
-                        try:
-                            with open(label_path, 'r') as f:
-                                for line in f:
-                                    if line.strip():
-                                        parts = line.strip().split()
-                                        if parts:
-                                            try:
-                                                class_id = int(parts[0])
-                                                class_ids.add(class_id)
-                                            except ValueError:
-                                                logger.warning(f"标签文件 {label_path} 中的类别ID无效: {parts[0]}")
-                        except Exception as e:
-                            logger.error(f"读取标签文件 {label_path} 时出错: {str(e)}")
+            progress.setValue(10)
+            if not archive.update(on_progress):
+                return False
+            self.archive_dirty = False
+            total_labels = len(archive.label_paths)
+            class_ids = set(int(class_id) for class_id in archive.class_ids() if class_id >= 0)
+            invalid_count = int((archive.boxes['class_id'] < 0).sum())
+            if invalid_count:
+                logger.warning(f"标签文件中有 {invalid_count} 个边界框的类别ID无效")
             
             progress.setValue(90)
             
@@ -1430,14 +2132,8 @@ class YOLOLabelCreator(QMainWindow):
                     labels_dirs.append(root)
                     
             for labels_dir in labels_dirs:
-                classes_path = os.path.join(labels_dir, "classes.txt")
-                try:
-                    with open(classes_path, 'w', encoding='utf-8') as f:
-                        for class_name in self.classes:
-                            f.write(f"{class_name}\n")
-                    logger.info(f"已更新类别文件: {classes_path}")
-                except Exception as e:
-                    logger.error(f"更新类别文件失败: {str(e)}")
+                self.save_classes_file(labels_dir)
+            self.label_writer.flush()
             
             progress.setValue(100)
             QMessageBox.information(
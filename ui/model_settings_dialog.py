@@ -1,18 +1,36 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, 
                             QGroupBox, QLabel, QComboBox, QLineEdit, 
                             QPushButton, QFileDialog, QDoubleSpinBox, 
-                            QSpinBox, QCheckBox, QRadioButton, QButtonGroup)
-from PyQt5.QtCore import Qt
+                            QSpinBox, QCheckBox, QRadioButton, QButtonGroup, QSlider)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
 import os
 import logging
 from utils.settings import Settings
+from utils.box_merge import (MERGE_ADD_NEW, MERGE_REFINE, MERGE_KEEP_EXISTING, MERGE_REPLACE,
+                             DEFAULT_MERGE_POLICY)
 from i18n import tr
 
 logger = logging.getLogger('YOLOLabelCreator.ModelSettings')
 
+class RawPredictionThread(QThread):
+    """在后台推理一张图像的原始候选框，用于阈值预览"""
+    
+    raw_ready = pyqtSignal(object)  # RawPredictions，失败时为None
+    
+    def __init__(self, predictor, image_path, parent=None):
+        super().__init__(parent)
+        self.predictor = predictor
+        self.image_path = image_path
+    
+    def run(self):
+        self.raw_ready.emit(self.predictor.predict_raw(self.image_path))
+
 class ModelSettingsDialog(QDialog):
     """模型预测参数设置对话框"""
     
+    # 阈值变化时发出 (置信度阈值, IoU阈值, 最大检测数量)，用于在画布上实时预览
+    thresholds_changed = pyqtSignal(float, float, int)
+    
     def __init__(self, parent=None, model_params=None, available_devices=None):
         super().__init__(parent)
         self.settings = Settings()
@@ -136,14 +154,16 @@ class ModelSettingsDialog(QDialog):
         self.conf_threshold.setRange(0.01, 1.0)
         self.conf_threshold.setSingleStep(0.05)
         self.conf_threshold.setValue(self.model_params.get("confidence_threshold", 0.5))
-        params_layout.addRow(tr("置信度阈值:"), self.conf_threshold)
+        self.conf_slider = self.create_threshold_slider(self.conf_threshold)
+        params_layout.addRow(tr("置信度阈值:"), self.threshold_row(self.conf_slider, self.conf_threshold))
         
         # IoU阈值
         self.iou_threshold = QDoubleSpinBox()
         self.iou_threshold.setRange(0.01, 1.0)
         self.iou_threshold.setSingleStep(0.05)
         self.iou_threshold.setValue(self.model_params.get("iou_threshold", 0.45))
-        params_layout.addRow(tr("IoU阈值:"), self.iou_threshold)
+        self.iou_slider = self.create_threshold_slider(self.iou_threshold)
+        params_layout.addRow(tr("IoU阈值:"), self.threshold_row(self.iou_slider, self.iou_threshold))
         
         # 最大检测数量
         self.max_detections = QSpinBox()
@@ -151,6 +171,14 @@ class ModelSettingsDialog(QDialog):
         self.max_detections.setValue(self.model_params.get("max_detections", 100))
         params_layout.addRow(tr("最大检测数量:"), self.max_detections)
         
+        # 阈值实时预览（由主窗口根据当前图像的原始候选框计算）
+        self.preview_label = QLabel(tr("无可预览的预测结果"))
+        params_layout.addRow(tr("预览:"), self.preview_label)
+        
+        self.conf_threshold.valueChanged.connect(self.emit_thresholds)
+        self.iou_threshold.valueChanged.connect(self.emit_thresholds)
+        self.max_detections.valueChanged.connect(self.emit_thresholds)
+        
         # 自动预测
         self.auto_predict = QCheckBox()
         auto_predict_value = self.model_params.get("enable_auto_predict", False)
@@ -167,6 +195,16 @@ class ModelSettingsDialog(QDialog):
         self.keypoints_spinbox.setToolTip(tr("设置为0表示使用模型默认值"))
         params_layout.addRow(tr("特征点数量:"), self.keypoints_spinbox)
         
+        # 自动标注结果与现有标注的合并策略
+        self.merge_policy_combo = QComboBox()
+        self.merge_policy_combo.addItem(tr("只添加新目标"), MERGE_ADD_NEW)
+        self.merge_policy_combo.addItem(tr("修正匹配的标注并添加新目标"), MERGE_REFINE)
+        self.merge_policy_combo.addItem(tr("保留已有标注（只标注无标签图像）"), MERGE_KEEP_EXISTING)
+        self.merge_policy_combo.addItem(tr("替换已有标注"), MERGE_REPLACE)
+        self.set_merge_policy(self.model_params.get("merge_policy", DEFAULT_MERGE_POLICY))
+        self.merge_policy_combo.setToolTip(tr("预测框与同类别已有标注的IoU不低于0.5时视为同一目标，重复自动标注不会产生重复标注"))
+        params_layout.addRow(tr("合并策略:"), self.merge_policy_combo)
+        
         params_group.setLayout(params_layout)
         
         # 按钮
@@ -191,6 +229,36 @@ class ModelSettingsDialog(QDialog):
         layout.addWidget(params_group)
         layout.addLayout(btn_layout)
     
+    def create_threshold_slider(self, spinbox):
+        """创建与阈值输入框同步的滑块（滑块值为阈值的100倍）"""
+        slider = QSlider(Qt.Horizontal)
+        slider.setRange(int(round(spinbox.minimum() * 100)), int(round(spinbox.maximum() * 100)))
+        slider.setValue(int(round(spinbox.value() * 100)))
+        slider.valueChanged.connect(lambda value: spinbox.setValue(value / 100))
+        
+        def sync_slider(value):
+            slider.blockSignals(True)
+            slider.setValue(int(round(value * 100)))
+            slider.blockSignals(False)
+        spinbox.valueChanged.connect(sync_slider)
+        return slider
+    
+    def threshold_row(self, slider, spinbox):
+        """将滑块和输入框放在同一行"""
+        row = QHBoxLayout()
+        row.addWidget(slider, 1)
+        row.addWidget(spinbox)
+        return row
+    
+    def emit_thresholds(self):
+        """发出当前阈值，用于实时预览"""
+        self.thresholds_changed.emit(self.conf_threshold.value(), self.iou_threshold.value(),
+                                     self.max_detections.value())
+    
+    def set_preview_status(self, text):
+        """显示预览状态（例如当前阈值下的检测数量）"""
+        self.preview_label.setText(text)
+    
     def browse_model(self):
         """浏览选择模型文件"""
         # 根据选择的格式确定文件过滤器
@@ -232,6 +300,7 @@ class ModelSettingsDialog(QDialog):
         
         self.device_combo.setCurrentText(default_params.get("device", "cpu"))
         self.keypoints_spinbox.setValue(default_params.get("keypoints_number", 0))
+        self.set_merge_policy(default_params.get("merge_policy", DEFAULT_MERGE_POLICY))
         
         # 重置模型版本和格式
         version = default_params.get("model_version", "yolov8")
@@ -261,6 +330,13 @@ class ModelSettingsDialog(QDialog):
         else:
             return "yolov11"
     
+    def set_merge_policy(self, policy):
+        """选中合并策略，未知策略使用默认值"""
+        index = self.merge_policy_combo.findData(policy)
+        if index < 0:
+            index = self.merge_policy_combo.findData(DEFAULT_MERGE_POLICY)
+        self.merge_policy_combo.setCurrentIndex(index)
+    
     def get_model_format(self):
         """获取选择的模型格式"""
         return "pt" if self.pt_radio.isChecked() else "onnx"
@@ -280,5 +356,6 @@ class ModelSettingsDialog(QDialog):
             "device": self.device_combo.currentText(),
             "model_version": self.get_model_version(),
             "model_format": self.get_model_format(),
-            "keypoints_number": self.keypoints_spinbox.value()
+            "keypoints_number": self.keypoints_spinbox.value(),
+            "merge_policy": self.merge_policy_combo.currentData()
         }
\ No newline at end of file
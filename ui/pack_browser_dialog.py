@@ -0,0 +1,157 @@
+import os
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QLineEdit,
+                             QListView, QSplitter, QSizePolicy)
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QImageReader
+from PyQt5.QtCore import (Qt, QBuffer, QByteArray, QIODevice, QStringListModel, QSortFilterProxyModel,
+                          QRectF, QPointF)
+
+from ui.canvas import BOX_COLORS
+from utils.label_io import parse_label_lines
+from utils.shard_pack import open_pack
+from i18n import tr
+
+logger = logging.getLogger('YOLOLabelCreator.PackBrowserDialog')
+
+
+class PackBrowserDialog(QDialog):
+    """
+    分片数据包浏览窗口（只读）
+
+    样本列表来自数据包索引，选中样本时通过mmap直接读取分片中的图像和标签，
+    按预览区域大小降采样解码并绘制边界框，不需要解包。
+    """
+
+    def __init__(self, pack_yaml, parent=None):
+        super().__init__(parent)
+        self.pack_yaml = pack_yaml
+        self.data, self.readers = open_pack(pack_yaml)
+        names = self.data.get('names') or []
+        self.class_names = list(names.values()) if isinstance(names, dict) else list(names)
+        self.reader = None
+        self.current_key = None
+
+        self.setWindowTitle(tr("分片数据包") + f" - {os.path.dirname(os.path.abspath(pack_yaml))}")
+        self.setModal(False)
+        self.setAttribute(Qt.WA_DeleteOnClose)
+        self.resize(1000, 650)
+        self.setup_ui()
+        if self.readers:
+            self.select_split(0)
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.split_combo = QComboBox()
+        for split, reader in self.readers.items():
+            self.split_combo.addItem(f"{split} ({len(reader)})", split)
+        self.split_combo.currentIndexChanged.connect(self.select_split)
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText(tr("按名称过滤"))
+        top_layout.addWidget(QLabel(tr("子集:")))
+        top_layout.addWidget(self.split_combo)
+        top_layout.addWidget(self.filter_edit, 1)
+        layout.addLayout(top_layout)
+
+        splitter = QSplitter(Qt.Horizontal)
+        self.key_model = QStringListModel(self)
+        self.proxy_model = QSortFilterProxyModel(self)
+        self.proxy_model.setSourceModel(self.key_model)
+        self.proxy_model.setFilterCaseSensitivity(Qt.CaseInsensitive)
+        self.filter_edit.textChanged.connect(self.proxy_model.setFilterFixedString)
+        self.key_view = QListView()
+        self.key_view.setUniformItemSizes(True)
+        self.key_view.setModel(self.proxy_model)
+        self.key_view.selectionModel().currentChanged.connect(self.on_current_changed)
+        splitter.addWidget(self.key_view)
+
+        self.preview_label = QLabel()
+        self.preview_label.setAlignment(Qt.AlignCenter)
+        self.preview_label.setMinimumSize(320, 240)
+        self.preview_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        splitter.addWidget(self.preview_label)
+        splitter.setSizes([250, 750])
+        layout.addWidget(splitter, 1)
+
+        self.info_label = QLabel()
+        self.info_label.setStyleSheet("color: #666; font-size: 9pt;")
+        layout.addWidget(self.info_label)
+
+    def select_split(self, index):
+        split = self.split_combo.itemData(index)
+        self.reader = self.readers.get(split)
+        self.key_model.setStringList(self.reader.keys() if self.reader else [])
+        self.preview_label.clear()
+        self.info_label.clear()
+        if self.proxy_model.rowCount():
+            self.key_view.setCurrentIndex(self.proxy_model.index(0, 0))
+
+    def on_current_changed(self, current, previous):
+        if not current.isValid() or self.reader is None:
+            return
+        self.current_key = self.proxy_model.data(current)
+        self.show_sample()
+
+    def show_sample(self):
+        """读取并显示当前样本（图像按预览区域大小降采样解码）"""
+        key = self.current_key
+        if key is None:
+            return
+        try:
+            data = QByteArray(self.reader.image_bytes(key))
+            label_text = self.reader.label_text(key)
+        except Exception as e:
+            logger.error(f"读取数据包样本失败: {key}, 错误: {str(e)}")
+            self.info_label.setText(f"{tr('读取失败')}: {str(e)}")
+            return
+
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+        original = reader.size()
+        target = self.preview_label.size() * self.devicePixelRatioF()
+        if original.isValid() and (original.width() > target.width() or original.height() > target.height()):
+            reader.setScaledSize(original.scaled(target, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            self.preview_label.clear()
+            self.info_label.setText(f"{tr('图像解码失败')}: {reader.errorString()}")
+            return
+        if not original.isValid():
+            original = image.size()
+
+        pixmap = QPixmap.fromImage(image)
+        boxes = parse_label_lines(label_text.splitlines(), original.width(), original.height()) if label_text else []
+        self.draw_boxes(pixmap, boxes, pixmap.width() / original.width(), pixmap.height() / original.height())
+        pixmap.setDevicePixelRatio(self.devicePixelRatioF())
+        self.preview_label.setPixmap(pixmap)
+        label_state = tr("无标签") if label_text is None else f"{len(boxes)} {tr('个标注')}"
+        self.info_label.setText(f"{self.reader.image_name(key)}    {original.width()}x{original.height()}    "
+                                f"{len(data) / 1024:.0f} KB    {label_state}")
+
+    def draw_boxes(self, pixmap, boxes, scale_x, scale_y):
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        for box in boxes:
+            color = BOX_COLORS[box.class_id % len(BOX_COLORS)]
+            painter.setPen(QPen(color, 2))
+            rect = QRectF(box.x1 * scale_x, box.y1 * scale_y,
+                          (box.x2 - box.x1) * scale_x, (box.y2 - box.y1) * scale_y).normalized()
+            painter.drawRect(rect)
+            name = self.class_names[box.class_id] if 0 <= box.class_id < len(self.class_names) else str(box.class_id)
+            painter.drawText(QPointF(rect.left(), rect.top() - 4), name)
+            if box.keypoints is not None:
+                painter.setPen(QPen(Qt.magenta, 4))
+                for x, y in box.keypoints:
+                    painter.drawPoint(int(x * scale_x), int(y * scale_y))
+        painter.end()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.show_sample()
+
+    def closeEvent(self, event):
+        for reader in self.readers.values():
+            reader.close()
+        super().closeEvent(event)
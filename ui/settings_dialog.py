@@ -1,10 +1,12 @@
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, 
                             QLabel, QTabWidget, QWidget, QTableWidget, 
-                            QTableWidgetItem, QHeaderView, QMessageBox)
+                            QTableWidgetItem, QHeaderView, QMessageBox, QFormLayout,
+                            QSpinBox)
 from PyQt5.QtGui import QKeySequence
 from PyQt5.QtCore import Qt
 
 from i18n import tr
+from utils.settings import DEFAULT_RENDER_PARAMS
 
 class ShortcutEditor(QTableWidget):
     def __init__(self, shortcuts, parent=None):
@@ -34,7 +36,9 @@ class ShortcutEditor(QTableWidget):
             'reset_zoom': tr("重置缩放"),
             'open_directory': tr("打开目录"),
             'exit': tr("退出"),
-            'auto_label': tr("自动标注")
+            'auto_label': tr("自动标注"),
+            'undo': tr("撤销"),
+            'redo': tr("重做")
         }
         
         row = 0
@@ -90,6 +94,34 @@ class SettingsDialog(QDialog):
         # 添加快捷键选项卡
         tab_widget.addTab(shortcuts_tab, tr("快捷键"))
         
+        # 显示选项卡：画布细节层次（缩小查看密集标注时省略的细节）
+        render_tab = QWidget()
+        render_layout = QVBoxLayout(render_tab)
+        render_form = QFormLayout()
+        render_params = self.settings.get_render_params()
+        self.render_spinboxes = {}
+        render_rows = [
+            ('label_min_size', tr("类别标签最小框尺寸:"), tr("边界框在屏幕上的较短边小于该值时不绘制类别标签，改为在左上角按类别汇总")),
+            ('keypoint_label_min_size', tr("特征点编号最小框尺寸:"), tr("边界框在屏幕上的较短边小于该值时不绘制特征点编号")),
+            ('keypoint_min_size', tr("特征点圆点最小框尺寸:"), tr("边界框在屏幕上的较短边小于该值时特征点绘制为单像素点")),
+            ('handle_min_size', tr("控制点最小框尺寸:"), tr("选中的边界框在屏幕上的较短边小于该值时不绘制控制点")),
+        ]
+        for key, label, tooltip in render_rows:
+            spinbox = QSpinBox()
+            spinbox.setRange(0, 1000)
+            spinbox.setSuffix(" px")
+            spinbox.setValue(render_params[key])
+            spinbox.setToolTip(tooltip)
+            render_form.addRow(label, spinbox)
+            self.render_spinboxes[key] = spinbox
+        render_layout.addLayout(render_form)
+        render_layout.addStretch()
+        
+        render_reset_button = QPushButton(tr("重置为默认"))
+        render_reset_button.clicked.connect(self.reset_render_params)
+        render_layout.addWidget(render_reset_button)
+        tab_widget.addTab(render_tab, tr("显示"))
+        
         # 添加选项卡到主布局
         layout.addWidget(tab_widget)
         
@@ -121,6 +153,11 @@ class SettingsDialog(QDialog):
                 if action in DEFAULT_SHORTCUTS:
                     self.shortcut_editor.item(row, 1).setText(DEFAULT_SHORTCUTS[action])
     
+    def reset_render_params(self):
+        """重置细节层次阈值为默认值"""
+        for key, spinbox in self.render_spinboxes.items():
+            spinbox.setValue(DEFAULT_RENDER_PARAMS[key])
+    
     def save_settings(self):
         """保存设置并关闭对话框"""
         # 获取修改后的快捷键
@@ -130,6 +167,8 @@ class SettingsDialog(QDialog):
         for action, shortcut in new_shortcuts.items():
             self.settings.set_shortcut(action, shortcut)
         
+        self.settings.set_render_params({key: spinbox.value() for key, spinbox in self.render_spinboxes.items()})
+        
         # 保存到文件
         if self.settings.save_settings():
             self.accept()  # 关闭对话框
@@ -0,0 +1,130 @@
+import logging
+from PyQt5.QtCore import (Qt, QObject, QRunnable, QThreadPool, QBuffer,
+                          QIODevice, QSize, pyqtSignal)
+from PyQt5.QtGui import QImage, QImageReader
+
+from utils.dataset_cache import file_signature
+
+logger = logging.getLogger('YOLOLabelCreator.ThumbnailLoader')
+
+
+def render_thumbnail(image_path, size):
+    """
+    以降采样方式解码图像并生成缩略图
+
+    对JPEG图像设置缩放尺寸后，解码器会直接在DCT域缩放，不会完整解码原图。
+
+    Returns:
+        QImage: 缩略图，失败时返回空QImage
+    """
+    reader = QImageReader(image_path)
+    reader.setAutoTransform(True)
+    original = reader.size()
+    if original.isValid() and (original.width() > size or original.height() > size):
+        reader.setScaledSize(original.scaled(QSize(size, size), Qt.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        return image
+    if image.width() > size or image.height() > size:
+        image = image.scaled(size, size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    return image
+
+
+class _ThumbnailSignals(QObject):
+    finished = pyqtSignal(str, QImage)
+
+
+class _ThumbnailTask(QRunnable):
+    """在线程池中生成或读取单张缩略图"""
+
+    def __init__(self, loader, image_path, generation):
+        super().__init__()
+        self.loader = loader
+        self.image_path = image_path
+        self.generation = generation
+
+    def run(self):
+        # 视口已经滚动离开时直接放弃
+        if not self.loader.is_wanted(self.image_path, self.generation):
+            self.loader.task_done(self.image_path)
+            return
+        try:
+            image = self.loader.load_thumbnail(self.image_path)
+            if not image.isNull():
+                self.loader.signals.finished.emit(self.image_path, image)
+        except Exception as e:
+            logger.warning(f"生成缩略图失败: {self.image_path}, 错误: {str(e)}")
+        finally:
+            self.loader.task_done(self.image_path)
+
+
+class ThumbnailLoader(QObject):
+    """
+    缩略图异步加载器
+
+    只为当前视口中可见的图像生成缩略图：每次请求都会替换之前的可见集合，
+    尚未开始执行的过期任务会被跳过。生成结果写入持久化的ThumbnailCache。
+    """
+
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, cache, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.thread_pool = QThreadPool(self)
+        if max_threads:
+            self.thread_pool.setMaxThreadCount(max_threads)
+        self.signals = _ThumbnailSignals()
+        self.signals.finished.connect(self.thumbnail_ready)
+        self._generation = 0
+        self._wanted = set()
+        self._in_flight = set()
+
+    def is_wanted(self, image_path, generation):
+        return generation == self._generation or image_path in self._wanted
+
+    def task_done(self, image_path):
+        self._in_flight.discard(image_path)
+
+    def request(self, image_paths):
+        """请求一批（当前可见的）图像的缩略图，替换之前的请求"""
+        self._generation += 1
+        self._wanted = set(image_paths)
+        for image_path in image_paths:
+            if image_path in self._in_flight:
+                continue
+            self._in_flight.add(image_path)
+            self.thread_pool.start(_ThumbnailTask(self, image_path, self._generation))
+
+    def load_thumbnail(self, image_path):
+        """从缓存读取缩略图，未命中时生成并写入缓存"""
+        signature = file_signature(image_path)
+        if signature is None:
+            return QImage()
+
+        data = self.cache.get(image_path, signature)
+        if data is not None:
+            image = QImage.fromData(data)
+            if not image.isNull():
+                return image
+
+        image = render_thumbnail(image_path, self.cache.thumbnail_size)
+        if not image.isNull():
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, 'JPG', 85)
+            self.cache.put(image_path, signature, bytes(buffer.data()))
+        return image
+
+    def clear(self):
+        """取消所有未开始的任务"""
+        self._generation += 1
+        self._wanted = set()
+        self.thread_pool.clear()
+        self._in_flight.clear()
+
+    def shutdown(self):
+        """等待正在执行的任务结束并关闭缓存"""
+        self.clear()
+        self.thread_pool.waitForDone()
+        self.cache.close()
@@ -0,0 +1,200 @@
+import os
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QComboBox,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QProgressBar, QMessageBox)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+
+from utils.annotation_validator import (AnnotationValidator, SEVERITY_ERROR,
+                                        ISSUE_MALFORMED, ISSUE_OUT_OF_RANGE, ISSUE_ZERO_AREA, ISSUE_BAD_CLASS,
+                                        ISSUE_KEYPOINT_FORMAT, ISSUE_KEYPOINT_COUNT, ISSUE_ORPHAN_LABEL,
+                                        ISSUE_MISSING_LABEL)
+from i18n import tr
+
+logger = logging.getLogger('YOLOLabelCreator.ValidationReportDialog')
+
+# 表格中最多显示的问题数量
+MAX_DISPLAYED_ISSUES = 10000
+
+
+class ValidationThread(QThread):
+    """后台线程用于执行标注检查，避免UI阻塞"""
+    progress = pyqtSignal(int, int)
+    issues_ready = pyqtSignal(list)
+    failed = pyqtSignal(str)
+
+    def __init__(self, dataset_dir, num_classes):
+        super().__init__()
+        self.dataset_dir = dataset_dir
+        self.num_classes = num_classes
+
+    def _on_progress(self, done, total):
+        self.progress.emit(done, total)
+        return not self.isInterruptionRequested()
+
+    def run(self):
+        try:
+            issues = AnnotationValidator(self.dataset_dir, self.num_classes).run(self._on_progress)
+            if issues is not None:
+                self.issues_ready.emit(issues)
+        except Exception as e:
+            logger.error(f"标注检查失败: {str(e)}")
+            self.failed.emit(str(e))
+
+
+class ValidationReportDialog(QDialog):
+    """标注检查报告窗口（非模态），双击问题跳转到对应图像"""
+
+    # 请求在主窗口中打开图像（参数为图像路径）
+    image_activated = pyqtSignal(str)
+
+    def __init__(self, dataset_dir, class_names=None, parent=None):
+        super().__init__(parent)
+        self.dataset_dir = dataset_dir
+        self.class_names = class_names or []
+        self.issues = []
+        self.summary_text = ""
+        self.thread = None
+
+        self.issue_names = {
+            ISSUE_MALFORMED: tr("格式错误"),
+            ISSUE_OUT_OF_RANGE: tr("坐标越界"),
+            ISSUE_ZERO_AREA: tr("零面积框"),
+            ISSUE_BAD_CLASS: tr("无效类别ID"),
+            ISSUE_KEYPOINT_FORMAT: tr("关键点格式错误"),
+            ISSUE_KEYPOINT_COUNT: tr("关键点数量不一致"),
+            ISSUE_ORPHAN_LABEL: tr("标签无对应图像"),
+            ISSUE_MISSING_LABEL: tr("图像无标签"),
+        }
+
+        self.setWindowTitle(tr("标注检查"))
+        self.setModal(False)
+        self.resize(900, 550)
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        """设置对话框UI"""
+        layout = QVBoxLayout(self)
+
+        top_layout = QHBoxLayout()
+        self.summary_label = QLabel()
+        self.summary_label.setWordWrap(True)
+        top_layout.addWidget(self.summary_label, 1)
+
+        top_layout.addWidget(QLabel(tr("问题类型:")))
+        self.type_combo = QComboBox()
+        self.type_combo.addItem(tr("全部"), None)
+        for code, name in self.issue_names.items():
+            self.type_combo.addItem(name, code)
+        self.type_combo.currentIndexChanged.connect(self.show_issues)
+        top_layout.addWidget(self.type_combo)
+
+        self.refresh_button = QPushButton(tr("重新检查"))
+        self.refresh_button.clicked.connect(self.refresh)
+        top_layout.addWidget(self.refresh_button)
+        layout.addLayout(top_layout)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setTextVisible(True)
+        layout.addWidget(self.progress_bar)
+
+        self.table = QTableWidget()
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels([tr("级别"), tr("问题类型"), tr("文件"), tr("行"), tr("说明")])
+        header = self.table.horizontalHeader()
+        header.setSectionResizeMode(QHeaderView.ResizeToContents)
+        header.setSectionResizeMode(4, QHeaderView.Stretch)
+        self.table.verticalHeader().setVisible(False)
+        self.table.cellDoubleClicked.connect(self.on_row_activated)
+        layout.addWidget(self.table, 1)
+
+        button_layout = QHBoxLayout()
+        button_layout.addWidget(QLabel(tr("双击问题跳转到对应图像")))
+        button_layout.addStretch()
+        close_button = QPushButton(tr("关闭"))
+        close_button.clicked.connect(self.close)
+        button_layout.addWidget(close_button)
+        layout.addLayout(button_layout)
+
+    # ---- 检查 ----
+
+    def refresh(self):
+        """在后台重新检查整个数据集"""
+        if self.thread and self.thread.isRunning():
+            return
+        self.set_busy(True)
+        self.thread = ValidationThread(self.dataset_dir, len(self.class_names))
+        self.thread.progress.connect(self.on_progress)
+        self.thread.issues_ready.connect(self.on_issues_ready)
+        self.thread.failed.connect(self.on_failed)
+        self.thread.finished.connect(lambda: self.set_busy(False))
+        self.thread.start()
+
+    def set_busy(self, busy):
+        self.refresh_button.setEnabled(not busy)
+        if busy:
+            self.progress_bar.setRange(0, 0)
+            self.progress_bar.show()
+            self.summary_label.setText(tr("正在检查..."))
+        else:
+            self.progress_bar.hide()
+
+    def on_progress(self, done, total):
+        self.progress_bar.setRange(0, max(1, total))
+        self.progress_bar.setValue(done)
+        self.progress_bar.setFormat(tr("检查标签文件") + f" {done}/{total}")
+
+    def on_failed(self, message):
+        self.summary_label.setText(tr("标注检查失败"))
+        QMessageBox.warning(self, tr("错误"), f"{tr('标注检查失败')}: {message}")
+
+    def on_issues_ready(self, issues):
+        self.issues = issues
+        errors = sum(1 for issue in issues if issue.severity == SEVERITY_ERROR)
+        if issues:
+            self.summary_text = tr("发现 {} 个错误，{} 个警告").format(errors, len(issues) - errors)
+        else:
+            self.summary_text = tr("未发现问题")
+        self.show_issues()
+
+    def show_issues(self):
+        """按当前选择的问题类型显示问题列表"""
+        code = self.type_combo.currentData()
+        issues = [issue for issue in self.issues if code is None or issue.code == code]
+        shown = issues[:MAX_DISPLAYED_ISSUES]
+
+        self.table.setSortingEnabled(False)
+        self.table.setRowCount(len(shown))
+        for row, issue in enumerate(shown):
+            path = issue.label_path or issue.image_path
+            severity = tr("错误") if issue.severity == SEVERITY_ERROR else tr("警告")
+            values = [severity, self.issue_names.get(issue.code, issue.code),
+                      os.path.relpath(path, self.dataset_dir), issue.line or "", issue.message]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if column == 0:
+                    # 图像路径保存在首列，排序后仍能找到对应的图像
+                    item.setData(Qt.UserRole, issue.image_path or "")
+                self.table.setItem(row, column, item)
+        self.table.setSortingEnabled(True)
+        summary = self.summary_text
+        if len(issues) > len(shown):
+            summary += " " + tr("（仅显示前 {} 条）").format(MAX_DISPLAYED_ISSUES)
+        self.summary_label.setText(summary)
+
+    def on_row_activated(self, row, column):
+        item = self.table.item(row, 0)
+        image_path = item.data(Qt.UserRole) if item else ""
+        if not image_path:
+            QMessageBox.information(self, tr("提示"), tr("该标签文件没有对应的图像"))
+            return
+        self.image_activated.emit(image_path)
+
+    def done(self, result):
+        # 关闭窗口时取消正在进行的检查
+        if self.thread and self.thread.isRunning():
+            self.thread.requestInterruption()
+            self.thread.wait()
+        super().done(result)
@@ -0,0 +1,512 @@
+import os
+import json
+import bisect
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.dataset_cache import get_cache_dir, load_json_cache
+from utils.dataset_stats import find_label_dirs
+
+logger = logging.getLogger('YOLOLabelCreator.AnnotationArchive')
+
+# 标注归档目录（位于数据集缓存目录下）及格式版本
+ARCHIVE_DIR = 'annotation_archive'
+ARCHIVE_VERSION = 2
+INDEX_FILE = 'index.json'
+FILES_FILE = 'files.npy'
+BOXES_FILE = 'boxes.npy'
+KEYPOINTS_FILE = 'keypoints.npy'
+POSTINGS_FILE = 'class_postings.npy'
+
+# 每个标签文件一行: 边界框起始行, 边界框数量, 划分序号, 修改时间, 文件大小
+FILE_DTYPE = np.dtype([('start', np.int64), ('count', np.int32), ('split', np.int32),
+                       ('mtime', np.int64), ('size', np.int64)])
+
+# 每个边界框一行: 所属标签文件序号, 类别, 归一化中心坐标和宽高, 关键点起始行, 关键点数量, 已标注关键点数量
+BOX_DTYPE = np.dtype([('file', np.int32), ('class_id', np.int32),
+                      ('cx', np.float32), ('cy', np.float32), ('w', np.float32), ('h', np.float32),
+                      ('kp_start', np.int64), ('kp_count', np.int32), ('kp_labeled', np.int32)])
+
+# 关键点数组的列: x, y, 可见性（x y格式的关键点按坐标是否大于0记为2或0）
+KEYPOINT_COLUMNS = 3
+
+# 每个进程任务解析的文件数量
+PARSE_CHUNK_SIZE = 512
+
+
+def _keypoint_triplets(values):
+    """将每行多余的列转换为 (n, 关键点数, 3) 的关键点数组，列数无法识别时返回None"""
+    n, extra = values.shape
+    if extra == 0:
+        return np.empty((n, 0, KEYPOINT_COLUMNS), np.float32)
+    if extra % 2 == 0:
+        # 本程序写出的格式: x y
+        points = values.reshape(n, -1, 2)
+        visible = np.where(np.any(points > 0, axis=2), 2, 0).astype(np.float32)
+        return np.concatenate([points, visible[:, :, None]], axis=2)
+    if extra % 3 == 0:
+        # x y visibility 格式
+        return values.reshape(n, -1, 3)
+    return None
+
+
+def _rows_to_arrays(values):
+    """将列数相同的标签行转换为 (边界框数组, 关键点数组)"""
+    boxes = np.zeros(len(values), BOX_DTYPE)
+    boxes['class_id'] = values[:, 0].astype(np.int32)
+    for column, name in enumerate(('cx', 'cy', 'w', 'h'), 1):
+        boxes[name] = values[:, column]
+    points = _keypoint_triplets(values[:, 5:])
+    if points is None or points.shape[1] == 0:
+        return boxes, np.empty((0, KEYPOINT_COLUMNS), np.float32)
+    count = points.shape[1]
+    boxes['kp_start'] = np.arange(len(values)) * count
+    boxes['kp_count'] = count
+    boxes['kp_labeled'] = (points[:, :, 2] > 0).sum(axis=1)
+    return boxes, points.reshape(-1, KEYPOINT_COLUMNS).astype(np.float32)
+
+
+def parse_archive_text(text):
+    """
+    将YOLO标签文本解析为归档格式
+
+    所有行列数相同时整体向量化转换；列数不一致时逐行解析。
+    少于5列或无法解析的行会被跳过。
+
+    Returns:
+        tuple: (BOX_DTYPE边界框数组（file为0，kp_start相对于本文件）, (m, 3)关键点数组)
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return np.empty(0, BOX_DTYPE), np.empty((0, KEYPOINT_COLUMNS), np.float32)
+
+    tokens = text.split()
+    columns = len(lines[0].split())
+    if columns >= 5 and len(tokens) == columns * len(lines):
+        try:
+            return _rows_to_arrays(np.array(tokens, dtype=np.float32).reshape(len(lines), columns))
+        except ValueError:
+            pass
+
+    box_parts = []
+    point_parts = []
+    offset = 0
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        try:
+            boxes, points = _rows_to_arrays(np.array(parts, dtype=np.float32).reshape(1, -1))
+        except ValueError:
+            continue
+        boxes['kp_start'] += offset
+        offset += len(points)
+        box_parts.append(boxes)
+        point_parts.append(points)
+    if not box_parts:
+        return np.empty(0, BOX_DTYPE), np.empty((0, KEYPOINT_COLUMNS), np.float32)
+    return np.concatenate(box_parts), np.concatenate(point_parts)
+
+
+def parse_archive_files(paths):
+    """
+    解析一批标签文件（在进程池中执行，因此定义在模块顶层）
+
+    Returns:
+        tuple: (每个文件的边界框数量数组, 拼接后的边界框数组, 拼接后的关键点数组)，
+            边界框的kp_start相对于本批关键点数组
+    """
+    counts = np.zeros(len(paths), np.int64)
+    box_parts = []
+    point_parts = []
+    offset = 0
+    for i, path in enumerate(paths):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                boxes, points = parse_archive_text(f.read())
+        except OSError as e:
+            logger.warning(f"读取标签文件失败: {path}, 错误: {str(e)}")
+            boxes, points = np.empty(0, BOX_DTYPE), np.empty((0, KEYPOINT_COLUMNS), np.float32)
+        boxes['kp_start'] += offset
+        offset += len(points)
+        counts[i] = len(boxes)
+        box_parts.append(boxes)
+        point_parts.append(points)
+    if not box_parts:
+        return counts, np.empty(0, BOX_DTYPE), np.empty((0, KEYPOINT_COLUMNS), np.float32)
+    return counts, np.concatenate(box_parts), np.concatenate(point_parts)
+
+
+def _ranges(starts, counts):
+    """拼接多个区间 [starts[i], starts[i] + counts[i]) 的下标（向量化）"""
+    counts = np.asarray(counts, np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, np.int64)
+    ends = np.cumsum(counts)
+    return np.repeat(np.asarray(starts, np.int64) - (ends - counts), counts) + np.arange(total)
+
+
+def build_class_postings(class_ids):
+    """
+    按类别建立边界框行号的倒排表
+
+    Returns:
+        tuple: (按类别排序的行号数组（同一类别内行号升序）, {类别ID: (起始位置, 数量)})
+    """
+    order = np.argsort(class_ids, kind='stable').astype(np.int64)
+    classes, starts, counts = np.unique(np.asarray(class_ids)[order], return_index=True, return_counts=True)
+    return order, {int(c): (int(start), int(count)) for c, start, count in zip(classes, starts, counts)}
+
+
+class AnnotationArchive:
+    """
+    数据集标注归档
+
+    把数据集中所有标签文件的边界框和关键点编译为NumPy结构化数组，保存为.npy文件，
+    以内存映射方式打开：files（每个标签文件对应的边界框行区间）、boxes（每个边界框一行）、
+    keypoints（每个关键点一行），以及按类别的边界框倒排表。全数据集的查询（按类别、面积等）
+    是对整列的向量化掩码运算，不需要重新读取标签文件。标签文件按相对路径排序，
+    同一标签文件夹中的文件及其边界框在数组中都是连续的区间。
+
+    更新时按标签文件的修改时间和大小增量进行：只重新解析变化的文件，
+    未变化文件的行从旧归档中整块复制。
+    """
+
+    def __init__(self, dataset_dir, max_workers=None):
+        self.dataset_dir = os.path.abspath(dataset_dir)
+        self.max_workers = max_workers
+        self.archive_dir = os.path.join(get_cache_dir(dataset_dir), ARCHIVE_DIR)
+
+        self.splits = []
+        self.label_paths = []
+        self._positions = None
+        self._clear_arrays()
+
+    def _clear_arrays(self):
+        self.files = np.empty(0, FILE_DTYPE)
+        self.boxes = np.empty(0, BOX_DTYPE)
+        self.keypoints = np.empty((0, KEYPOINT_COLUMNS), np.float32)
+        self.postings = np.empty(0, np.int64)
+        self.class_ranges = {}
+        self._folder_names = {}
+
+    # ---- 读写 ----
+
+    def load(self):
+        """
+        以内存映射方式打开已有的归档（不检查标签文件是否变化）
+
+        Returns:
+            bool: 归档是否存在且完整
+        """
+        index = load_json_cache(os.path.join(self.archive_dir, INDEX_FILE))
+        if index.get('version') != ARCHIVE_VERSION:
+            return False
+        try:
+            files = np.load(os.path.join(self.archive_dir, FILES_FILE), mmap_mode='r')
+            boxes = np.load(os.path.join(self.archive_dir, BOXES_FILE), mmap_mode='r')
+            keypoints = np.load(os.path.join(self.archive_dir, KEYPOINTS_FILE), mmap_mode='r')
+            postings = np.load(os.path.join(self.archive_dir, POSTINGS_FILE), mmap_mode='r')
+        except Exception as e:
+            logger.warning(f"读取标注归档失败，将重新生成: {str(e)}")
+            return False
+        paths = index.get('paths', [])
+        if (files.dtype != FILE_DTYPE or boxes.dtype != BOX_DTYPE or len(files) != len(paths)
+                or len(boxes) != index.get('boxes') or len(keypoints) != index.get('keypoints')
+                or len(postings) != len(boxes)):
+            logger.warning("标注归档不完整，将重新生成")
+            return False
+        self._set_arrays(index.get('splits', []), paths, files, boxes, keypoints, postings,
+                         {int(c): tuple(r) for c, r in index.get('classes', {}).items()})
+        return True
+
+    def _set_arrays(self, splits, paths, files, boxes, keypoints, postings, class_ranges):
+        self.splits = splits
+        self.label_paths = paths
+        self._positions = None
+        self.files, self.boxes, self.keypoints = files, boxes, keypoints
+        self.postings, self.class_ranges = postings, class_ranges
+        self._folder_names = {}
+
+    def _save(self, splits, paths, files, boxes, keypoints, postings, class_ranges):
+        """写入新的归档（先写临时文件，索引最后替换，中断时旧归档仍被视为不完整而重建）"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        arrays = ((FILES_FILE, files), (BOXES_FILE, boxes), (KEYPOINTS_FILE, keypoints), (POSTINGS_FILE, postings))
+        for name, array in arrays:
+            np.save(os.path.join(self.archive_dir, f"{name}.tmp.npy"), array)
+        # 替换前释放旧归档的内存映射（Windows下被映射的文件不能替换）
+        self._clear_arrays()
+        index_path = os.path.join(self.archive_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+        for name, _ in arrays:
+            os.replace(os.path.join(self.archive_dir, f"{name}.tmp.npy"), os.path.join(self.archive_dir, name))
+        index = {'version': ARCHIVE_VERSION, 'splits': splits, 'paths': paths,
+                 'boxes': len(boxes), 'keypoints': len(keypoints),
+                 'classes': {str(c): list(r) for c, r in class_ranges.items()}}
+        with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    def close(self):
+        """释放内存映射"""
+        self._clear_arrays()
+
+    # ---- 增量更新 ----
+
+    def _scan_label_files(self):
+        """列出所有标签文件: [(相对路径, 绝对路径, 划分序号, (mtime_ns, 大小)), ...]"""
+        splits = []
+        files = []
+        for split_index, (split, labels_dir) in enumerate(find_label_dirs(self.dataset_dir)):
+            splits.append(split)
+            rel_dir = os.path.relpath(labels_dir, self.dataset_dir).replace(os.sep, '/')
+            try:
+                with os.scandir(labels_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.txt') and entry.name != 'classes.txt' and entry.is_file():
+                            st = entry.stat()
+                            files.append((f"{rel_dir}/{entry.name}", entry.path, split_index,
+                                          (st.st_mtime_ns, st.st_size)))
+            except OSError as e:
+                logger.error(f"扫描标签目录失败: {labels_dir}, 错误: {str(e)}")
+        files.sort()
+        return splits, files
+
+    def update(self, progress_callback=None):
+        """
+        使归档与标签文件保持一致，完成后以内存映射方式打开
+
+        Args:
+            progress_callback (callable, optional): 进度回调 callback(done, total)，
+                返回False时取消
+
+        Returns:
+            bool: 是否完成（取消时返回False，已有的归档保持不变）
+        """
+        splits, files = self._scan_label_files()
+        has_archive = self.load()
+        old_positions = {path: i for i, path in enumerate(self.label_paths)} if has_archive else {}
+        old_files = np.asarray(self.files)
+        old_signatures = list(zip(old_files['mtime'].tolist(), old_files['size'].tolist()))
+
+        reused = np.full(len(files), -1, np.int64)
+        pending = []
+        for i, (rel_path, _, _, signature) in enumerate(files):
+            j = old_positions.get(rel_path)
+            if j is not None and old_signatures[j] == signature:
+                reused[i] = j
+            else:
+                pending.append(i)
+
+        total = len(files)
+        done = total - len(pending)
+        if (has_archive and not pending and len(files) == len(old_positions)
+                and splits == self.splits
+                and np.array_equal(old_files['split'][reused], [split_index for _, _, split_index, _ in files])):
+            logger.info(f"标注归档无变化: {total} 个标签文件，{len(self.boxes)} 个边界框")
+            return True
+        logger.info(f"标注归档复用 {done} 个标签文件，需要解析 {len(pending)} 个")
+        if progress_callback and progress_callback(done, total) is False:
+            return False
+
+        # 解析变化的文件
+        parsed_counts = np.zeros(len(files), np.int64)
+        box_parts = []
+        point_parts = []
+        if pending:
+            chunks = [pending[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(pending), PARSE_CHUNK_SIZE)]
+            if len(chunks) == 1:
+                iterator = zip(chunks, [parse_archive_files([files[i][1] for i in chunks[0]])])
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                iterator = zip(chunks, executor.map(parse_archive_files,
+                                                    [[files[i][1] for i in chunk] for chunk in chunks]))
+            canceled = False
+            point_offset = 0
+            try:
+                for chunk, (counts, boxes, points) in iterator:
+                    parsed_counts[chunk] = counts
+                    boxes['kp_start'] += point_offset
+                    point_offset += len(points)
+                    box_parts.append(boxes)
+                    point_parts.append(points)
+                    done += len(chunk)
+                    if progress_callback and progress_callback(done, total) is False:
+                        canceled = True
+                        break
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=not canceled, cancel_futures=canceled)
+            if canceled:
+                return False
+
+        # 候选行 = 旧归档的全部行 + 新解析的行，再按新的文件顺序整体收集
+        old_boxes = np.asarray(self.boxes)
+        old_points = np.asarray(self.keypoints)
+        new_boxes = np.concatenate(box_parts) if box_parts else np.empty(0, BOX_DTYPE)
+        new_points = np.concatenate(point_parts) if point_parts else np.empty((0, KEYPOINT_COLUMNS), np.float32)
+        new_boxes['kp_start'] += len(old_points)
+        pool_boxes = np.concatenate([old_boxes, new_boxes])
+        pool_points = np.concatenate([old_points, new_points])
+
+        is_reused = reused >= 0
+        counts = np.where(is_reused, 0, parsed_counts)
+        counts[is_reused] = old_files['count'][reused[is_reused]]
+        pool_starts = np.zeros(len(files), np.int64)
+        pool_starts[is_reused] = old_files['start'][reused[is_reused]]
+        pending_index = np.flatnonzero(~is_reused)
+        pending_counts = parsed_counts[pending_index]
+        pool_starts[pending_index] = len(old_boxes) + np.cumsum(pending_counts) - pending_counts
+
+        boxes = pool_boxes[_ranges(pool_starts, counts)]
+        boxes['file'] = np.repeat(np.arange(len(files), dtype=np.int32), counts)
+        keypoints = pool_points[_ranges(boxes['kp_start'], boxes['kp_count'])]
+        boxes['kp_start'] = np.cumsum(boxes['kp_count'], dtype=np.int64) - boxes['kp_count']
+
+        file_array = np.zeros(len(files), FILE_DTYPE)
+        file_array['start'] = np.cumsum(counts) - counts
+        file_array['count'] = counts
+        file_array['split'] = [split_index for _, _, split_index, _ in files]
+        file_array['mtime'] = [signature[0] for _, _, _, signature in files]
+        file_array['size'] = [signature[1] for _, _, _, signature in files]
+
+        paths = [rel_path for rel_path, _, _, _ in files]
+        postings, class_ranges = build_class_postings(boxes['class_id'])
+        del old_files, old_boxes, old_points
+        try:
+            self._save(splits, paths, file_array, boxes, keypoints, postings, class_ranges)
+        except Exception as e:
+            logger.error(f"保存标注归档失败: {str(e)}")
+            self._set_arrays(splits, paths, file_array, boxes, keypoints, postings, class_ranges)
+            return True
+        self.load()
+        logger.info(f"标注归档已更新: {len(files)} 个标签文件，{len(boxes)} 个边界框，{len(keypoints)} 个关键点")
+        return True
+
+    # ---- 查询 ----
+
+    def file_index(self, label_path):
+        """标签文件在归档中的序号，不存在时返回None"""
+        if self._positions is None:
+            self._positions = {path: i for i, path in enumerate(self.label_paths)}
+        rel_path = os.path.relpath(os.path.abspath(label_path), self.dataset_dir).replace(os.sep, '/')
+        return self._positions.get(rel_path)
+
+    def boxes_for(self, label_path):
+        """标签文件的边界框（归档中的行区间视图），不存在时返回空数组"""
+        index = self.file_index(label_path)
+        if index is None:
+            return np.empty(0, BOX_DTYPE)
+        start, count = int(self.files['start'][index]), int(self.files['count'][index])
+        return self.boxes[start:start + count]
+
+    def box_keypoints(self, box):
+        """一个边界框的关键点 (k, 3)"""
+        return self.keypoints[box['kp_start']:box['kp_start'] + box['kp_count']]
+
+    def box_areas(self):
+        """所有边界框的归一化面积"""
+        return self.boxes['w'] * self.boxes['h']
+
+    def class_ids(self):
+        """数据集中用到的所有类别ID（已排序）"""
+        return np.array(sorted(self.class_ranges), np.int64)
+
+    def class_rows(self, class_ids, first_row=0, end_row=None):
+        """
+        通过倒排表取出指定类别的边界框行号（不扫描其他类别的行）
+
+        Args:
+            class_ids (iterable): 类别ID
+            first_row, end_row (int, optional): 只返回 [first_row, end_row) 范围内的行
+
+        Returns:
+            np.ndarray: 升序的行号
+        """
+        end_row = len(self.boxes) if end_row is None else end_row
+        parts = []
+        for class_id in set(class_ids):
+            start, count = self.class_ranges.get(int(class_id), (0, 0))
+            rows = self.postings[start:start + count]
+            parts.append(rows[np.searchsorted(rows, first_row):np.searchsorted(rows, end_row)])
+        if not parts:
+            return np.empty(0, np.int64)
+        return np.sort(np.concatenate(parts)) if len(parts) > 1 else np.asarray(parts[0])
+
+    def folder_range(self, labels_dir):
+        """
+        标签文件夹中的文件在归档中的序号区间
+
+        Returns:
+            tuple: (起始序号, 结束序号)，区间内为该文件夹中（不含子文件夹）的标签文件
+        """
+        rel_dir = os.path.relpath(os.path.abspath(labels_dir), self.dataset_dir).replace(os.sep, '/')
+        # 路径已排序，以 "<文件夹>/" 开头的路径都位于 "<文件夹>/" 与 "<文件夹>0" 之间
+        first = bisect.bisect_left(self.label_paths, f"{rel_dir}/")
+        end = bisect.bisect_left(self.label_paths, f"{rel_dir}0", first)
+        return first, end
+
+    def folder_names(self, labels_dir):
+        """
+        标签文件夹中的标签基本名（不含.txt），结果按文件夹缓存
+
+        Returns:
+            tuple: (起始序号, 结束序号, 基本名列表, 基本名集合)
+        """
+        key = os.path.normcase(os.path.abspath(labels_dir))
+        cached = self._folder_names.get(key)
+        if cached is None:
+            first, end = self.folder_range(labels_dir)
+            prefix_length = len(os.path.relpath(os.path.abspath(labels_dir), self.dataset_dir)) + 1
+            names = [path[prefix_length:-4] for path in self.label_paths[first:end]]
+            cached = self._folder_names[key] = (first, end, names, set(names))
+        return cached
+
+    def row_range(self, first_file, end_file):
+        """一段连续标签文件对应的边界框行区间 (起始行, 结束行)"""
+        if end_file <= first_file:
+            return 0, 0
+        last = end_file - 1
+        return int(self.files['start'][first_file]), int(self.files['start'][last] + self.files['count'][last])
+
+    def select_boxes(self, class_ids=None, min_area=None, max_area=None, splits=None):
+        """
+        按条件筛选边界框
+
+        Args:
+            class_ids (iterable, optional): 类别ID
+            min_area (float, optional): 最小归一化面积（包含）
+            max_area (float, optional): 最大归一化面积（不包含）
+            splits (iterable, optional): 划分名称
+
+        Returns:
+            np.ndarray: 边界框的布尔掩码
+        """
+        if class_ids is not None:
+            mask = np.zeros(len(self.boxes), bool)
+            mask[self.class_rows(class_ids)] = True
+        else:
+            mask = np.ones(len(self.boxes), bool)
+        if min_area is not None or max_area is not None:
+            areas = self.box_areas()
+            if min_area is not None:
+                mask &= areas >= min_area
+            if max_area is not None:
+                mask &= areas < max_area
+        if splits is not None:
+            split_ids = [i for i, split in enumerate(self.splits) if split in set(splits)]
+            mask &= np.isin(self.files['split'], split_ids)[self.boxes['file']]
+        return mask
+
+    def files_with(self, box_mask):
+        """含有至少一个被选中边界框的标签文件序号（已排序）"""
+        return np.unique(self.boxes['file'][box_mask])
+
+    def label_files_with(self, box_mask):
+        """含有至少一个被选中边界框的标签文件路径"""
+        return [os.path.join(self.dataset_dir, self.label_paths[i]) for i in self.files_with(box_mask)]
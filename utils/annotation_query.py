@@ -0,0 +1,243 @@
+import re
+import logging
+
+import numpy as np
+
+logger = logging.getLogger('YOLOLabelCreator.AnnotationQuery')
+
+# 比较运算符（":" 等同于 "="）
+_OPERATORS = {
+    '<': np.less, '<=': np.less_equal, '>': np.greater, '>=': np.greater_equal,
+    '=': np.equal, ':': np.equal, '!=': np.not_equal,
+}
+_TERM_PATTERN = re.compile(r'^([a-z_]+)(<=|>=|!=|<|>|=|:)(.+)$', re.IGNORECASE)
+
+# 针对单个边界框的数值条件（归一化坐标）
+BOX_FIELDS = ('area', 'width', 'height', 'aspect')
+
+# 标注状态关键字（多个状态之间为"或"）
+STATUS_UNLABELED = 'unlabeled'    # 没有标签文件
+STATUS_EMPTY = 'empty'            # 标签文件为空
+STATUS_LABELED = 'labeled'        # 至少有一个边界框
+STATUS_KEYWORDS = (STATUS_UNLABELED, STATUS_EMPTY, STATUS_LABELED)
+
+# 关键点状态
+KEYPOINT_STATES = ('complete', 'incomplete', 'none', 'any')
+
+
+class QueryError(ValueError):
+    """查询语法错误"""
+
+
+def is_annotation_query(text):
+    """筛选文本中是否含有标注查询条件（否则按文件名筛选处理）"""
+    for token in text.split():
+        if token.lower() in STATUS_KEYWORDS:
+            return True
+        match = _TERM_PATTERN.match(token)
+        if match and match.group(1).lower() in ('class', 'count', 'keypoints') + BOX_FIELDS:
+            return True
+    return False
+
+
+def _parse_number(key, value):
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f"{key} 的值不是数字: {value}")
+
+
+def _parse_classes(value, class_names):
+    """解析类别列表（名称或ID，逗号分隔，名称不区分大小写）"""
+    lookup = {name.lower(): i for i, name in enumerate(class_names or [])}
+    class_ids = set()
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        if item.lower() in lookup:
+            class_ids.add(lookup[item.lower()])
+        elif re.fullmatch(r'-?\d+', item):
+            class_ids.add(int(item))
+        else:
+            raise QueryError(f"未知的类别: {item}")
+    if not class_ids:
+        raise QueryError("class 需要指定类别名称或ID")
+    return class_ids
+
+
+class AnnotationQuery:
+    """
+    标注查询
+
+    语法为空格分隔的条件，各条件之间为"与"：
+
+    - ``class:person,car`` 类别（名称或ID，逗号分隔为"或"）
+    - ``area<0.001`` ``width>0.5`` ``height<=0.1`` ``aspect>2`` 边界框的归一化面积、宽、高、宽高比
+    - ``keypoints:incomplete`` 关键点状态（complete / incomplete / none / any）
+    - ``count>20`` 满足上述边界框条件的框数（没有边界框条件时为全部框数）
+    - ``unlabeled`` ``empty`` ``labeled`` 标注状态（多个状态之间为"或"）
+    - 其他文本按文件名筛选
+
+    边界框条件作用于同一个边界框，例如 ``class:person area<0.001`` 表示含有面积小于0.1%的person框的图像。
+    只有边界框条件而没有count条件时，要求至少有一个满足条件的框。
+    """
+
+    def __init__(self):
+        self.class_ids = None
+        self.box_conditions = []
+        self.keypoint_state = None
+        self.count_conditions = []
+        self.statuses = set()
+        self.name_text = ""
+
+    @property
+    def has_box_conditions(self):
+        return self.class_ids is not None or bool(self.box_conditions) or self.keypoint_state is not None
+
+    @classmethod
+    def parse(cls, text, class_names=None):
+        """
+        解析查询文本
+
+        Args:
+            text (str): 查询文本
+            class_names (list, optional): 类别名称列表，用于按名称指定类别
+
+        Raises:
+            QueryError: 查询语法错误
+        """
+        query = cls()
+        name_tokens = []
+        for token in text.split():
+            lowered = token.lower()
+            if lowered in STATUS_KEYWORDS:
+                query.statuses.add(lowered)
+                continue
+            match = _TERM_PATTERN.match(token)
+            key = match.group(1).lower() if match else None
+            if key == 'class':
+                if match.group(2) not in (':', '='):
+                    raise QueryError(f"class 只支持 \":\" : {token}")
+                class_ids = _parse_classes(match.group(3), class_names)
+                query.class_ids = class_ids if query.class_ids is None else query.class_ids | class_ids
+            elif key == 'keypoints':
+                state = match.group(3).lower()
+                if match.group(2) not in (':', '=') or state not in KEYPOINT_STATES:
+                    raise QueryError(f"keypoints 的值应为 {' / '.join(KEYPOINT_STATES)}: {token}")
+                query.keypoint_state = state
+            elif key == 'count':
+                query.count_conditions.append((_OPERATORS[match.group(2)], _parse_number(key, match.group(3))))
+            elif key in BOX_FIELDS:
+                query.box_conditions.append((key, _OPERATORS[match.group(2)], _parse_number(key, match.group(3))))
+            else:
+                name_tokens.append(token)
+        query.name_text = " ".join(name_tokens)
+        return query
+
+    def _box_mask(self, boxes):
+        """边界框条件的掩码（boxes为归档中边界框行的结构化数组）"""
+        mask = np.ones(len(boxes), bool)
+        for field, op, value in self.box_conditions:
+            if field == 'area':
+                column = boxes['w'] * boxes['h']
+            elif field == 'width':
+                column = boxes['w']
+            elif field == 'height':
+                column = boxes['h']
+            else:
+                column = np.divide(boxes['w'], boxes['h'], out=np.zeros(len(boxes), np.float32),
+                                   where=boxes['h'] > 0)
+            mask &= op(column, value)
+        if self.keypoint_state == 'complete':
+            mask &= (boxes['kp_count'] > 0) & (boxes['kp_labeled'] == boxes['kp_count'])
+        elif self.keypoint_state == 'incomplete':
+            mask &= boxes['kp_labeled'] < boxes['kp_count']
+        elif self.keypoint_state == 'none':
+            mask &= boxes['kp_count'] == 0
+        elif self.keypoint_state == 'any':
+            mask &= boxes['kp_count'] > 0
+        return mask
+
+    def _image_mask(self, counts, box_counts):
+        """
+        标签文件的图像级条件掩码
+
+        Args:
+            counts (np.ndarray): 满足边界框条件的框数
+            box_counts (np.ndarray): 每个标签文件的全部框数
+        """
+        mask = np.ones(len(counts), bool)
+        for op, value in self.count_conditions:
+            mask &= op(counts, value)
+        if self.has_box_conditions and not self.count_conditions:
+            mask &= counts > 0
+        if self.statuses:
+            status_mask = np.zeros(len(counts), bool)
+            if STATUS_EMPTY in self.statuses:
+                status_mask |= box_counts == 0
+            if STATUS_LABELED in self.statuses:
+                status_mask |= box_counts > 0
+            mask &= status_mask
+        return mask
+
+    def evaluate(self, archive, labels_dir):
+        """
+        在标注归档上求值（只访问该标签文件夹对应的连续区间）
+
+        Args:
+            archive (AnnotationArchive): 已打开的标注归档
+            labels_dir (str): 标签文件夹
+
+        Returns:
+            tuple: (满足条件的标签基本名集合, 文件夹中全部标签基本名集合, 没有标签文件的图像是否满足条件)
+        """
+        first_file, end_file, names, name_set = archive.folder_names(labels_dir)
+        first_row, end_row = archive.row_range(first_file, end_file)
+        box_counts = np.asarray(archive.files['count'][first_file:end_file])
+
+        if self.has_box_conditions:
+            if self.class_ids is not None:
+                boxes = archive.boxes[archive.class_rows(self.class_ids, first_row, end_row)]
+            else:
+                boxes = archive.boxes[first_row:end_row]
+            box_files = boxes['file'][self._box_mask(boxes)] - first_file
+            counts = np.bincount(box_files, minlength=end_file - first_file)
+        else:
+            counts = box_counts
+        image_mask = self._image_mask(counts, box_counts)
+
+        # 没有标签文件的图像视为0个边界框；文件状态条件中unlabeled不匹配任何标签文件
+        unlabeled_ok = ((not self.statuses or STATUS_UNLABELED in self.statuses)
+                        and all(op(0, value) for op, value in self.count_conditions)
+                        and not (self.has_box_conditions and not self.count_conditions))
+
+        matched = {names[i] for i in np.flatnonzero(image_mask).tolist()}
+        return matched, name_set, unlabeled_ok
+
+    def build_matcher(self, archive, labels_dir, name_matcher=None):
+        """
+        构造图像文件名的匹配函数
+
+        Args:
+            archive (AnnotationArchive): 已打开的标注归档
+            labels_dir (str): 当前图像文件夹对应的标签文件夹
+            name_matcher (callable, optional): 文件名匹配函数（由name_text构造）
+
+        Returns:
+            callable: matcher(图像文件名) -> bool
+        """
+        matched, labeled, unlabeled_ok = self.evaluate(archive, labels_dir)
+        logger.info(f"标注查询: {len(matched)} / {len(labeled)} 个标签文件满足条件")
+
+        # 图像列表可能有数十万项，匹配函数尽量简单（rpartition比os.path.splitext快得多）
+        if unlabeled_ok:
+            def annotation_matcher(name):
+                base_name = name.rpartition('.')[0]
+                return base_name in matched or base_name not in labeled
+        else:
+            def annotation_matcher(name):
+                return name.rpartition('.')[0] in matched
+        if name_matcher is None:
+            return annotation_matcher
+        return lambda name: name_matcher(name) and annotation_matcher(name)
@@ -0,0 +1,119 @@
+import logging
+from collections import OrderedDict
+
+from utils.dataset_cache import file_signature
+
+logger = logging.getLogger('YOLOLabelCreator.AnnotationSession')
+
+# 最多保留多少张未修改图像的标注（已修改的标注不会被淘汰）
+MAX_CLEAN_ENTRIES = 2000
+
+
+class ImageAnnotation:
+    """单张图像在编辑会话中的标注状态"""
+
+    __slots__ = ('boxes', 'image_size', 'label_signature', 'dirty', 'version')
+
+    def __init__(self, boxes, image_size, label_signature):
+        self.boxes = boxes
+        self.image_size = image_size
+        self.label_signature = label_signature
+        self.dirty = False
+        self.version = 0
+
+
+class AnnotationSession:
+    """
+    标注编辑会话
+
+    在内存中保存浏览过的图像的标注（边界框列表和图像尺寸）及修改标记，
+    保存全部标注时只需写出被修改的条目，无需重新解码任何图像。
+
+    未修改的条目记录标签文件签名，标签文件被其他操作修改后自动失效；
+    超出数量上限时按最近使用顺序淘汰未修改的条目。
+    """
+
+    def __init__(self, max_clean_entries=MAX_CLEAN_ENTRIES):
+        self.max_clean_entries = max_clean_entries
+        self._entries = OrderedDict()
+
+    def get(self, image_path, label_path):
+        """
+        获取图像的标注状态
+
+        Returns:
+            ImageAnnotation: 会话中的标注，不存在或已失效时返回None
+        """
+        entry = self._entries.get(image_path)
+        if entry is None:
+            return None
+        if not entry.dirty and entry.label_signature != file_signature(label_path):
+            # 标签文件已被外部修改
+            del self._entries[image_path]
+            return None
+        self._entries.move_to_end(image_path)
+        return entry
+
+    def store(self, image_path, boxes, image_size, label_path=None):
+        """记录图像当前的标注（保留已有的修改标记）"""
+        entry = self._entries.get(image_path)
+        if entry is None:
+            entry = ImageAnnotation(boxes, image_size, file_signature(label_path) if label_path else None)
+            self._entries[image_path] = entry
+            self._evict()
+        else:
+            entry.boxes = boxes
+            entry.image_size = image_size
+            self._entries.move_to_end(image_path)
+        return entry
+
+    def mark_dirty(self, image_path):
+        """标记图像标注已修改，返回新的修改版本号"""
+        entry = self._entries.get(image_path)
+        if entry is None:
+            return None
+        entry.dirty = True
+        entry.version += 1
+        return entry.version
+
+    def mark_clean(self, image_path, label_path, version=None):
+        """
+        标注写入磁盘后清除修改标记
+
+        Args:
+            version (int, optional): 写入时的修改版本号，期间又有新修改时不清除
+        """
+        entry = self._entries.get(image_path)
+        if entry is None or (version is not None and entry.version != version):
+            return
+        entry.dirty = False
+        entry.label_signature = file_signature(label_path)
+        self._evict()
+
+    def is_dirty(self, image_path):
+        entry = self._entries.get(image_path)
+        return entry is not None and entry.dirty
+
+    def dirty_items(self):
+        """返回所有已修改的条目 [(图像路径, ImageAnnotation), ...]"""
+        return [(path, entry) for path, entry in self._entries.items() if entry.dirty]
+
+    def discard(self, image_path):
+        self._entries.pop(image_path, None)
+
+    def clear(self):
+        dirty_count = sum(1 for entry in self._entries.values() if entry.dirty)
+        if dirty_count:
+            logger.warning(f"丢弃 {dirty_count} 张图像未保存的标注修改")
+        self._entries.clear()
+
+    def _evict(self):
+        clean = len(self._entries) - sum(1 for entry in self._entries.values() if entry.dirty)
+        if clean <= self.max_clean_entries:
+            return
+        for path in list(self._entries):
+            if clean <= self.max_clean_entries:
+                break
+            if not self._entries[path].dirty:
+                del self._entries[path]
+                clean -= 1
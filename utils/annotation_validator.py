@@ -0,0 +1,251 @@
+import os
+import math
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from utils.dataset_cache import CACHE_DIR_NAME
+
+logger = logging.getLogger('YOLOLabelCreator.AnnotationValidator')
+
+# 支持的图像格式
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 每个进程任务检查的标签文件数量
+VALIDATE_CHUNK_SIZE = 256
+
+# 问题严重程度
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+
+# 问题类型
+ISSUE_MALFORMED = 'malformed'                # 格式错误的行
+ISSUE_OUT_OF_RANGE = 'out_of_range'          # 归一化坐标超出0-1范围
+ISSUE_ZERO_AREA = 'zero_area'                # 宽或高不大于0
+ISSUE_BAD_CLASS = 'bad_class'                # 类别ID小于0或不小于类别数
+ISSUE_KEYPOINT_FORMAT = 'keypoint_format'    # 关键点坐标数量不是偶数
+ISSUE_KEYPOINT_COUNT = 'keypoint_count'      # 关键点数量与数据集中的多数不一致
+ISSUE_ORPHAN_LABEL = 'orphan_label'          # 标签文件没有对应图像
+ISSUE_MISSING_LABEL = 'missing_label'        # 图像没有对应标签文件
+
+ISSUE_SEVERITY = {
+    ISSUE_MALFORMED: SEVERITY_ERROR,
+    ISSUE_OUT_OF_RANGE: SEVERITY_ERROR,
+    ISSUE_ZERO_AREA: SEVERITY_ERROR,
+    ISSUE_BAD_CLASS: SEVERITY_ERROR,
+    ISSUE_KEYPOINT_FORMAT: SEVERITY_ERROR,
+    ISSUE_KEYPOINT_COUNT: SEVERITY_ERROR,
+    ISSUE_ORPHAN_LABEL: SEVERITY_WARNING,
+    ISSUE_MISSING_LABEL: SEVERITY_WARNING,
+}
+
+# 坐标范围检查的容差
+COORD_TOLERANCE = 1e-6
+
+
+class ValidationIssue:
+    """一条标注检查问题"""
+
+    __slots__ = ('code', 'severity', 'image_path', 'label_path', 'line', 'message')
+
+    def __init__(self, code, image_path, label_path, line, message):
+        self.code = code
+        self.severity = ISSUE_SEVERITY.get(code, SEVERITY_ERROR)
+        self.image_path = image_path
+        self.label_path = label_path
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"ValidationIssue({self.code}, {self.label_path or self.image_path}:{self.line}, {self.message})"
+
+
+def validate_label_file(label_path, num_classes):
+    """
+    检查单个标签文件
+
+    Args:
+        label_path (str): 标签文件路径
+        num_classes (int): 类别数量，不大于0时不检查类别ID
+
+    Returns:
+        tuple: (问题列表 [(行号, 问题类型, 说明)], 该文件中出现的关键点数量集合)
+    """
+    issues = []
+    keypoint_counts = set()
+    try:
+        with open(label_path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+    except OSError as e:
+        return [(0, ISSUE_MALFORMED, f"无法读取文件: {str(e)}")], keypoint_counts
+
+    for line_no, line in enumerate(lines, 1):
+        parts = line.split()
+        if not parts:
+            continue
+        if len(parts) < 5:
+            issues.append((line_no, ISSUE_MALFORMED, f"列数不足（{len(parts)}列）: {line.strip()}"))
+            continue
+        try:
+            class_value = float(parts[0])
+            cx, cy, w, h = (float(v) for v in parts[1:5])
+            extra = [float(v) for v in parts[5:]]
+            # float()可以解析nan/inf，这类值同样视为无法解析
+            if not all(math.isfinite(v) for v in (class_value, cx, cy, w, h, *extra)):
+                raise ValueError
+        except ValueError:
+            issues.append((line_no, ISSUE_MALFORMED, f"无法解析数值: {line.strip()}"))
+            continue
+
+        if class_value != int(class_value):
+            issues.append((line_no, ISSUE_MALFORMED, f"类别ID不是整数: {parts[0]}"))
+        class_id = int(class_value)
+        if class_id < 0 or (num_classes > 0 and class_id >= num_classes):
+            issues.append((line_no, ISSUE_BAD_CLASS, f"类别ID {class_id} 超出范围 [0, {num_classes})"))
+
+        if w <= 0 or h <= 0:
+            issues.append((line_no, ISSUE_ZERO_AREA, f"宽高必须大于0: w={w:g}, h={h:g}"))
+        low, high = -COORD_TOLERANCE, 1 + COORD_TOLERANCE
+        if not (low <= cx - w / 2 and cx + w / 2 <= high and low <= cy - h / 2 and cy + h / 2 <= high):
+            issues.append((line_no, ISSUE_OUT_OF_RANGE,
+                           f"边界框超出图像范围: cx={cx:g}, cy={cy:g}, w={w:g}, h={h:g}"))
+
+        if extra:
+            if len(extra) % 2 != 0:
+                issues.append((line_no, ISSUE_KEYPOINT_FORMAT, f"关键点坐标数量为奇数: {len(extra)}"))
+            else:
+                keypoint_counts.add(len(extra) // 2)
+                if any(v < low or v > high for v in extra):
+                    issues.append((line_no, ISSUE_OUT_OF_RANGE, "关键点坐标超出0-1范围"))
+        else:
+            keypoint_counts.add(0)
+    return issues, keypoint_counts
+
+
+def validate_label_files(label_paths, num_classes):
+    """检查一批标签文件（在进程池中执行，因此定义在模块顶层）"""
+    return [(path, *validate_label_file(path, num_classes)) for path in label_paths]
+
+
+def _list_files(directory, extensions):
+    """列出目录中指定扩展名的文件: {不含扩展名的文件名: 路径}"""
+    files = {}
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                base_name, ext = os.path.splitext(entry.name)
+                if ext.lower() in extensions and entry.name != 'classes.txt':
+                    files[base_name] = entry.path
+    except OSError:
+        pass
+    return files
+
+
+class AnnotationValidator:
+    """
+    数据集标注检查器
+
+    在进程池中并行检查数据集中所有标签文件，并检查images/labels目录中
+    图像与标签的对应关系。数据集中的images与labels目录按共同的上级目录配对
+    （例如 train/images 与 train/labels）。
+    """
+
+    def __init__(self, dataset_dir, num_classes, max_workers=None):
+        self.dataset_dir = dataset_dir
+        self.num_classes = num_classes
+        self.max_workers = max_workers
+
+    def _find_pairs(self):
+        """返回 [(图像目录或None, 标签目录或None), ...]"""
+        pairs = {}
+        for root, dirs, _ in os.walk(self.dataset_dir):
+            dirs[:] = [d for d in dirs if d != CACHE_DIR_NAME and not d.startswith('.')]
+            name = os.path.basename(root)
+            if name in ("images", "labels"):
+                pair = pairs.setdefault(os.path.dirname(root), [None, None])
+                pair[0 if name == "images" else 1] = root
+                dirs[:] = []
+        return [tuple(pairs[parent]) for parent in sorted(pairs)]
+
+    def run(self, progress_callback=None):
+        """
+        执行检查
+
+        Args:
+            progress_callback (callable, optional): 进度回调 callback(done, total)，
+                返回False时取消
+
+        Returns:
+            list: ValidationIssue列表，取消时返回None
+        """
+        issues = []
+        label_files = []
+        label_to_image = {}
+        for images_dir, labels_dir in self._find_pairs():
+            images = _list_files(images_dir, IMAGE_EXTENSIONS) if images_dir else {}
+            labels = _list_files(labels_dir, ('.txt',)) if labels_dir else {}
+            for base_name, label_path in labels.items():
+                image_path = images.get(base_name)
+                label_to_image[label_path] = image_path
+                label_files.append(label_path)
+                if image_path is None and images_dir:
+                    issues.append(ValidationIssue(ISSUE_ORPHAN_LABEL, None, label_path, 0, "标签文件没有对应的图像"))
+            for base_name, image_path in images.items():
+                if base_name not in labels:
+                    issues.append(ValidationIssue(ISSUE_MISSING_LABEL, image_path, None, 0, "图像没有对应的标签文件"))
+
+        total = len(label_files)
+        done = 0
+        if progress_callback and progress_callback(done, total) is False:
+            return None
+
+        chunks = [label_files[i:i + VALIDATE_CHUNK_SIZE] for i in range(0, total, VALIDATE_CHUNK_SIZE)]
+        keypoint_files = {}
+        canceled = False
+        executor = ProcessPoolExecutor(max_workers=self.max_workers) if len(chunks) > 1 else None
+        try:
+            if executor is not None:
+                results = executor.map(validate_label_files, chunks, [self.num_classes] * len(chunks))
+            else:
+                results = (validate_label_files(chunk, self.num_classes) for chunk in chunks)
+            for chunk_results in results:
+                for label_path, file_issues, keypoint_counts in chunk_results:
+                    image_path = label_to_image.get(label_path)
+                    for line_no, code, message in file_issues:
+                        issues.append(ValidationIssue(code, image_path, label_path, line_no, message))
+                    for count in keypoint_counts:
+                        keypoint_files.setdefault(count, []).append(label_path)
+                done += len(chunk_results)
+                if progress_callback and progress_callback(done, total) is False:
+                    canceled = True
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=not canceled, cancel_futures=canceled)
+        if canceled:
+            return None
+
+        issues.extend(self._check_keypoint_consistency(keypoint_files, label_to_image))
+        logger.info(f"标注检查完成: {total} 个标签文件，发现 {len(issues)} 个问题")
+        return issues
+
+    @staticmethod
+    def _check_keypoint_consistency(keypoint_files, label_to_image):
+        """
+        检查关键点数量是否一致（YOLO姿态模型要求kpt_shape固定）
+
+        以含关键点的文件中最常见的关键点数量为准，不带关键点的边界框也视为不一致。
+        """
+        with_keypoints = {count: files for count, files in keypoint_files.items() if count > 0}
+        if not with_keypoints:
+            return []
+        expected = max(with_keypoints, key=lambda count: len(with_keypoints[count]))
+        issues = []
+        for count, files in keypoint_files.items():
+            if count == expected:
+                continue
+            for label_path in files:
+                issues.append(ValidationIssue(
+                    ISSUE_KEYPOINT_COUNT, label_to_image.get(label_path), label_path, 0,
+                    f"关键点数量为 {count}，与数据集中多数文件的 {expected} 不一致"
+                    f"（{len(keypoint_files[expected])} 个文件）"))
+        return issues
@@ -0,0 +1,164 @@
+import logging
+
+import numpy as np
+
+from models.bounding_box import BoundingBox
+from utils.box_ops import box_iou
+from utils.undo_stack import copy_keypoints
+
+# 尝试导入 scipy（用于匈牙利算法匹配，不可用时使用贪心匹配）
+try:
+    from scipy.optimize import linear_sum_assignment
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+logger = logging.getLogger('YOLOLabelCreator.BoxMerge')
+
+# 合并策略
+MERGE_KEEP_EXISTING = 'keep_existing'  # 已有标注的图像保持不变，只为没有标注的图像添加预测结果
+MERGE_REPLACE = 'replace'              # 用预测结果替换现有标注
+MERGE_ADD_NEW = 'add_new'              # 保留现有标注，只添加与现有标注不匹配的预测结果
+MERGE_REFINE = 'refine'                # 用匹配的预测结果修正现有标注的坐标，并添加不匹配的预测结果
+
+MERGE_POLICIES = (MERGE_ADD_NEW, MERGE_REFINE, MERGE_KEEP_EXISTING, MERGE_REPLACE)
+DEFAULT_MERGE_POLICY = MERGE_ADD_NEW
+
+# 预测结果与现有标注视为同一目标的最小IoU
+DEFAULT_MATCH_IOU = 0.5
+
+# 坐标差异不超过该值（像素）时视为相同，避免标签文件精度误差导致重复修正
+COORD_TOLERANCE = 0.5
+
+
+def boxes_to_array(boxes):
+    """将BoundingBox列表转换为 (N, 4) 的xyxy数组（坐标按左上/右下排列）"""
+    if not boxes:
+        return np.empty((0, 4), dtype=np.float32)
+    coords = np.array([(b.x1, b.y1, b.x2, b.y2) for b in boxes], dtype=np.float32)
+    return np.hstack([np.minimum(coords[:, :2], coords[:, 2:]), np.maximum(coords[:, :2], coords[:, 2:])])
+
+
+def _same_coords(a, b):
+    return a.shape == b.shape and (a.size == 0 or float(np.abs(a - b).max()) <= COORD_TOLERANCE)
+
+
+def match_boxes(existing, predictions, iou_threshold=DEFAULT_MATCH_IOU):
+    """
+    将预测结果与现有标注一一匹配（只匹配同类别的边界框）
+
+    一次计算全部IoU矩阵，scipy可用时用匈牙利算法求IoU总和最大的匹配，
+    否则按IoU从高到低贪心匹配。
+
+    Returns:
+        list: [(现有标注索引, 预测结果索引), ...]，只包含IoU不低于阈值的匹配
+    """
+    if not existing or not predictions:
+        return []
+    iou = box_iou(boxes_to_array(existing), boxes_to_array(predictions))
+    existing_classes = np.array([b.class_id for b in existing])
+    prediction_classes = np.array([b.class_id for b in predictions])
+    iou[existing_classes[:, None] != prediction_classes[None, :]] = 0.0
+
+    if SCIPY_AVAILABLE:
+        rows, cols = linear_sum_assignment(iou, maximize=True)
+    else:
+        rows, cols = np.nonzero(iou >= iou_threshold)
+        order = np.argsort(-iou[rows, cols], kind='stable')
+        used_rows, used_cols = set(), set()
+        pairs = []
+        for r, c in zip(rows[order], cols[order]):
+            if r not in used_rows and c not in used_cols:
+                used_rows.add(r)
+                used_cols.add(c)
+                pairs.append((r, c))
+        rows = np.array([p[0] for p in pairs], dtype=np.int64)
+        cols = np.array([p[1] for p in pairs], dtype=np.int64)
+
+    valid = iou[rows, cols] >= iou_threshold
+    return [(int(r), int(c)) for r, c in zip(rows[valid], cols[valid])]
+
+
+def _refined_copy(box, prediction):
+    """以现有标注为基础，坐标取自预测结果的新边界框（不修改原对象，便于撤销）"""
+    refined = BoundingBox(prediction.x1, prediction.y1, prediction.x2, prediction.y2,
+                          box.class_id, box.confidence)
+    refined.keypoints = copy_keypoints(box.keypoints)
+    if refined.keypoints is None and prediction.keypoints is not None:
+        refined.keypoints = copy_keypoints(prediction.keypoints)
+    return refined
+
+
+class MergeResult:
+    """
+    合并结果
+
+    Attributes:
+        boxes (list): 合并后的边界框列表
+        added (int): 新增的预测结果数量
+        refined (int): 坐标被修正的现有标注数量
+        removed (int): 被替换掉的现有标注数量
+    """
+
+    __slots__ = ('boxes', 'added', 'refined', 'removed')
+
+    def __init__(self, boxes, added=0, refined=0, removed=0):
+        self.boxes = boxes
+        self.added = added
+        self.refined = refined
+        self.removed = removed
+
+    @property
+    def changed(self):
+        return bool(self.added or self.refined or self.removed)
+
+
+def merge_predictions(existing, predictions, policy=DEFAULT_MERGE_POLICY, iou_threshold=DEFAULT_MATCH_IOU):
+    """
+    按策略将预测结果合并到现有标注中
+
+    对同一组预测重复执行时结果不变：已匹配的预测不会被再次添加，
+    refine修正后的坐标与预测结果一致，replace在标注已与预测一致时不做修改。
+
+    Args:
+        existing (list): 现有的BoundingBox列表（不会被修改）
+        predictions (list): 预测得到的BoundingBox列表
+        policy (str): 合并策略，见MERGE_POLICIES
+        iou_threshold (float): 视为同一目标的最小IoU
+
+    Returns:
+        MergeResult: 合并结果
+    """
+    existing = list(existing)
+    predictions = list(predictions)
+    if policy not in MERGE_POLICIES:
+        logger.warning(f"未知的合并策略: {policy}，使用默认策略 {DEFAULT_MERGE_POLICY}")
+        policy = DEFAULT_MERGE_POLICY
+
+    if policy == MERGE_REPLACE:
+        unchanged = len(existing) == len(predictions) and \
+            _same_coords(boxes_to_array(existing), boxes_to_array(predictions)) and \
+            all(a.class_id == b.class_id for a, b in zip(existing, predictions))
+        if unchanged:
+            return MergeResult(existing)
+        return MergeResult(predictions, added=len(predictions), removed=len(existing))
+
+    if policy == MERGE_KEEP_EXISTING:
+        if existing:
+            return MergeResult(existing)
+        return MergeResult(predictions, added=len(predictions))
+
+    matches = match_boxes(existing, predictions, iou_threshold)
+    matched_predictions = {p for _, p in matches}
+    new_boxes = [box for i, box in enumerate(predictions) if i not in matched_predictions]
+
+    refined = 0
+    if policy == MERGE_REFINE:
+        existing_coords = boxes_to_array(existing)
+        prediction_coords = boxes_to_array(predictions)
+        for e, p in matches:
+            if not _same_coords(existing_coords[e], prediction_coords[p]):
+                existing[e] = _refined_copy(existing[e], predictions[p])
+                refined += 1
+
+    return MergeResult(existing + new_boxes, added=len(new_boxes), refined=refined)
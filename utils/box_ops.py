@@ -0,0 +1,105 @@
+import numpy as np
+
+# 候选框数量不超过该值时NMS使用完整的IoU矩阵
+NMS_MATRIX_LIMIT = 1000
+
+
+def box_area(boxes):
+    """计算xyxy格式边界框的面积"""
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def box_iou(boxes_a, boxes_b):
+    """
+    计算两组xyxy格式边界框之间的IoU矩阵
+
+    Args:
+        boxes_a (numpy.ndarray): (N, 4)
+        boxes_b (numpy.ndarray): (M, 4)
+
+    Returns:
+        numpy.ndarray: (N, M) IoU矩阵
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    # 按坐标分量分别广播，避免生成(N, M, 2)的中间数组
+    width = np.minimum(boxes_a[:, 2, None], boxes_b[None, :, 2])
+    width -= np.maximum(boxes_a[:, 0, None], boxes_b[None, :, 0])
+    np.clip(width, 0, None, out=width)
+    height = np.minimum(boxes_a[:, 3, None], boxes_b[None, :, 3])
+    height -= np.maximum(boxes_a[:, 1, None], boxes_b[None, :, 1])
+    np.clip(height, 0, None, out=height)
+    intersection = width * height
+    union = box_area(boxes_a)[:, None] + box_area(boxes_b)[None, :] - intersection
+    np.maximum(union, 1e-9, out=union)
+    return intersection / union
+
+
+def nms(boxes, scores, iou_threshold, classes=None, max_keep=None):
+    """
+    非极大值抑制
+
+    传入classes时按类别分别抑制（通过按类别平移坐标实现，一次完成所有类别）。
+    候选框较少时先一次性计算IoU矩阵，贪心过程中每保留一个框只需一次行运算。
+
+    Args:
+        boxes (numpy.ndarray): (N, 4) xyxy格式边界框
+        scores (numpy.ndarray): (N,) 置信度
+        iou_threshold (float): IoU阈值，与已保留的边界框IoU大于该值的边界框被抑制
+        classes (numpy.ndarray, optional): (N,) 类别ID
+        max_keep (int, optional): 最多保留的数量，达到后提前结束
+
+    Returns:
+        numpy.ndarray: 保留的边界框索引，按置信度从高到低排列
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.int64)
+    if classes is not None:
+        offset = float(boxes.max()) + 1.0
+        boxes = boxes + (np.asarray(classes, dtype=np.float32) * offset)[:, None]
+    if max_keep is None:
+        max_keep = len(boxes)
+
+    order = np.argsort(-np.asarray(scores), kind='stable')
+    boxes = boxes[order]
+    keep = []
+    if len(boxes) <= NMS_MATRIX_LIMIT:
+        suppressed = box_iou(boxes, boxes) > iou_threshold
+        removed = np.zeros(len(boxes), dtype=bool)
+        for i in range(len(boxes)):
+            if removed[i]:
+                continue
+            keep.append(i)
+            if len(keep) >= max_keep:
+                break
+            removed |= suppressed[i]
+    else:
+        areas = box_area(boxes)
+        remaining = np.arange(len(boxes))
+        while remaining.size > 0 and len(keep) < max_keep:
+            i = remaining[0]
+            keep.append(i)
+            rest = remaining[1:]
+            top_left = np.maximum(boxes[i, :2], boxes[rest, :2])
+            bottom_right = np.minimum(boxes[i, 2:], boxes[rest, 2:])
+            wh = np.clip(bottom_right - top_left, 0, None)
+            intersection = wh[:, 0] * wh[:, 1]
+            iou = intersection / np.maximum(areas[i] + areas[rest] - intersection, 1e-9)
+            remaining = rest[iou <= iou_threshold]
+    return order[np.asarray(keep, dtype=np.int64)]
+
+
+def filter_detections(boxes, scores, classes, conf_threshold, iou_threshold, max_detections):
+    """
+    置信度过滤 + 按类别NMS + 数量限制
+
+    Returns:
+        numpy.ndarray: 保留的检测结果索引，按置信度从高到低排列
+    """
+    candidates = np.flatnonzero(np.asarray(scores) >= conf_threshold)
+    if candidates.size == 0:
+        return candidates
+    max_detections = max(0, int(max_detections))
+    keep = nms(boxes[candidates], scores[candidates], iou_threshold, classes[candidates], max_detections)
+    return candidates[keep[:max_detections]]
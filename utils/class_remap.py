@@ -0,0 +1,203 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from utils.dataset_stats import find_label_dirs
+from utils.label_writer import write_file_atomic
+
+logger = logging.getLogger('YOLOLabelCreator.ClassRemap')
+
+# 每个线程任务处理的标签文件数量
+REMAP_CHUNK_SIZE = 256
+
+# 查找表中表示删除的值
+DELETED = -1
+
+
+def build_lookup(mapping, num_classes=0):
+    """
+    根据类别映射生成查找表
+
+    Args:
+        mapping (dict): {旧类别ID: 新类别ID或None}，None表示删除该类别的所有边界框
+        num_classes (int): 原类别数量，映射中未出现的类别ID保持不变
+
+    Returns:
+        numpy.ndarray: 查找表，lookup[旧ID] = 新ID，删除为-1
+    """
+    size = max([num_classes] + [old + 1 for old in mapping])
+    lookup = np.arange(size, dtype=np.int64)
+    for old, new in mapping.items():
+        lookup[old] = DELETED if new is None else new
+    return lookup
+
+
+def is_identity(lookup):
+    """查找表是否不改变任何类别ID"""
+    return bool(np.array_equal(lookup, np.arange(len(lookup))))
+
+
+def _parse_class_ids(heads):
+    """将每行首列解析为浮点数组，无法解析的为NaN"""
+    try:
+        return np.asarray(heads, dtype=np.float64)
+    except ValueError:
+        ids = np.full(len(heads), np.nan)
+        for i, head in enumerate(heads):
+            try:
+                ids[i] = float(head)
+            except ValueError:
+                pass
+        return ids
+
+
+def remap_label_text(text, lookup):
+    """
+    按查找表改写一个标签文件的内容
+
+    所有行的类别ID一次性通过查找表映射，只有类别ID改变的行才重新拼接，
+    其余内容（坐标、关键点）保持原样。无法解析或不在查找表范围内的类别ID保持不变。
+
+    Returns:
+        tuple: (新内容，未变化时为None, 修改的边界框数, 删除的边界框数, 受影响的旧类别ID数组)
+    """
+    lines = text.splitlines()
+    rows = []
+    heads = []
+    for i, line in enumerate(lines):
+        parts = line.split(None, 1)
+        if parts:
+            rows.append(i)
+            heads.append(parts[0])
+    if not rows:
+        return None, 0, 0, None
+
+    ids = _parse_class_ids(heads)
+    valid = np.isfinite(ids) & (ids == np.floor(ids)) & (ids >= 0) & (ids < len(lookup))
+    old_ids = np.where(valid, ids, 0).astype(np.int64)
+    new_ids = lookup[old_ids]
+    deleted = valid & (new_ids == DELETED)
+    changed = valid & (new_ids != old_ids) & ~deleted
+    affected = changed | deleted
+    if not affected.any():
+        return None, 0, 0, None
+
+    output = list(lines)
+    for k in np.flatnonzero(changed):
+        i = rows[k]
+        parts = lines[i].split(None, 1)
+        output[i] = f"{new_ids[k]} {parts[1]}" if len(parts) > 1 else str(new_ids[k])
+    for k in np.flatnonzero(deleted):
+        output[rows[k]] = None
+
+    new_text = "\n".join(line for line in output if line is not None)
+    if new_text and text.endswith("\n"):
+        new_text += "\n"
+    return new_text, int(changed.sum()), int(deleted.sum()), old_ids[affected]
+
+
+def remap_label_files(paths, lookup, dry_run=False):
+    """
+    改写一批标签文件（在线程池中执行）
+
+    Returns:
+        list: [(标签路径, 修改的边界框数, 删除的边界框数, 受影响的旧类别ID数组, 错误信息), ...]
+    """
+    results = []
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            new_text, changed, deleted, affected = remap_label_text(text, lookup)
+            if new_text is not None and not dry_run:
+                write_file_atomic(path, new_text)
+            results.append((path, changed, deleted, affected, None))
+        except (OSError, UnicodeDecodeError) as e:
+            results.append((path, 0, 0, None, str(e)))
+    return results
+
+
+def list_label_files(dataset_dir):
+    """列出数据集中所有labels目录下的标签文件（不含classes.txt）"""
+    paths = []
+    for _, labels_dir in find_label_dirs(dataset_dir):
+        try:
+            with os.scandir(labels_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith('.txt') and entry.name != 'classes.txt' and entry.is_file():
+                        paths.append(entry.path)
+        except OSError as e:
+            logger.error(f"读取标签目录失败: {labels_dir}, 错误: {str(e)}")
+    paths.sort()
+    return paths
+
+
+class ClassRemapper:
+    """
+    数据集类别ID批量重映射（合并、删除、重新排序）
+
+    在线程池中并行改写数据集中的所有标签文件，每个文件以原子方式写入。
+    dry_run模式只统计将要发生的修改，不写入文件。
+    """
+
+    def __init__(self, dataset_dir, mapping, num_classes=0, max_workers=8):
+        self.dataset_dir = dataset_dir
+        self.lookup = build_lookup(mapping, num_classes)
+        self.max_workers = max_workers
+
+    def run(self, dry_run=False, progress_callback=None):
+        """
+        执行重映射
+
+        Args:
+            dry_run (bool): 只统计修改数量，不写入文件
+            progress_callback (callable, optional): 进度回调 callback(done, total)，在调用线程中执行。
+                dry_run时返回False可取消；实际写入时不支持取消，以免数据集只被改写一部分
+
+        Returns:
+            dict: 统计结果，取消时返回None
+                files: 标签文件总数
+                changed_files: 需要（或已经）改写的文件数
+                changed_boxes: 类别ID改变的边界框数
+                deleted_boxes: 被删除的边界框数
+                per_class: {旧类别ID: 受影响的边界框数}
+                errors: [(标签路径, 错误信息), ...]
+        """
+        paths = list_label_files(self.dataset_dir)
+        result = {'files': len(paths), 'changed_files': 0, 'changed_boxes': 0, 'deleted_boxes': 0,
+                  'per_class': {}, 'errors': []}
+        if is_identity(self.lookup) or not paths:
+            return result
+
+        per_class = np.zeros(len(self.lookup), dtype=np.int64)
+        done = 0
+        canceled = False
+        chunks = [paths[i:i + REMAP_CHUNK_SIZE] for i in range(0, len(paths), REMAP_CHUNK_SIZE)]
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = [executor.submit(remap_label_files, chunk, self.lookup, dry_run) for chunk in chunks]
+            for future in as_completed(futures):
+                for path, changed, deleted, affected, error in future.result():
+                    if error:
+                        result['errors'].append((path, error))
+                        logger.error(f"改写标签文件失败: {path}, 错误: {error}")
+                    elif affected is not None:
+                        result['changed_files'] += 1
+                        result['changed_boxes'] += changed
+                        result['deleted_boxes'] += deleted
+                        per_class += np.bincount(affected, minlength=len(per_class))
+                done += len(future.result())
+                if progress_callback and progress_callback(done, len(paths)) is False and dry_run:
+                    canceled = True
+                    break
+        finally:
+            executor.shutdown(wait=True, cancel_futures=canceled)
+        if canceled:
+            return None
+
+        result['per_class'] = {int(i): int(count) for i, count in enumerate(per_class) if count}
+        logger.info(f"类别重映射{'预览' if dry_run else '完成'}: {result['changed_files']}/{len(paths)} 个文件, "
+                    f"{result['changed_boxes']} 个边界框修改类别, {result['deleted_boxes']} 个边界框删除")
+        return result
@@ -0,0 +1,82 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger('YOLOLabelCreator.DatasetCache')
+
+# 每个数据集的缓存目录名称（位于数据集根目录下）
+CACHE_DIR_NAME = '.labelcreator'
+
+
+def get_cache_dir(dataset_dir, create=True):
+    """
+    获取数据集的缓存目录
+
+    Args:
+        dataset_dir (str): 数据集根目录
+        create (bool): 目录不存在时是否创建
+
+    Returns:
+        str: 缓存目录路径
+    """
+    cache_dir = os.path.join(dataset_dir, CACHE_DIR_NAME)
+    if create and not os.path.isdir(cache_dir):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as e:
+            logger.error(f"创建缓存目录失败: {cache_dir}, 错误: {str(e)}")
+    return cache_dir
+
+
+def file_signature(path, stat_result=None):
+    """
+    获取文件签名（修改时间和大小），用于判断缓存是否失效
+
+    Args:
+        path (str): 文件路径
+        stat_result (os.stat_result, optional): 已有的stat结果，避免重复stat
+
+    Returns:
+        tuple: (mtime_ns, size)，文件不存在时返回None
+    """
+    try:
+        st = stat_result if stat_result is not None else os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_json_cache(path):
+    """读取JSON缓存文件，读取失败时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception as e:
+        logger.warning(f"读取缓存文件失败，将重新生成: {path}, 错误: {str(e)}")
+        return {}
+
+
+def save_json_cache(path, data):
+    """
+    原子方式写入JSON缓存文件（先写临时文件再替换）
+
+    Returns:
+        bool: 写入是否成功
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.error(f"写入缓存文件失败: {path}, 错误: {str(e)}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
@@ -0,0 +1,462 @@
+import os
+import csv
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from utils.dataset_cache import CACHE_DIR_NAME, get_cache_dir
+
+logger = logging.getLogger('YOLOLabelCreator.DatasetStats')
+
+# 统计缓存文件名及格式版本
+STATS_CACHE_FILE = 'label_stats.npz'
+STATS_CACHE_VERSION = 1
+
+# 每个边界框在数组中的列: 类别, 中心x, 中心y, 宽, 高, 关键点总数, 已标注关键点数
+COL_CLASS, COL_CX, COL_CY, COL_W, COL_H, COL_KP_TOTAL, COL_KP_LABELED = range(7)
+BOX_COLUMNS = 7
+
+# 每个进程任务解析的文件数量
+PARSE_CHUNK_SIZE = 512
+
+# 直方图分箱数量及分位数
+HISTOGRAM_BINS = 20
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+# COCO风格的目标尺寸划分（像素面积）
+SMALL_AREA = 32 * 32
+MEDIUM_AREA = 96 * 96
+
+
+def _keypoint_columns(values, extra):
+    """根据关键点数据计算 (关键点总数, 已标注关键点数)，values为(n, extra)数组"""
+    if extra <= 0:
+        return np.zeros(len(values), np.float32), np.zeros(len(values), np.float32)
+    if extra % 2 == 0:
+        # 本程序写出的格式: x y
+        points = values.reshape(len(values), -1, 2)
+        labeled = np.any(points > 0, axis=2).sum(axis=1)
+    elif extra % 3 == 0:
+        # x y visibility 格式
+        points = values.reshape(len(values), -1, 3)
+        labeled = (points[:, :, 2] > 0).sum(axis=1)
+    else:
+        return np.zeros(len(values), np.float32), np.zeros(len(values), np.float32)
+    return np.full(len(values), points.shape[1], np.float32), labeled.astype(np.float32)
+
+
+def parse_label_text(text):
+    """
+    将YOLO标签文本解析为边界框数组
+
+    所有行列数相同时整体向量化转换；列数不一致时逐行解析。
+    少于5列或无法解析的行会被跳过。
+
+    Returns:
+        np.ndarray: 形状为(n, BOX_COLUMNS)的float32数组
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return np.empty((0, BOX_COLUMNS), np.float32)
+
+    tokens = text.split()
+    columns = len(lines[0].split())
+    if columns >= 5 and len(tokens) == columns * len(lines):
+        try:
+            values = np.array(tokens, dtype=np.float32).reshape(len(lines), columns)
+            kp_total, kp_labeled = _keypoint_columns(values[:, 5:], columns - 5)
+            return np.column_stack([values[:, :5], kp_total, kp_labeled]).astype(np.float32)
+        except ValueError:
+            pass
+
+    rows = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) < 5:
+            continue
+        try:
+            values = np.array(parts, dtype=np.float32).reshape(1, -1)
+        except ValueError:
+            continue
+        kp_total, kp_labeled = _keypoint_columns(values[:, 5:], len(parts) - 5)
+        rows.append(np.concatenate([values[0, :5], kp_total, kp_labeled]))
+    if not rows:
+        return np.empty((0, BOX_COLUMNS), np.float32)
+    return np.array(rows, dtype=np.float32)
+
+
+def parse_label_files(paths):
+    """
+    解析一批标签文件（在进程池中执行，因此定义在模块顶层）
+
+    Returns:
+        tuple: (每个文件的边界框数量数组, 拼接后的边界框数组)
+    """
+    counts = np.zeros(len(paths), np.int64)
+    arrays = []
+    for i, path in enumerate(paths):
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                boxes = parse_label_text(f.read())
+        except OSError as e:
+            logger.warning(f"读取标签文件失败: {path}, 错误: {str(e)}")
+            boxes = np.empty((0, BOX_COLUMNS), np.float32)
+        counts[i] = len(boxes)
+        arrays.append(boxes)
+    if arrays:
+        return counts, np.concatenate(arrays)
+    return counts, np.empty((0, BOX_COLUMNS), np.float32)
+
+
+def find_label_dirs(dataset_dir):
+    """
+    查找数据集中所有名为labels的目录
+
+    Returns:
+        list: [(划分名称, 标签目录), ...]，划分名称为labels上级目录的相对路径
+    """
+    label_dirs = []
+    for root, dirs, _ in os.walk(dataset_dir):
+        dirs[:] = [d for d in dirs if d != CACHE_DIR_NAME and not d.startswith('.')]
+        if os.path.basename(root) == "labels":
+            split = os.path.relpath(os.path.dirname(root), dataset_dir).replace(os.sep, '/')
+            label_dirs.append((split, root))
+            dirs[:] = []
+    label_dirs.sort()
+    return label_dirs
+
+
+def _histogram(values, bins, value_range):
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    return {'edges': [round(float(e), 6) for e in edges], 'counts': counts.tolist()}
+
+
+def _quantiles(values):
+    if len(values) == 0:
+        return {}
+    results = np.quantile(values, QUANTILES)
+    return {f"p{int(q * 100)}": round(float(v), 6) for q, v in zip(QUANTILES, results)}
+
+
+class DatasetStatistics:
+    """
+    数据集标注统计
+
+    并行地将所有标签文件解析为NumPy数组，再以向量化方式计算类别分布、
+    边界框尺寸直方图与分位数、每图框数分布、关键点完整度及各划分的汇总。
+
+    每个标签文件的解析结果按修改时间和大小缓存在数据集缓存目录中，
+    刷新时只重新解析变化的文件。
+    """
+
+    def __init__(self, dataset_dir, max_workers=None):
+        self.dataset_dir = os.path.abspath(dataset_dir)
+        self.max_workers = max_workers
+        self.cache_path = os.path.join(get_cache_dir(dataset_dir), STATS_CACHE_FILE)
+
+        # collect()之后可用的数据
+        self.splits = []
+        self.file_paths = []
+        self.file_split = np.empty(0, np.int32)
+        self.file_counts = np.empty(0, np.int64)
+        self.boxes = np.empty((0, BOX_COLUMNS), np.float32)
+
+    # ---- 缓存 ----
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_path):
+            return {}
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data['version']) != STATS_CACHE_VERSION:
+                    return {}
+                paths = data['paths'].tolist()
+                mtimes = data['mtimes']
+                sizes = data['sizes']
+                counts = data['counts']
+                boxes = data['boxes']
+        except Exception as e:
+            logger.warning(f"读取统计缓存失败，将重新解析: {str(e)}")
+            return {}
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return {path: (int(mtimes[i]), int(sizes[i]), boxes[offsets[i]:offsets[i + 1]])
+                for i, path in enumerate(paths)}
+
+    def _save_cache(self, rel_paths, signatures):
+        tmp_path = f"{self.cache_path}.tmp.npz"
+        try:
+            np.savez(tmp_path,
+                     version=np.int64(STATS_CACHE_VERSION),
+                     paths=np.array(rel_paths, dtype=str),
+                     mtimes=np.array([s[0] for s in signatures], np.int64),
+                     sizes=np.array([s[1] for s in signatures], np.int64),
+                     counts=self.file_counts,
+                     boxes=self.boxes)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.error(f"保存统计缓存失败: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    # ---- 数据收集 ----
+
+    def collect(self, progress_callback=None):
+        """
+        收集所有标签文件的边界框数据
+
+        Args:
+            progress_callback (callable, optional): 进度回调 callback(done, total)，
+                返回False时取消
+
+        Returns:
+            bool: 是否完成（取消时返回False）
+        """
+        self.splits = []
+        files = []
+        for split_index, (split, labels_dir) in enumerate(find_label_dirs(self.dataset_dir)):
+            self.splits.append(split)
+            try:
+                with os.scandir(labels_dir) as entries:
+                    for entry in entries:
+                        if entry.name.endswith('.txt') and entry.name != 'classes.txt' and entry.is_file():
+                            st = entry.stat()
+                            files.append((entry.path, split_index, (st.st_mtime_ns, st.st_size)))
+            except OSError as e:
+                logger.error(f"扫描标签目录失败: {labels_dir}, 错误: {str(e)}")
+
+        cache = self._load_cache()
+        rel_paths = [os.path.relpath(path, self.dataset_dir).replace(os.sep, '/') for path, _, _ in files]
+        per_file = [None] * len(files)
+        pending = []
+        for i, (path, _, signature) in enumerate(files):
+            cached = cache.get(rel_paths[i])
+            if cached is not None and cached[0] == signature[0] and cached[1] == signature[1]:
+                per_file[i] = cached[2]
+            else:
+                pending.append(i)
+
+        total = len(files)
+        done = total - len(pending)
+        logger.info(f"统计缓存命中 {done} 个标签文件，需要解析 {len(pending)} 个")
+        if progress_callback and progress_callback(done, total) is False:
+            return False
+
+        if pending:
+            chunks = [pending[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(pending), PARSE_CHUNK_SIZE)]
+            if len(chunks) == 1:
+                results = [parse_label_files([files[i][0] for i in chunks[0]])]
+                iterator = zip(chunks, results)
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                iterator = zip(chunks, executor.map(parse_label_files,
+                                                    [[files[i][0] for i in chunk] for chunk in chunks]))
+            canceled = False
+            try:
+                for chunk, (counts, boxes) in iterator:
+                    offsets = np.concatenate([[0], np.cumsum(counts)])
+                    for j, i in enumerate(chunk):
+                        per_file[i] = boxes[offsets[j]:offsets[j + 1]]
+                    done += len(chunk)
+                    if progress_callback and progress_callback(done, total) is False:
+                        canceled = True
+                        break
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=not canceled, cancel_futures=canceled)
+            if canceled:
+                return False
+
+        self.file_paths = [path for path, _, _ in files]
+        self.file_split = np.array([split_index for _, split_index, _ in files], np.int32)
+        self.file_counts = np.array([len(boxes) for boxes in per_file], np.int64)
+        self.boxes = np.concatenate(per_file) if per_file else np.empty((0, BOX_COLUMNS), np.float32)
+        if pending or len(cache) != len(files):
+            self._save_cache(rel_paths, [signature for _, _, signature in files])
+        logger.info(f"统计数据收集完成: {len(files)} 个标签文件，{len(self.boxes)} 个边界框")
+        return True
+
+    def image_paths_for_labels(self):
+        """
+        查找每个标签文件对应的图像（与labels同级的images目录中同名的图像）
+
+        Returns:
+            list: 与file_paths对应的图像路径，找不到时为None
+        """
+        image_paths = []
+        listing_cache = {}
+        for label_path in self.file_paths:
+            labels_dir = os.path.dirname(label_path)
+            if labels_dir not in listing_cache:
+                images_dir = os.path.join(os.path.dirname(labels_dir), "images")
+                listing = {}
+                try:
+                    with os.scandir(images_dir) as entries:
+                        for entry in entries:
+                            base_name, ext = os.path.splitext(entry.name)
+                            if ext.lower() in ('.jpg', '.jpeg', '.png', '.bmp'):
+                                listing[base_name] = entry.path
+                except OSError:
+                    pass
+                listing_cache[labels_dir] = listing
+            base_name = os.path.splitext(os.path.basename(label_path))[0]
+            image_paths.append(listing_cache[labels_dir].get(base_name))
+        return image_paths
+
+    # ---- 统计计算 ----
+
+    def compute(self, class_names=None, image_sizes=None):
+        """
+        计算统计结果
+
+        Args:
+            class_names (list, optional): 类别名称列表
+            image_sizes (np.ndarray, optional): 与file_paths对应的(宽, 高)数组，
+                提供时额外统计像素尺寸和小/中/大目标数量（未知尺寸为0）
+
+        Returns:
+            dict: 可直接序列化为JSON的统计结果
+        """
+        class_names = class_names or []
+        boxes = self.boxes
+        class_ids = boxes[:, COL_CLASS].astype(np.int64)
+        valid = class_ids >= 0
+        num_classes = max(len(class_names), int(class_ids[valid].max()) + 1 if valid.any() else 0)
+        box_split = np.repeat(self.file_split, self.file_counts)
+
+        widths = boxes[:, COL_W]
+        heights = boxes[:, COL_H]
+        areas = widths * heights
+        aspects = np.divide(widths, heights, out=np.zeros_like(widths), where=heights > 0)
+
+        # 类别分布（总体及各划分）
+        class_counts = np.bincount(class_ids[valid], minlength=num_classes)
+        images_per_class = np.zeros(num_classes, np.int64)
+        if valid.any():
+            box_file = np.repeat(np.arange(len(self.file_paths)), self.file_counts)
+            pairs = np.unique(box_file[valid] * num_classes + class_ids[valid])
+            images_per_class = np.bincount(pairs % num_classes, minlength=num_classes)
+        classes = []
+        for class_id in range(num_classes):
+            classes.append({
+                'id': class_id,
+                'name': class_names[class_id] if class_id < len(class_names) else f"Class_{class_id}",
+                'boxes': int(class_counts[class_id]),
+                'images': int(images_per_class[class_id]),
+                'fraction': round(float(class_counts[class_id]) / max(1, len(boxes)), 6),
+            })
+
+        splits = []
+        for split_index, split in enumerate(self.splits):
+            file_mask = self.file_split == split_index
+            box_mask = (box_split == split_index) & valid
+            splits.append({
+                'name': split,
+                'images': int(file_mask.sum()),
+                'empty_images': int((self.file_counts[file_mask] == 0).sum()),
+                'boxes': int((box_split == split_index).sum()),
+                'class_boxes': np.bincount(class_ids[box_mask], minlength=num_classes).tolist(),
+            })
+
+        # 每图框数分布
+        max_count = int(self.file_counts.max()) if len(self.file_counts) else 0
+        boxes_per_image = np.bincount(self.file_counts, minlength=max_count + 1).tolist()
+
+        # 关键点完整度
+        kp_total = boxes[:, COL_KP_TOTAL]
+        keypoints = {
+            'boxes_with_keypoints': int((kp_total > 0).sum()),
+            'total': int(kp_total.sum()),
+            'labeled': int(boxes[:, COL_KP_LABELED].sum()),
+        }
+        keypoints['completeness'] = round(keypoints['labeled'] / keypoints['total'], 6) if keypoints['total'] else None
+
+        # 坐标越界检查（归一化坐标应在0-1范围内）
+        out_of_range = ((boxes[:, COL_CX] - widths / 2 < -1e-6) | (boxes[:, COL_CX] + widths / 2 > 1 + 1e-6) |
+                        (boxes[:, COL_CY] - heights / 2 < -1e-6) | (boxes[:, COL_CY] + heights / 2 > 1 + 1e-6))
+
+        stats = {
+            'dataset': self.dataset_dir,
+            'summary': {
+                'label_files': len(self.file_paths),
+                'empty_label_files': int((self.file_counts == 0).sum()),
+                'boxes': int(len(boxes)),
+                'classes': num_classes,
+                'invalid_class_ids': int((~valid).sum()),
+                'out_of_range_boxes': int(out_of_range.sum()),
+                'mean_boxes_per_image': round(float(self.file_counts.mean()), 4) if len(self.file_counts) else 0,
+            },
+            'classes': classes,
+            'splits': splits,
+            'boxes_per_image': boxes_per_image,
+            'box_width': {'histogram': _histogram(widths, HISTOGRAM_BINS, (0, 1)), 'quantiles': _quantiles(widths)},
+            'box_height': {'histogram': _histogram(heights, HISTOGRAM_BINS, (0, 1)), 'quantiles': _quantiles(heights)},
+            'box_area': {'histogram': _histogram(areas, HISTOGRAM_BINS, (0, 1)), 'quantiles': _quantiles(areas)},
+            'aspect_ratio': {'histogram': _histogram(np.log2(np.clip(aspects, 1 / 16, 16)), HISTOGRAM_BINS, (-4, 4)),
+                             'quantiles': _quantiles(aspects[aspects > 0])},
+            'keypoints': keypoints,
+        }
+
+        if image_sizes is not None and len(boxes):
+            box_sizes = np.repeat(np.asarray(image_sizes, np.float64).reshape(-1, 2), self.file_counts, axis=0)
+            known = (box_sizes[:, 0] > 0) & (box_sizes[:, 1] > 0)
+            pixel_areas = (widths * box_sizes[:, 0]) * (heights * box_sizes[:, 1])
+            pixel_areas = pixel_areas[known]
+            stats['pixel_size'] = {
+                'boxes_with_known_size': int(known.sum()),
+                'small': int((pixel_areas < SMALL_AREA).sum()),
+                'medium': int(((pixel_areas >= SMALL_AREA) & (pixel_areas < MEDIUM_AREA)).sum()),
+                'large': int((pixel_areas >= MEDIUM_AREA).sum()),
+                'area_quantiles': _quantiles(pixel_areas),
+            }
+        return stats
+
+
+def export_json(stats, path):
+    """将统计结果导出为JSON文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+
+
+def export_csv(stats, path):
+    """
+    将统计结果导出为CSV文件
+
+    每行一条记录: 分组, 名称, 指标, 数值
+    """
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['section', 'name', 'metric', 'value'])
+        for key, value in stats['summary'].items():
+            writer.writerow(['summary', '', key, value])
+        for item in stats['classes']:
+            writer.writerow(['class', item['name'], 'boxes', item['boxes']])
+            writer.writerow(['class', item['name'], 'images', item['images']])
+        for split in stats['splits']:
+            writer.writerow(['split', split['name'], 'images', split['images']])
+            writer.writerow(['split', split['name'], 'empty_images', split['empty_images']])
+            writer.writerow(['split', split['name'], 'boxes', split['boxes']])
+            for class_id, count in enumerate(split['class_boxes']):
+                name = stats['classes'][class_id]['name'] if class_id < len(stats['classes']) else str(class_id)
+                writer.writerow(['split_class', f"{split['name']}/{name}", 'boxes', count])
+        for count, images in enumerate(stats['boxes_per_image']):
+            writer.writerow(['boxes_per_image', str(count), 'images', images])
+        for section in ('box_width', 'box_height', 'box_area', 'aspect_ratio'):
+            histogram = stats[section]['histogram']
+            for i, count in enumerate(histogram['counts']):
+                bin_name = f"[{histogram['edges'][i]}, {histogram['edges'][i + 1]})"
+                writer.writerow([section, bin_name, 'count', count])
+            for name, value in stats[section]['quantiles'].items():
+                writer.writerow([section, name, 'quantile', value])
+        for key, value in stats['keypoints'].items():
+            writer.writerow(['keypoints', '', key, value])
+        for key, value in stats.get('pixel_size', {}).items():
+            if isinstance(value, dict):
+                for name, item in value.items():
+                    writer.writerow(['pixel_size', name, key, item])
+            else:
+                writer.writerow(['pixel_size', '', key, value])
@@ -0,0 +1,311 @@
+import os
+import hashlib
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from utils.dataset_cache import get_cache_dir, file_signature, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.ImageHasher')
+
+# 哈希缓存文件名及格式版本
+HASH_CACHE_FILE = 'image_hashes.json'
+HASH_CACHE_VERSION = 1
+
+# 感知哈希参数：64位哈希（8x8）
+HASH_SIZE = 8
+PHASH_DCT_SIZE = 32
+
+# 相似图像默认的最大汉明距离
+DEFAULT_MAX_DISTANCE = 4
+
+
+def _dct_matrix(n):
+    """生成n阶DCT-II正交变换矩阵"""
+    k = np.arange(n).reshape(-1, 1)
+    i = np.arange(n).reshape(1, -1)
+    matrix = np.sqrt(2.0 / n) * np.cos(np.pi * (2 * i + 1) * k / (2 * n))
+    matrix[0, :] = np.sqrt(1.0 / n)
+    return matrix.astype(np.float32)
+
+
+_DCT_MATRIX = _dct_matrix(PHASH_DCT_SIZE)
+
+
+def _bits_to_hex(bits):
+    """将布尔数组打包为十六进制字符串"""
+    return np.packbits(bits.ravel()).tobytes().hex()
+
+
+def content_hash(path, chunk_size=1 << 20):
+    """
+    计算文件内容哈希（用于精确重复检测）
+
+    Args:
+        path (str): 文件路径
+        chunk_size (int): 每次读取的字节数
+
+    Returns:
+        str: 十六进制哈希字符串
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _load_gray(path):
+    """以降采样方式解码图像并转换为灰度图"""
+    with Image.open(path) as img:
+        # 对JPEG使用DCT域缩放，避免完整分辨率解码
+        img.draft('L', (PHASH_DCT_SIZE * 4, PHASH_DCT_SIZE * 4))
+        return img.convert('L')
+
+
+def dhash_from_gray(gray):
+    """根据灰度图计算dHash（相邻像素差分哈希）"""
+    small = gray.resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    return _bits_to_hex(pixels[:, 1:] > pixels[:, :-1])
+
+
+def phash_from_gray(gray):
+    """根据灰度图计算pHash（DCT低频系数哈希）"""
+    small = gray.resize((PHASH_DCT_SIZE, PHASH_DCT_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.float32)
+    dct = _DCT_MATRIX @ pixels @ _DCT_MATRIX.T
+    low = dct[:HASH_SIZE, :HASH_SIZE].ravel()
+    # 中值计算排除直流分量
+    median = np.median(low[1:])
+    return _bits_to_hex(low > median)
+
+
+def compute_image_hashes(path):
+    """
+    计算单张图像的内容哈希和感知哈希
+
+    该函数在进程池中执行，因此必须定义在模块顶层。
+
+    Returns:
+        tuple: (path, hashes)，失败时hashes为None
+    """
+    try:
+        gray = _load_gray(path)
+        return path, {
+            'content': content_hash(path),
+            'dhash': dhash_from_gray(gray),
+            'phash': phash_from_gray(gray),
+        }
+    except Exception as e:
+        logger.warning(f"计算图像哈希失败: {path}, 错误: {str(e)}")
+        return path, None
+
+
+def hamming_distance(hash_a, hash_b):
+    """计算两个十六进制哈希的汉明距离"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+
+class BKTree:
+    """
+    BK树，用于在汉明空间中快速查找相近的哈希值
+
+    节点结构: [哈希整数值, 条目列表, {距离: 子节点}]
+    """
+
+    def __init__(self):
+        self.root = None
+
+    def add(self, hash_value, item):
+        """添加一个哈希值（十六进制字符串）及其关联条目"""
+        value = int(hash_value, 16)
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = bin(node[0] ^ value).count('1')
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, hash_value, max_distance):
+        """
+        查找与给定哈希距离不超过max_distance的所有条目
+
+        Returns:
+            list: [(距离, 条目), ...]
+        """
+        if self.root is None:
+            return []
+
+        value = int(hash_value, 16)
+        results = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            distance = bin(node[0] ^ value).count('1')
+            if distance <= max_distance:
+                results.extend((distance, item) for item in node[1])
+            # 三角不等式剪枝
+            low = distance - max_distance
+            high = distance + max_distance
+            for child_distance, child in node[2].items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return results
+
+
+class _UnionFind:
+    """并查集，用于合并重复图像分组"""
+
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+
+class DuplicateFinder:
+    """
+    重复/近似重复图像检测器
+
+    计算内容哈希和感知哈希（在进程池中并行），哈希结果按路径+修改时间
+    缓存在数据集的缓存目录中，再次扫描时只计算新增或变化的图像。
+    """
+
+    def __init__(self, dataset_dir, max_workers=None):
+        self.dataset_dir = dataset_dir
+        self.max_workers = max_workers
+        self.cache_path = os.path.join(get_cache_dir(dataset_dir), HASH_CACHE_FILE)
+        self.hashes = {}
+
+    def _cache_key(self, path):
+        """缓存键：数据集内的图像使用相对路径，便于数据集整体移动"""
+        abs_path = os.path.abspath(path)
+        try:
+            rel_path = os.path.relpath(abs_path, os.path.abspath(self.dataset_dir))
+        except ValueError:
+            return abs_path
+        return abs_path if rel_path.startswith('..') else rel_path
+
+    def scan(self, image_paths, progress_callback=None):
+        """
+        计算（或从缓存读取）所有图像的哈希
+
+        Args:
+            image_paths (list): 图像路径列表
+            progress_callback (callable, optional): 进度回调 callback(done, total)，
+                返回False时取消扫描
+
+        Returns:
+            dict: {图像路径: {'content', 'dhash', 'phash'}}，取消时返回None
+        """
+        cache = load_json_cache(self.cache_path)
+        entries = cache.get('entries', {}) if cache.get('version') == HASH_CACHE_VERSION else {}
+
+        self.hashes = {}
+        pending = []
+        signatures = {}
+        for path in image_paths:
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            key = self._cache_key(path)
+            signatures[path] = (key, signature)
+            entry = entries.get(key)
+            if entry and entry.get('mtime') == signature[0] and entry.get('size') == signature[1]:
+                self.hashes[path] = entry
+            else:
+                pending.append(path)
+
+        total = len(image_paths)
+        done = total - len(pending)
+        logger.info(f"图像哈希缓存命中 {done} 个，需要计算 {len(pending)} 个")
+        if progress_callback and progress_callback(done, total) is False:
+            return None
+
+        canceled = False
+        if pending:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            try:
+                chunksize = max(1, min(64, len(pending) // ((self.max_workers or os.cpu_count() or 1) * 4)))
+                for path, result in executor.map(compute_image_hashes, pending, chunksize=chunksize):
+                    done += 1
+                    if result is not None:
+                        key, signature = signatures[path]
+                        result['mtime'], result['size'] = signature
+                        self.hashes[path] = result
+                        entries[key] = result
+                    if progress_callback and progress_callback(done, total) is False:
+                        canceled = True
+                        break
+            finally:
+                executor.shutdown(wait=not canceled, cancel_futures=canceled)
+
+        save_json_cache(self.cache_path, {'version': HASH_CACHE_VERSION, 'entries': entries})
+        if canceled:
+            logger.info("图像哈希扫描已取消")
+            return None
+        return self.hashes
+
+    def find_groups(self, max_distance=DEFAULT_MAX_DISTANCE, hash_type='phash'):
+        """
+        根据已扫描的哈希查找重复图像分组
+
+        内容哈希相同的图像视为完全重复；感知哈希汉明距离不超过
+        max_distance的图像视为近似重复。
+
+        Args:
+            max_distance (int): 近似重复的最大汉明距离，小于0时只检测完全重复
+            hash_type (str): 使用的感知哈希类型（'phash' 或 'dhash'）
+
+        Returns:
+            list: 重复分组列表，每个分组为包含至少两个图像路径的列表
+        """
+        paths = list(self.hashes.keys())
+        union_find = _UnionFind(len(paths))
+
+        # 完全重复：内容哈希相同
+        first_by_content = {}
+        for i, path in enumerate(paths):
+            content = self.hashes[path]['content']
+            if content in first_by_content:
+                union_find.union(first_by_content[content], i)
+            else:
+                first_by_content[content] = i
+
+        # 近似重复：在BK树中查找相近的感知哈希
+        if max_distance >= 0:
+            tree = BKTree()
+            for i, path in enumerate(paths):
+                value = self.hashes[path][hash_type]
+                for _, other in tree.search(value, max_distance):
+                    union_find.union(other, i)
+                tree.add(value, i)
+
+        groups = {}
+        for i, path in enumerate(paths):
+            groups.setdefault(union_find.find(i), []).append(path)
+
+        duplicate_groups = [sorted(group) for group in groups.values() if len(group) > 1]
+        logger.info(f"找到 {len(duplicate_groups)} 组重复图像，"
+                    f"共 {sum(len(g) for g in duplicate_groups)} 张")
+        return duplicate_groups
@@ -0,0 +1,130 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from utils.dataset_cache import get_cache_dir, file_signature, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.ImageInfo')
+
+# 图像尺寸缓存文件名及格式版本
+SIZE_CACHE_FILE = 'image_sizes.json'
+SIZE_CACHE_VERSION = 1
+
+# EXIF方向标签
+EXIF_ORIENTATION_TAG = 0x0112
+
+# 新增多少条记录后自动保存一次缓存
+SIZE_SAVE_INTERVAL = 1000
+
+
+def read_image_header(path):
+    """
+    只读取图像文件头获取尺寸和EXIF方向，不解码像素数据
+
+    返回的宽高是文件中存储的原始尺寸（与QPixmap直接加载的尺寸一致），
+    YOLO坐标的归一化均基于该尺寸。
+
+    Args:
+        path (str): 图像路径
+
+    Returns:
+        tuple: (宽度, 高度, EXIF方向)，方向未知时为1；读取失败时返回None
+    """
+    try:
+        with Image.open(path) as img:
+            width, height = img.size
+            orientation = 1
+            try:
+                orientation = int(img.getexif().get(EXIF_ORIENTATION_TAG, 1))
+            except Exception:
+                pass
+            return width, height, orientation
+    except Exception as e:
+        logger.warning(f"读取图像文件头失败: {path}, 错误: {str(e)}")
+        return None
+
+
+def oriented_size(width, height, orientation):
+    """按EXIF方向校正后的显示尺寸（方向5-8需要交换宽高）"""
+    if orientation in (5, 6, 7, 8):
+        return height, width
+    return width, height
+
+
+class ImageSizeCache:
+    """
+    持久化的图像尺寸缓存
+
+    按数据集内相对路径记录图像的修改时间、文件大小、宽高和EXIF方向，
+    批量统计、导出和自动标注写回时无需解码图像即可得到归一化所需的尺寸。
+
+    该类是线程安全的。
+    """
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = os.path.abspath(dataset_dir)
+        self.cache_path = os.path.join(get_cache_dir(dataset_dir), SIZE_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        cache = load_json_cache(self.cache_path)
+        self.entries = cache.get('entries', {}) if cache.get('version') == SIZE_CACHE_VERSION else {}
+
+    def _key(self, path):
+        rel_path = os.path.relpath(os.path.abspath(path), self.dataset_dir)
+        return rel_path.replace(os.sep, '/')
+
+    def get_info(self, path):
+        """
+        获取图像的尺寸和EXIF方向
+
+        Returns:
+            tuple: (宽度, 高度, EXIF方向)，无法读取时返回None
+        """
+        signature = file_signature(path)
+        if signature is None:
+            return None
+        key = self._key(path)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is not None and entry[0] == signature[0] and entry[1] == signature[1]:
+            return tuple(entry[2:5])
+
+        info = read_image_header(path)
+        if info is None:
+            return None
+        with self._lock:
+            self.entries[key] = [signature[0], signature[1], *info]
+            self._unsaved += 1
+            if self._unsaved >= SIZE_SAVE_INTERVAL:
+                self._save_locked()
+        return info
+
+    def get_size(self, path):
+        """获取图像的原始宽高 (width, height)，无法读取时返回None"""
+        info = self.get_info(path)
+        return info[:2] if info else None
+
+    def get_sizes(self, paths, max_workers=8):
+        """
+        批量获取图像尺寸，未缓存的图像在线程池中读取文件头
+
+        Returns:
+            dict: {图像路径: (宽度, 高度)}，无法读取的图像不包含在结果中
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            sizes = dict(zip(paths, executor.map(self.get_size, paths)))
+        return {path: size for path, size in sizes.items() if size is not None}
+
+    def _save_locked(self):
+        save_json_cache(self.cache_path, {'version': SIZE_CACHE_VERSION, 'entries': self.entries})
+        self._unsaved = 0
+
+    def save(self):
+        """保存缓存"""
+        with self._lock:
+            if self._unsaved:
+                self._save_locked()
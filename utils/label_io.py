@@ -0,0 +1,94 @@
+import logging
+import numpy as np
+
+from models.bounding_box import BoundingBox
+
+logger = logging.getLogger('YOLOLabelCreator.LabelIO')
+
+
+def parse_label_lines(lines, img_width, img_height):
+    """
+    解析YOLO格式标签行
+
+    Args:
+        lines (iterable): 标签文件的文本行
+        img_width (int): 图像宽度
+        img_height (int): 图像高度
+
+    Returns:
+        list: BoundingBox列表（像素坐标），格式错误的行会被跳过
+    """
+    boxes = []
+    for line in lines:
+        line = line.strip()
+        if not line:  # 跳过空行
+            continue
+
+        parts = line.split()
+        if len(parts) < 5:  # 至少需要类别和边界框坐标
+            logger.warning(f"格式错误的标注行: {line}")
+            continue
+
+        try:
+            # 解析YOLO格式数据
+            class_id = int(parts[0])
+            x_center = float(parts[1])
+            y_center = float(parts[2])
+            width = float(parts[3])
+            height = float(parts[4])
+
+            # 转换为像素坐标
+            x1 = (x_center - width / 2) * img_width
+            y1 = (y_center - height / 2) * img_height
+            x2 = (x_center + width / 2) * img_width
+            y2 = (y_center + height / 2) * img_height
+
+            box = BoundingBox(x1, y1, x2, y2, class_id)
+
+            # 检查是否有关键点数据（每个点有x、y两个坐标值）
+            keypoints_data = parts[5:]
+            if keypoints_data and len(keypoints_data) % 2 == 0:
+                keypoints = []
+                for i in range(len(keypoints_data) // 2):
+                    try:
+                        kp_x = float(keypoints_data[i * 2]) * img_width
+                        kp_y = float(keypoints_data[i * 2 + 1]) * img_height
+                        keypoints.append([kp_x, kp_y])
+                    except (ValueError, IndexError) as e:
+                        logger.warning(f"解析关键点坐标时出错 #{i}: {str(e)}")
+                if keypoints:
+                    box.set_keypoints(np.array(keypoints))
+
+            boxes.append(box)
+        except ValueError as e:
+            logger.warning(f"解析标注数据时出错: {str(e)}, 行: {line}")
+    return boxes
+
+
+def read_label_file(label_path, img_width, img_height):
+    """读取YOLO格式标签文件，返回BoundingBox列表"""
+    with open(label_path, 'r', encoding='utf-8') as f:
+        return parse_label_lines(f, img_width, img_height)
+
+
+def format_label_lines(boxes, img_width, img_height):
+    """
+    将边界框转换为YOLO格式标签文本
+
+    YOLO格式：每行表示一个边界框，格式为 "class_id x_center y_center width height [keypoints...]"，
+    所有坐标都是归一化的（0-1范围）
+
+    Returns:
+        str: 标签文件内容
+    """
+    lines = []
+    for box in boxes:
+        yolo_box = box.to_yolo_format(img_width, img_height)
+        line = f"{yolo_box[0]} {yolo_box[1]:.6f} {yolo_box[2]:.6f} {yolo_box[3]:.6f} {yolo_box[4]:.6f}"
+
+        # 有特征点数据时将其归一化后添加到行末
+        if box.has_keypoints():
+            for kp in box.keypoints:
+                line += f" {kp[0] / img_width:.6f} {kp[1] / img_height:.6f}"
+        lines.append(line + "\n")
+    return "".join(lines)
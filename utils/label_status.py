@@ -0,0 +1,190 @@
+import os
+import logging
+import threading
+
+from utils.dataset_cache import get_cache_dir, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.LabelStatus')
+
+# 标注状态索引缓存文件名及格式版本
+STATUS_CACHE_FILE = 'label_status.json'
+STATUS_CACHE_VERSION = 1
+
+# 标注状态类别
+STATUS_UNLABELED = 'unlabeled'    # 没有标签文件
+STATUS_EMPTY = 'empty'            # 标签文件为空
+STATUS_LABELED = 'labeled'        # 人工标注
+STATUS_PREDICTED = 'predicted'    # 含有自动标注（模型预测）的边界框
+
+# 低置信度筛选的默认阈值
+LOW_CONFIDENCE_THRESHOLD = 0.5
+
+
+def label_dir_for(image_dir):
+    """图像文件夹对应的标签文件夹（与图像文件夹同级的labels目录）"""
+    return os.path.join(os.path.dirname(image_dir), "labels")
+
+
+def label_path_for(image_path):
+    """图像对应的YOLO标签文件路径（不会创建目录）"""
+    base_name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.normpath(os.path.join(label_dir_for(os.path.dirname(image_path)), f"{base_name}.txt"))
+
+
+def count_label_lines(label_path):
+    """统计标签文件中的边界框数量（非空行数）"""
+    with open(label_path, 'rb') as f:
+        return sum(1 for line in f if line.strip())
+
+
+class LabelStatusIndex:
+    """
+    标注状态索引
+
+    按标签文件夹记录每个标签文件的修改时间、边界框数量、是否包含自动标注
+    以及自动标注的最低置信度。一次后台扫描建立索引（修改时间未变化的条目
+    直接复用缓存），保存标注时增量更新，之后查询图像状态无需访问磁盘。
+
+    YOLO标签文件本身不保存置信度，因此自动标注信息只能来自本程序保存时的
+    记录；标签文件被其他工具修改后该信息会被清除。
+    """
+
+    def __init__(self, dataset_dir):
+        self.dataset_dir = os.path.abspath(dataset_dir)
+        self.cache_path = os.path.join(get_cache_dir(dataset_dir), STATUS_CACHE_FILE)
+        self._lock = threading.Lock()
+        self._dirty = False
+
+        cache = load_json_cache(self.cache_path)
+        if cache.get('version') == STATUS_CACHE_VERSION:
+            self._cached = cache.get('folders', {})
+        else:
+            self._cached = {}
+        # 本次运行中已扫描的文件夹: {文件夹键: {标签基本名: [mtime_ns, 边界框数量, 是否自动标注, 最低置信度]}}
+        self._folders = {}
+        # 所在文件夹尚未扫描完成时保存的标注，扫描结束后合并
+        self._pending = {}
+
+    def _folder_key(self, labels_dir):
+        rel_path = os.path.relpath(os.path.abspath(labels_dir), self.dataset_dir)
+        return rel_path.replace(os.sep, '/')
+
+    def is_scanned(self, image_dir):
+        with self._lock:
+            return self._folder_key(label_dir_for(image_dir)) in self._folders
+
+    def scan_folder(self, image_dir, should_stop=None):
+        """
+        扫描图像文件夹对应的标签文件夹，建立该文件夹的状态索引
+
+        只对标签文件夹执行一次scandir，修改时间未变化的标签文件不会重新读取。
+
+        Args:
+            image_dir (str): 图像文件夹
+            should_stop (callable, optional): 返回True时中止扫描
+
+        Returns:
+            bool: 扫描是否完成
+        """
+        labels_dir = label_dir_for(image_dir)
+        key = self._folder_key(labels_dir)
+        with self._lock:
+            cached = dict(self._cached.get(key, {}))
+
+        entries = {}
+        reused = 0
+        try:
+            with os.scandir(labels_dir) as it:
+                for entry in it:
+                    if should_stop and should_stop():
+                        return False
+                    name = entry.name
+                    if not name.endswith('.txt') or name == 'classes.txt':
+                        continue
+                    base_name = name[:-4]
+                    try:
+                        mtime = entry.stat().st_mtime_ns
+                        old = cached.get(base_name)
+                        if old is not None and old[0] == mtime:
+                            entries[base_name] = old
+                            reused += 1
+                        else:
+                            entries[base_name] = [mtime, count_label_lines(entry.path), False, None]
+                    except OSError as e:
+                        logger.warning(f"读取标签文件失败: {entry.path}, 错误: {str(e)}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"扫描标签文件夹失败: {labels_dir}, 错误: {str(e)}")
+            return False
+
+        with self._lock:
+            # 扫描期间保存的标注以较新的记录为准
+            for base_name, entry in self._pending.pop(key, {}).items():
+                if base_name not in entries or entry[0] >= entries[base_name][0]:
+                    entries[base_name] = entry
+            self._folders[key] = entries
+            if entries:
+                self._cached[key] = entries
+            else:
+                self._cached.pop(key, None)
+            self._dirty = True
+        logger.info(f"标注状态索引已建立: {labels_dir}，共 {len(entries)} 个标签文件（复用缓存 {reused} 个）")
+        return True
+
+    def status(self, image_dir, image_name):
+        """
+        查询图像的标注状态（只查内存索引）
+
+        Returns:
+            tuple: (状态类别, 边界框数量, 自动标注最低置信度或None)，
+                文件夹尚未扫描时返回None
+        """
+        base_name = os.path.splitext(image_name)[0]
+        with self._lock:
+            folder = self._folders.get(self._folder_key(label_dir_for(image_dir)))
+            if folder is None:
+                return None
+            entry = folder.get(base_name)
+        if entry is None:
+            return (STATUS_UNLABELED, 0, None)
+        _, boxes, auto, min_conf = entry
+        if boxes == 0:
+            return (STATUS_EMPTY, 0, None)
+        return (STATUS_PREDICTED if auto else STATUS_LABELED, boxes, min_conf)
+
+    def update(self, image_path, boxes):
+        """
+        保存标注后更新索引
+
+        Args:
+            image_path (str): 图像路径
+            boxes (list): 已保存的边界框列表（BoundingBox），置信度小于1的视为自动标注
+        """
+        label_path = label_path_for(image_path)
+        try:
+            mtime = os.stat(label_path).st_mtime_ns
+        except OSError:
+            return
+        predicted = [box.confidence for box in boxes if box.confidence < 1.0]
+        entry = [mtime, len(boxes), bool(predicted), min(predicted) if predicted else None]
+        key = self._folder_key(os.path.dirname(label_path))
+        base_name = os.path.splitext(os.path.basename(label_path))[0]
+        with self._lock:
+            folder = self._folders.get(key)
+            if folder is None:
+                self._pending.setdefault(key, {})[base_name] = entry
+                self._cached.setdefault(key, {})[base_name] = entry
+            else:
+                folder[base_name] = entry
+            self._dirty = True
+
+    def save(self):
+        """将索引写入缓存目录"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {'version': STATUS_CACHE_VERSION, 'folders': self._cached}
+            self._dirty = False
+            # 在锁内序列化，避免扫描线程同时修改
+            save_json_cache(self.cache_path, data)
@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import threading
+
+logger = logging.getLogger('YOLOLabelCreator.LabelWriter')
+
+# 提交后延迟多久再写入磁盘（秒），期间对同一文件的多次提交只写最后一次
+DEFAULT_WRITE_DELAY = 0.5
+
+
+def write_file_atomic(path, content):
+    """
+    原子方式写入文本文件
+
+    先写入同目录下的临时文件再替换目标文件，程序崩溃时不会留下写了一半的文件。
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LabelWriter:
+    """
+    延迟合并的后台标签写入器
+
+    标签内容在界面线程中格式化后提交，按文件路径合并：同一文件在写入前
+    被多次提交时只写出最后一次的内容。工作线程在最后一次提交后等待一小段
+    时间再批量写入，所有文件都以原子方式写入。
+
+    写入完成（或失败）后调用回调函数 on_written(image_path, path, version, error)，
+    非标签文件（如classes.txt）的image_path为None。注意回调在工作线程中执行。
+    """
+
+    def __init__(self, on_written=None, delay=DEFAULT_WRITE_DELAY):
+        self.on_written = on_written
+        self.delay = delay
+        self._pending = {}
+        self._last_submit = 0.0
+        self._writing = 0
+        self._flush_requested = False
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='LabelWriter', daemon=True)
+        self._thread.start()
+
+    def submit(self, path, content, image_path=None, version=None):
+        """
+        提交一个文件写入任务（覆盖同一路径上尚未写入的内容）
+
+        Args:
+            path (str): 目标文件路径
+            content (str): 文件内容
+            image_path (str, optional): 标签对应的图像路径
+            version (int, optional): 标注修改版本号，原样传给回调
+        """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("LabelWriter已关闭")
+            self._pending.pop(path, None)
+            self._pending[path] = (content, image_path, version)
+            self._last_submit = time.monotonic()
+            self._condition.notify_all()
+
+    def is_pending(self, path):
+        with self._condition:
+            return path in self._pending
+
+    def flush(self):
+        """立即写出所有待写入的文件并等待完成"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._pending or self._writing:
+                self._condition.wait()
+            self._flush_requested = False
+
+    def close(self):
+        """写出剩余文件并结束工作线程"""
+        self.flush()
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                # 等待提交，并在最后一次提交后延迟一段时间再写入
+                while True:
+                    if self._closed and not self._pending:
+                        return
+                    if self._pending:
+                        remaining = self._last_submit + self.delay - time.monotonic()
+                        if self._flush_requested or self._closed or remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                batch = self._pending
+                self._pending = {}
+                self._writing = len(batch)
+
+            for path, (content, image_path, version) in batch.items():
+                error = None
+                try:
+                    write_file_atomic(path, content)
+                except OSError as e:
+                    error = e
+                    logger.error(f"写入文件失败: {path}, 错误: {str(e)}")
+                if self.on_written:
+                    try:
+                        self.on_written(image_path, path, version, error)
+                    except Exception as e:
+                        logger.error(f"标签写入回调失败: {str(e)}")
+
+            with self._condition:
+                self._writing = 0
+                self._condition.notify_all()
+            logger.debug(f"批量写入 {len(batch)} 个文件")
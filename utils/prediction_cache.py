@@ -0,0 +1,134 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from utils.dataset_cache import file_signature
+from utils.image_hasher import content_hash
+
+logger = logging.getLogger('YOLOLabelCreator.PredictionCache')
+
+# 预测缓存子目录名称及格式版本
+PREDICTION_CACHE_DIR = 'predictions'
+PREDICTION_CACHE_VERSION = 1
+
+# 内存中保留的原始预测结果数量
+MEMORY_CACHE_SIZE = 256
+
+
+class RawPredictions:
+    """
+    一张图像的原始候选检测结果（低置信度阈值、宽松NMS）
+
+    坐标为原始图像像素坐标，调整置信度/IoU阈值时直接在这些候选框上重新过滤，
+    无需再次推理。
+    """
+
+    __slots__ = ('boxes', 'scores', 'classes', 'keypoints')
+
+    def __init__(self, boxes, scores, classes, keypoints=None):
+        self.boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        self.scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        self.classes = np.asarray(classes, dtype=np.int32).reshape(-1)
+        self.keypoints = None if keypoints is None else np.asarray(keypoints, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.scores)
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4)), np.empty(0), np.empty(0))
+
+
+class PredictionCache:
+    """
+    磁盘上的原始预测缓存
+
+    按 (模型键, 图像内容哈希) 保存RawPredictions，模型键由调用方根据模型文件哈希、
+    输入尺寸等推理参数生成。图像内容哈希按文件修改时间和大小缓存在内存中，
+    同一会话中不会重复计算。
+    """
+
+    def __init__(self, cache_dir):
+        self.root = os.path.join(cache_dir, PREDICTION_CACHE_DIR)
+        self._image_hashes = {}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def image_hash(self, image_path):
+        """获取图像内容哈希（文件未变化时使用内存中的结果）"""
+        signature = file_signature(image_path)
+        if signature is None:
+            return None
+        with self._lock:
+            cached = self._image_hashes.get(image_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        digest = content_hash(image_path)
+        with self._lock:
+            self._image_hashes[image_path] = (signature, digest)
+        return digest
+
+    def _path(self, model_key, digest):
+        return os.path.join(self.root, model_key, digest[:2], f"{digest}.npz")
+
+    def get(self, model_key, image_path):
+        """读取缓存的原始预测结果，不存在时返回None"""
+        digest = self.image_hash(image_path)
+        if digest is None:
+            return None
+        key = (model_key, digest)
+        with self._lock:
+            raw = self._memory.get(key)
+            if raw is not None:
+                self._memory.move_to_end(key)
+                return raw
+
+        path = self._path(model_key, digest)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                if int(data['version']) != PREDICTION_CACHE_VERSION:
+                    return None
+                raw = RawPredictions(data['boxes'], data['scores'], data['classes'],
+                                     data['keypoints'] if 'keypoints' in data.files else None)
+        except Exception as e:
+            logger.warning(f"读取预测缓存失败: {path}, 错误: {str(e)}")
+            return None
+        self._remember(key, raw)
+        return raw
+
+    def put(self, model_key, image_path, raw):
+        """保存原始预测结果（原子写入）"""
+        digest = self.image_hash(image_path)
+        if digest is None:
+            return
+        self._remember((model_key, digest), raw)
+
+        path = self._path(model_key, digest)
+        arrays = {'version': np.array(PREDICTION_CACHE_VERSION), 'boxes': raw.boxes,
+                  'scores': raw.scores, 'classes': raw.classes}
+        if raw.keypoints is not None:
+            arrays['keypoints'] = raw.keypoints
+        tmp_path = f"{path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.error(f"写入预测缓存失败: {path}, 错误: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _remember(self, key, raw):
+        with self._lock:
+            self._memory[key] = raw
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_CACHE_SIZE:
+                self._memory.popitem(last=False)
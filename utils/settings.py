@@ -18,7 +18,9 @@ DEFAULT_SHORTCUTS = {
     'exit': 'Ctrl+Q',
     'auto_label': 'Ctrl+A',
     'auto_label_all': 'Ctrl+Shift+A',
-    'toggle_keypoint_mode': 'Ctrl+K'
+    'toggle_keypoint_mode': 'Ctrl+K',
+    'undo': 'Ctrl+Z',
+    'redo': 'Ctrl+Y'
 }
 
 # 默认模型预测参数
@@ -30,7 +32,16 @@ DEFAULT_MODEL_PARAMS = {
     "enable_auto_predict": False,
     "device": "cpu",
     "model_version": "yolov8",
-    "model_format": "pt"
+    "model_format": "pt",
+    "merge_policy": "add_new"
+}
+
+# 画布细节层次阈值（屏幕像素，按边界框较短边计算）
+DEFAULT_RENDER_PARAMS = {
+    "label_min_size": 40,           # 小于该值时不绘制类别标签，改为在左上角按类别汇总
+    "keypoint_label_min_size": 48,  # 小于该值时不绘制特征点编号
+    "keypoint_min_size": 12,        # 小于该值时特征点绘制为单像素点
+    "handle_min_size": 16           # 选中的边界框小于该值时不绘制控制点
 }
 
 class Settings:
@@ -49,6 +60,7 @@ class Settings:
         self.app_dir = app_dir
         self.settings_file = os.path.join(app_dir, 'config', 'settings.json')
         self.shortcuts = DEFAULT_SHORTCUTS.copy()
+        self.render_params = DEFAULT_RENDER_PARAMS.copy()
         self.qsettings = QSettings()
         
         # 加载设置
@@ -70,6 +82,10 @@ class Settings:
                         for key, value in data['shortcuts'].items():
                             if key in self.shortcuts:
                                 self.shortcuts[key] = value
+                    if 'render' in data:
+                        for key, value in data['render'].items():
+                            if key in self.render_params:
+                                self.render_params[key] = int(value)
                 logger.info(f"已从 {self.settings_file} 加载设置")
             else:
                 logger.info("未找到设置文件，使用默认设置")
@@ -81,7 +97,8 @@ class Settings:
         """保存设置到文件"""
         try:
             data = {
-                'shortcuts': self.shortcuts
+                'shortcuts': self.shortcuts,
+                'render': self.render_params
             }
             with open(self.settings_file, 'w', encoding='utf-8') as f:
                 json.dump(data, f, indent=4, ensure_ascii=False)
@@ -92,6 +109,16 @@ class Settings:
             logger.error(f"保存设置时出错: {str(e)}")
             return False
     
+    def get_render_params(self):
+        """获取画布细节层次阈值"""
+        return self.render_params.copy()
+    
+    def set_render_params(self, params):
+        """设置画布细节层次阈值（需调用save_settings保存）"""
+        for key, value in params.items():
+            if key in self.render_params:
+                self.render_params[key] = int(value)
+    
     def get_shortcut(self, action_name):
         """获取指定操作的快捷键"""
         return self.shortcuts.get(action_name, '')
@@ -120,7 +147,8 @@ class Settings:
             "device": self.qsettings.value("model/device", "cpu"),
             "model_version": self.qsettings.value("model/model_version", "yolov8"),
             "model_format": self.qsettings.value("model/model_format", "pt"),
-            "keypoints_number": int(self.qsettings.value("model/keypoints_number", 0))
+            "keypoints_number": int(self.qsettings.value("model/keypoints_number", 0)),
+            "merge_policy": self.qsettings.value("model/merge_policy", "add_new")
         }
         return params
     
@@ -147,6 +175,7 @@ class Settings:
         self.qsettings.setValue("model/model_version", params.get("model_version", "yolov8"))
         self.qsettings.setValue("model/model_format", params.get("model_format", "pt"))
         self.qsettings.setValue("model/keypoints_number", int(params.get("keypoints_number", 0)))
+        self.qsettings.setValue("model/merge_policy", params.get("merge_policy", "add_new"))
         self.qsettings.sync()
         return True
     
@@ -0,0 +1,317 @@
+import io
+import os
+import mmap
+import shutil
+import json
+import logging
+import tarfile
+import threading
+
+import yaml
+
+from utils.dataset_cache import file_signature, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.ShardPack')
+
+# 数据包格式版本（写入数据包的data.yaml，用于识别数据包）
+PACK_VERSION = 1
+PACK_YAML_KEY = 'shard_pack'
+
+# 每个划分目录中的索引文件及分片文件名
+INDEX_FILE = 'index.json'
+SHARD_NAME = 'shard-{:06d}.tar'
+
+# 单个分片的目标大小（字节），超过后开始写下一个分片
+DEFAULT_SHARD_BYTES = 256 * 1024 * 1024
+
+# tar文件块大小
+TAR_BLOCK = tarfile.BLOCKSIZE
+
+# 解包目录中记录已解包索引的文件
+UNPACK_MANIFEST = '.unpacked.json'
+
+SPLIT_KEYS = ('train', 'val', 'test')
+
+
+def _padded(size):
+    return (size + TAR_BLOCK - 1) // TAR_BLOCK * TAR_BLOCK
+
+
+class ShardWriter:
+    """
+    分片数据包写入器（一个划分）
+
+    样本写入未压缩的tar分片（WebDataset风格，成员名为 <key>.<扩展名> 和 <key>.txt），
+    同时记录每个成员数据在分片中的偏移和长度，写入index.json，读取时通过mmap随机访问。
+    """
+
+    def __init__(self, output_dir, shard_bytes=DEFAULT_SHARD_BYTES):
+        self.output_dir = output_dir
+        self.shard_bytes = shard_bytes
+        self.shards = []
+        self.samples = []
+        self.keys = set()
+        self.tar = None
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _open_shard(self):
+        name = SHARD_NAME.format(len(self.shards))
+        self.shards.append(name)
+        self.tar = tarfile.open(os.path.join(self.output_dir, name), 'w', format=tarfile.PAX_FORMAT)
+
+    def _add_member(self, name, data, mtime):
+        """写入一个成员，返回其数据在分片中的偏移"""
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = mtime
+        self.tar.addfile(info, io.BytesIO(data))
+        # addfile之后offset位于数据（按块补齐）之后；扩展头的长度不固定，因此从末尾倒推
+        return self.tar.offset - _padded(len(data))
+
+    def add(self, key, image_data, image_ext, label_data=None, mtime=0):
+        """
+        添加一个样本
+
+        Args:
+            key (str): 样本键（同一划分内唯一）
+            image_data (bytes): 图像文件内容
+            image_ext (str): 图像扩展名（如 .jpg）
+            label_data (bytes, optional): 标签文件内容，没有标签时为None
+            mtime (float): 写入tar成员的修改时间
+        """
+        if key in self.keys:
+            raise ValueError(f"重复的样本键: {key}")
+        if self.tar is None or self.tar.offset >= self.shard_bytes:
+            self.close_shard()
+            self._open_shard()
+        self.keys.add(key)
+        shard = len(self.shards) - 1
+        image_offset = self._add_member(f"{key}{image_ext.lower()}", image_data, mtime)
+        label_offset, label_size = -1, 0
+        if label_data is not None:
+            label_offset = self._add_member(f"{key}.txt", label_data, mtime)
+            label_size = len(label_data)
+        self.samples.append([key, shard, image_ext.lower(), image_offset, len(image_data), label_offset, label_size])
+
+    def add_files(self, key, image_path, label_path=None):
+        """从文件添加一个样本（每个文件只打开一次，顺序读取）"""
+        with open(image_path, 'rb') as f:
+            image_data = f.read()
+        label_data = None
+        if label_path and os.path.exists(label_path):
+            with open(label_path, 'rb') as f:
+                label_data = f.read()
+        mtime = os.path.getmtime(image_path)
+        self.add(key, image_data, os.path.splitext(image_path)[1], label_data, mtime)
+
+    def close_shard(self):
+        if self.tar is not None:
+            self.tar.close()
+            self.tar = None
+
+    def close(self):
+        """结束写入并保存索引"""
+        self.close_shard()
+        index = {'version': PACK_VERSION, 'shards': self.shards, 'samples': self.samples}
+        tmp_path = os.path.join(self.output_dir, f"{INDEX_FILE}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(self.output_dir, INDEX_FILE))
+        logger.info(f"已写入数据包: {self.output_dir}, {len(self.samples)} 个样本, {len(self.shards)} 个分片")
+
+
+class ShardReader:
+    """
+    分片数据包读取器（一个划分）
+
+    读取index.json后按需mmap分片文件，按样本键或序号随机读取图像和标签，
+    每次读取只是一次内存切片，没有逐文件的打开开销。可在多个线程中共用。
+    """
+
+    def __init__(self, split_dir):
+        self.split_dir = split_dir
+        with open(os.path.join(split_dir, INDEX_FILE), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get('version') != PACK_VERSION:
+            raise ValueError(f"不支持的数据包版本: {index.get('version')}")
+        self.shards = index['shards']
+        self.samples = index['samples']
+        self.positions = {sample[0]: i for i, sample in enumerate(self.samples)}
+        self._maps = {}
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.samples)
+
+    def keys(self):
+        return [sample[0] for sample in self.samples]
+
+    def _sample(self, key_or_index):
+        if isinstance(key_or_index, int):
+            return self.samples[key_or_index]
+        return self.samples[self.positions[key_or_index]]
+
+    def _map(self, shard):
+        mapped = self._maps.get(shard)
+        if mapped is not None:
+            return mapped
+        with self._lock:
+            mapped = self._maps.get(shard)
+            if mapped is None:
+                f = open(os.path.join(self.split_dir, self.shards[shard]), 'rb')
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._files[shard] = f
+                self._maps[shard] = mapped
+        return mapped
+
+    def image_name(self, key_or_index):
+        """样本的图像文件名（键加扩展名）"""
+        sample = self._sample(key_or_index)
+        return f"{sample[0]}{sample[2]}"
+
+    def image_bytes(self, key_or_index):
+        _, shard, _, offset, size, _, _ = self._sample(key_or_index)
+        return self._map(shard)[offset:offset + size]
+
+    def label_bytes(self, key_or_index):
+        """标签文件内容，样本没有标签时返回None"""
+        _, shard, _, _, _, offset, size = self._sample(key_or_index)
+        if offset < 0:
+            return None
+        return self._map(shard)[offset:offset + size]
+
+    def label_text(self, key_or_index):
+        data = self.label_bytes(key_or_index)
+        return None if data is None else data.decode('utf-8')
+
+    def close(self):
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            for f in self._files.values():
+                f.close()
+            self._maps.clear()
+            self._files.clear()
+
+
+def is_pack_yaml(path):
+    """判断data.yaml是否为分片数据包的描述文件"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f)
+    except Exception:
+        return False
+    return isinstance(data, dict) and data.get(PACK_YAML_KEY) == PACK_VERSION
+
+
+def write_pack_yaml(output_dir, splits, fields):
+    """
+    写入数据包的data.yaml
+
+    Args:
+        output_dir (str): 数据包根目录
+        splits (list): 包含的划分名称
+        fields (dict): 其他YOLO数据集字段（nc、names、kpt_shape等）
+
+    Returns:
+        str: data.yaml路径
+    """
+    data = {PACK_YAML_KEY: PACK_VERSION}
+    data.update({key: value for key, value in fields.items() if key not in SPLIT_KEYS and key != 'path'})
+    for split in splits:
+        data[split] = split
+    path = os.path.join(output_dir, 'data.yaml')
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    return path
+
+
+def open_pack(pack_yaml):
+    """
+    打开分片数据包
+
+    Returns:
+        tuple: (data.yaml内容, {划分名称: ShardReader})
+    """
+    with open(pack_yaml, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    root = os.path.dirname(os.path.abspath(pack_yaml))
+    readers = {}
+    for split in SPLIT_KEYS:
+        if data.get(split):
+            readers[split] = ShardReader(os.path.join(root, data[split]))
+    return data, readers
+
+
+def _index_signatures(root, data):
+    return {split: list(file_signature(os.path.join(root, data[split], INDEX_FILE)) or [])
+            for split in SPLIT_KEYS if data.get(split)}
+
+
+def unpack_pack(pack_yaml, dest_dir, progress=None):
+    """
+    将分片数据包解包为普通的YOLO数据集目录（images/labels），返回解包后的data.yaml路径
+
+    每个分片顺序读取一次，适合先从网络存储解包到本地磁盘再训练。
+    数据包索引未变化时直接使用已解包的结果；索引变化时先删除各划分已解包的
+    images/labels目录再重新解包，避免残留已移到其他划分或已删除的样本。
+
+    Args:
+        pack_yaml (str): 数据包的data.yaml
+        dest_dir (str): 解包目录
+        progress (callable, optional): progress(已完成数量, 总数量)
+    """
+    data, readers = open_pack(pack_yaml)
+    root = os.path.dirname(os.path.abspath(pack_yaml))
+    manifest_path = os.path.join(dest_dir, UNPACK_MANIFEST)
+    signatures = _index_signatures(root, data)
+    dest_yaml = os.path.join(dest_dir, 'data.yaml')
+    try:
+        if load_json_cache(manifest_path).get('indexes') == signatures and os.path.exists(dest_yaml):
+            logger.info(f"数据包未变化，使用已解包的数据集: {dest_dir}")
+            return dest_yaml
+
+        # 先删除清单，解包中断时下次会重新解包
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+        for split in SPLIT_KEYS:
+            for subdir in ('images', 'labels'):
+                stale_dir = os.path.join(dest_dir, split, subdir)
+                if os.path.isdir(stale_dir):
+                    shutil.rmtree(stale_dir)
+
+        total = sum(len(reader) for reader in readers.values())
+        done = 0
+        fields = {key: value for key, value in data.items() if key not in SPLIT_KEYS and key != PACK_YAML_KEY}
+        fields['path'] = os.path.abspath(dest_dir)
+        for split, reader in readers.items():
+            image_dir = os.path.join(dest_dir, split, 'images')
+            label_dir = os.path.join(dest_dir, split, 'labels')
+            os.makedirs(image_dir, exist_ok=True)
+            os.makedirs(label_dir, exist_ok=True)
+            for i in range(len(reader)):
+                key = reader.samples[i][0]
+                image_path = os.path.join(image_dir, reader.image_name(i))
+                os.makedirs(os.path.dirname(image_path), exist_ok=True)
+                with open(image_path, 'wb') as f:
+                    f.write(reader.image_bytes(i))
+                label = reader.label_bytes(i)
+                if label is not None:
+                    label_path = os.path.join(label_dir, f"{key}.txt")
+                    os.makedirs(os.path.dirname(label_path), exist_ok=True)
+                    with open(label_path, 'wb') as f:
+                        f.write(label)
+                done += 1
+                if progress:
+                    progress(done, total)
+            fields[split] = f"{split}/images"
+
+        with open(dest_yaml, 'w', encoding='utf-8') as f:
+            yaml.safe_dump(fields, f, allow_unicode=True, sort_keys=False)
+        save_json_cache(manifest_path, {'indexes': signatures})
+        logger.info(f"数据包已解包: {pack_yaml} -> {dest_dir}, {total} 个样本")
+        return dest_yaml
+    finally:
+        for reader in readers.values():
+            reader.close()
@@ -0,0 +1,143 @@
+import os
+import logging
+import threading
+
+from utils.dataset_cache import get_cache_dir, load_json_cache, save_json_cache
+
+logger = logging.getLogger('YOLOLabelCreator.ThumbnailCache')
+
+# 缩略图打包文件及索引文件名
+THUMBNAIL_PACK_FILE = 'thumbnails.pack'
+THUMBNAIL_INDEX_FILE = 'thumbnails.idx.json'
+THUMBNAIL_CACHE_VERSION = 1
+
+# 默认缩略图边长（像素）
+DEFAULT_THUMBNAIL_SIZE = 128
+
+# 新增多少条缩略图后自动保存一次索引
+INDEX_SAVE_INTERVAL = 256
+
+# 失效数据占比超过该值时在关闭时压缩打包文件
+COMPACT_RATIO = 0.5
+
+
+class ThumbnailCache:
+    """
+    持久化缩略图缓存
+
+    所有缩略图（编码后的JPEG字节）顺序追加写入同一个打包文件，
+    索引文件记录每张图像的修改时间、大小以及在打包文件中的偏移和长度。
+    图像修改后旧数据成为失效数据，关闭时按需压缩。
+
+    该类是线程安全的，可以被多个缩略图生成线程同时使用。
+    """
+
+    def __init__(self, dataset_dir, thumbnail_size=DEFAULT_THUMBNAIL_SIZE):
+        self.dataset_dir = os.path.abspath(dataset_dir)
+        self.thumbnail_size = thumbnail_size
+        cache_dir = get_cache_dir(dataset_dir)
+        self.pack_path = os.path.join(cache_dir, THUMBNAIL_PACK_FILE)
+        self.index_path = os.path.join(cache_dir, THUMBNAIL_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+        index = load_json_cache(self.index_path)
+        if index.get('version') == THUMBNAIL_CACHE_VERSION and index.get('size') == thumbnail_size:
+            self.entries = index.get('entries', {})
+        else:
+            self.entries = {}
+
+        # 索引与打包文件不一致（例如打包文件被删除）时丢弃索引
+        pack_size = os.path.getsize(self.pack_path) if os.path.exists(self.pack_path) else 0
+        if any(offset + length > pack_size for _, _, offset, length in self.entries.values()):
+            logger.warning("缩略图索引与打包文件不一致，重建缩略图缓存")
+            self.entries = {}
+            pack_size = 0
+        self._file = open(self.pack_path, 'r+b' if pack_size else 'w+b')
+        if not self.entries:
+            self._file.truncate(0)
+        logger.info(f"缩略图缓存已打开: {self.pack_path}，共 {len(self.entries)} 条")
+
+    def _key(self, path):
+        rel_path = os.path.relpath(os.path.abspath(path), self.dataset_dir)
+        return rel_path.replace(os.sep, '/')
+
+    def get(self, path, signature):
+        """
+        读取缩略图数据
+
+        Args:
+            path (str): 图像路径
+            signature (tuple): 图像文件签名 (mtime_ns, size)
+
+        Returns:
+            bytes: 编码后的缩略图数据，缓存未命中或已失效时返回None
+        """
+        with self._lock:
+            entry = self.entries.get(self._key(path))
+            if entry is None or self._file is None or (entry[0], entry[1]) != tuple(signature):
+                return None
+            self._file.seek(entry[2])
+            return self._file.read(entry[3])
+
+    def put(self, path, signature, data):
+        """追加写入一张缩略图"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.seek(0, os.SEEK_END)
+            offset = self._file.tell()
+            self._file.write(data)
+            self.entries[self._key(path)] = [signature[0], signature[1], offset, len(data)]
+            self._unsaved += 1
+            if self._unsaved >= INDEX_SAVE_INTERVAL:
+                self._save_index_locked()
+
+    def _save_index_locked(self):
+        self._file.flush()
+        save_json_cache(self.index_path, {
+            'version': THUMBNAIL_CACHE_VERSION,
+            'size': self.thumbnail_size,
+            'entries': self.entries,
+        })
+        self._unsaved = 0
+
+    def flush(self):
+        """保存索引"""
+        with self._lock:
+            if self._file is not None and self._unsaved:
+                self._save_index_locked()
+
+    def _compact_locked(self):
+        """重写打包文件，去除失效数据"""
+        tmp_path = f"{self.pack_path}.tmp"
+        new_entries = {}
+        with open(tmp_path, 'wb') as out:
+            for key, (mtime, size, offset, length) in self.entries.items():
+                self._file.seek(offset)
+                new_entries[key] = [mtime, size, out.tell(), length]
+                out.write(self._file.read(length))
+        self._file.close()
+        os.replace(tmp_path, self.pack_path)
+        self.entries = new_entries
+        self._file = open(self.pack_path, 'r+b')
+        self._unsaved += 1
+        logger.info(f"缩略图缓存已压缩，剩余 {len(self.entries)} 条")
+
+    def close(self):
+        """保存索引并关闭打包文件，必要时先压缩"""
+        with self._lock:
+            if self._file is None:
+                return
+            try:
+                self._file.seek(0, os.SEEK_END)
+                pack_size = self._file.tell()
+                live_size = sum(entry[3] for entry in self.entries.values())
+                if pack_size and (pack_size - live_size) / pack_size > COMPACT_RATIO:
+                    self._compact_locked()
+                self._save_index_locked()
+            except Exception as e:
+                logger.error(f"关闭缩略图缓存失败: {str(e)}")
+            finally:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,214 @@
+import logging
+from collections import OrderedDict, deque
+
+import numpy as np
+
+logger = logging.getLogger('YOLOLabelCreator.UndoStack')
+
+# 每张图像最多保留的撤销步数
+DEFAULT_MAX_COMMANDS = 200
+
+# 最多保留撤销历史的图像数量（超出时丢弃最久未访问的图像的历史）
+DEFAULT_MAX_IMAGES = 100
+
+
+def box_geometry(box):
+    """边界框的坐标 (x1, y1, x2, y2)"""
+    return (box.x1, box.y1, box.x2, box.y2)
+
+
+def copy_keypoints(keypoints):
+    """复制特征点数组（特征点数组会被原地修改，记录前需要复制）"""
+    return None if keypoints is None else np.array(keypoints, copy=True)
+
+
+class EditCommand:
+    """
+    标注编辑命令的基类
+
+    命令只记录变化量（边界框索引和修改前后的值），不保存图像数据，
+    undo/redo直接作用于图像的边界框列表。
+    """
+
+    __slots__ = ()
+
+    def undo(self, boxes):
+        raise NotImplementedError
+
+    def redo(self, boxes):
+        raise NotImplementedError
+
+
+class AddBoxes(EditCommand):
+    """在index处添加一个或多个边界框"""
+
+    __slots__ = ('index', 'boxes')
+
+    def __init__(self, index, boxes):
+        self.index = index
+        self.boxes = list(boxes)
+
+    def undo(self, boxes):
+        del boxes[self.index:self.index + len(self.boxes)]
+
+    def redo(self, boxes):
+        boxes[self.index:self.index] = self.boxes
+
+
+class RemoveBox(EditCommand):
+    """删除index处的边界框"""
+
+    __slots__ = ('index', 'box')
+
+    def __init__(self, index, box):
+        self.index = index
+        self.box = box
+
+    def undo(self, boxes):
+        boxes.insert(self.index, self.box)
+
+    def redo(self, boxes):
+        del boxes[self.index]
+
+
+class ReplaceBoxes(EditCommand):
+    """用新的边界框列表替换整张图像的边界框（例如自动标注结果合并）"""
+
+    __slots__ = ('old', 'new')
+
+    def __init__(self, old, new):
+        self.old = list(old)
+        self.new = list(new)
+
+    def undo(self, boxes):
+        boxes[:] = self.old
+
+    def redo(self, boxes):
+        boxes[:] = self.new
+
+
+class ChangeGeometry(EditCommand):
+    """移动或调整边界框大小"""
+
+    __slots__ = ('index', 'old', 'new')
+
+    def __init__(self, index, old, new):
+        self.index = index
+        self.old = old
+        self.new = new
+
+    def _apply(self, boxes, geometry):
+        box = boxes[self.index]
+        box.x1, box.y1, box.x2, box.y2 = geometry
+
+    def undo(self, boxes):
+        self._apply(boxes, self.old)
+
+    def redo(self, boxes):
+        self._apply(boxes, self.new)
+
+
+class ChangeClass(EditCommand):
+    """修改边界框类别"""
+
+    __slots__ = ('index', 'old', 'new')
+
+    def __init__(self, index, old, new):
+        self.index = index
+        self.old = old
+        self.new = new
+
+    def undo(self, boxes):
+        boxes[self.index].class_id = self.old
+
+    def redo(self, boxes):
+        boxes[self.index].class_id = self.new
+
+
+class ChangeKeypoints(EditCommand):
+    """添加、移动或删除边界框的特征点（记录修改前后的特征点坐标）"""
+
+    __slots__ = ('index', 'old', 'new')
+
+    def __init__(self, index, old, new):
+        self.index = index
+        self.old = copy_keypoints(old)
+        self.new = copy_keypoints(new)
+
+    def undo(self, boxes):
+        boxes[self.index].keypoints = copy_keypoints(self.old)
+
+    def redo(self, boxes):
+        boxes[self.index].keypoints = copy_keypoints(self.new)
+
+
+class UndoHistory:
+    """单张图像的撤销/重做历史"""
+
+    __slots__ = ('undo_stack', 'redo_stack')
+
+    def __init__(self, max_commands=DEFAULT_MAX_COMMANDS):
+        self.undo_stack = deque(maxlen=max_commands)
+        self.redo_stack = deque(maxlen=max_commands)
+
+    def push(self, command):
+        """记录一次已经执行的编辑，并清空重做历史"""
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self, boxes):
+        """撤销最近一次编辑，返回被撤销的命令，没有可撤销的编辑时返回None"""
+        if not self.undo_stack:
+            return None
+        command = self.undo_stack.pop()
+        command.undo(boxes)
+        self.redo_stack.append(command)
+        return command
+
+    def redo(self, boxes):
+        """重做最近一次撤销的编辑，返回被重做的命令，没有可重做的编辑时返回None"""
+        if not self.redo_stack:
+            return None
+        command = self.redo_stack.pop()
+        command.redo(boxes)
+        self.undo_stack.append(command)
+        return command
+
+
+class UndoManager:
+    """
+    按图像保存撤销历史
+
+    切换图像后再切换回来时仍可撤销之前的编辑。历史只保存在内存中，
+    图像数量和每张图像的步数都有上限。
+    """
+
+    def __init__(self, max_images=DEFAULT_MAX_IMAGES, max_commands=DEFAULT_MAX_COMMANDS):
+        self.max_images = max_images
+        self.max_commands = max_commands
+        self._histories = OrderedDict()
+
+    def history_for(self, image_path):
+        """获取（必要时创建）图像的撤销历史"""
+        history = self._histories.get(image_path)
+        if history is None:
+            history = UndoHistory(self.max_commands)
+            self._histories[image_path] = history
+            while len(self._histories) > self.max_images:
+                self._histories.popitem(last=False)
+        else:
+            self._histories.move_to_end(image_path)
+        return history
+
+    def discard(self, image_path):
+        """丢弃图像的撤销历史（例如标注被重新从磁盘读取时）"""
+        self._histories.pop(image_path, None)
+
+    def clear(self):
+        self._histories.clear()
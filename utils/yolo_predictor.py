@@ -6,6 +6,9 @@ from i18n import tr
 import numpy as np
 from PIL import Image
 from models.bounding_box import BoundingBox
+from utils.box_ops import filter_detections
+from utils.image_hasher import content_hash
+from utils.prediction_cache import PredictionCache, RawPredictions
 
 # 尝试导入 ultralytics 包
 try:
@@ -16,12 +19,24 @@ except ImportError:
 
 logger = logging.getLogger('YOLOLabelCreator.YOLOPredictor')
 
+# 推理时使用的宽松参数：保留足够多的候选框，之后按用户设置的阈值重新过滤
+RAW_CONF_THRESHOLD = 0.01
+RAW_IOU_THRESHOLD = 0.9
+RAW_MAX_DETECTIONS = 1000
+
+# 模型未记录训练时的输入尺寸时使用的推理输入尺寸
+DEFAULT_IMGSZ = 640
+
 class YOLOPredictor:
     """
     YOLO模型预测器类
     
     用于加载YOLO模型并对图像进行目标检测预测。
     支持YOLOv8和ONNX格式的模型。
+    
+    推理时使用宽松的阈值得到原始候选框，按 (模型哈希, 图像哈希, 输入尺寸) 缓存到磁盘，
+    再按当前的置信度、IoU阈值和最大检测数量过滤。调整阈值后再次预测同一图像时
+    只需重新过滤，不需要重新推理。
     """
     
     def __init__(self):
@@ -32,6 +47,10 @@ class YOLOPredictor:
         self.device = "cpu"  # 默认使用CPU
         self.model_type = None  # 'yolov8', 'onnx'
         self.keypoints_number = 0  # 特征点数量，0表示使用模型默认值
+        self.imgsz = DEFAULT_IMGSZ  # 推理输入尺寸
+        self.model_hash = None  # 模型文件内容哈希
+        self.prediction_cache = None  # 原始预测缓存（按数据集设置）
+        self.last_raw = None  # 最近一张图像的原始候选框 (图像路径, RawPredictions)，用于阈值实时预览
         
         # 检测可用设备
         self.available_devices = ["cpu"]
@@ -59,9 +78,22 @@ class YOLOPredictor:
                 except Exception as e:
                     logger.error(f"移动模型到设备 {self.device} 失败: {str(e)}")
         if keypoints_number is not None:
+            if keypoints_number != self.keypoints_number:
+                self.last_raw = None
             self.keypoints_number = keypoints_number
             logger.info(f"设置特征点数量: {self.keypoints_number}")
     
+    def set_cache_dir(self, cache_dir):
+        """设置原始预测缓存目录，为None时不使用磁盘缓存"""
+        self.prediction_cache = PredictionCache(cache_dir) if cache_dir else None
+    
+    @property
+    def model_key(self):
+        """缓存键：模型哈希及影响推理结果的参数"""
+        if not self.model_hash:
+            return None
+        return f"{self.model_hash}_{self.imgsz}_{self.keypoints_number}"
+    
     def load_model(self, model_path):
         """加载YOLO模型"""
         if not os.path.exists(model_path):
@@ -70,6 +102,9 @@ class YOLOPredictor:
         
         try:
             logger.info(f"正在加载YOLO模型: {model_path}")
+            self.model_hash = content_hash(model_path)
+            self.last_raw = None
+            self.imgsz = DEFAULT_IMGSZ
             
             # 根据文件扩展名确定模型类型
             file_ext = os.path.splitext(model_path)[1].lower()
@@ -92,7 +127,9 @@ class YOLOPredictor:
             elif ULTRALYTICS_AVAILABLE:
                 self.model = YOLO(model_path)
                 self.model_type = 'yolov8'
-                logger.info("YOLOv8模型加载成功")
+                # 使用模型训练时的输入尺寸（与直接调用model.predict的默认行为一致）
+                self.imgsz = getattr(self.model, 'overrides', {}).get('imgsz') or DEFAULT_IMGSZ
+                logger.info(f"YOLOv8模型加载成功，输入尺寸: {self.imgsz}")
                 return True
                 
             # 不支持的模型类型
@@ -116,39 +153,104 @@ class YOLOPredictor:
         Returns:
             list: 检测到的边界框列表，每个边界框为BoundingBox对象
         """
+        raw = self.predict_raw(image_path)
+        if raw is None:
+            return []
+        return self.filter_predictions(raw)
+    
+    def predict_raw(self, image_path):
+        """
+        获取图像的原始候选检测结果（优先使用缓存）
+        
+        Returns:
+            RawPredictions: 原始候选框，预测失败时返回None
+        """
         if self.model is None:
             logger.error("模型未加载")
-            return []
+            return None
         
         if not os.path.exists(image_path):
             logger.error(f"图像文件不存在: {image_path}")
-            return []
+            return None
         
         try:
+            model_key = self.model_key
+            if self.prediction_cache and model_key:
+                raw = self.prediction_cache.get(model_key, image_path)
+                if raw is not None:
+                    logger.info(f"使用缓存的预测结果: {image_path}")
+                    self.last_raw = (image_path, raw)
+                    return raw
+            
             logger.info(f"对图像进行预测: {image_path}")
             
             # 根据模型类型选择不同的预测方法
             if self.model_type == 'onnx':
-                return self._predict_onnx(image_path)
+                raw = self._predict_onnx(image_path)
             elif self.model_type == 'yolov8':
-                return self._predict_yolov8(image_path)
+                raw = self._predict_yolov8(image_path)
             else:
                 logger.error(f"不支持的模型类型: {self.model_type}")
-                return []
+                return None
+            
+            if self.prediction_cache and model_key:
+                self.prediction_cache.put(model_key, image_path, raw)
+            self.last_raw = (image_path, raw)
+            return raw
                 
         except Exception as e:
             logger.error(f"预测失败: {str(e)}")
             logger.error(f"异常详情: {traceback.format_exc()}")
-            return []
+            return None
+    
+    def get_last_raw(self, image_path):
+        """获取内存中保留的原始候选框（仅当其属于指定图像时），否则返回None"""
+        if self.last_raw is not None and self.last_raw[0] == image_path:
+            return self.last_raw[1]
+        return None
+    
+    def filter_predictions(self, raw, conf_threshold=None, iou_threshold=None, max_detections=None):
+        """
+        按阈值过滤原始候选框（置信度过滤 + 按类别NMS + 数量限制）
+        
+        Args:
+            raw (RawPredictions): 原始候选框
+            conf_threshold, iou_threshold, max_detections: 不指定时使用当前设置
+            
+        Returns:
+            list: BoundingBox列表，按置信度从高到低排列
+        """
+        keep = filter_detections(
+            raw.boxes, raw.scores, raw.classes,
+            self.conf_threshold if conf_threshold is None else conf_threshold,
+            self.iou_threshold if iou_threshold is None else iou_threshold,
+            self.max_detections if max_detections is None else max_detections
+        )
+        predictions = []
+        for i in keep:
+            x1, y1, x2, y2 = raw.boxes[i]
+            bbox = BoundingBox(
+                x1=float(x1),
+                y1=float(y1),
+                x2=float(x2),
+                y2=float(y2),
+                class_id=int(raw.classes[i]),
+                confidence=float(raw.scores[i])
+            )
+            if raw.keypoints is not None and len(raw.keypoints[i]) > 0:
+                bbox.set_keypoints(raw.keypoints[i].astype(np.float64))
+            predictions.append(bbox)
+        return predictions
     
     def _predict_yolov8(self, image_path):
-        """使用YOLOv8模型预测"""
-        # 设置参数
+        """使用YOLOv8模型预测，返回原始候选框"""
+        # 设置参数（宽松阈值，最终结果由filter_predictions过滤）
         predict_args = {
             "source": image_path,
-            "conf": self.conf_threshold,
-            "iou": self.iou_threshold,
-            "max_det": self.max_detections,
+            "conf": RAW_CONF_THRESHOLD,
+            "iou": RAW_IOU_THRESHOLD,
+            "max_det": RAW_MAX_DETECTIONS,
+            "imgsz": self.imgsz,
             "device": self.device
         }
         
@@ -157,50 +259,29 @@ class YOLOPredictor:
             predict_args["kpt_num"] = self.keypoints_number
             
         results = self.model.predict(**predict_args)
+        if len(results) == 0:
+            return RawPredictions.empty()
         
-        # 提取预测结果
-        predictions = []
-        if len(results) > 0:
-            result = results[0]
-            boxes = result.boxes
-            
-            for i in range(len(boxes)):
-                box = boxes[i]
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                conf = box.conf[0].cpu().numpy()
-                cls = box.cls[0].cpu().numpy()
-                
-                # 创建边界框对象
-                bbox = BoundingBox(
-                    x1=float(x1),
-                    y1=float(y1),
-                    x2=float(x2),
-                    y2=float(y2),
-                    class_id=int(cls),
-                    confidence=float(conf)
-                )
-                
-                # 检查是否有关键点数据
-                if hasattr(result, 'keypoints') and result.keypoints is not None:
-                    try:
-                        # 提取关键点数据
-                        keypoints = result.keypoints[i].data[0].cpu().numpy()
-                        # 只保留 x, y 坐标，去掉置信度
-                        if len(keypoints) > 0:
-                            # 转换为只包含 x, y 的数组
-                            keypoints_xy = keypoints[:, :2]
-                            # 设置边界框的关键点
-                            bbox.set_keypoints(keypoints_xy)
-                            logger.info(f"检测到 {len(keypoints_xy)} 个特征点")
-                    except Exception as e:
-                        logger.error(f"提取特征点时出错: {str(e)}")
-                
-                predictions.append(bbox)
+        # 一次性提取所有候选框
+        result = results[0]
+        boxes = result.boxes
+        keypoints = None
+        if hasattr(result, 'keypoints') and result.keypoints is not None:
+            try:
+                # 只保留 x, y 坐标，去掉置信度
+                keypoints = result.keypoints.data.cpu().numpy()[:, :, :2]
+            except Exception as e:
+                logger.error(f"提取特征点时出错: {str(e)}")
         
-        return predictions
+        return RawPredictions(
+            boxes.xyxy.cpu().numpy(),
+            boxes.conf.cpu().numpy(),
+            boxes.cls.cpu().numpy(),
+            keypoints
+        )
     
     def _predict_onnx(self, image_path):
-        """使用ONNX模型预测"""
+        """使用ONNX模型预测，返回原始候选框"""
         # 加载并预处理图像
         image = Image.open(image_path).convert('RGB')
         img = np.array(image)
@@ -218,35 +299,13 @@ class YOLOPredictor:
         outputs = self.model.run(None, {input_name: img})
         
         # 解析输出 (具体解析方式取决于模型输出格式)
-        # 这里假设输出格式为 [batch_id, x1, y1, x2, y2, confidence, class_id]
-        predictions = []
+        # 这里假设输出格式为 [x1, y1, x2, y2, confidence, class_id]，坐标为归一化值
+        if len(outputs) == 0 or len(outputs[0]) == 0:
+            return RawPredictions.empty()
         
-        # 获取原始图像尺寸
-        img_height, img_width = image.height, image.width
+        detections = np.asarray(outputs[0], dtype=np.float32).reshape(-1, outputs[0].shape[-1])
+        detections = detections[detections[:, 4] >= RAW_CONF_THRESHOLD]
         
-        if len(outputs) > 0 and len(outputs[0]) > 0:
-            detections = outputs[0]
-            
-            # 应用置信度阈值
-            valid_detections = detections[detections[:, 4] > self.conf_threshold]
-            
-            for detection in valid_detections:
-                x1, y1, x2, y2, conf = detection[:5]
-                cls_id = int(detection[5])
-                
-                # 将坐标转换为原始图像尺寸
-                x1 = float(x1 * img_width)
-                y1 = float(y1 * img_height)
-                x2 = float(x2 * img_width)
-                y2 = float(y2 * img_height)
-                
-                predictions.append({
-                    'x1': x1,
-                    'y1': y1,
-                    'x2': x2,
-                    'y2': y2,
-                    'confidence': float(conf),
-                    'class_id': cls_id
-                })
-        
-        return predictions
\ No newline at end of file
+        # 将坐标转换为原始图像尺寸
+        scale = np.array([image.width, image.height, image.width, image.height], dtype=np.float32)
+        return RawPredictions(detections[:, :4] * scale, detections[:, 4], detections[:, 5])
\ No newline at end of file